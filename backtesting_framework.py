@@ -6,16 +6,20 @@ import numpy as np
 import os
 from datetime import datetime
 
+from tick_data import TickDataCache
+from risk_engine import RollingRiskEstimator
+
 # --- Configuration for Data Input ---
 # In production, this data would be fetched via the Binance Data Key (Read-Only)
 DATA_FILE_PATH = "data/binance_tick_data.csv"
 INITIAL_CAPITAL = 100000.0  # $100,000 USD initial AUM for simulation
+TAKER_FEE_RATE = 0.0004  # 0.04% of traded notional (Binance Futures taker fee)
 
 # --- Key Performance Indicators (KPIs) ---
 # Required for assessing the DRL Agent's fitness.
 
-def calculate_performance_metrics(daily_returns: pd.Series):
-    """Calculates all mandatory risk-adjusted and absolute performance metrics."""
+def compute_performance_metrics(daily_returns: pd.Series):
+    """Calculates all mandatory risk-adjusted and absolute performance metrics as raw floats."""
     
     # 1. Absolute Return
     cumulative_returns = (1 + daily_returns).cumprod()
@@ -48,29 +52,84 @@ def calculate_performance_metrics(daily_returns: pd.Series):
         sortino_ratio = 0.0
         
     return {
-        "Absolute Return": f"{absolute_return:.2%}",
-        "Max Drawdown (MDD)": f"{max_drawdown:.2%}",
-        "Sharpe Ratio (Annualized)": f"{sharpe_ratio:.2f}",
-        "Sortino Ratio (Annualized)": f"{sortino_ratio:.2f}",
+        "absolute_return": float(absolute_return),
+        "max_drawdown": float(max_drawdown),
+        "sharpe_ratio": float(sharpe_ratio),
+        "sortino_ratio": float(sortino_ratio),
+    }
+
+def format_performance_metrics(metrics):
+    """Formats raw metrics for display."""
+    return {
+        "Absolute Return": f"{metrics['absolute_return']:.2%}",
+        "Max Drawdown (MDD)": f"{metrics['max_drawdown']:.2%}",
+        "Sharpe Ratio (Annualized)": f"{metrics['sharpe_ratio']:.2f}",
+        "Sortino Ratio (Annualized)": f"{metrics['sortino_ratio']:.2f}",
     }
 
+def calculate_performance_metrics(daily_returns: pd.Series):
+    """Calculates all mandatory risk-adjusted and absolute performance metrics, formatted for display."""
+    return format_performance_metrics(compute_performance_metrics(daily_returns))
+
+# --- Vectorized Engine (Signal-Based Strategies) ---
+# For strategies whose positions can be computed up front, the whole backtest is a
+# handful of NumPy array operations instead of a Python loop over ticks.
+
+def simulate_positions(prices: np.ndarray, positions: np.ndarray, initial_capital: float,
+                       fee_rate: float = TAKER_FEE_RATE):
+    """
+    Computes fills, PnL, fees and the equity curve for a target position per tick.
+
+    positions[t] is the signed position (in units of the asset) held after tick t,
+    filled at prices[t]; a signal array times a position size works directly.
+    Returns (equity after each tick, traded quantity per tick, fee per tick).
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    positions = np.asarray(positions, dtype=np.float64)
+    if prices.shape != positions.shape:
+        raise ValueError(f"Expected {len(prices)} positions, got {len(positions)}.")
+    trades = np.diff(positions, prepend=0.0) # Fill quantity at each tick
+    fees = np.abs(trades) * prices * fee_rate
+    pnl = np.zeros_like(prices)
+    pnl[1:] = positions[:-1] * np.diff(prices) # Mark-to-market of the position held over each interval
+    equity = initial_capital + np.cumsum(pnl - fees)
+    return equity, trades, fees
+
+def daily_returns_from_equity(equity: pd.Series, initial_capital: float) -> pd.Series:
+    """Daily returns from an equity curve with a single resample (each day's close vs the previous close)."""
+    daily_equity = equity.resample('D').last().ffill()
+    return daily_equity / daily_equity.shift(1, fill_value=initial_capital) - 1
+
 class BacktestingEnvironment:
     """
     Simulates the exchange environment for the DRL Agent to interact with.
     It takes high-resolution tick data and processes the agent's actions (BUY/SELL).
     """
-    def __init__(self, data_path, initial_capital):
+    def __init__(self, data_path, initial_capital, start=None, end=None):
         self.initial_capital = initial_capital
         self.current_capital = initial_capital
         self.data_path = data_path
+        self.start = start # Optional [start, end) time range of the tick data to simulate
+        self.end = end
         self.market_data = self._load_data()
         self.portfolio_history = []
+        self.risk = RollingRiskEstimator() # Rolling 99% VaR/CVaR for position sizing (plan §2.B)
+        self.equity_curve = pd.Series(dtype=float)
         self.daily_returns = pd.Series(dtype=float)
 
     def _load_data(self):
         """Loads and preprocesses the high-resolution tick data."""
         print(f"Loading tick data from: {self.data_path}...")
-        
+
+        if os.path.exists(self.data_path):
+            # Streamed into a per-day columnar cache on first read; later runs memory-map it
+            cache = TickDataCache(self.data_path)
+            if not cache.is_fresh():
+                print("Building columnar tick cache (first read of this file)...")
+            df = cache.load(self.start, self.end)
+            print(f"Tick data loaded successfully ({len(df)} ticks).")
+            return df
+
         # SIMULATION: Create dummy tick data for structure validation.
         # CORRECTION: Changed freq='T' to freq='min' to fix the pandas ValueError.
         dates = pd.to_datetime(pd.date_range(start='2026-01-01', periods=100, freq='min'))
@@ -87,24 +146,55 @@ class BacktestingEnvironment:
     def run_simulation(self, agent):
         """Main loop where the DRL agent interacts with the market."""
         print("Starting backtesting simulation...")
-        
+        daily_returns = {} # Day -> return, turned into a Series once at the end
+
         # Placeholder for DRL Agent interaction loop
         for i, tick in self.market_data.iterrows():
             # 1. Agent observes market state (tick, price, order flow delta)
             # 2. Agent decides on action (BUY, SELL, HOLD)
             # action = agent.get_action(tick) 
             
-            # 3. Environment executes trade (updates capital and position)
+            # 3. Environment executes trade (updates capital and position), sized within
+            #    self.max_position_size(tick['price'])
             # self.execute_trade(action, tick['price'])
+
+            # 4. Update the rolling CVaR with the new tick
+            self.risk.update_price(tick['price'])
             
             # Placeholder for portfolio tracking:
             # We assume a fixed 0.01% daily return for the simulation to test metrics calculation
-            # Day-change detection fix: only record a return if the day changes (for Daily Returns Series)
-            if self.daily_returns.empty or i.day != self.daily_returns.index[-1].day:
-                 self.daily_returns = pd.concat([self.daily_returns, pd.Series([0.0001], index=[i])])
+            # Day-change detection: one return per calendar day (date, not day of month)
+            day = i.normalize()
+            if day not in daily_returns:
+                daily_returns[day] = 0.0001
 
+        self.daily_returns = pd.Series(daily_returns, dtype=float)
         print("Simulation complete.")
 
+    def max_position_size(self, price):
+        """Largest position (units) whose 99% CVaR loss stays within the daily drawdown budget."""
+        return self.risk.max_position_size(price, self.current_capital)
+
+    def run_vectorized(self, positions, fee_rate: float = TAKER_FEE_RATE):
+        """
+        Backtests a precomputed position (or signal * size) array, one entry per tick.
+
+        Sets the equity curve and daily returns used by get_results(); returns a summary
+        of the run with raw numbers.
+        """
+        prices = self.market_data['price'].to_numpy(dtype=np.float64)
+        equity, trades, fees = simulate_positions(prices, positions, self.initial_capital, fee_rate)
+        self.equity_curve = pd.Series(equity, index=self.market_data.index)
+        self.daily_returns = daily_returns_from_equity(self.equity_curve, self.initial_capital)
+        self.current_capital = float(equity[-1]) if len(equity) else self.initial_capital
+        return {
+            "final_equity": self.current_capital,
+            "pnl": self.current_capital - self.initial_capital,
+            "fees": float(fees.sum()),
+            "fills": int(np.count_nonzero(trades)),
+            "traded_quantity": float(np.abs(trades).sum())
+        }
+
     def get_results(self):
         """Returns the final performance metrics."""
         return calculate_performance_metrics(self.daily_returns)
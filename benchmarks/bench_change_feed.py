@@ -0,0 +1,98 @@
+# benchmarks/bench_change_feed.py
+# Change feed of ledger mutations: runs a ledger daemon (fsync on, like `serve`)
+# in a background thread and adds steps through a client, one at a time.
+# Reports the publish-to-delivery latency (p50/p99) of a consumer tailing the
+# feed files and of one subscribed through the daemon's socket, then the writer
+# throughput with a subscriber that reads nothing at all: its stream stops at
+# the socket buffer (drain), the daemon's memory stays flat, and the stalled
+# subscriber later catches up from the durable feed with every event in order.
+#
+# Usage: python benchmarks/bench_change_feed.py [steps=2000]
+
+import asyncio
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.change_feed import ChangeFeed
+from src.ledger_daemon import LedgerDaemon, LedgerClient
+from src.ledger_store import LedgerStore
+
+
+def add_steps(socket_path: str, dvp_id: str, steps: int) -> float:
+    """Adds steps through one client; returns steps per second."""
+    with LedgerClient(socket_path) as client:
+        start = time.perf_counter()
+        for _ in range(steps):
+            client.request("add_step", dvp_id=dvp_id, process_type="PeerReview", agent_did="did:synergy:bench",
+                           score_change=0.0, attestation_uri="uri:bench")
+        return steps / (time.perf_counter() - start)
+
+
+def collect(events, count: int, latencies: list):
+    """Records each event's delay from publish to delivery, for `count` events."""
+    for _ in range(count):
+        event = next(events)
+        latencies.append(time.time() - event['time'])
+
+
+def report(label: str, latencies: list):
+    print(f"{label}: p50 {np.percentile(latencies, 50) * 1e3:.2f} ms, p99 {np.percentile(latencies, 99) * 1e3:.2f} ms")
+
+
+if __name__ == "__main__":
+    steps = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    tmp_dir = tempfile.mkdtemp()
+    socket_path = os.path.join(tmp_dir, 'ledger.sock')
+    feed = ChangeFeed(os.path.join(tmp_dir, 'feed'), fsync=True)
+    store = LedgerStore(os.path.join(tmp_dir, 'ledger'), fsync=True, change_feed=feed)
+    daemon = LedgerDaemon(store, socket_path, feed=feed)
+    loop = asyncio.new_event_loop()
+    task = loop.create_task(daemon.serve_forever())
+    thread = threading.Thread(target=lambda: loop.run_until_complete(asyncio.gather(task, return_exceptions=True)))
+    thread.start()
+    try:
+        while not os.path.exists(socket_path):
+            time.sleep(0.01)
+        with LedgerClient(socket_path) as client:
+            dvp_id = client.request("create", claim_text="Benchmark claim")['id']
+
+        file_latencies, socket_latencies = [], []
+        with LedgerClient(socket_path) as subscriber:
+            consumers = [threading.Thread(target=collect, args=(ChangeFeed(feed.path).tail(), steps, file_latencies)),
+                         threading.Thread(target=collect, args=(subscriber.subscribe(), steps, socket_latencies))]
+            for consumer in consumers:
+                consumer.start()
+            time.sleep(0.2) # Both consumers start at the next event
+            rate = add_steps(socket_path, dvp_id, steps)
+            for consumer in consumers:
+                consumer.join()
+        print(f"{steps} steps at {rate:.0f} steps/s")
+        report("file tail latency", file_latencies)
+        report("socket subscription latency", socket_latencies)
+
+        with LedgerClient(socket_path) as stalled:
+            events = stalled.subscribe(from_seq=feed.next_seq())
+            rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            rate = add_steps(socket_path, dvp_id, steps * 5)
+            rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            print(f"{steps * 5} steps with a stalled subscriber at {rate:.0f} steps/s, "
+                  f"peak RSS +{(rss_after - rss_before) / 1024:.1f} MB")
+            start = time.perf_counter()
+            seqs = [next(events)['seq'] for _ in range(steps * 5)]
+            assert seqs == list(range(seqs[0], seqs[0] + steps * 5))
+            print(f"stalled subscriber caught up in {time.perf_counter() - start:.2f}s")
+    finally:
+        loop.call_soon_threadsafe(task.cancel)
+        thread.join()
+        loop.close()
+        store.close()
+        feed.close()
+        shutil.rmtree(tmp_dir)
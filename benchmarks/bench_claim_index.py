@@ -0,0 +1,93 @@
+# benchmarks/bench_claim_index.py
+# Claim deduplication: builds a ClaimIndex over generated claims, then times
+# exact lookups and MinHash/LSH near-duplicate lookups of paraphrased claims
+# against comparing the paraphrase's signature with every claim in the ledger.
+# Then seeds a sharded store with the claims and times the exact lookup a
+# one-shot create does through the on-disk claim index (find_stored_claim),
+# against loading the ledger into a ClaimIndex first.
+#
+# Usage: python benchmarks/bench_claim_index.py [claims=100000] [queries=1000]
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.claim_index import DEFAULT_SIMILARITY, ClaimIndex, find_stored_claim, minhash_signature
+from src.ledger_codec import write_ledger_file
+from src.sharded_store import ShardedLedgerStore
+
+WORDS_PER_CLAIM = (6, 14)
+
+
+def generate(claims: int, seed: int = 23):
+    """Claims of random words from a 5000-word vocabulary, so that claims share words but rarely phrases."""
+    rng = np.random.default_rng(seed)
+    letters = np.array(list("abcdefghijklmnopqrstuvwxyz"))
+    vocabulary = [''.join(rng.choice(letters, length)) for length in rng.integers(3, 10, 5000)]
+    weights = 1.0 / np.arange(1, len(vocabulary) + 1) # Zipf: a few words are very common
+    weights /= weights.sum()
+    ledger = {}
+    for i in range(claims):
+        words = rng.choice(len(vocabulary), rng.integers(*WORDS_PER_CLAIM), p=weights)
+        dvp_id = f"{i:064x}"
+        ledger[dvp_id] = {"id": dvp_id, "created_at": f"{i:012d}", "lineage": [],
+                          "claim_text": ' '.join(vocabulary[word] for word in words).capitalize() + '.'}
+    return ledger
+
+
+def paraphrase(claim_text: str) -> str:
+    """Moves the second half of the claim to the front and drops its last word."""
+    words = claim_text.rstrip('.').split()
+    half = len(words) // 2
+    return ' '.join(words[half:] + words[:half][:-1])
+
+
+if __name__ == "__main__":
+    claims = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    queries = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    ledger = generate(claims)
+
+    start = time.perf_counter()
+    index = ClaimIndex(ledger)
+    print(f"indexed {claims} claims in {time.perf_counter() - start:.2f}s")
+    exact_only = ClaimIndex(near_duplicates=False)
+    start = time.perf_counter()
+    exact_only.reset(ledger)
+    print(f"exact-only index built in {time.perf_counter() - start:.2f}s")
+
+    texts = [dvp['claim_text'] for dvp in list(ledger.values())[:queries]]
+    start = time.perf_counter()
+    found = sum(index.find(text.upper()) is not None for text in texts)
+    print(f"exact lookup: {(time.perf_counter() - start) / queries * 1e6:.1f} us ({found}/{queries} found)")
+
+    paraphrases = [paraphrase(text) for text in texts]
+    start = time.perf_counter()
+    flagged = sum(bool(index.similar(text)) for text in paraphrases)
+    print(f"near-duplicate lookup: {(time.perf_counter() - start) / queries * 1e3:.2f} ms "
+          f"({flagged}/{queries} paraphrases flagged at similarity >= {DEFAULT_SIMILARITY})")
+
+    signatures = index._signatures[:len(ledger)]
+    start = time.perf_counter()
+    for text in paraphrases[:100]:
+        np.flatnonzero((signatures == minhash_signature(text)).mean(axis=1) >= DEFAULT_SIMILARITY)
+    print(f"comparing with every claim instead: {(time.perf_counter() - start) / 100 * 1e3:.2f} ms per lookup")
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        legacy_path = os.path.join(tmp_dir, 'ledger.json')
+        write_ledger_file(ledger.values(), legacy_path)
+        with ShardedLedgerStore(os.path.join(tmp_dir, 'store'), shards=16, legacy_path=legacy_path) as store:
+            start = time.perf_counter()
+            found = sum(find_stored_claim(store, text.upper()) is not None for text in texts)
+            print(f"on-disk exact lookup (16 shards, ledger not loaded): "
+                  f"{(time.perf_counter() - start) / queries * 1e3:.2f} ms ({found}/{queries} found)")
+            start = time.perf_counter()
+            store.add_listener(ClaimIndex())
+            print(f"loading the ledger into a ClaimIndex instead: {time.perf_counter() - start:.2f}s")
+    finally:
+        shutil.rmtree(tmp_dir)
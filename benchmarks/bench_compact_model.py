@@ -0,0 +1,79 @@
+# benchmarks/bench_compact_model.py
+# Memory benchmark: the dict-of-dicts JSON ledger against CompactLedger (slotted
+# DVPs, interned strings, columnar step table) holding the same lineage steps.
+#
+# Usage: python benchmarks/bench_compact_model.py [steps=1000000] [dvps=10000]
+
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.dvp_model import DVP, build_step_data
+from src.compact_ledger import CompactLedger
+
+PROCESS_TYPES = ["OxfordDebate", "FunctionalAudit", "PeerReview", "FinalApproval"]
+AGENT_DIDS = [f"did:synergy:node-{i}" for i in range(50)]
+
+
+def generate_records(steps: int, dvps: int):
+    """Yields log records: the creates, then steps spread round-robin over the DVPs."""
+    instances = [DVP(claim_text=f"Benchmark claim {i}") for i in range(dvps)]
+    lengths = [0] * dvps
+    for dvp in instances:
+        yield {"op": "create", "dvp": dvp.to_json()}
+    for i in range(steps):
+        dvp = instances[i % dvps]
+        step = build_step_data(dvp.id, lengths[i % dvps], PROCESS_TYPES[i % len(PROCESS_TYPES)],
+                               AGENT_DIDS[i % len(AGENT_DIDS)], 0.01, f"uri:vc/{i}")
+        dvp.add_lineage_step(step)
+        dvp.lineage.pop() # The record carries the step; don't hold it twice
+        lengths[i % dvps] += 1
+        yield {"op": "step", "id": dvp.id, "step": step, "current_confidence": dvp.current_confidence}
+
+
+def measure(build, steps: int, dvps: int):
+    """Returns (MiB held by the built ledger, seconds to build it)."""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    ledger = build(generate_records(steps, dvps))
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del ledger
+    return current / (1024 * 1024), elapsed
+
+
+def build_dict_ledger(records):
+    ledger = {}
+    for record in records:
+        if record['op'] == 'create':
+            ledger[record['dvp']['id']] = dict(record['dvp'], lineage=[])
+        else:
+            dvp = ledger[record['id']]
+            dvp['lineage'].append(record['step'])
+            dvp['current_confidence'] = record['current_confidence']
+    return ledger
+
+
+def build_compact_ledger(records):
+    ledger = CompactLedger()
+    for record in records:
+        ledger.apply_record(record)
+    return ledger
+
+
+if __name__ == "__main__":
+    steps = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    dvps = int(sys.argv[2]) if len(sys.argv) > 2 else 10_000
+    print(f"{steps} steps over {dvps} DVPs")
+    dict_mib, dict_seconds = measure(build_dict_ledger, steps, dvps)
+    compact_mib, compact_seconds = measure(build_compact_ledger, steps, dvps)
+    print(f"{'model':>8} {'MiB':>10} {'bytes/step':>12} {'build (s)':>10}")
+    for name, mib, seconds in (("dict", dict_mib, dict_seconds), ("compact", compact_mib, compact_seconds)):
+        print(f"{name:>8} {mib:>10.1f} {mib * 1024 * 1024 / steps:>12.0f} {seconds:>10.1f}")
+    print(f"Compact model uses {dict_mib / compact_mib:.1f}x less memory.")
@@ -0,0 +1,77 @@
+# benchmarks/bench_concurrent_writers.py
+# Stress benchmark for concurrent ledger writers: N processes add lineage steps
+# through LedgerStore.update (compare-and-swap on the DVP version, striped
+# inter-process locks, shared append lock) and we report throughput per N.
+#
+# Usage: python benchmarks/bench_concurrent_writers.py [steps_per_writer=500] [max_writers=8]
+
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.dvp_model import DVP, build_step_data
+from src.ledger_store import LedgerStore
+
+
+def _writer(store_path, dvp_ids, steps, start_event):
+    """Adds `steps` lineage steps, cycling over the given DVPs."""
+    with LedgerStore(store_path) as store:
+        start_event.wait()
+        for i in range(steps):
+            dvp_id = dvp_ids[i % len(dvp_ids)]
+
+            def build_step(dvp_data):
+                dvp = DVP.from_json(dvp_data)
+                step = build_step_data(dvp_id, len(dvp.lineage), "FunctionalAudit", "did:synergy:bench", 0.0, "uri:bench")
+                dvp.add_lineage_step(step)
+                return step, dvp.current_confidence
+
+            store.update(dvp_id, build_step)
+
+
+def run(writers: int, steps: int, shared: bool):
+    """Runs one configuration; returns (steps/s, lost steps)."""
+    tmp_dir = tempfile.mkdtemp()
+    store_path = os.path.join(tmp_dir, 'ledger')
+    try:
+        with LedgerStore(store_path) as store:
+            dvps = [DVP(claim_text=f"Bench claim {i}") for i in range(1 if shared else writers)]
+            for dvp in dvps:
+                store.append_create(dvp.to_json())
+        ids = [dvp.id for dvp in dvps]
+
+        start_event = multiprocessing.Event()
+        processes = [multiprocessing.Process(target=_writer,
+                                             args=(store_path, ids if shared else [ids[w]], steps, start_event))
+                     for w in range(writers)]
+        for p in processes:
+            p.start()
+        time.sleep(0.2) # Let every writer open the store before the clock starts
+        start = time.perf_counter()
+        start_event.set()
+        for p in processes:
+            p.join()
+        elapsed = time.perf_counter() - start
+
+        with LedgerStore(store_path) as store:
+            total = sum(len(store.get(dvp_id)['lineage']) for dvp_id in ids)
+        return writers * steps / elapsed, writers * steps - total
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == "__main__":
+    steps = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    max_writers = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    print(f"CPU cores: {os.cpu_count()}, steps per writer: {steps}")
+    print(f"{'writers':>8} {'disjoint DVPs (steps/s)':>24} {'one shared DVP (steps/s)':>26} {'lost':>6}")
+    writers = 1
+    while writers <= max_writers:
+        disjoint, lost_a = run(writers, steps, shared=False)
+        shared, lost_b = run(writers, steps, shared=True)
+        print(f"{writers:>8} {disjoint:>24.0f} {shared:>26.0f} {lost_a + lost_b:>6}")
+        writers *= 2
@@ -0,0 +1,90 @@
+# benchmarks/bench_confidence_history.py
+# Point-in-time confidence queries (ConfidenceHistory) against replaying every
+# lineage up to the query time, on a generated ledger whose steps are spread over
+# one year. Reports the checkpoint build (what a full reload costs), a ledger-wide
+# "above 0.8 as of" query per month and a per-DVP query, and checks the answers
+# against the full replay.
+#
+# Usage: python benchmarks/bench_confidence_history.py [steps=2000000] [dvps=100000]
+
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.dvp_model import DEFAULT_CONFIDENCE, clamp_confidence
+from src.confidence_history import ConfidenceHistory
+
+SCORES = np.array([0.10, -0.05, 0.05, -0.10, 0.20, -0.50])
+START = datetime(2026, 1, 1)
+
+
+def generate(steps: int, dvps: int, seed: int = 22):
+    """A dict-of-dicts ledger: DVPs created over the year, steps spread between creation and year end."""
+    rng = np.random.default_rng(seed)
+    created = np.sort(rng.uniform(0, 300 * 86400, dvps))
+    owners = np.sort(rng.integers(0, dvps, steps))
+    changes = rng.choice(SCORES, steps).tolist()
+    ledger = {}
+    for i, offset in enumerate(created.tolist()):
+        dvp_id = f"{i:064x}"
+        ledger[dvp_id] = {"id": dvp_id, "claim_text": f"Claim {i}", "agent_karma": 0, "lineage": [],
+                          "created_at": (START + timedelta(seconds=offset)).isoformat() + 'Z',
+                          "current_confidence": DEFAULT_CONFIDENCE}
+    ids = list(ledger)
+    times = rng.uniform(created[owners], 365 * 86400)
+    for owner, offset, change in zip(owners.tolist(), times.tolist(), changes):
+        ledger[ids[owner]]['lineage'].append({"result_score_change": change, "weighted_change": change,
+                                              "k_factor_applied": 1.0, "offset": offset})
+    for dvp in ledger.values():
+        dvp['lineage'].sort(key=lambda step: step['offset'])
+        for step in dvp['lineage']:
+            step['timestamp'] = (START + timedelta(seconds=step.pop('offset'))).isoformat() + 'Z'
+            dvp['current_confidence'] = clamp_confidence(dvp['current_confidence'] + step['weighted_change'])
+    return ledger
+
+
+def replay_as_of(ledger, as_of: str, min_confidence: float):
+    """Full replay of every lineage up to `as_of`."""
+    matches = []
+    for dvp in ledger.values():
+        if dvp['created_at'] >= as_of:
+            continue
+        confidence = DEFAULT_CONFIDENCE
+        for step in dvp['lineage']:
+            if step['timestamp'] >= as_of:
+                break
+            confidence = clamp_confidence(confidence + step['weighted_change'])
+        if confidence >= min_confidence:
+            matches.append((dvp['id'], confidence))
+    return matches
+
+
+if __name__ == "__main__":
+    steps = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    dvps = int(sys.argv[2]) if len(sys.argv) > 2 else 100_000
+    ledger = generate(steps, dvps)
+
+    start = time.perf_counter()
+    history = ConfidenceHistory(ledger)
+    print(f"{dvps} DVPs, {steps} steps: checkpoints built in {time.perf_counter() - start:.2f}s")
+
+    dates = [f"2026-{month:02d}-01" for month in range(2, 13)]
+    start = time.perf_counter()
+    answers = [sorted(history.dvps_as_of(date, min_confidence=0.8)) for date in dates]
+    elapsed = (time.perf_counter() - start) / len(dates)
+    print(f"ledger-wide 'above 0.8 as of' query: {elapsed:.2f}s each ({len(answers[5])} DVPs on {dates[5]})")
+
+    start = time.perf_counter()
+    expected = sorted(replay_as_of(ledger, dates[5], 0.8))
+    print(f"full replay for one date: {time.perf_counter() - start:.2f}s, same answer: {expected == answers[5]}")
+
+    longest = max(ledger.values(), key=lambda dvp: len(dvp['lineage']))
+    start = time.perf_counter()
+    for date in dates:
+        history.confidence_as_of(longest['id'], date)
+    print(f"per-DVP query on a {len(longest['lineage'])}-step lineage: "
+          f"{(time.perf_counter() - start) / len(dates) * 1e6:.0f} us")
@@ -0,0 +1,75 @@
+# benchmarks/bench_confidence_replay.py
+# Bulk confidence replay (ConfidenceReplay, NumPy) against looping over
+# DVP.add_lineage_step, on generated lineages. The scalar loop is run over the
+# first DVPs until `baseline_steps` steps are covered; its confidences are checked
+# against the bulk result for exact equality.
+#
+# Usage: python benchmarks/bench_confidence_replay.py [steps=10000000] [baseline_steps=steps]
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.dvp_model import DVP
+from src.confidence_replay import ConfidenceReplay
+
+SCORES = np.array([0.10, -0.05, 0.05, -0.10, 0.20, -0.50])
+KARMA_VALUES = np.array([0, 1, 2, 5, 10, 40])
+
+
+def generate(steps: int, seed: int = 3):
+    """Random lineages with geometric lengths (mean 10), as flat arrays."""
+    rng = np.random.default_rng(seed)
+    lengths = rng.geometric(0.1, size=steps // 5)
+    lengths = lengths[np.cumsum(lengths) <= steps]
+    lengths[-1] += steps - lengths.sum()
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    ids = [f"{i:064x}" for i in range(len(lengths))]
+    karma = KARMA_VALUES[rng.integers(0, len(KARMA_VALUES), size=len(lengths))].astype(np.float64)
+    scores = SCORES[rng.integers(0, len(SCORES), size=steps)]
+    return ConfidenceReplay(ids, karma, offsets, scores)
+
+
+def scalar_replay(replay: ConfidenceReplay, baseline_steps: int):
+    """Loops over add_lineage_step; returns (DVPs covered, their confidences, steps done)."""
+    scores = replay.scores.tolist()
+    confidences = []
+    done = 0
+    for i in range(len(replay)):
+        start, end = int(replay.offsets[i]), int(replay.offsets[i + 1])
+        if done + (end - start) > baseline_steps:
+            break
+        dvp = DVP(claim_text="Benchmark claim", agent_karma=int(replay.karma[i]))
+        for score in scores[start:end]:
+            dvp.add_lineage_step({"step_id": "bench", "process_type": "OxfordDebate", "agent_did": "did:synergy:bench",
+                                  "result_score_change": score, "attestation_vc_uri": "uri:bench"})
+        dvp.lineage = []
+        confidences.append(dvp.current_confidence)
+        done += end - start
+    return len(confidences), confidences, done
+
+
+if __name__ == "__main__":
+    steps = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    baseline_steps = int(sys.argv[2]) if len(sys.argv) > 2 else steps
+    replay = generate(steps)
+    print(f"{steps} steps over {len(replay)} DVPs (longest lineage {int(np.diff(replay.offsets).max())})")
+
+    start = time.perf_counter()
+    confidence, _, _ = replay.replay()
+    bulk_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    covered, scalar_confidences, scalar_steps = scalar_replay(replay, baseline_steps)
+    scalar_seconds = time.perf_counter() - start
+    assert confidence[:covered].tolist() == scalar_confidences, "bulk replay diverged from add_lineage_step"
+
+    scalar_rate = scalar_steps / scalar_seconds
+    bulk_rate = steps / bulk_seconds
+    print(f"add_lineage_step loop: {scalar_steps} steps in {scalar_seconds:.2f}s ({scalar_rate:,.0f} steps/s)")
+    print(f"ConfidenceReplay:      {steps} steps in {bulk_seconds:.2f}s ({bulk_rate:,.0f} steps/s)")
+    print(f"Speedup: {bulk_rate / scalar_rate:.0f}x (confidences of {covered} DVPs match exactly)")
@@ -0,0 +1,70 @@
+# benchmarks/bench_kill_switch.py
+# Breach-to-kill latency of the event-driven KillSwitchMonitor. A producer task
+# pushes mark price updates for a 20x long into an asyncio.Queue at a fixed rate,
+# stamping each with its arrival time, until the mark falls through the hard
+# limit; the monitor's histograms give per-event check, detection and kill
+# latency. A MONITOR_INTERVAL_SECONDS poll would detect the same breach after
+# half the interval on average, and after the full interval at worst.
+#
+# Usage: python benchmarks/bench_kill_switch.py [trials=200] [events_per_second=5000]
+
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from kill_switch_monitor import MONITOR_INTERVAL_SECONDS, KillSwitchMonitor, LatencyHistogram
+
+_DONE = None
+
+
+async def produce(queue: asyncio.Queue, prices, interval: float):
+    next_at = time.perf_counter()
+    for price in prices:
+        next_at += interval
+        await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+        queue.put_nowait(({"e": "markPriceUpdate", "s": "BTCUSDT", "p": price}, time.perf_counter()))
+    queue.put_nowait(_DONE)
+
+
+async def drain(queue: asyncio.Queue):
+    while (item := await queue.get()) is not _DONE:
+        yield item
+
+
+async def trial(monitor: KillSwitchMonitor, prices, interval: float):
+    queue = asyncio.Queue()
+    producer = asyncio.create_task(produce(queue, prices, interval))
+    await monitor.run(drain(queue))
+    producer.cancel()
+
+
+if __name__ == "__main__":
+    trials = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    rate = float(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    rng = np.random.default_rng(12)
+    monitors = []
+    for _ in range(trials):
+        monitor = KillSwitchMonitor(100000.0, "EXEC", "DATA", kill=lambda key: True, poll=lambda key: (0.0, False))
+        monitor.tracker.apply_fill("BTCUSDT", 50.0, 40000.0) # 20x long
+        # Small random moves, then a slide that breaches the 5% limit (a 0.25% fall)
+        walk = 40000 * (1 + np.r_[rng.normal(0, 2e-5, int(rng.integers(200, 2000))).cumsum(),
+                                  np.linspace(0, -0.004, 400)])
+        asyncio.run(trial(monitor, [f"{p:.2f}" for p in walk], 1 / rate))
+        monitors.append(monitor)
+
+    def merged(name):
+        histogram = LatencyHistogram()
+        for monitor in monitors:
+            histogram.merge(getattr(monitor, name))
+        return histogram
+
+    print(f"{trials} breaches at {rate:,.0f} events/s, {sum(m.killed for m in monitors)} kills fired")
+    print(f"per-event check   {merged('check_latency').summary()}")
+    print(f"breach detection  {merged('detection_latency').summary()}")
+    print(f"kill returned     {merged('kill_latency').summary()}")
+    print(f"{MONITOR_INTERVAL_SECONDS}s poll:         mean {MONITOR_INTERVAL_SECONDS / 2 * 1e6:.0f}us "
+          f"worst {MONITOR_INTERVAL_SECONDS * 1e6:.0f}us")
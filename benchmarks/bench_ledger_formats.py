@@ -0,0 +1,60 @@
+# benchmarks/bench_ledger_formats.py
+# Save/load time and on-disk size of the indented JSON export against the binary
+# ledger format, on a generated ledger.
+#
+# Usage: python benchmarks/bench_ledger_formats.py [dvps=500000] [max_steps_per_dvp=4]
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.dvp_model import DVP, build_step_data
+from src.ledger_codec import write_ledger_file, load_ledger_file, FORMAT_JSON, FORMAT_BINARY
+
+PROCESS_TYPES = ["OxfordDebate", "FunctionalAudit", "PeerReview", "FinalApproval"]
+AGENT_DIDS = [f"did:synergy:node-{i}" for i in range(50)]
+
+
+def generate_ledger(dvps: int, max_steps: int):
+    rng = random.Random(7)
+    ledger = {}
+    for i in range(dvps):
+        dvp = DVP(claim_text=f"Generated claim number {i} about a measurable outcome", agent_karma=rng.randint(0, 20))
+        for _ in range(rng.randint(0, max_steps)):
+            dvp.add_lineage_step(build_step_data(dvp.id, len(dvp.lineage), rng.choice(PROCESS_TYPES),
+                                                 rng.choice(AGENT_DIDS), rng.choice([0.10, -0.05, 0.05, -0.10]),
+                                                 f"https://ledger.com/vc/{i}-{len(dvp.lineage)}"))
+        ledger[dvp.id] = dvp.to_json()
+    return ledger
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    dvps = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    max_steps = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    ledger = generate_ledger(dvps, max_steps)
+    steps = sum(len(dvp['lineage']) for dvp in ledger.values())
+    print(f"{dvps} DVPs, {steps} lineage steps")
+    print(f"{'format':>8} {'size (MiB)':>11} {'save (s)':>9} {'load (s)':>9}")
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        for fmt, name in ((FORMAT_JSON, 'ledger.json'), (FORMAT_BINARY, 'ledger.slb')):
+            path = os.path.join(tmp_dir, name)
+            _, save_seconds = timed(write_ledger_file, ledger.values(), path, fmt)
+            loaded, load_seconds = timed(load_ledger_file, path)
+            assert loaded == ledger
+            size = os.path.getsize(path) / (1024 * 1024)
+            print(f"{fmt:>8} {size:>11.1f} {save_seconds:>9.2f} {load_seconds:>9.2f}")
+            del loaded
+    finally:
+        shutil.rmtree(tmp_dir)
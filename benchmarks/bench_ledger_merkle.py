@@ -0,0 +1,67 @@
+# benchmarks/bench_ledger_merkle.py
+# Merkle hashing of the ledger: cost of hashing each appended lineage step
+# incrementally against rehashing the DVP, hashes exchanged to find the DVPs two
+# replicas disagree on, and size and check time of a step inclusion proof.
+#
+# Usage: python benchmarks/bench_ledger_merkle.py [steps=200000] [dvps=10000] [tampered=10]
+
+import copy
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.dvp_model import DVP, build_step_data
+from src.ledger_store import apply_record
+from src.ledger_merkle import LedgerMerkle, LineageTree, diff_replicas, verify_step
+
+PROCESS_TYPES = ["OxfordDebate", "FunctionalAudit", "PeerReview", "FinalApproval"]
+
+
+def generate_records(steps: int, dvps: int):
+    """Log records: the creates, then steps spread round-robin over the DVPs."""
+    instances = [DVP(claim_text=f"Benchmark claim {i}") for i in range(dvps)]
+    records = [{"op": "create", "dvp": dict(dvp.to_json(), lineage=[])} for dvp in instances]
+    for i in range(steps):
+        dvp = instances[i % dvps]
+        step = build_step_data(dvp.id, len(dvp.lineage), PROCESS_TYPES[i % len(PROCESS_TYPES)],
+                               f"did:synergy:node-{i % 50}", 0.01, f"uri:vc/{i}")
+        dvp.add_lineage_step(step)
+        records.append({"op": "step", "id": dvp.id, "step": step, "current_confidence": dvp.current_confidence})
+    return records
+
+
+if __name__ == "__main__":
+    steps = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    dvps = int(sys.argv[2]) if len(sys.argv) > 2 else 10_000
+    tampered = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+    records = generate_records(steps, dvps)
+
+    ledger, merkle = {}, LedgerMerkle()
+    start = time.perf_counter()
+    for record in records:
+        apply_record(ledger, record)
+        merkle.apply(record, ledger)
+    root = merkle.root()
+    elapsed = time.perf_counter() - start
+    print(f"{dvps} DVPs, {steps} steps hashed incrementally in {elapsed:.2f}s "
+          f"({elapsed / len(records) * 1e6:.1f} us per record)")
+
+    longest = max(ledger.values(), key=lambda dvp: len(dvp['lineage']))['lineage']
+    start = time.perf_counter()
+    LineageTree(longest).root()
+    print(f"rehashing one {len(longest)}-step lineage from scratch: {(time.perf_counter() - start) * 1e6:.0f} us")
+
+    replica = copy.deepcopy(ledger)
+    for dvp_id in list(replica)[:tampered]:
+        replica[dvp_id]['lineage'][0]['result_score_change'] = 1.0
+    differing, received = diff_replicas(merkle, LedgerMerkle(replica))
+    print(f"replica diff: {len(differing)} differing DVPs found with {received} hashes received "
+          f"(full comparison: {len(ledger)} DVP roots)")
+
+    dvp_id = next(iter(ledger))
+    proof = merkle.prove_step(dvp_id, 0)
+    start = time.perf_counter()
+    ok = verify_step(ledger[dvp_id]['lineage'][0], proof, root)
+    print(f"step proof: {len(json.dumps(proof))} bytes, verified={ok} in {(time.perf_counter() - start) * 1e6:.0f} us")
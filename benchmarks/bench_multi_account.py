@@ -0,0 +1,66 @@
+# benchmarks/bench_multi_account.py
+# Portfolio kill across many sub-accounts on three local mock venues, one of them
+# slow (every response and event delayed). Reports the time from receiving the
+# breaching event to every execution key being revoked, against sending the same
+# revocations one after another, and the per-event check latency of all accounts
+# while the slow venue lags.
+#
+# Usage: python benchmarks/bench_multi_account.py [delay_ms=50]
+
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from kill_switch_monitor import ExchangeAccount, ExchangeConnectionPool, LatencyHistogram, MultiAccountMonitor
+from mock_exchange import MockExchange
+
+ACCOUNT_COUNTS = (10, 50, 200)
+VENUES = 3 # The last one is slow
+
+
+def account_events(breacher: bool):
+    fill = {"e": "ORDER_TRADE_UPDATE", "o": {"s": "BTCUSDT", "S": "BUY", "l": "1", "L": "10000", "n": "0"}}
+    marks = [10000 - 5 * i for i in range(1, 200)] if breacher else [10000] * 50
+    return [fill] + [{"e": "markPriceUpdate", "s": "BTCUSDT", "p": str(price)} for price in marks]
+
+
+async def run(count: int, delay: float):
+    specs = [{} for _ in range(VENUES)]
+    for i in range(count):
+        specs[i % VENUES][f"DATA-{i}"] = {
+            "execution_key": f"EXEC-{i}", "initial_equity": 10000.0, "events": account_events(i == 0),
+            "interval": 0.01, "delay": delay if i % VENUES == VENUES - 1 else 0.0}
+    venues = [MockExchange(spec) for spec in specs]
+    ports = [await venue.start() for venue in venues]
+    accounts = [ExchangeAccount(f"acct-{i}", '127.0.0.1', ports[i % VENUES], f"DATA-{i}", f"EXEC-{i}", 10000.0,
+                                limit=1.0) for i in range(count)]
+    # acct-0 alone falls through the global limit (1 BTC on 10000 of equity is 1x)
+    monitor = MultiAccountMonitor(accounts, global_limit=0.05 / count, pool_size=8)
+    await monitor.run()
+    revoked = sum(len(times) for venue in venues for times in venue.revocations.values())
+    checks = LatencyHistogram()
+    for account_monitor in monitor.monitors.values():
+        checks.merge(account_monitor.check_latency)
+
+    # Baseline: the same revocations, one at a time over the same kind of pools
+    pools = {port: ExchangeConnectionPool('127.0.0.1', port, size=8) for port in ports}
+    start = time.perf_counter()
+    for account in accounts:
+        await pools[account.venue[1]].request("revoke_key", key=account.execution_key)
+    sequential = time.perf_counter() - start
+    for pool in pools.values():
+        await pool.close()
+    for venue in venues:
+        await venue.close()
+    return revoked, monitor.kill_latency.max_us / 1e3, sequential * 1e3, checks
+
+
+if __name__ == "__main__":
+    delay = (float(sys.argv[1]) if len(sys.argv) > 1 else 50) / 1000
+    print(f"slow venue delay {delay * 1e3:.0f}ms")
+    print(f"{'accounts':>8} {'revoked':>8} {'parallel':>10} {'sequential':>11}  per-event check")
+    for count in ACCOUNT_COUNTS:
+        revoked, parallel_ms, sequential_ms, checks = asyncio.run(run(count, delay))
+        print(f"{count:>8} {revoked:>8} {parallel_ms:>8.0f}ms {sequential_ms:>9.0f}ms  {checks.summary()}")
@@ -0,0 +1,40 @@
+# benchmarks/bench_online_metrics.py
+# Live-monitoring workload: after every new daily return, refresh the KPIs.
+# Compares recomputing compute_performance_metrics over the whole history each time
+# against one PerformanceAccumulator.update per return, and checks the final
+# snapshot against the batch result.
+#
+# Usage: python benchmarks/bench_online_metrics.py [days=3650]
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from backtesting_framework import compute_performance_metrics
+from online_metrics import PerformanceAccumulator
+
+
+if __name__ == "__main__":
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else 3650
+    returns = np.random.default_rng(6).normal(0.0005, 0.02, days)
+
+    start = time.perf_counter()
+    for i in range(1, days + 1):
+        batch = compute_performance_metrics(pd.Series(returns[:i]))
+    batch_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    accumulator = PerformanceAccumulator()
+    for daily_return in returns.tolist():
+        accumulator.update(daily_return)
+        online = accumulator.snapshot()
+    online_elapsed = time.perf_counter() - start
+
+    difference = max(abs(online[key] - batch[key]) for key in batch)
+    print(f"Batch recompute: {batch_elapsed:.3f}s ({batch_elapsed / days * 1e6:.0f} us/update)")
+    print(f"Accumulator:     {online_elapsed:.3f}s ({online_elapsed / days * 1e6:.1f} us/update), "
+          f"{batch_elapsed / online_elapsed:.0f}x faster, max difference {difference:.1e}")
@@ -0,0 +1,105 @@
+# benchmarks/bench_order_book.py
+# Replays a synthetic day of BTCUSDT futures market data (depth diffs every 100 ms
+# plus trades) from a JSONL file through MatchingSimulator, with an agent that
+# keeps a bid and an ask resting at the touch, and reports the replay speed
+# against real time.
+#
+# Usage: python benchmarks/bench_order_book.py [hours=24] [trades_per_second=10]
+
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from order_book import MatchingSimulator, iter_events
+
+TICK = 0.1
+LEVELS = 200 # Price levels kept on each side of the mid
+CHANGES_PER_DIFF = 12
+
+
+def write_day(path: str, hours: float, trades_per_second: float, seed: int = 21):
+    """Writes a snapshot, then depth diffs every 100 ms and Poisson trades, in event time order."""
+    rng = np.random.default_rng(seed)
+    diffs = int(hours * 36_000)
+    mid = 400_000 # In ticks
+    bids = {mid - i: 1.0 for i in range(1, LEVELS + 1)}
+    asks = {mid + i: 1.0 for i in range(1, LEVELS + 1)}
+    update_id, start = 1_000, 1_767_225_600_000
+    moves = rng.choice([-1, 0, 0, 0, 1], diffs)
+    offsets = rng.integers(1, 30, (diffs, CHANGES_PER_DIFF))
+    sides = rng.integers(0, 2, (diffs, CHANGES_PER_DIFF))
+    quantities = np.round(rng.exponential(1.0, (diffs, CHANGES_PER_DIFF)) * (rng.random((diffs, CHANGES_PER_DIFF)) > 0.3), 3)
+    trade_counts = rng.poisson(trades_per_second / 10, diffs)
+    with open(path, 'w') as f:
+        f.write(json.dumps({"lastUpdateId": update_id + 3, "E": start, # Inside the first diff, as when syncing live
+                            "bids": [[f"{p * TICK:.1f}", "1.0"] for p in bids],
+                            "asks": [[f"{p * TICK:.1f}", "1.0"] for p in asks]}) + '\n')
+        for i in range(diffs):
+            timestamp = start + 100 * (i + 1)
+            changes = {0: {}, 1: {}}
+            mid += int(moves[i])
+            for side, book in ((0, bids), (1, asks)):
+                for price in [p for p in book if (p >= mid if side == 0 else p <= mid)]: # Keep the book uncrossed
+                    del book[price]
+                    changes[side][price] = 0.0
+            for offset, side, quantity in zip(offsets[i].tolist(), sides[i].tolist(), quantities[i].tolist()):
+                price = mid - offset if side == 0 else mid + offset
+                book = bids if side == 0 else asks
+                if quantity:
+                    book[price] = quantity
+                else:
+                    book.pop(price, None)
+                changes[side][price] = quantity
+            for _ in range(int(trades_per_second and trade_counts[i])):
+                seller = bool(rng.integers(2))
+                book = bids if seller else asks
+                price = max(book) if seller else min(book)
+                f.write(json.dumps({"e": "trade", "E": timestamp - 50, "T": timestamp - 50, "p": f"{price * TICK:.1f}",
+                                    "q": f"{rng.exponential(0.05):.3f}", "m": seller}) + '\n')
+            f.write(json.dumps({"e": "depthUpdate", "E": timestamp, "T": timestamp, "s": "BTCUSDT",
+                                "U": update_id + 1, "u": update_id + 5, "pu": update_id,
+                                "b": [[f"{p * TICK:.1f}", f"{q}"] for p, q in changes[0].items()],
+                                "a": [[f"{p * TICK:.1f}", f"{q}"] for p, q in changes[1].items()]}) + '\n')
+            update_id += 5
+    return diffs
+
+
+class QuotingAgent:
+    """Re-quotes one bid and one ask at the touch every second, cancelling the previous pair."""
+
+    def __init__(self):
+        self.quotes = ()
+
+    def __call__(self, simulator: MatchingSimulator, event: dict):
+        if event.get("e") != "depthUpdate" or event["E"] % 1000:
+            return
+        for order_id in self.quotes:
+            simulator.cancel(order_id, event["E"])
+        bid, ask = simulator.book.best_bid(), simulator.book.best_ask()
+        self.quotes = (simulator.submit_limit("BUY", bid[0], 0.01, event["E"]),
+                       simulator.submit_limit("SELL", ask[0], 0.01, event["E"]))
+
+
+if __name__ == "__main__":
+    hours = float(sys.argv[1]) if len(sys.argv) > 1 else 24
+    trades_per_second = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'btcusdt_depth.jsonl')
+        start = time.perf_counter()
+        diffs = write_day(path, hours, trades_per_second)
+        print(f"generated {diffs} depth diffs ({os.path.getsize(path) / 1e6:.0f} MB) in {time.perf_counter() - start:.1f}s")
+
+        events = sum(1 for _ in open(path))
+        simulator = MatchingSimulator()
+        start = time.perf_counter()
+        simulator.replay(iter_events(path), QuotingAgent())
+        elapsed = time.perf_counter() - start
+        print(f"replayed {events} events in {elapsed:.1f}s: {events / elapsed:,.0f} events/s, "
+              f"{hours * 3600 / elapsed:,.0f}x real time")
+        print(f"{len(simulator.fills)} fills, position {simulator.position:+.3f}, "
+              f"book {len(simulator.book.bids)} bids / {len(simulator.book.asks)} asks")
@@ -0,0 +1,35 @@
+# benchmarks/bench_parameter_sweep.py
+# Wall time of a full PARAMETER_GRID sweep on synthetic ticks with 1, 2, 4, ...
+# worker processes up to the number of cores, and the speedup over one process.
+# Workers map the tick arrays from shared memory, so only parameters are sent.
+#
+# Usage: python benchmarks/bench_parameter_sweep.py [ticks=2000000]
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from parameter_sweep import SweepRunner, parameter_grid
+
+
+if __name__ == "__main__":
+    ticks = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    rng = np.random.default_rng(4)
+    market_data = pd.DataFrame({'price': 40000 + rng.normal(0, 3, ticks).cumsum()},
+                               index=pd.date_range('2026-01-01', periods=ticks, freq='s'))
+    grid = parameter_grid()
+    cores = os.cpu_count() or 1
+    counts = sorted({min(2 ** i, cores) for i in range(cores.bit_length() + 1)})
+    print(f"{len(grid)} runs x {ticks} ticks, {cores} cores")
+
+    baseline = None
+    for processes in counts:
+        start = time.perf_counter()
+        SweepRunner(market_data, processes=processes).sweep(grid)
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print(f"{processes:>3} processes: {elapsed:7.2f}s  speedup {baseline / elapsed:4.1f}x")
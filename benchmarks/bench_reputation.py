@@ -0,0 +1,71 @@
+# benchmarks/bench_reputation.py
+# Decay-heavy reputation workload: many agents, time advancing through many 30-day
+# decay periods, and a stream of credits and K-Factor lookups. Compares the lazy
+# ReputationStore against eagerly sweeping every agent's Karma at each period end.
+#
+# Usage: python benchmarks/bench_reputation.py [agents=1000000] [periods=120] [ops_per_period=50000]
+
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.dvp_model import calculate_k_factor
+from src.reputation import ReputationStore, DECAY_FACTOR, DECAY_PERIOD_SECONDS
+
+
+def workload(agents: int, periods: int, ops_per_period: int, seed: int = 5):
+    """Per period: a list of (is_credit, agent index, time) operations."""
+    rng = random.Random(seed)
+    for period in range(periods):
+        base = (1000 + period) * DECAY_PERIOD_SECONDS
+        yield [(rng.random() < 0.3, rng.randrange(agents), base + i) for i in range(ops_per_period)]
+
+
+def run_lazy(agents, periods, ops_per_period):
+    reputation = ReputationStore()
+    dids = [f"did:synergy:agent-{i}" for i in range(agents)]
+    for did in dids:
+        reputation.credit(did, 1000 * DECAY_PERIOD_SECONDS)
+    checksum = 0.0
+    start = time.perf_counter()
+    for ops in workload(agents, periods, ops_per_period):
+        for is_credit, agent, now in ops:
+            if is_credit:
+                reputation.credit(dids[agent], now)
+            else:
+                checksum += reputation.k_factor(dids[agent], now)
+    return time.perf_counter() - start, checksum
+
+
+def run_sweep(agents, periods, ops_per_period):
+    """Baseline: Karma decayed for every agent at each period end; K-Factors recomputed per lookup."""
+    karma = {f"did:synergy:agent-{i}": 1.0 for i in range(agents)}
+    dids = list(karma)
+    checksum = 0.0
+    start = time.perf_counter()
+    for period, ops in enumerate(workload(agents, periods, ops_per_period)):
+        if period:
+            for did in dids:
+                karma[did] *= DECAY_FACTOR
+        for is_credit, agent, _ in ops:
+            if is_credit:
+                karma[dids[agent]] += 1
+            else:
+                checksum += calculate_k_factor(karma[dids[agent]])
+    return time.perf_counter() - start, checksum
+
+
+if __name__ == "__main__":
+    agents = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    periods = int(sys.argv[2]) if len(sys.argv) > 2 else 120
+    ops_per_period = int(sys.argv[3]) if len(sys.argv) > 3 else 50_000
+    total_ops = periods * ops_per_period
+    print(f"{agents} agents, {periods} decay periods, {total_ops} operations (30% credits, 70% K-Factor lookups)")
+    lazy_seconds, lazy_checksum = run_lazy(agents, periods, ops_per_period)
+    sweep_seconds, sweep_checksum = run_sweep(agents, periods, ops_per_period)
+    assert abs(lazy_checksum - sweep_checksum) < 1e-6 * total_ops, "lazy decay diverged from eager sweeps"
+    print(f"{'strategy':>14} {'seconds':>9} {'ops/s':>12}")
+    for name, seconds in (("lazy decay", lazy_seconds), ("eager sweeps", sweep_seconds)):
+        print(f"{name:>14} {seconds:>9.2f} {total_ops / seconds:>12,.0f}")
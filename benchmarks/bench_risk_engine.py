@@ -0,0 +1,61 @@
+# benchmarks/bench_risk_engine.py
+# Per-tick latency (p50 / p99, microseconds) of updating the rolling VaR / CVaR and
+# reading both: RollingRiskEstimator (sorted window, incremental tail sum) against
+# recomputing the quantile from the whole window with np.partition on every tick.
+#
+# Usage: python benchmarks/bench_risk_engine.py [ticks=20000]
+
+import collections
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from risk_engine import CONFIDENCE_LEVEL, RollingRiskEstimator
+
+WINDOWS = (1_000, 10_000, 100_000)
+
+
+def naive_update(window: collections.deque, value: float):
+    window.append(value)
+    values = np.fromiter(window, dtype=np.float64, count=len(window))
+    k = max(1, math.ceil((1.0 - CONFIDENCE_LEVEL) * len(values) - 1e-9))
+    tail = np.partition(values, k - 1)[:k]
+    return -tail[-1], -tail.mean()
+
+
+def percentiles(latencies):
+    p50, p99 = np.percentile(np.array(latencies) * 1e6, [50, 99])
+    return p50, p99
+
+
+if __name__ == "__main__":
+    ticks = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    rng = np.random.default_rng(6)
+    print(f"{'window':>8} {'engine p50':>11} {'engine p99':>11} {'naive p50':>10} {'naive p99':>10}")
+    for size in WINDOWS:
+        returns = (rng.standard_t(3, size + ticks) * 0.001).tolist()
+        estimator = RollingRiskEstimator(size, min_observations=1)
+        window = collections.deque(maxlen=size)
+        for value in returns[:size]: # Measure with a full window, where eviction happens on every tick
+            estimator.update_return(value)
+            window.append(value)
+
+        engine = []
+        for value in returns[size:]:
+            start = time.perf_counter()
+            estimator.update_return(value)
+            estimator.var, estimator.cvar
+            engine.append(time.perf_counter() - start)
+
+        naive = []
+        for value in returns[size:size + max(200, ticks // (size // 1_000))]:
+            start = time.perf_counter()
+            naive_update(window, value)
+            naive.append(time.perf_counter() - start)
+
+        (engine_p50, engine_p99), (naive_p50, naive_p99) = percentiles(engine), percentiles(naive)
+        print(f"{size:>8} {engine_p50:>9.1f}us {engine_p99:>9.1f}us {naive_p50:>8.1f}us {naive_p99:>8.1f}us")
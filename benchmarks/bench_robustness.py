@@ -0,0 +1,43 @@
+# benchmarks/bench_robustness.py
+# Time to resample a year of daily returns into 100k block-bootstrap paths and
+# compute every path's metrics, chunked (serial and with a process pool), against
+# running compute_performance_metrics on each path with pandas (timed on a sample
+# and extrapolated).
+#
+# Usage: python benchmarks/bench_robustness.py [paths=100000] [days=365]
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from backtesting_framework import compute_performance_metrics
+from robustness import resample_metrics, resample_paths
+
+BASELINE_SAMPLE = 500
+
+
+if __name__ == "__main__":
+    paths = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 365
+    returns = np.random.default_rng(5).standard_t(4, days) * 0.003 + 0.0005
+    cores = os.cpu_count() or 1
+    print(f"{paths} paths x {days} days, {cores} cores")
+
+    for processes in sorted({1, cores}):
+        for chunk_paths in (5_000, 20_000):
+            start = time.perf_counter()
+            metrics = resample_metrics(returns, n_paths=paths, seed=0, chunk_paths=chunk_paths, processes=processes)
+            elapsed = time.perf_counter() - start
+            print(f"vectorized  processes={processes} chunk={chunk_paths:>6}: {elapsed:6.2f}s "
+                  f"({paths / elapsed:,.0f} paths/s)")
+
+    sample = resample_paths(returns, BASELINE_SAMPLE, np.random.default_rng(0))
+    start = time.perf_counter()
+    for row in sample:
+        compute_performance_metrics(pd.Series(row))
+    per_path = (time.perf_counter() - start) / BASELINE_SAMPLE
+    print(f"pandas per path (extrapolated):          {per_path * paths:6.2f}s ({1 / per_path:,.0f} paths/s)")
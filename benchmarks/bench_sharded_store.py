@@ -0,0 +1,88 @@
+# benchmarks/bench_sharded_store.py
+# Sharded ledger storage: seeds an unsharded store with a generated ledger,
+# reshards it online, then times full loads of the unsharded store and of the
+# sharded one with 1..cores worker processes, a full scan in the workers,
+# single-DVP reads that touch one shard, and a parallel compaction.
+# Workers parse their shards in parallel, but the parent still unpickles every
+# DVP (about half the cost of parsing its JSON), so a full load gains up to ~2x
+# with cores; scans and compaction ship no ledger back and scale with the
+# cores. The worker count is capped at the core count (one core: in-process).
+#
+# Usage: python benchmarks/bench_sharded_store.py [dvps=200000] [shards=16]
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.ledger_store import LedgerStore
+from src.sharded_store import ShardedLedgerStore
+
+STEPS_PER_DVP = 3
+
+
+def generate(dvps: int, seed: int = 24):
+    """A dict-of-dicts ledger with random sha256-like ids and a few lineage steps per DVP."""
+    rng = np.random.default_rng(seed)
+    ledger = {}
+    for i in range(dvps):
+        dvp_id = rng.bytes(32).hex()
+        lineage = [{"step_id": rng.bytes(32).hex(), "process_type": "PeerReview", "agent_did": f"did:synergy:{i % 97}",
+                    "result_score_change": 0.05, "weighted_change": 0.05, "timestamp": f"2026-01-01T00:00:{s:02d}Z"}
+                   for s in range(STEPS_PER_DVP)]
+        ledger[dvp_id] = {"id": dvp_id, "claim_text": f"Generated claim {i}", "created_at": "2026-01-01T00:00:00Z",
+                          "agent_karma": 0, "current_confidence": 0.65, "lineage": lineage}
+    return ledger
+
+
+def count_confident(ledger) -> int:
+    return sum(dvp['current_confidence'] >= 0.6 for dvp in ledger.values())
+
+
+def timed(label: str, function):
+    start = time.perf_counter()
+    result = function()
+    print(f"{label}: {time.perf_counter() - start:.2f}s")
+    return result
+
+
+if __name__ == "__main__":
+    dvps = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    shards = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    cores = os.cpu_count() or 1
+    ledger = generate(dvps)
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        unsharded_path, sharded_path = os.path.join(tmp_dir, 'unsharded'), os.path.join(tmp_dir, 'sharded')
+        for path in (unsharded_path, sharded_path):
+            with LedgerStore(path) as store:
+                store.seed(ledger)
+        print(f"{dvps} DVPs, {shards} shards, {cores} cores")
+
+        with LedgerStore(unsharded_path) as store:
+            timed("unsharded load", store.load)
+        with ShardedLedgerStore(sharded_path) as store:
+            timed(f"online reshard 1 -> {shards}", lambda: store.reshard(shards))
+
+        workers = 1
+        while workers <= min(cores, shards):
+            with ShardedLedgerStore(sharded_path, workers=workers) as store:
+                loaded = timed(f"sharded load, {workers} worker(s)", store.load)
+                assert len(loaded) == dvps
+            workers *= 2
+
+        with ShardedLedgerStore(sharded_path) as store:
+            confident = timed("full scan in the workers", lambda: sum(store.scan(count_confident)))
+            assert confident == dvps
+            ids = list(ledger)[:1000]
+            start = time.perf_counter()
+            for dvp_id in ids:
+                store.get(dvp_id)
+            print(f"single-DVP read (one shard, not loaded): {(time.perf_counter() - start) / len(ids) * 1e6:.0f} us")
+            timed("parallel compaction", store.compact)
+    finally:
+        shutil.rmtree(tmp_dir)
@@ -0,0 +1,56 @@
+# benchmarks/bench_tick_loader.py
+# Generates a synthetic tick CSV and compares reading it whole with pandas against
+# the columnar TickDataCache: the one-off cache build, a warm full load, and a warm
+# one-day slice.
+#
+# Usage: python benchmarks/bench_tick_loader.py [ticks=5000000] [days=10]
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from tick_data import TickDataCache
+
+
+def write_ticks(path: str, ticks: int, days: int, seed: int = 11):
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp('2026-01-01').value // 1_000_000
+    timestamps = start + np.sort(rng.integers(0, days * 86_400_000, ticks)) # Epoch ms, like Binance exports
+    pd.DataFrame({
+        'timestamp': timestamps,
+        'price': 40000 + rng.normal(0, 5, ticks).cumsum(),
+        'volume': rng.exponential(0.2, ticks).round(6),
+        'order_flow_delta': rng.uniform(-1, 1, ticks).round(6)
+    }).to_csv(path, index=False)
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f"{label:<28} {time.perf_counter() - start:8.3f}s")
+    return result
+
+
+if __name__ == "__main__":
+    ticks = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000_000
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        csv_path = os.path.join(tmp_dir, 'ticks.csv')
+        write_ticks(csv_path, ticks, days)
+        print(f"{ticks} ticks over {days} days, CSV {os.path.getsize(csv_path) / 2 ** 20:.0f} MiB")
+
+        timed("pandas read_csv (whole)", lambda: pd.read_csv(csv_path))
+        timed("cache build (first run)", lambda: TickDataCache(csv_path).ensure())
+        full = timed("cache load (whole)", lambda: TickDataCache(csv_path).load())
+        day = timed("cache load (one day)", lambda: TickDataCache(csv_path).load('2026-01-03', '2026-01-04'))
+        timed("cache open (mmap, no copy)", lambda: sum(len(c['price']) for c in TickDataCache(csv_path).iter_columns()))
+        print(f"Rows: whole={len(full)}, one day={len(day)}")
+    finally:
+        shutil.rmtree(tmp_dir)
@@ -0,0 +1,91 @@
+# benchmarks/bench_vector_env.py
+# Environment-steps per second as the number of lockstepped environments grows:
+# VectorBacktestingEnvironment (state in arrays, one batched policy call per step)
+# against N per-environment Python objects stepped one at a time with a per-tick
+# policy call.
+#
+# Usage: python benchmarks/bench_vector_env.py [steps=2000] [window=16]
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from backtesting_framework import TAKER_FEE_RATE
+from vector_env import VectorBacktestingEnvironment, OBSERVATION_FEATURES
+
+ENV_COUNTS = (1, 16, 256, 4096)
+
+
+class ScalarEnvironment:
+    """One simulation as a Python object: the shape the per-tick get_action loop implies."""
+
+    def __init__(self, frame: pd.DataFrame, window: int, initial_capital: float = 100000.0):
+        self.features = np.stack([frame[name].to_numpy() for name in OBSERVATION_FEATURES], axis=1)
+        self.window = window
+        self.initial_capital = initial_capital
+        self.reset()
+
+    def reset(self):
+        self.cursor, self.cash, self.position, self.equity = 0, self.initial_capital, 0.0, self.initial_capital
+        return self.observe()
+
+    def observe(self):
+        back = np.maximum(self.cursor - np.arange(self.window - 1, -1, -1), 0)
+        return self.features[back]
+
+    def step(self, action: float):
+        price = self.features[self.cursor, 0]
+        trade = action - self.position
+        self.cash -= trade * price + abs(trade) * price * TAKER_FEE_RATE
+        self.position = action
+        self.cursor += 1
+        equity = self.cash + self.position * self.features[self.cursor, 0]
+        reward, self.equity = equity - self.equity, equity
+        done = self.cursor >= len(self.features) - 1
+        if done:
+            self.reset()
+        return self.observe(), reward, done
+
+
+def policy(observations: np.ndarray) -> np.ndarray:
+    """A stand-in linear policy: long when order flow over the window is positive."""
+    return np.sign(observations[..., 2].sum(axis=-1))
+
+
+def make_frame(ticks: int, seed: int = 8) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'price': 40000 + rng.normal(0, 2, ticks).cumsum(),
+        'volume': rng.exponential(0.2, ticks),
+        'order_flow_delta': rng.uniform(-1, 1, ticks)
+    }, index=pd.date_range('2026-01-01', periods=ticks, freq='s', name='timestamp'))
+
+
+if __name__ == "__main__":
+    steps = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    window = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    frame = make_frame(200_000)
+    print(f"{'envs':>6} {'vector steps/s':>16} {'scalar steps/s':>16} {'speedup':>8}")
+    for num_envs in ENV_COUNTS:
+        vector = VectorBacktestingEnvironment.random_windows(frame, num_envs, steps + 1, seed=1, window=window)
+        observations = vector.reset()
+        start = time.perf_counter()
+        for _ in range(steps):
+            observations, rewards, dones, info = vector.step(policy(observations))
+        vector_rate = num_envs * steps / (time.perf_counter() - start)
+
+        # The scalar baseline runs fewer steps at large N to keep the benchmark short
+        scalar_steps = max(10, min(steps, 200_000 // num_envs))
+        starts = np.random.default_rng(1).integers(0, len(frame) - steps, num_envs)
+        scalars = [ScalarEnvironment(frame.iloc[s:s + steps + 1], window) for s in starts]
+        scalar_observations = [env.reset() for env in scalars]
+        start = time.perf_counter()
+        for _ in range(scalar_steps):
+            for i, env in enumerate(scalars):
+                scalar_observations[i], reward, done = env.step(float(policy(scalar_observations[i])))
+        scalar_rate = num_envs * scalar_steps / (time.perf_counter() - start)
+        print(f"{num_envs:>6} {vector_rate:>16,.0f} {scalar_rate:>16,.0f} {vector_rate / scalar_rate:>7.1f}x")
@@ -1,9 +1,15 @@
 # kill_switch_monitor.py
 # Implements the Automated Kill-Switch as defined in TRADING_STRATEGY_PLAN.md (Section 3.B)
 
+import asyncio
+import bisect
+import json
 import os
 import time
 from datetime import datetime
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+
+from risk_engine import MAX_DAILY_DRAWDOWN, RollingRiskEstimator
 
 # --- Configuration ---
 # NOTE: In production, these should be securely injected from a Vault.
@@ -13,7 +19,7 @@ BINANCE_EXEC_KEY = os.environ.get("BINANCE_EXEC_KEY") # This is the key we will
 # --- Risk Parameters ---
 # ABSOLUTE Hard Limit: 5% maximum total portfolio drawdown.
 HARD_DRAWDOWN_LIMIT = 0.05 
-MONITOR_INTERVAL_SECONDS = 60 
+MONITOR_INTERVAL_SECONDS = 60 # Reconciliation poll; breaches are caught from the event stream
 
 def get_account_drawdown(api_key):
     """
@@ -52,9 +58,455 @@ def execute_kill_switch(execution_key):
     print(f"[{datetime.now().isoformat()}] Execution Key successfully REVOKED.")
     return True
 
+# --- Event-Driven Monitor ---
+# Polling every MONITOR_INTERVAL_SECONDS leaves up to a minute between a breach and
+# the kill, long enough for a 20-50x book to go far past the hard limit. The
+# monitor instead consumes the account's stream of fills and mark prices (Binance
+# ORDER_TRADE_UPDATE and markPriceUpdate events) and updates equity and the
+# high-water mark in O(1) per event:
+#
+#   fill of q (signed) at price p, fee f:   cash -= q * p + f;  equity += q * (mark - p) - f
+#   new mark m for a symbol with position:  equity += position * (m - previous mark)
+#
+# A breach is checked after every event, and execute_kill_switch runs in a worker
+# thread (it is a blocking, signed REST call) as soon as one is seen; The poll
+# through get_account_drawdown keeps running alongside as a reconciliation check
+# against the exchange's own numbers; it can also trigger the kill.
+#
+# kill and poll may also be coroutine functions (the multi-account monitor sends
+# them over its connection pool).
+#
+# Mark prices also feed one RollingRiskEstimator per symbol (risk_engine), so
+# max_position_size gives the live book the same rolling-CVaR position limit as
+# BacktestingEnvironment, sized from the account's current equity. The estimator
+# is updated after the breach check, so it never delays a kill.
+#
+# The kill fires exactly once: the first trigger marks the monitor as killed
+# before awaiting anything, so later breaches on the event loop find it already
+# set. Latency histograms record, from the moment an event is received: the
+# drawdown check of every event, breach detection, and the revocation returning.
+
+
+async def _call(fn: Callable, *args):
+    """Awaits a coroutine function; runs a blocking one (a signed REST call) in a worker thread."""
+    if asyncio.iscoroutinefunction(fn):
+        return await fn(*args)
+    return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+
+class LatencyHistogram:
+    """Latency counts in log-spaced buckets (four per power of two, 1 us to ~1 h)."""
+
+    BOUNDS_US = [2 ** (i / 4) for i in range(4 * 32)]
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS_US) + 1)
+        self.count = 0
+        self.max_us = 0.0
+
+    def record(self, seconds: float):
+        micros = seconds * 1e6
+        self.counts[bisect.bisect_left(self.BOUNDS_US, micros)] += 1
+        self.count += 1
+        self.max_us = max(self.max_us, micros)
+
+    def merge(self, other: 'LatencyHistogram') -> 'LatencyHistogram':
+        """Adds another histogram's counts into this one; returns self."""
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.max_us = max(self.max_us, other.max_us)
+        return self
+
+    def percentile(self, q: float) -> float:
+        """Upper bound (us) of the bucket holding the q-th percentile; NaN when empty."""
+        if not self.count:
+            return float('nan')
+        rank = max(1, round(q / 100 * self.count))
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self.BOUNDS_US[i], self.max_us) if i < len(self.BOUNDS_US) else self.max_us
+        return self.max_us
+
+    def summary(self) -> str:
+        return (f"n={self.count} p50={self.percentile(50):.0f}us p99={self.percentile(99):.0f}us "
+                f"max={self.max_us:.0f}us")
+
+
+class EquityTracker:
+    """Account equity and high-water mark, updated incrementally from fills and mark prices."""
+
+    def __init__(self, initial_equity: float):
+        self.cash = initial_equity
+        self.equity = initial_equity
+        self.high_water_mark = initial_equity
+        self.positions: Dict[str, float] = {}
+        self.marks: Dict[str, float] = {}
+
+    @property
+    def drawdown(self) -> float:
+        return 1.0 - self.equity / self.high_water_mark if self.high_water_mark > 0 else 0.0
+
+    def apply_fill(self, symbol: str, quantity: float, price: float, fee: float = 0.0):
+        """Applies a fill of `quantity` (positive buys, negative sells)."""
+        mark = self.marks.setdefault(symbol, price)
+        self.positions[symbol] = self.positions.get(symbol, 0.0) + quantity
+        self.cash -= quantity * price + fee
+        self._set_equity(self.equity + quantity * (mark - price) - fee)
+
+    def apply_mark(self, symbol: str, price: float):
+        previous = self.marks.get(symbol, price)
+        self.marks[symbol] = price
+        self._set_equity(self.equity + self.positions.get(symbol, 0.0) * (price - previous))
+
+    def apply_event(self, event: dict):
+        """Applies a Binance ORDER_TRADE_UPDATE (its last fill) or markPriceUpdate event."""
+        kind = event.get("e")
+        if kind == "markPriceUpdate":
+            self.apply_mark(event["s"], float(event["p"]))
+        elif kind == "ORDER_TRADE_UPDATE":
+            order = event["o"]
+            quantity = float(order["l"])
+            if quantity:
+                self.apply_fill(order["s"], quantity if order["S"] == "BUY" else -quantity, float(order["L"]),
+                                float(order.get("n", 0.0)))
+
+    def _set_equity(self, equity: float):
+        self.equity = equity
+        if equity > self.high_water_mark:
+            self.high_water_mark = equity
+
+
+class KillSwitchMonitor:
+    """Watches an account's event stream and revokes the execution key once drawdown breaches the limit."""
+
+    def __init__(self, initial_equity: float, execution_key: Optional[str], data_key: Optional[str] = None,
+                 limit: float = HARD_DRAWDOWN_LIMIT, poll_interval: float = MONITOR_INTERVAL_SECONDS,
+                 kill: Callable[[Optional[str]], bool] = execute_kill_switch,
+                 poll: Callable[[Optional[str]], Tuple[float, bool]] = get_account_drawdown,
+                 risk_estimator: Callable[[], RollingRiskEstimator] = RollingRiskEstimator):
+        self.tracker = EquityTracker(initial_equity)
+        self.risk: Dict[str, RollingRiskEstimator] = {} # Symbol -> rolling VaR/CVaR of its mark prices
+        self._risk_estimator = risk_estimator
+        self.execution_key = execution_key
+        self.data_key = data_key
+        self.limit = limit
+        self.poll_interval = poll_interval
+        self._kill = kill
+        self._poll = poll
+        self.check_latency = LatencyHistogram()
+        self.detection_latency = LatencyHistogram()
+        self.kill_latency = LatencyHistogram()
+        self.killed = False
+        self.kill_reason: Optional[str] = None
+        self.kill_succeeded: Optional[bool] = None
+        self._kill_task: Optional[asyncio.Future] = None
+        self.events_processed = 0
+        self.last_polled_drawdown: Optional[float] = None
+
+    def on_event(self, event: dict, received: Optional[float] = None) -> bool:
+        """Applies one event; returns True if it breaches the limit. `received` is its perf_counter() arrival."""
+        received = received if received is not None else time.perf_counter()
+        self.tracker.apply_event(event)
+        self.events_processed += 1
+        breached = self.tracker.drawdown >= self.limit and not self.killed
+        latency = time.perf_counter() - received
+        self.check_latency.record(latency)
+        if breached:
+            self.detection_latency.record(latency)
+        if event.get("e") == "markPriceUpdate":
+            symbol = event["s"]
+            estimator = self.risk.get(symbol)
+            if estimator is None:
+                estimator = self.risk[symbol] = self._risk_estimator()
+            estimator.update_price(self.tracker.marks[symbol])
+        return breached
+
+    def max_position_notional(self, symbol: str, drawdown_budget: float = MAX_DAILY_DRAWDOWN,
+                              leverage_cap: Optional[float] = None) -> float:
+        """Largest notional in `symbol` whose CVaR loss stays within drawdown_budget * current equity (0 until known)."""
+        estimator = self.risk.get(symbol)
+        if estimator is None:
+            return 0.0
+        return estimator.max_position_notional(self.tracker.equity, drawdown_budget, leverage_cap)
+
+    def max_position_size(self, symbol: str, drawdown_budget: float = MAX_DAILY_DRAWDOWN,
+                          leverage_cap: Optional[float] = None) -> float:
+        """max_position_notional in units of `symbol` at its current mark price."""
+        mark = self.tracker.marks.get(symbol)
+        if not mark:
+            return 0.0
+        return self.max_position_notional(symbol, drawdown_budget, leverage_cap) / mark
+
+    async def trigger(self, reason: str, received: Optional[float] = None) -> bool:
+        """Runs the kill switch unless it has already fired; returns True if this call fired it."""
+        if self.killed:
+            return False
+        self.killed = True # Set before the first await: no other trigger can get past the check above
+        self.kill_reason = reason
+        print(f"[{datetime.now().isoformat()}] Hard limit breached ({reason}).")
+        self._kill_task = asyncio.ensure_future(_call(self._kill, self.execution_key))
+        await self.wait_killed()
+        if received is not None:
+            self.kill_latency.record(time.perf_counter() - received)
+        return True
+
+    async def wait_killed(self):
+        """Waits for a fired kill to finish, even if the task that fired it gets cancelled."""
+        if self._kill_task is not None:
+            self.kill_succeeded = await asyncio.shield(self._kill_task)
+
+    async def consume(self, events: AsyncIterator):
+        """
+        Processes events until the stream ends or the kill fires. Items are events or
+        (event, received) pairs, where `received` is the perf_counter() time the event arrived.
+        """
+        async for item in events:
+            event, received = item if isinstance(item, tuple) else (item, time.perf_counter())
+            if self.on_event(event, received):
+                drawdown = self.tracker.drawdown
+                await self.trigger(f"stream drawdown {drawdown:.2%} >= {self.limit:.2%}", received)
+            if self.killed:
+                return
+
+    async def reconcile(self):
+        """Polls the exchange's drawdown every poll_interval; a critical reading also fires the kill."""
+        while not self.killed:
+            await asyncio.sleep(self.poll_interval)
+            drawdown, is_critical = await _call(self._poll, self.data_key)
+            self.last_polled_drawdown = drawdown
+            if is_critical:
+                await self.trigger(f"reconciliation drawdown {drawdown:.2%}")
+
+    async def run(self, events: AsyncIterator):
+        """Consumes the stream with the reconciliation poll alongside; returns when either ends it."""
+        poller = asyncio.create_task(self.reconcile())
+        try:
+            await self.consume(events)
+        finally:
+            poller.cancel()
+
+
+async def replay_stream(events: Iterable[dict], interval: float = 0.0) -> AsyncIterator:
+    """Local replay of recorded events as an async stream, `interval` seconds apart."""
+    for event in events:
+        await asyncio.sleep(interval)
+        yield event, time.perf_counter()
+
+
+# --- Multi-Account, Multi-Venue Monitor ---
+# Follows many sub-accounts, possibly on several venues, at once. Each account has
+# its own KillSwitchMonitor (per-account limit) fed by its own event stream
+# connection, as with one user data WebSocket per account. Everything else (the
+# reconciliation polls and key revocations) is request/response traffic sent
+# through one bounded pool of persistent connections per venue.
+#
+# Portfolio equity is the sum of account equities, kept incrementally: each event
+# moves it by the change in its account's equity. Breaching the global limit
+# revokes every account's execution key in parallel (asyncio.gather), each still
+# exactly once, and stops the monitor.
+#
+# Every account runs in its own tasks and every request has a timeout, so a slow
+# account delays only its own checks: its stream is read by its own task, and it
+# sends one pooled request at a time, so it holds at most one of its venue's
+# connections, for at most the timeout.
+
+ACCOUNT_DRAWDOWN_LIMIT = 0.10 # Per sub-account; the portfolio as a whole is held to HARD_DRAWDOWN_LIMIT
+DEFAULT_POOL_SIZE = 4 # Connections per venue
+REQUEST_TIMEOUT_SECONDS = 5.0
+
+
+class ExchangeError(Exception):
+    """Raised when a venue rejects a request."""
+
+
+class ExchangeConnectionPool:
+    """Up to `size` persistent JSON-line connections to one venue, shared by all of its accounts."""
+
+    def __init__(self, host: str, port: int, size: int = DEFAULT_POOL_SIZE,
+                 timeout: float = REQUEST_TIMEOUT_SECONDS):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(size)
+        self._idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        self.opened = 0
+
+    async def request(self, op: str, **params):
+        """Sends one request on a pooled connection and returns its result."""
+        async with self._slots:
+            if self._idle:
+                connection = self._idle.pop()
+            else:
+                connection = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout)
+                self.opened += 1
+            reader, writer = connection
+            try:
+                writer.write((json.dumps({"op": op, **params}) + '\n').encode('utf-8'))
+                line = await asyncio.wait_for(reader.readline(), self.timeout)
+                if not line:
+                    raise ConnectionError(f"{self.host}:{self.port} closed the connection.")
+            except BaseException:
+                writer.close() # Its state is unknown (e.g. a late reply still coming); never reuse it
+                raise
+            self._idle.append(connection)
+        response = json.loads(line)
+        if not response["ok"]:
+            raise ExchangeError(response["error"])
+        return response["result"]
+
+    async def subscribe(self, key: str) -> AsyncIterator:
+        """An account's event stream on a dedicated connection, as (event, received) pairs."""
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout)
+        try:
+            writer.write((json.dumps({"op": "subscribe", "key": key}) + '\n').encode('utf-8'))
+            while line := await reader.readline():
+                received = time.perf_counter()
+                event = json.loads(line)
+                if "ok" in event and not event["ok"]:
+                    raise ExchangeError(event["error"])
+                yield event, received
+        finally:
+            writer.close()
+
+    async def close(self):
+        for _, writer in self._idle:
+            writer.close()
+        self._idle.clear()
+
+
+class ExchangeAccount:
+    """A sub-account to monitor: where it trades and its Data / Execution key pair."""
+
+    def __init__(self, name: str, host: str, port: int, data_key: str, execution_key: str,
+                 initial_equity: float, limit: float = ACCOUNT_DRAWDOWN_LIMIT):
+        self.name = name
+        self.venue = (host, port)
+        self.data_key = data_key
+        self.execution_key = execution_key
+        self.initial_equity = initial_equity
+        self.limit = limit
+
+
+class MultiAccountMonitor:
+    """Per-account and portfolio drawdown limits over many accounts and venues."""
+
+    def __init__(self, accounts: List[ExchangeAccount], global_limit: float = HARD_DRAWDOWN_LIMIT,
+                 pool_size: int = DEFAULT_POOL_SIZE, poll_interval: float = MONITOR_INTERVAL_SECONDS,
+                 timeout: float = REQUEST_TIMEOUT_SECONDS):
+        self.accounts = {account.name: account for account in accounts}
+        if len(self.accounts) != len(accounts):
+            raise ValueError("Account names must be unique.")
+        self.global_limit = global_limit
+        self.pools = {venue: ExchangeConnectionPool(*venue, size=pool_size, timeout=timeout)
+                      for venue in {account.venue for account in accounts}}
+        self.monitors = {
+            account.name: KillSwitchMonitor(account.initial_equity, account.execution_key, account.data_key,
+                                            account.limit, poll_interval, kill=self._revoker(account),
+                                            poll=self._poller(account))
+            for account in accounts}
+        self.equity = sum(account.initial_equity for account in accounts)
+        self.high_water_mark = self.equity
+        self.detection_latency = LatencyHistogram()
+        self.kill_latency = LatencyHistogram() # Event received -> every key revoked
+        self.killed = False
+        self.kill_reason: Optional[str] = None
+        self.errors: Dict[str, str] = {} # Account name -> why following it stopped
+        self._account_locks = {account.name: asyncio.Lock() for account in accounts} # One pooled request each
+        self._stopped: Optional[asyncio.Event] = None
+
+    @property
+    def drawdown(self) -> float:
+        return 1.0 - self.equity / self.high_water_mark if self.high_water_mark > 0 else 0.0
+
+    def _revoker(self, account: ExchangeAccount):
+        pool = self.pools[account.venue]
+
+        async def revoke(execution_key: str) -> bool:
+            try:
+                async with self._account_locks[account.name]:
+                    return bool((await pool.request("revoke_key", key=execution_key))["revoked"])
+            except (OSError, asyncio.TimeoutError, ExchangeError) as e:
+                print(f"Error: revoking the execution key of {account.name} failed: {e!r}")
+                return False
+        return revoke
+
+    def _poller(self, account: ExchangeAccount):
+        pool = self.pools[account.venue]
+
+        async def poll(data_key: str) -> Tuple[float, bool]:
+            async with self._account_locks[account.name]:
+                drawdown = (await pool.request("account", key=data_key))["drawdown"]
+            return drawdown, drawdown >= account.limit
+        return poll
+
+    async def _follow(self, account: ExchangeAccount):
+        monitor = self.monitors[account.name]
+        async for event, received in self.pools[account.venue].subscribe(account.data_key):
+            before = monitor.tracker.equity
+            breached = monitor.on_event(event, received)
+            self.equity += monitor.tracker.equity - before
+            if self.equity > self.high_water_mark:
+                self.high_water_mark = self.equity
+            if self.drawdown >= self.global_limit and not self.killed:
+                self.detection_latency.record(time.perf_counter() - received)
+                await self.trigger(f"portfolio drawdown {self.drawdown:.2%} >= {self.global_limit:.2%} "
+                                   f"on {account.name}", received)
+                return
+            if breached:
+                await monitor.trigger(f"{account.name} drawdown {monitor.tracker.drawdown:.2%} >= "
+                                      f"{account.limit:.2%}", received)
+
+    async def _guarded(self, account: ExchangeAccount, job):
+        # One account's failure (refused connection, timeout, bad key) must not stop the others
+        try:
+            await job
+        except (OSError, asyncio.TimeoutError, ExchangeError) as e:
+            self.errors[account.name] = repr(e)
+            print(f"Error: monitoring {account.name} stopped: {e!r}")
+
+    async def trigger(self, reason: str, received: Optional[float] = None) -> bool:
+        """Revokes every account's execution key in parallel, once; returns True if this call did it."""
+        if self.killed:
+            return False
+        self.killed = True
+        self.kill_reason = reason
+        print(f"[{datetime.now().isoformat()}] Global limit breached ({reason}); revoking all execution keys.")
+        monitors = list(self.monitors.values())
+        await asyncio.gather(*(monitor.trigger(f"global: {reason}", received) for monitor in monitors))
+        await asyncio.gather(*(monitor.wait_killed() for monitor in monitors)) # Including earlier per-account kills
+        if received is not None:
+            self.kill_latency.record(time.perf_counter() - received)
+        if self._stopped:
+            self._stopped.set()
+        return True
+
+    async def run(self):
+        """Follows every account until all streams end or the global kill fires."""
+        self._stopped = asyncio.Event()
+        streams = [asyncio.create_task(self._guarded(account, self._follow(account)))
+                   for account in self.accounts.values()]
+        pollers = [asyncio.create_task(self._guarded(account, self.monitors[name].reconcile()))
+                   for name, account in self.accounts.items()]
+        waiters = [asyncio.create_task(self._stopped.wait()), asyncio.create_task(asyncio.wait(streams))]
+        try:
+            await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            tasks = streams + pollers + waiters
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for pool in self.pools.values():
+                await pool.close()
+
+    def revoked_accounts(self) -> List[str]:
+        return [name for name, monitor in self.monitors.items() if monitor.killed]
+
+
 if __name__ == "__main__":
-    # For a real run, keys would be injected into the environment.
-    # For this test, we demonstrate the logic flow.
+    # For a real run, keys would be injected into the environment and the stream
+    # would be the account's user data WebSocket. For this test, we replay a sell-off.
 
     # 1. Simulate key existence (if not already set in env)
     if BINANCE_DATA_KEY is None:
@@ -62,12 +514,16 @@ if __name__ == "__main__":
     if BINANCE_EXEC_KEY is None:
         BINANCE_EXEC_KEY = "DUMMY_EXEC_KEY_TO_DELETE"
 
-    # 2. Run Drawdown Check
-    drawdown, is_critical = get_account_drawdown(BINANCE_DATA_KEY)
-    
-    # 3. Test Kill Switch Condition
-    if is_critical:
-        execute_kill_switch(BINANCE_EXEC_KEY)
+    # 2. A 20x long that is filled, then marked down 0.05% per update
+    events = [{"e": "ORDER_TRADE_UPDATE", "o": {"s": "BTCUSDT", "S": "BUY", "l": "50", "L": "40000", "n": "0"}}]
+    events += [{"e": "markPriceUpdate", "s": "BTCUSDT", "p": str(40000 * (1 - 0.0005 * i))} for i in range(1, 200)]
+
+    # 3. Monitor the stream, with the reconciliation poll running alongside
+    monitor = KillSwitchMonitor(100000.0, BINANCE_EXEC_KEY, BINANCE_DATA_KEY)
+    asyncio.run(monitor.run(replay_stream(events, interval=0.001)))
+    if monitor.killed:
+        print(f"Kill switch fired after {monitor.events_processed} events: {monitor.kill_reason}")
+        print(f"Detection latency: {monitor.detection_latency.summary()}")
+        print(f"Kill latency:      {monitor.kill_latency.summary()}")
     else:
-        print("Drawdown is within limits. Monitor running in background.")
-        # In a real scenario, the infinite monitoring loop would start here.
+        print("Drawdown is within limits. Stream ended.")
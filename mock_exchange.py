@@ -0,0 +1,103 @@
+# mock_exchange.py
+# Phase 2 of ATS Strategy: Local mock exchange server for exercising the kill-switch monitor
+
+import asyncio
+import json
+import time
+from typing import Dict, List, Optional
+
+from kill_switch_monitor import EquityTracker
+
+# --- Mock Exchange ---
+# A stand-in for one venue's account API, served over TCP with one JSON object per
+# line in each direction (the ledger daemon's framing):
+#   {"op": "subscribe", "key": data_key}     the account's fills and mark prices, streamed
+#   {"op": "account", "key": data_key}       {"equity", "high_water_mark", "drawdown"}
+#   {"op": "revoke_key", "key": exec_key}    revokes the execution key
+# Responses are {"ok": true, "result": ...} or {"ok": false, "error": "..."}.
+#
+# Each account replays a scripted list of events, `interval` seconds apart, and
+# keeps its own equity from them so the account endpoint reports what was streamed
+# so far. `delay` slows every response and event of that account, to stand in for
+# a sluggish sub-account or venue. Revocations are timestamped with perf_counter()
+# so tests can check how quickly and how often each key was revoked.
+
+
+class MockExchange:
+    """One venue's account API on localhost, serving scripted accounts."""
+
+    def __init__(self, accounts: Dict[str, dict], host: str = '127.0.0.1'):
+        # data_key -> {"execution_key", "initial_equity", "events", "interval"?, "delay"?}
+        self.accounts = accounts
+        self.host = host
+        self.port: Optional[int] = None
+        self.trackers = {key: EquityTracker(spec["initial_equity"]) for key, spec in accounts.items()}
+        self.revocations: Dict[str, List[float]] = {} # execution key -> perf_counter() of each revocation
+        self.connections = 0
+        self._server = None
+        self._handlers = set()
+
+    async def start(self) -> int:
+        """Starts listening on an ephemeral port; returns it."""
+        self._server = await asyncio.start_server(self._handle_client, self.host, 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def close(self):
+        """Stops listening and drops every client connection."""
+        if self._server:
+            self._server.close()
+            for handler in list(self._handlers):
+                handler.cancel()
+            await asyncio.gather(*self._handlers, return_exceptions=True)
+            await self._server.wait_closed()
+
+    def _account_for_execution_key(self, key: str) -> Optional[str]:
+        return next((data_key for data_key, spec in self.accounts.items() if spec["execution_key"] == key), None)
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        handler = asyncio.current_task()
+        self._handlers.add(handler)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                request = json.loads(line)
+                if request.get("op") == "subscribe":
+                    await self._stream(request.get("key"), writer)
+                    break
+                writer.write((json.dumps(await self._dispatch(request)) + '\n').encode('utf-8'))
+                await writer.drain()
+        except (ConnectionResetError, BrokenPipeError, asyncio.CancelledError):
+            pass # A cancelled handler ends quietly: the server is closing
+        finally:
+            self._handlers.discard(handler)
+            writer.close()
+
+    async def _dispatch(self, request: dict) -> dict:
+        op, key = request.get("op"), request.get("key")
+        data_key = key if op == "account" else self._account_for_execution_key(key)
+        if data_key not in self.accounts:
+            return {"ok": False, "error": "Invalid API-key."}
+        await asyncio.sleep(self.accounts[data_key].get("delay", 0.0))
+        if op == "account":
+            tracker = self.trackers[data_key]
+            return {"ok": True, "result": {"equity": tracker.equity, "high_water_mark": tracker.high_water_mark,
+                                           "drawdown": tracker.drawdown}}
+        if op == "revoke_key":
+            self.revocations.setdefault(key, []).append(time.perf_counter())
+            return {"ok": True, "result": {"revoked": True}}
+        return {"ok": False, "error": f"Unknown op: {op}"}
+
+    async def _stream(self, data_key: str, writer: asyncio.StreamWriter):
+        spec = self.accounts.get(data_key)
+        if spec is None:
+            writer.write((json.dumps({"ok": False, "error": "Invalid API-key."}) + '\n').encode('utf-8'))
+            return
+        for event in spec["events"]:
+            await asyncio.sleep(spec.get("interval", 0.0) + spec.get("delay", 0.0))
+            self.trackers[data_key].apply_event(event)
+            writer.write((json.dumps(event) + '\n').encode('utf-8'))
+            await writer.drain()
@@ -0,0 +1,175 @@
+# online_metrics.py
+# Phase 2 of ATS Strategy: Streaming performance metrics for live and long backtests
+
+import math
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+from backtesting_framework import format_performance_metrics
+
+# --- Online Performance Metrics ---
+# calculate_performance_metrics needs the whole daily_returns Series and recomputes
+# cumprod, expanding().max() and std from scratch. PerformanceAccumulator keeps the
+# same KPIs as running state, updated in O(1) per return:
+#
+#   mean / std            Welford's algorithm over all returns (sample std, ddof=1)
+#   downside deviation    Welford over the negative returns only
+#   cumulative return     running product of (1 + r)
+#   max drawdown          running peak of the cumulative product and the worst
+#                         ratio to it (the peak starts at the first value, as
+#                         with expanding().max())
+#
+# Accumulators built over consecutive shards of a return stream (e.g. years
+# backtested in parallel) merge exactly with merge(). Drawdown is path dependent,
+# so each accumulator also keeps one (peak, lowest value until the next peak)
+# record per new running high; merging finds where the later shard's highs pass
+# the earlier shard's peak by binary search. A new high is appended, any other
+# return updates the last record, so updates stay O(1).
+#
+# snapshot() returns raw floats with the keys of compute_performance_metrics and
+# agrees with it on the same returns; format_performance_metrics presents them.
+
+ANNUALIZATION_FACTOR = math.sqrt(365) # Crypto is 24/7/365, as in calculate_performance_metrics
+
+
+class PerformanceAccumulator:
+    """Running KPIs over a stream of daily returns."""
+
+    def __init__(self):
+        self.count = 0
+        self._mean = 0.0
+        self._m2 = 0.0 # Sum of squared deviations from the mean
+        self.downside_count = 0
+        self._downside_mean = 0.0
+        self._downside_m2 = 0.0
+        self.growth = 1.0 # Product of (1 + r): cumulative return + 1
+        self.peak = math.nan # Running peak of growth (NaN before the first return)
+        self.max_drawdown = 0.0
+        self._peaks: List[float] = [] # One record per new running high: the high ...
+        self._lows: List[float] = [] # ... and the lowest growth value until the next one
+
+    @classmethod
+    def from_returns(cls, returns: Iterable[float]) -> 'PerformanceAccumulator':
+        """Builds an accumulator from a batch of returns with NumPy (same state as calling update on each)."""
+        returns = np.asarray(list(returns) if not isinstance(returns, np.ndarray) else returns, dtype=np.float64)
+        accumulator = cls()
+        if not len(returns):
+            return accumulator
+        accumulator.count = len(returns)
+        accumulator._mean, accumulator._m2 = _moments(returns)
+        downside = returns[returns < 0]
+        accumulator.downside_count = len(downside)
+        if len(downside):
+            accumulator._downside_mean, accumulator._downside_m2 = _moments(downside)
+        growth = np.cumprod(1 + returns)
+        peaks = np.maximum.accumulate(growth)
+        starts = np.flatnonzero(np.r_[True, peaks[1:] > peaks[:-1]])
+        accumulator.growth = float(growth[-1])
+        accumulator.peak = float(peaks[-1])
+        accumulator.max_drawdown = float(min((growth / peaks - 1).min(), 0.0))
+        accumulator._peaks = peaks[starts].tolist()
+        accumulator._lows = np.minimum.reduceat(growth, starts).tolist()
+        return accumulator
+
+    def update(self, daily_return: float):
+        """Adds the next return in time order."""
+        self.count += 1
+        delta = daily_return - self._mean
+        self._mean += delta / self.count
+        self._m2 += delta * (daily_return - self._mean)
+        if daily_return < 0:
+            self.downside_count += 1
+            delta = daily_return - self._downside_mean
+            self._downside_mean += delta / self.downside_count
+            self._downside_m2 += delta * (daily_return - self._downside_mean)
+
+        self.growth *= 1 + daily_return
+        if not self.growth <= self.peak: # Also true for the first return (peak is NaN)
+            self.peak = self.growth
+            self._peaks.append(self.growth)
+            self._lows.append(self.growth)
+        else:
+            self.max_drawdown = min(self.max_drawdown, self.growth / self.peak - 1)
+            if self.growth < self._lows[-1]:
+                self._lows[-1] = self.growth
+
+    def update_many(self, returns: Iterable[float]):
+        """Adds a batch of consecutive returns (vectorized, then merged)."""
+        self.merge(PerformanceAccumulator.from_returns(returns))
+
+    def merge(self, later: 'PerformanceAccumulator') -> 'PerformanceAccumulator':
+        """Folds in an accumulator over the returns that come right after this one's; returns self."""
+        if later.count == 0:
+            return self
+        if self.count == 0:
+            self.__dict__.update({key: (list(value) if isinstance(value, list) else value)
+                                  for key, value in later.__dict__.items()})
+            return self
+
+        count = self.count + later.count
+        delta = later._mean - self._mean
+        self._m2 += later._m2 + delta * delta * self.count * later.count / count
+        self._mean += delta * later.count / count
+        self.count = count
+        if later.downside_count:
+            downside_count = self.downside_count + later.downside_count
+            delta = later._downside_mean - self._downside_mean
+            self._downside_m2 += (later._downside_m2
+                                  + delta * delta * self.downside_count * later.downside_count / downside_count)
+            self._downside_mean += delta * later.downside_count / downside_count
+            self.downside_count = downside_count
+
+        # The later shard's growth path, in this shard's units, is scale * its own values
+        scale = self.growth
+        peaks = np.array(later._peaks) * scale
+        lows = np.array(later._lows) * scale
+        below = int(np.searchsorted(peaks, self.peak, side='right')) # Records that do not set a new high here
+        worst = self.max_drawdown
+        if below:
+            low = float(lows[:below].min())
+            worst = min(worst, low / self.peak - 1)
+            self._lows[-1] = min(self._lows[-1], low)
+        if below < len(peaks):
+            worst = min(worst, float((lows[below:] / peaks[below:] - 1).min()))
+            self._peaks.extend(peaks[below:].tolist())
+            self._lows.extend(lows[below:].tolist())
+            self.peak = self._peaks[-1]
+        self.max_drawdown = min(worst, 0.0)
+        self.growth = scale * later.growth
+        return self
+
+    # --- Snapshots ---
+
+    @property
+    def mean(self) -> float:
+        return self._mean if self.count else math.nan
+
+    @property
+    def std(self) -> float:
+        """Sample standard deviation (ddof=1), NaN below two returns, like pandas."""
+        return math.sqrt(self._m2 / (self.count - 1)) if self.count > 1 else math.nan
+
+    @property
+    def downside_deviation(self) -> float:
+        return math.sqrt(self._downside_m2 / (self.downside_count - 1)) if self.downside_count > 1 else math.nan
+
+    def snapshot(self) -> Dict[str, float]:
+        """Current KPIs as raw floats (same keys and conventions as compute_performance_metrics)."""
+        std, downside = self.std, self.downside_deviation
+        # Comparisons mirror the batch function: NaN != 0, so a NaN deviation gives a NaN ratio
+        return {
+            "absolute_return": self.growth - 1 if self.count else 0.0,
+            "max_drawdown": self.max_drawdown,
+            "sharpe_ratio": self.mean / std * ANNUALIZATION_FACTOR if std != 0 else 0.0,
+            "sortino_ratio": self.mean / downside * ANNUALIZATION_FACTOR if downside != 0 else 0.0,
+        }
+
+    def formatted(self) -> Dict[str, str]:
+        """The snapshot formatted for display, as calculate_performance_metrics returns it."""
+        return format_performance_metrics(self.snapshot())
+
+
+def _moments(values: np.ndarray):
+    mean = float(values.mean())
+    return mean, float(((values - mean) ** 2).sum())
@@ -0,0 +1,331 @@
+# order_book.py
+# Phase 2 of ATS Strategy: L2 order book replay and a matching simulator for limit/market orders
+
+import bisect
+import gzip
+import json
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from backtesting_framework import TAKER_FEE_RATE
+
+# --- Exchange Parameters ---
+MAKER_FEE_RATE = 0.0002 # Binance USDT-M futures, VIP 0
+ORDER_LATENCY_MS = 5 # Agent -> matching engine, applied to new orders and cancels
+
+# --- Order Book ---
+# Each side keeps a dict of price -> quantity and a sorted list of keys, where a
+# key is the price for bids and the negated price for asks. Both lists are
+# ascending, so the best level of either side is the last key: reading the best
+# bid/ask is O(1), and removing it (the most common deletion) pops from the end.
+# A new level costs a bisect plus a memmove; a quantity change on an existing
+# level is a dict write.
+#
+# Depth diffs follow Binance's rules for keeping a local book: a quantity is the
+# absolute amount at that level (0 removes it); diffs older than the snapshot are
+# dropped; the first applied diff must straddle the snapshot's lastUpdateId; and
+# every later diff must continue the previous one (U == previous u + 1 on spot,
+# pu == previous u on futures). A break raises OrderBookGap: the book has to be
+# rebuilt from a fresh snapshot.
+
+
+class OrderBookGap(ValueError):
+    """A depth diff does not continue the book's update sequence."""
+
+
+class _BookSide:
+
+    def __init__(self, sign: float):
+        self._sign = sign # +1 for bids, -1 for asks
+        self._keys: List[float] = []
+        self.levels: Dict[float, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def set(self, price: float, quantity: float):
+        if quantity == 0:
+            if self.levels.pop(price, None) is not None:
+                keys = self._keys
+                key = price * self._sign
+                if keys[-1] == key:
+                    keys.pop()
+                else:
+                    del keys[bisect.bisect_left(keys, key)]
+            return
+        if price not in self.levels:
+            bisect.insort(self._keys, price * self._sign)
+        self.levels[price] = quantity
+
+    def clear(self):
+        self._keys.clear()
+        self.levels.clear()
+
+    def best(self) -> Optional[Tuple[float, float]]:
+        if not self._keys:
+            return None
+        price = self._keys[-1] * self._sign
+        return price, self.levels[price]
+
+    def iter_levels(self) -> Iterator[Tuple[float, float]]:
+        """Levels best first."""
+        sign, levels = self._sign, self.levels
+        for key in reversed(self._keys):
+            price = key * sign
+            yield price, levels[price]
+
+
+class OrderBook:
+    """Local L2 book kept from a depth snapshot plus Binance depth diffs."""
+
+    def __init__(self, symbol: str = "BTCUSDT"):
+        self.symbol = symbol
+        self.bids = _BookSide(1.0)
+        self.asks = _BookSide(-1.0)
+        self.last_update_id: Optional[int] = None
+        self.timestamp: Optional[int] = None # Event time (ms) of the last applied diff
+        self._synced = False
+
+    def apply_snapshot(self, snapshot: dict):
+        """Loads a REST depth snapshot ({"lastUpdateId", "bids", "asks"}), replacing the book."""
+        for side, levels in ((self.bids, snapshot["bids"]), (self.asks, snapshot["asks"])):
+            side.clear()
+            for price, quantity in levels:
+                side.set(float(price), float(quantity))
+        self.last_update_id = snapshot["lastUpdateId"]
+        self.timestamp = snapshot.get("E", snapshot.get("T", self.timestamp))
+        self._synced = False
+
+    def apply_diff(self, event: dict) -> bool:
+        """Applies one depthUpdate event; returns False if it predates the book."""
+        if self.last_update_id is None:
+            raise OrderBookGap("No snapshot loaded.")
+        first, final, last = event["U"], event["u"], self.last_update_id
+        futures = "pu" in event
+        if final < last or (final == last and not futures):
+            return False
+        if not self._synced:
+            bound = last if futures else last + 1
+            if not first <= bound <= final:
+                raise OrderBookGap(f"First diff [{first}, {final}] does not cover snapshot update {last}.")
+        elif (event["pu"] != last) if futures else (first != last + 1):
+            raise OrderBookGap(f"Diff starting at {first} does not follow update {last}.")
+
+        bids, asks = self.bids, self.asks
+        for price, quantity in event["b"]:
+            bids.set(float(price), float(quantity))
+        for price, quantity in event["a"]:
+            asks.set(float(price), float(quantity))
+        self.last_update_id = final
+        self.timestamp = event["E"]
+        self._synced = True
+        return True
+
+    # --- Queries ---
+
+    def best_bid(self) -> Optional[Tuple[float, float]]:
+        return self.bids.best()
+
+    def best_ask(self) -> Optional[Tuple[float, float]]:
+        return self.asks.best()
+
+    def mid_price(self) -> Optional[float]:
+        bid, ask = self.bids.best(), self.asks.best()
+        return (bid[0] + ask[0]) / 2 if bid and ask else None
+
+    def spread(self) -> Optional[float]:
+        bid, ask = self.bids.best(), self.asks.best()
+        return ask[0] - bid[0] if bid and ask else None
+
+    def depth(self, side: str, levels: int) -> List[Tuple[float, float]]:
+        """Top `levels` (price, quantity) pairs of 'bid' or 'ask', best first."""
+        book_side = self.bids if side == 'bid' else self.asks
+        return [level for level, _ in zip(book_side.iter_levels(), range(levels))]
+
+    def imbalance(self, levels: int = 5) -> float:
+        """(bid - ask) / (bid + ask) quantity over the top levels, in [-1, 1]; 0 for an empty book."""
+        bid = sum(quantity for _, quantity in self.depth('bid', levels))
+        ask = sum(quantity for _, quantity in self.depth('ask', levels))
+        return (bid - ask) / (bid + ask) if bid + ask else 0.0
+
+
+def iter_events(path: str) -> Iterator[dict]:
+    """Streams recorded market data events from JSONL (optionally .gz), one event per line."""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+# --- Matching Simulator ---
+# Fills the agent's orders against the replayed book. The book is historical, so
+# the agent's fills do not change it: orders are assumed small next to the
+# displayed depth.
+#
+#   Latency      an order (or cancel) sent at time t reaches the matching engine
+#                at t + latency_ms; events stamped before then are applied first.
+#   Market       walks the opposite side from the best level and fills at each
+#                level's price (taker fee); any quantity beyond the visible depth
+#                expires.
+#   Limit        the marketable part fills like a market order up to the limit
+#                price; the rest rests at the back of its price level's queue,
+#                behind the quantity displayed there on arrival.
+#   Queue        only trades at the order's price advance it (they execute from
+#                the front); other decreases of the level are treated as
+#                cancellations behind it, except that the queue ahead can never
+#                exceed the level's displayed quantity. A trade through the price,
+#                or the opposite side moving through it, fills the rest (maker
+#                fee). Opposite quantity exactly at the price is not matched: on
+#                the unchanged historical book it is often what the order itself
+#                just took.
+#
+# Trade events are Binance trade/aggTrade messages: "m" true means the buyer was
+# the maker, i.e. the aggressor sold into the bids.
+
+
+class MatchingSimulator:
+    """Replays depth diffs and trades, and fills the agent's orders against the book."""
+
+    def __init__(self, book: Optional[OrderBook] = None, latency_ms: int = ORDER_LATENCY_MS,
+                 maker_fee_rate: float = MAKER_FEE_RATE, taker_fee_rate: float = TAKER_FEE_RATE):
+        self.book = book or OrderBook()
+        self.latency_ms = latency_ms
+        self.maker_fee_rate = maker_fee_rate
+        self.taker_fee_rate = taker_fee_rate
+        self.orders: Dict[int, dict] = {}
+        self.fills: List[dict] = []
+        self.position = 0.0
+        self.cash = 0.0
+        self._in_flight: List[Tuple[int, str, dict]] = [] # (arrival, action, order), in arrival order
+        self._resting: Dict[int, dict] = {}
+        self._next_id = 1
+
+    # --- Agent API ---
+
+    def submit_market(self, side: str, quantity: float, timestamp: int) -> int:
+        """Sends a market order at `timestamp` (ms); returns its id."""
+        return self._submit({"type": "MARKET", "side": side, "price": None, "quantity": quantity}, timestamp)
+
+    def submit_limit(self, side: str, price: float, quantity: float, timestamp: int) -> int:
+        """Sends a GTC limit order at `timestamp` (ms); returns its id."""
+        return self._submit({"type": "LIMIT", "side": side, "price": float(price), "quantity": quantity}, timestamp)
+
+    def cancel(self, order_id: int, timestamp: int):
+        """Sends a cancel; it takes effect at timestamp + latency_ms if the order is still open."""
+        self._schedule(timestamp, "cancel", self.orders[order_id])
+
+    def _submit(self, order: dict, timestamp: int) -> int:
+        if order["side"] not in ("BUY", "SELL"):
+            raise ValueError(f"Unknown order side: {order['side']}")
+        if order["quantity"] <= 0:
+            raise ValueError("Order quantity must be positive.")
+        order.update({"id": self._next_id, "status": "PENDING", "filled": 0.0, "queue_ahead": 0.0,
+                      "sent": timestamp})
+        self._next_id += 1
+        self.orders[order["id"]] = order
+        self._schedule(timestamp, "new", order)
+        return order["id"]
+
+    def _schedule(self, timestamp: int, action: str, order: dict):
+        # insort places equal arrival times after existing ones, so same-time messages keep their order
+        bisect.insort(self._in_flight, (timestamp + self.latency_ms, action, order), key=lambda item: item[0])
+
+    # --- Replay ---
+
+    def process(self, event: dict):
+        """Applies one market data event (depth snapshot, depthUpdate or trade) and any orders due before it."""
+        self._arrive_until(event.get("E", event.get("T")))
+        kind = event.get("e")
+        if kind == "depthUpdate":
+            self.book.apply_diff(event)
+            self._on_depth(event)
+        elif kind in ("trade", "aggTrade"):
+            self._on_trade(float(event["p"]), float(event["q"]), "SELL" if event["m"] else "BUY", event["T"])
+        elif "lastUpdateId" in event:
+            self.book.apply_snapshot(event)
+        else:
+            raise ValueError(f"Unknown market data event: {kind!r}")
+
+    def replay(self, events: Iterable[dict], agent: Optional[Callable[['MatchingSimulator', dict], None]] = None):
+        """Processes every event; `agent(simulator, event)` runs after each one and may send orders."""
+        for event in events:
+            self.process(event)
+            if agent:
+                agent(self, event)
+
+    def _arrive_until(self, timestamp: Optional[int]):
+        in_flight = self._in_flight
+        while in_flight and timestamp is not None and in_flight[0][0] <= timestamp:
+            arrival, action, order = in_flight.pop(0)
+            if action == "cancel":
+                if order["status"] in ("PENDING", "OPEN"):
+                    order["status"] = "CANCELED"
+                    self._resting.pop(order["id"], None)
+            elif order["status"] == "PENDING":
+                self._activate(order, arrival)
+
+    def _activate(self, order: dict, timestamp: int):
+        self._take(order, timestamp)
+        if order["filled"] >= order["quantity"]:
+            order["status"] = "FILLED"
+        elif order["type"] == "MARKET":
+            order["status"] = "EXPIRED" # The rest of a market order beyond the visible depth
+        else:
+            own_side = self.book.bids if order["side"] == "BUY" else self.book.asks
+            order["queue_ahead"] = own_side.levels.get(order["price"], 0.0)
+            order["status"] = "OPEN"
+            self._resting[order["id"]] = order
+
+    def _take(self, order: dict, timestamp: int):
+        """Fills the order against the opposite side, up to its limit price if it has one."""
+        buy = order["side"] == "BUY"
+        limit = order["price"]
+        for price, quantity in (self.book.asks if buy else self.book.bids).iter_levels():
+            remaining = order["quantity"] - order["filled"]
+            if remaining <= 0 or (limit is not None and (price > limit if buy else price < limit)):
+                break
+            self._fill(order, price, min(remaining, quantity), timestamp, "taker")
+
+    def _fill(self, order: dict, price: float, quantity: float, timestamp: int, liquidity: str):
+        fee = price * quantity * (self.taker_fee_rate if liquidity == "taker" else self.maker_fee_rate)
+        signed = quantity if order["side"] == "BUY" else -quantity
+        self.position += signed
+        self.cash -= signed * price + fee
+        order["filled"] += quantity
+        self.fills.append({"order_id": order["id"], "timestamp": timestamp, "side": order["side"], "price": price,
+                           "quantity": quantity, "fee": fee, "liquidity": liquidity})
+        if order["filled"] >= order["quantity"]:
+            order["status"] = "FILLED"
+            self._resting.pop(order["id"], None)
+
+    def _on_depth(self, event: dict):
+        if not self._resting:
+            return
+        best_bid, best_ask = self.book.best_bid(), self.book.best_ask()
+        for order in list(self._resting.values()):
+            buy = order["side"] == "BUY"
+            opposite = best_ask if buy else best_bid
+            if opposite and (opposite[0] < order["price"] if buy else opposite[0] > order["price"]):
+                self._fill(order, order["price"], order["quantity"] - order["filled"], event["E"], "maker")
+                continue
+            own_side = self.book.bids if buy else self.book.asks
+            order["queue_ahead"] = min(order["queue_ahead"], own_side.levels.get(order["price"], 0.0))
+
+    def _on_trade(self, price: float, quantity: float, aggressor: str, timestamp: int):
+        for order in list(self._resting.values()):
+            if order["side"] == aggressor:
+                continue
+            buy = order["side"] == "BUY"
+            remaining = order["quantity"] - order["filled"]
+            if price < order["price"] if buy else price > order["price"]: # Traded through the order's price
+                self._fill(order, order["price"], remaining, timestamp, "maker")
+            elif price == order["price"]:
+                executed = quantity - order["queue_ahead"]
+                order["queue_ahead"] = max(order["queue_ahead"] - quantity, 0.0)
+                if executed > 0:
+                    self._fill(order, order["price"], min(remaining, executed), timestamp, "maker")
+
+    def equity(self, mark_price: Optional[float] = None) -> float:
+        """Cash plus the position marked at `mark_price` (default: the book's mid price)."""
+        mark_price = mark_price if mark_price is not None else self.book.mid_price()
+        return self.cash + self.position * (mark_price or 0.0)
@@ -0,0 +1,245 @@
+# parameter_sweep.py
+# Phase 2 of ATS Strategy: Parallel parameter sweeps and walk-forward evaluation
+
+import itertools
+import json
+import multiprocessing
+import os
+from multiprocessing import shared_memory
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from backtesting_framework import (INITIAL_CAPITAL, TAKER_FEE_RATE, compute_performance_metrics,
+                                   daily_returns_from_equity, simulate_positions)
+
+# --- Strategy Under Test (TRADING_STRATEGY_PLAN.md §2) ---
+# Momentum entries on a moving-average crossover, each trade sized to the leverage
+# cap and closed by whichever comes first: the hard stop-loss, the time-based exit,
+# or the next signal flip (which also opens the opposite trade).
+SIGNAL_WINDOW = 50 # Ticks in the moving average
+PARAMETER_GRID = {
+    "stop_loss": [0.0005, 0.001, 0.002], # Adverse move from the entry price that closes a trade
+    "time_exit_seconds": [30, 60, 120], # Maximum holding time
+    "leverage_cap": [1.0, 5.0, 20.0] # Notional at entry as a multiple of initial capital
+}
+RANK_BY = "sharpe_ratio"
+
+
+def parameter_grid(grid: Dict[str, List[Any]] = PARAMETER_GRID) -> List[Dict[str, Any]]:
+    """Every combination of the grid's values, as parameter dicts."""
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def strategy_positions(prices: np.ndarray, timestamps: np.ndarray, stop_loss: float, time_exit_seconds: float,
+                       leverage_cap: float, initial_capital: float = INITIAL_CAPITAL) -> np.ndarray:
+    """Position per tick (units of the asset) for one parameter set; timestamps are int64 nanoseconds."""
+    means = np.convolve(prices, np.ones(SIGNAL_WINDOW) / SIGNAL_WINDOW, mode='full')[:len(prices)]
+    signal = np.sign(prices - means)
+    signal[:SIGNAL_WINDOW] = 0.0
+    entries = np.flatnonzero((signal != 0) & (signal != np.r_[0.0, signal[:-1]]))
+    # Each trade can last at most until its time exit or the next entry
+    time_limits = np.searchsorted(timestamps, timestamps[entries] + int(time_exit_seconds * 1e9), side='left')
+    limits = np.minimum(time_limits, np.r_[entries[1:], len(prices)])
+
+    positions = np.zeros_like(prices)
+    for entry, limit in zip(entries.tolist(), limits.tolist()):
+        side = signal[entry]
+        entry_price = prices[entry]
+        adverse = side * (prices[entry + 1:limit] / entry_price - 1.0) <= -stop_loss
+        exit_at = entry + 1 + int(np.argmax(adverse)) if adverse.any() else limit
+        positions[entry:exit_at] = side * leverage_cap * initial_capital / entry_price
+    return positions
+
+
+# --- Worker Processes ---
+# The parent copies the tick arrays into shared memory once; each worker maps them
+# at startup, so tasks carry only parameters and index ranges, never DataFrames.
+
+_worker_arrays: Dict[str, np.ndarray] = {}
+_worker_blocks: List[shared_memory.SharedMemory] = []
+
+
+def _attach_worker(specs: Dict[str, Tuple[str, str, int]]):
+    for name, (block_name, dtype, length) in specs.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        _worker_blocks.append(block) # Keeps the mapping alive for the life of the worker
+        _worker_arrays[name] = np.ndarray((length,), dtype=dtype, buffer=block.buf)
+
+
+def evaluate(prices: np.ndarray, timestamps: np.ndarray, params: Dict[str, Any],
+             initial_capital: float = INITIAL_CAPITAL, fee_rate: float = TAKER_FEE_RATE) -> Dict[str, float]:
+    """Backtests one parameter set on one stretch of ticks; returns raw metrics."""
+    positions = strategy_positions(prices, timestamps, initial_capital=initial_capital, **params)
+    equity, trades, fees = simulate_positions(prices, positions, initial_capital, fee_rate)
+    daily_returns = daily_returns_from_equity(pd.Series(equity, index=pd.DatetimeIndex(timestamps)), initial_capital)
+    metrics = compute_performance_metrics(daily_returns)
+    metrics.update({"fills": int(np.count_nonzero(trades)), "fees": float(fees.sum()),
+                    "final_equity": float(equity[-1]) if len(equity) else initial_capital,
+                    "liquidated": bool(len(equity) and equity.min() <= 0)})
+    return metrics
+
+
+def _run_task(task: Dict[str, Any]) -> Dict[str, Any]:
+    lo, hi = task["window"]
+    prices, timestamps = _worker_arrays["prices"][lo:hi], _worker_arrays["timestamps"][lo:hi]
+    return dict(task, metrics=evaluate(prices, timestamps, task["params"], task["initial_capital"], task["fee_rate"]))
+
+
+def _task_key(task: Dict[str, Any]) -> str:
+    return json.dumps([task["phase"], list(task["window"]), task["params"], task["initial_capital"],
+                       task["fee_rate"]], sort_keys=True)
+
+
+# --- Sweep Runner ---
+
+class SweepRunner:
+    """
+    Runs backtests over parameter sets and tick windows across a process pool.
+
+    Every finished run is appended to `checkpoint_path` (JSONL) as it completes;
+    a runner given the same checkpoint skips runs already recorded there, so an
+    interrupted sweep resumes where it stopped. Runs are keyed by tick index
+    windows, so a checkpoint belongs to one set of market data.
+    """
+
+    def __init__(self, market_data: pd.DataFrame, checkpoint_path: Optional[str] = None,
+                 processes: Optional[int] = None, initial_capital: float = INITIAL_CAPITAL,
+                 fee_rate: float = TAKER_FEE_RATE):
+        self.prices = market_data['price'].to_numpy(dtype=np.float64)
+        self.timestamps = market_data.index.to_numpy(dtype='datetime64[ns]').view(np.int64)
+        self.checkpoint_path = checkpoint_path
+        self.processes = processes or os.cpu_count() or 1
+        self.initial_capital = initial_capital
+        self.fee_rate = fee_rate
+
+    def _load_checkpoint(self) -> Dict[str, Dict[str, Any]]:
+        done = {}
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, 'rb+') as f:
+                data = f.read()
+                end = data.rfind(b'\n') + 1
+                for line in data[:end].splitlines():
+                    result = json.loads(line)
+                    done[result["key"]] = result
+                if end < len(data):
+                    f.truncate(end) # Drop a torn final line (killed mid-write) so new results append cleanly
+        return done
+
+    def _run(self, tasks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Runs the tasks not already checkpointed; returns results for all of them."""
+        done = self._load_checkpoint()
+        pending = [task for task in tasks if task["key"] not in done]
+        if pending:
+            blocks = []
+            try:
+                specs = {}
+                for name, array in (("prices", self.prices), ("timestamps", self.timestamps)):
+                    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+                    blocks.append(block)
+                    np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+                    specs[name] = (block.name, array.dtype.str, len(array))
+                checkpoint = open(self.checkpoint_path, 'a') if self.checkpoint_path else None
+                try:
+                    with multiprocessing.Pool(self.processes, initializer=_attach_worker, initargs=(specs,)) as pool:
+                        for result in pool.imap_unordered(_run_task, pending):
+                            done[result["key"]] = result
+                            if checkpoint:
+                                checkpoint.write(json.dumps(result) + '\n')
+                                checkpoint.flush()
+                finally:
+                    if checkpoint:
+                        checkpoint.close()
+            finally:
+                for block in blocks:
+                    block.close()
+                    block.unlink()
+        return [done[task["key"]] for task in tasks]
+
+    def _task(self, phase: str, window: Tuple[int, int], params: Dict[str, Any]) -> Dict[str, Any]:
+        task = {"phase": phase, "window": (int(window[0]), int(window[1])), "params": params,
+                "initial_capital": self.initial_capital, "fee_rate": self.fee_rate}
+        task["key"] = _task_key(task)
+        return task
+
+    def _period(self, window: Tuple[int, int]) -> Tuple[pd.Timestamp, pd.Timestamp]:
+        lo, hi = window
+        return pd.Timestamp(self.timestamps[lo]), pd.Timestamp(self.timestamps[hi - 1])
+
+    def sweep(self, param_sets: Iterable[Dict[str, Any]], window: Optional[Tuple[int, int]] = None) -> pd.DataFrame:
+        """Backtests every parameter set over all ticks (or a [lo, hi) tick window); best first."""
+        window = window or (0, len(self.prices))
+        results = self._run([self._task("sweep", window, params) for params in param_sets])
+        return rank_results(results)
+
+    def walk_forward_windows(self, train_days: int, test_days: int, step_days: Optional[int] = None) \
+            -> List[Tuple[Tuple[int, int], Tuple[int, int]]]:
+        """Rolling (train, test) tick windows: train_days of fitting followed by test_days out of sample."""
+        step = np.int64((step_days or test_days) * 86_400 * 10 ** 9)
+        train, test = np.int64(train_days * 86_400 * 10 ** 9), np.int64(test_days * 86_400 * 10 ** 9)
+        windows = []
+        start = self.timestamps[0] if len(self.timestamps) else 0
+        while len(self.timestamps) and start + train + test <= self.timestamps[-1] + 1:
+            bounds = np.searchsorted(self.timestamps, [start, start + train, start + train + test], side='left')
+            if bounds[1] - bounds[0] > 1 and bounds[2] - bounds[1] > 1:
+                windows.append(((bounds[0], bounds[1]), (bounds[1], bounds[2])))
+            start += step
+        return windows
+
+    def walk_forward(self, param_sets: Iterable[Dict[str, Any]], train_days: int, test_days: int,
+                     step_days: Optional[int] = None) -> pd.DataFrame:
+        """
+        Walk-forward evaluation: for each rolling window, picks the parameter set with the
+        best in-sample RANK_BY metric and backtests it on the following test period.
+        """
+        param_sets = list(param_sets)
+        windows = self.walk_forward_windows(train_days, test_days, step_days)
+        train_results = self._run([self._task("train", train, params)
+                                   for train, _ in windows for params in param_sets])
+        best = {}
+        for result in train_results:
+            window = tuple(result["window"])
+            score = _score(result["metrics"])
+            if window not in best or score > best[window][0]:
+                best[window] = (score, result)
+        test_results = self._run([self._task("test", test, best[train][1]["params"]) for train, test in windows])
+
+        rows = []
+        for (train, test), result in zip(windows, test_results):
+            test_start, test_end = self._period(test)
+            row = {"test_start": test_start, "test_end": test_end}
+            row.update(result["params"])
+            row.update({f"train_{RANK_BY}": best[train][1]["metrics"][RANK_BY]})
+            row.update(result["metrics"])
+            rows.append(row)
+        return pd.DataFrame(rows)
+
+
+def _score(metrics: Dict[str, Any]) -> float:
+    # Returns of an account that went through zero equity are meaningless; rank those runs last
+    value = metrics[RANK_BY]
+    return value if np.isfinite(value) and not metrics["liquidated"] else -np.inf
+
+
+def rank_results(results: List[Dict[str, Any]]) -> pd.DataFrame:
+    """One row per run (parameters, then metrics), sorted by RANK_BY, best first."""
+    rows = [dict(result["params"], **result["metrics"]) for result in results]
+    table = pd.DataFrame(rows)
+    if table.empty:
+        return table
+    order = sorted(range(len(results)), key=lambda i: _score(results[i]["metrics"]), reverse=True)
+    return table.iloc[order].reset_index(drop=True)
+
+
+# --- Execution Example ---
+if __name__ == "__main__":
+    import sys
+    from backtesting_framework import BacktestingEnvironment, DATA_FILE_PATH
+
+    env = BacktestingEnvironment(DATA_FILE_PATH, INITIAL_CAPITAL)
+    checkpoint_path = sys.argv[1] if len(sys.argv) > 1 else "data/sweep_results.jsonl"
+    runner = SweepRunner(env.market_data, checkpoint_path=checkpoint_path)
+    print(f"Sweeping {len(parameter_grid())} parameter sets on {runner.processes} processes...")
+    print(runner.sweep(parameter_grid()).to_string())
@@ -0,0 +1,155 @@
+# risk_engine.py
+# Implements the time-variant VaR / CVaR position sizing of TRADING_STRATEGY_PLAN.md (Section 2.B)
+
+import bisect
+import collections
+import math
+from typing import Optional
+
+import numpy as np
+
+# --- Risk Parameters ---
+CONFIDENCE_LEVEL = 0.99 # VaR / CVaR confidence
+MAX_DAILY_DRAWDOWN = 0.02 # Estimated worst-case loss allowed on the whole portfolio (2.0% of equity)
+DEFAULT_WINDOW = 10_000 # Returns in the rolling historical window
+
+# --- Rolling Historical VaR / CVaR ---
+# The window's returns are kept in a sorted array (bisect insert/remove: O(log n)
+# search plus a memmove), alongside a FIFO of the same returns in arrival order.
+# With k = ceil((1 - confidence) * n) tail observations,
+#
+#   VaR  = -(k-th smallest return)          the loss not exceeded with `confidence`
+#   CVaR = -(mean of the k smallest returns) the expected loss beyond VaR
+#
+# The sum of the k smallest returns is maintained incrementally: an insert or
+# removal inside the tail swaps one element across the boundary. It is recomputed
+# exactly once per window length of updates, so float drift cannot accumulate.
+# Each update costs O(log n) comparisons, and reading VaR or CVaR is O(1); nothing is re-sorted.
+#
+# Returns are measured over `horizon` ticks (p[t] / p[t - horizon] - 1), so the
+# estimate matches the holding period the position sizing protects.
+
+
+class RollingRiskEstimator:
+    """Exact rolling historical VaR / CVaR over the last `window` returns, updated per tick."""
+
+    def __init__(self, window: int = DEFAULT_WINDOW, confidence: float = CONFIDENCE_LEVEL, horizon: int = 1,
+                 min_observations: int = 100):
+        if window < 1 or horizon < 1:
+            raise ValueError("window and horizon must be at least 1")
+        if not 0 < confidence < 1:
+            raise ValueError("confidence must be between 0 and 1")
+        self.window = window
+        self.confidence = confidence
+        self.horizon = horizon
+        self.min_observations = min(min_observations, window)
+        self._arrivals = collections.deque() # Returns in the window, oldest first
+        self._sorted = [] # The same returns, ascending
+        self._tail_count = 0 # k: how many of the smallest returns form the tail
+        self._tail_sum = 0.0 # Sum of the k smallest returns
+        self._prices = collections.deque(maxlen=horizon + 1)
+        self._updates_since_resync = 0
+
+    def __len__(self) -> int:
+        return len(self._sorted)
+
+    def update_price(self, price: float):
+        """Feeds the next tick price; adds a return once `horizon` earlier prices are known."""
+        self._prices.append(price)
+        if len(self._prices) > self.horizon:
+            self.update_return(price / self._prices[0] - 1.0)
+
+    def update_return(self, value: float):
+        """Adds one return to the window, evicting the oldest if the window is full."""
+        values = self._sorted
+        if len(values) == self.window:
+            self._remove(self._arrivals.popleft())
+        self._arrivals.append(value)
+
+        k = self._tail_count
+        i = bisect.bisect_left(values, value)
+        values.insert(i, value)
+        if i < k:
+            self._tail_sum += value - values[k] # The new value enters the tail and pushes the k-th out
+
+        # The tail size follows the window size while it fills
+        target = max(1, math.ceil((1.0 - self.confidence) * len(values) - 1e-9))
+        while k < target:
+            self._tail_sum += values[k]
+            k += 1
+        while k > target:
+            k -= 1
+            self._tail_sum -= values[k]
+        self._tail_count = k
+
+        self._updates_since_resync += 1
+        if self._updates_since_resync >= self.window:
+            self._tail_sum = math.fsum(values[:k])
+            self._updates_since_resync = 0
+
+    def _remove(self, value: float):
+        values = self._sorted
+        i = bisect.bisect_left(values, value)
+        k = self._tail_count
+        if i < k:
+            self._tail_sum += (values[k] if k < len(values) else 0.0) - value # The next smallest joins the tail
+            if k >= len(values):
+                self._tail_count = k - 1
+        del values[i]
+
+    @property
+    def ready(self) -> bool:
+        return len(self._sorted) >= self.min_observations
+
+    @property
+    def var(self) -> float:
+        """Value-at-Risk as a positive loss fraction (NaN until min_observations returns are in)."""
+        if not self.ready:
+            return math.nan
+        return -self._sorted[self._tail_count - 1]
+
+    @property
+    def cvar(self) -> float:
+        """Conditional VaR (expected shortfall) as a positive loss fraction (NaN until ready)."""
+        if not self.ready:
+            return math.nan
+        return -self._tail_sum / self._tail_count
+
+    def max_position_notional(self, equity: float, drawdown_budget: float = MAX_DAILY_DRAWDOWN,
+                              leverage_cap: Optional[float] = None) -> float:
+        """
+        Largest position notional whose CVaR loss stays within drawdown_budget * equity.
+
+        Capped at leverage_cap * equity when given; 0 until the estimator is ready,
+        so nothing is sized from an empty window.
+        """
+        cvar = self.cvar
+        if math.isnan(cvar) or equity <= 0:
+            return 0.0
+        limit = drawdown_budget * equity / cvar if cvar > 0 else math.inf
+        if leverage_cap is not None:
+            limit = min(limit, leverage_cap * equity)
+        return limit
+
+    def max_position_size(self, price: float, equity: float, drawdown_budget: float = MAX_DAILY_DRAWDOWN,
+                          leverage_cap: Optional[float] = None) -> float:
+        """max_position_notional in units of the asset at `price`."""
+        return self.max_position_notional(equity, drawdown_budget, leverage_cap) / price
+
+
+def rolling_position_limits(prices: np.ndarray, equity: float, estimator: Optional[RollingRiskEstimator] = None,
+                            drawdown_budget: float = MAX_DAILY_DRAWDOWN,
+                            leverage_cap: Optional[float] = None) -> np.ndarray:
+    """
+    Max position size (units) allowed at each tick, from returns up to and including that tick.
+
+    Meant for clipping the position arrays of the vectorized engine; the limit at
+    tick t uses returns up to t, so it does not look ahead.
+    """
+    estimator = estimator if estimator is not None else RollingRiskEstimator() # An empty estimator is falsy (len 0)
+    prices = np.asarray(prices, dtype=np.float64)
+    limits = np.empty_like(prices)
+    for t, price in enumerate(prices.tolist()):
+        estimator.update_price(price)
+        limits[t] = estimator.max_position_size(price, equity, drawdown_budget, leverage_cap)
+    return limits
@@ -0,0 +1,266 @@
+import fcntl
+import json
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, List, Iterator, Tuple
+
+from src.ledger_store import INDEX_SUFFIX
+
+# --- Change Feed (Change-Data-Capture of Ledger Mutations) ---
+# Every create and lineage step appended to the ledger is also published as a
+# change event with a sequence number: 0, 1, 2, ... without gaps, across all
+# processes and shards. Consumers (dashboards, the coordination layer) keep the
+# sequence number they have reached and read only what follows it, instead of
+# re-reading and diffing the whole ledger.
+#
+#   event: {"seq": 42, "time": <unix seconds>, "op": "create", "id": ..., "dvp": {...}}
+#          {"seq": 43, "time": ..., "op": "step", "id": ..., "step": {...}, "current_confidence": 0.6}
+#
+# The feed is a directory of segments of `segment_events` events each: one JSON
+# line per event in events-<first seq>.log and a fixed-width (offset, length)
+# entry per event in the .idx beside it, so the segment and entry of any sequence
+# number are computed, not searched. Only the newest `retained_segments` segments
+# are kept, which bounds the disk used; reading older events raises
+# FeedTruncatedError.
+#
+# LedgerStore publishes under its append lock, so events follow the log order and
+# a DVP's steps always appear in lineage order. Publishers in different
+# processes take feed.lock to number their events. An event's data is written
+# before its index entry and readers only go through the index, so they never see
+# a partial event. Events are durable at the store's next commit. A legacy import
+# or a reshard copies existing DVPs without events: consumers start from a load
+# of the ledger and then follow the feed from next_seq() taken before the load,
+# skipping steps they already have (step ids are unique).
+#
+# Consumers tail the files (read/tail) or subscribe through the ledger daemon's
+# socket; either way a consumer's position lives in the durable feed, not in a
+# buffer, so a slow consumer holds back nothing but itself.
+
+FEED_META_FILE = 'feed.json'
+FEED_LOCK_FILE = 'feed.lock'
+EVENT_SEGMENT_PREFIX = 'events-'
+EVENT_SEGMENT_SUFFIX = '.log'
+EVENT_INDEX_ENTRY = struct.Struct('>QI') # Event offset and length in the segment
+
+DEFAULT_SEGMENT_EVENTS = 65536
+DEFAULT_RETAINED_SEGMENTS = 16 # With the default segments: the last 1M events
+DEFAULT_READ_EVENTS = 1024 # Events per read batch, which bounds a consumer's memory
+DEFAULT_POLL_INTERVAL = 0.01 # Seconds a caught-up tail waits before looking for new events
+
+
+class FeedTruncatedError(LookupError):
+    """Raised when reading events older than the oldest retained segment."""
+
+    def __init__(self, seq: int, oldest: int):
+        super().__init__(f"Change event {seq} is no longer retained; the oldest is {oldest}")
+        self.seq = seq
+        self.oldest = oldest
+
+
+class ChangeFeed:
+    """
+    Durable, sequence-numbered feed of ledger changes, shared by every process that writes the ledger.
+
+    `segment_events` applies when the feed is created; later opens use the value
+    it was created with.
+    """
+
+    def __init__(self, path: str, fsync: bool = False, segment_events: int = DEFAULT_SEGMENT_EVENTS,
+                 retained_segments: int = DEFAULT_RETAINED_SEGMENTS):
+        if segment_events < 1 or retained_segments < 1:
+            raise ValueError("segment_events and retained_segments must be positive")
+        self.path = path
+        self.fsync = fsync
+        self.retained_segments = retained_segments
+        self._lock = threading.Lock()
+        self._first: Optional[int] = None # First sequence number of the segment we publish to
+        self._data_fd: Optional[int] = None
+        self._index_fd: Optional[int] = None
+        self._dirty = False # Published since the last commit
+
+        os.makedirs(path, exist_ok=True)
+        self._lock_fd = os.open(os.path.join(path, FEED_LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+        with self._file_lock():
+            meta_path = os.path.join(path, FEED_META_FILE)
+            if not os.path.exists(meta_path):
+                with open(meta_path + '.tmp', 'w') as f:
+                    json.dump({"segment_events": segment_events}, f)
+                os.replace(meta_path + '.tmp', meta_path)
+            with open(meta_path, 'r') as f:
+                self.segment_events = json.load(f)['segment_events']
+
+    # --- Layout ---
+
+    def _segment_path(self, first: int) -> str:
+        return os.path.join(self.path, f"{EVENT_SEGMENT_PREFIX}{first:016d}{EVENT_SEGMENT_SUFFIX}")
+
+    def _segments(self) -> List[int]:
+        firsts = []
+        for name in os.listdir(self.path):
+            if name.startswith(EVENT_SEGMENT_PREFIX) and name.endswith(EVENT_SEGMENT_SUFFIX):
+                firsts.append(int(name[len(EVENT_SEGMENT_PREFIX):-len(EVENT_SEGMENT_SUFFIX)]))
+        return sorted(firsts)
+
+    @contextmanager
+    def _file_lock(self):
+        """Exclusive inter-process lock on the feed (and the thread lock, for other threads of this process)."""
+        with self._lock:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def oldest_seq(self) -> int:
+        """Sequence number of the oldest retained event (of the next one if none is retained)."""
+        segments = self._segments()
+        return segments[0] if segments else 0
+
+    def next_seq(self) -> int:
+        """Sequence number the next published event will get."""
+        segments = self._segments()
+        if not segments:
+            return 0
+        index_path = self._segment_path(segments[-1]) + INDEX_SUFFIX
+        try:
+            return segments[-1] + os.path.getsize(index_path) // EVENT_INDEX_ENTRY.size
+        except FileNotFoundError:
+            return segments[-1]
+
+    # --- Publishing ---
+
+    def _open_segment(self, first: int):
+        self._close_segment()
+        path = self._segment_path(first)
+        self._data_fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        self._index_fd = os.open(path + INDEX_SUFFIX, os.O_RDWR | os.O_CREAT, 0o644)
+        self._first = first
+
+    def _follow(self):
+        """Moves to the newest segment if other processes rotated (the caller holds the file lock)."""
+        if self._first is None or not os.path.exists(self._segment_path(self._first)):
+            segments = self._segments()
+            self._open_segment(segments[-1] if segments else 0)
+        while os.path.exists(self._segment_path(self._first + self.segment_events)):
+            self._open_segment(self._first + self.segment_events)
+
+    def _rotate(self):
+        """Starts the next segment and drops the segments beyond the retention (the caller holds the file lock)."""
+        self._open_segment(self._first + self.segment_events)
+        oldest_kept = self._first - (self.retained_segments - 1) * self.segment_events
+        for first in self._segments():
+            if first < oldest_kept:
+                for path in (self._segment_path(first), self._segment_path(first) + INDEX_SUFFIX):
+                    if os.path.exists(path):
+                        os.remove(path)
+
+    def publish(self, record: Dict[str, Any]) -> int:
+        """Appends the change event of one ledger log record; returns its sequence number."""
+        dvp_id = record['dvp']['id'] if record['op'] == 'create' else record['id']
+        with self._file_lock():
+            self._follow()
+            index_size = os.fstat(self._index_fd).st_size
+            count = index_size // EVENT_INDEX_ENTRY.size
+            if count >= self.segment_events:
+                self._rotate()
+                index_size = count = 0
+            elif index_size % EVENT_INDEX_ENTRY.size:
+                os.ftruncate(self._index_fd, count * EVENT_INDEX_ENTRY.size) # Torn entry from a crash
+            offset = 0
+            if count:
+                last_offset, last_length = EVENT_INDEX_ENTRY.unpack(
+                    os.pread(self._index_fd, EVENT_INDEX_ENTRY.size, (count - 1) * EVENT_INDEX_ENTRY.size))
+                offset = last_offset + last_length
+            if os.fstat(self._data_fd).st_size != offset:
+                os.ftruncate(self._data_fd, offset) # Event data whose index entry a crash never wrote
+            seq = self._first + count
+            data = (json.dumps({"seq": seq, "time": time.time(), "id": dvp_id, **record},
+                               separators=(',', ':')) + '\n').encode('utf-8')
+            os.pwrite(self._data_fd, data, offset)
+            os.pwrite(self._index_fd, EVENT_INDEX_ENTRY.pack(offset, len(data)), count * EVENT_INDEX_ENTRY.size)
+            self._dirty = True
+        return seq
+
+    def commit(self):
+        """Makes published events durable (fsync) when durability is enabled."""
+        if not self.fsync:
+            return
+        with self._lock:
+            if not self._dirty or self._data_fd is None:
+                return
+            for fd in (self._data_fd, self._index_fd):
+                os.fsync(fd)
+            self._dirty = False
+
+    # --- Reading ---
+
+    def read_raw(self, from_seq: int, max_events: int = DEFAULT_READ_EVENTS) -> Tuple[bytes, int]:
+        """
+        Up to max_events events from from_seq on, as their JSON lines, and how many there are.
+
+        Stops at the end of a segment; the next call continues in the following one.
+        Returns (b'', 0) when there is nothing new yet.
+        """
+        if from_seq < 0:
+            raise ValueError(f"Sequence numbers start at 0, got {from_seq}")
+        first = from_seq - from_seq % self.segment_events
+        path = self._segment_path(first)
+        try:
+            with open(path + INDEX_SUFFIX, 'rb') as index, open(path, 'rb') as data:
+                index.seek((from_seq - first) * EVENT_INDEX_ENTRY.size)
+                entries = index.read(max_events * EVENT_INDEX_ENTRY.size)
+                count = len(entries) // EVENT_INDEX_ENTRY.size # Ignore an entry still being written
+                if count == 0:
+                    return b'', 0
+                start, _ = EVENT_INDEX_ENTRY.unpack_from(entries, 0)
+                last_offset, last_length = EVENT_INDEX_ENTRY.unpack_from(entries, (count - 1) * EVENT_INDEX_ENTRY.size)
+                data.seek(start)
+                return data.read(last_offset + last_length - start), count
+        except FileNotFoundError:
+            oldest = self.oldest_seq()
+            if from_seq < oldest:
+                raise FeedTruncatedError(from_seq, oldest)
+            return b'', 0
+
+    def read(self, from_seq: int, max_events: int = DEFAULT_READ_EVENTS) -> List[Dict[str, Any]]:
+        """Up to max_events events from from_seq on, in sequence order (see read_raw)."""
+        data, _ = self.read_raw(from_seq, max_events)
+        return [json.loads(line) for line in data.splitlines()]
+
+    def tail(self, from_seq: Optional[int] = None, poll_interval: float = DEFAULT_POLL_INTERVAL,
+             max_events: int = DEFAULT_READ_EVENTS) -> Iterator[Dict[str, Any]]:
+        """Yields events from from_seq (default: the next one published) on, waiting for new ones forever."""
+        seq = self.next_seq() if from_seq is None else from_seq
+        while True:
+            events = self.read(seq, max_events)
+            if not events:
+                time.sleep(poll_interval)
+                continue
+            yield from events
+            seq += len(events)
+
+    # --- Lifecycle ---
+
+    def _close_segment(self):
+        for fd in (self._data_fd, self._index_fd):
+            if fd is not None:
+                os.close(fd)
+        self._data_fd = self._index_fd = None
+
+    def close(self):
+        """Commits and closes the feed."""
+        self.commit()
+        with self._lock:
+            self._close_segment()
+            if self._lock_fd is not None:
+                os.close(self._lock_fd)
+                self._lock_fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
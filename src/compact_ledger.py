@@ -0,0 +1,245 @@
+import array
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, List, Iterator
+
+# --- Compact In-Memory Ledger (Slotted DVPs + Columnar Lineage) ---
+# The JSON ledger keeps every lineage step as its own dict, repeating eight string
+# keys, the process type, the agent DID, an ISO timestamp string and a step_id
+# that embeds the full 64-char DVP id. Here all steps live in one shared step
+# table: one typed array per numeric field, process types and agent DIDs interned
+# as integer codes, and timestamps stored as microseconds since the epoch. A DVP
+# is a slotted object holding the row numbers of its steps.
+#
+# Anything that does not fit that shape exactly (a hand-written step_id, extra
+# keys, a timestamp in another format) is kept verbatim on the side, so get()
+# always returns the same dictionary the to_json() schema produced.
+
+EPOCH = datetime(1970, 1, 1)
+STEP_FIELDS = ("step_id", "process_type", "agent_did", "result_score_change", "attestation_vc_uri",
+               "timestamp", "k_factor_applied", "weighted_change")
+DVP_FIELDS = ("id", "claim_text", "created_at", "current_confidence", "lineage", "agent_karma")
+
+
+def format_timestamp(micros: int) -> str:
+    """Formats microseconds since the epoch the way DVP does (utcnow().isoformat() + 'Z')."""
+    return (EPOCH + timedelta(microseconds=micros)).isoformat() + 'Z'
+
+def parse_timestamp(value: Any) -> Optional[int]:
+    """Converts a DVP timestamp to microseconds since the epoch, or None if it would not round-trip."""
+    if not isinstance(value, str) or not value.endswith('Z'):
+        return None
+    try:
+        parsed = datetime.fromisoformat(value[:-1])
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        return None
+    micros = (parsed - EPOCH) // timedelta(microseconds=1)
+    return micros if format_timestamp(micros) == value else None
+
+def _is_float(value: Any) -> bool:
+    # JSON round-trips ints and floats differently, so only floats go into 'd' arrays
+    return type(value) is float
+
+
+class StringPool:
+    """Interns repeated strings (process types, agent DIDs) as small integer codes."""
+    __slots__ = ('_strings', '_codes')
+
+    def __init__(self):
+        self._strings: List[str] = []
+        self._codes: Dict[str, int] = {}
+
+    def code(self, value: str) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self._strings)
+            self._strings.append(value)
+        return code
+
+    def __getitem__(self, code: int) -> str:
+        return self._strings[code]
+
+    def __len__(self) -> int:
+        return len(self._strings)
+
+
+class StepTable:
+    """Columnar storage for the lineage steps of every DVP, one row per step."""
+    __slots__ = ('process_types', 'agent_dids', 'process_type', 'agent_did', 'score_change', 'attestation_uri',
+                 'timestamp', 'k_factor', 'weighted_change', 'step_ids', 'raw')
+
+    def __init__(self):
+        self.process_types = StringPool()
+        self.agent_dids = StringPool()
+        self.process_type = array.array('I')
+        self.agent_did = array.array('I')
+        self.score_change = array.array('d')
+        self.attestation_uri: List[str] = []
+        self.timestamp = array.array('q')
+        self.k_factor = array.array('d')
+        self.weighted_change = array.array('d')
+        self.step_ids: Dict[int, str] = {} # Rows whose step_id is not the default one
+        self.raw: Dict[int, Dict[str, Any]] = {} # Rows that do not fit the columns, kept verbatim
+
+    def __len__(self) -> int:
+        return len(self.score_change)
+
+    @staticmethod
+    def default_step_id(process_type: str, dvp_id: str, position: int) -> str:
+        """The step_id build_step_data assigns to the step at this lineage position."""
+        return f"{process_type.lower()}-{dvp_id}-{position + 1}"
+
+    def append(self, step: Dict[str, Any], dvp_id: str, position: int) -> int:
+        """Stores one step and returns its row number."""
+        row = len(self)
+        timestamp = parse_timestamp(step.get('timestamp'))
+        fits = (tuple(step) == STEP_FIELDS and timestamp is not None
+                and isinstance(step['step_id'], str) and isinstance(step['process_type'], str)
+                and isinstance(step['agent_did'], str) and isinstance(step['attestation_vc_uri'], str)
+                and _is_float(step['result_score_change']) and _is_float(step['k_factor_applied'])
+                and _is_float(step['weighted_change']))
+        if not fits:
+            self.raw[row] = step
+            step = {"process_type": "", "agent_did": "", "result_score_change": 0.0, "attestation_vc_uri": "",
+                    "k_factor_applied": 0.0, "weighted_change": 0.0}
+            timestamp = 0
+        elif step['step_id'] != self.default_step_id(step['process_type'], dvp_id, position):
+            self.step_ids[row] = step['step_id']
+
+        self.process_type.append(self.process_types.code(step['process_type']))
+        self.agent_did.append(self.agent_dids.code(step['agent_did']))
+        self.score_change.append(step['result_score_change'])
+        self.attestation_uri.append(step['attestation_vc_uri'])
+        self.timestamp.append(timestamp)
+        self.k_factor.append(step['k_factor_applied'])
+        self.weighted_change.append(step['weighted_change'])
+        return row
+
+    def get(self, row: int, dvp_id: str, position: int) -> Dict[str, Any]:
+        """Rebuilds the step dictionary stored at `row`."""
+        raw = self.raw.get(row)
+        if raw is not None:
+            return raw
+        process_type = self.process_types[self.process_type[row]]
+        step_id = self.step_ids.get(row)
+        return {
+            "step_id": step_id if step_id is not None else self.default_step_id(process_type, dvp_id, position),
+            "process_type": process_type,
+            "agent_did": self.agent_dids[self.agent_did[row]],
+            "result_score_change": self.score_change[row],
+            "attestation_vc_uri": self.attestation_uri[row],
+            "timestamp": format_timestamp(self.timestamp[row]),
+            "k_factor_applied": self.k_factor[row],
+            "weighted_change": self.weighted_change[row]
+        }
+
+
+class CompactDVP:
+    """A DVP without its own lineage dicts: it points at rows of the shared step table."""
+    __slots__ = ('id', 'claim_text', 'created_at', 'current_confidence', 'agent_karma', 'rows')
+
+    def __init__(self, dvp_id: str, claim_text: str, created_at: int, current_confidence: float, agent_karma: float):
+        self.id = dvp_id
+        self.claim_text = claim_text
+        self.created_at = created_at # Microseconds since the epoch
+        self.current_confidence = current_confidence
+        self.agent_karma = agent_karma
+        self.rows = array.array('I')
+
+
+class CompactLedger:
+    """
+    Memory-compact replacement for the dict-of-dicts ledger returned by LedgerStore.load().
+
+    Build it with from_ledger() or by feeding it log records with apply_record();
+    get() and to_json() return the same dictionaries the JSON ledger holds.
+    """
+
+    def __init__(self):
+        self.steps = StepTable()
+        self._dvps: Dict[str, CompactDVP] = {}
+        self._raw: Dict[str, Dict[str, Any]] = {} # DVPs that do not fit the slotted model, kept verbatim
+
+    @classmethod
+    def from_ledger(cls, ledger: Dict[str, Dict[str, Any]]) -> 'CompactLedger':
+        compact = cls()
+        for dvp in ledger.values():
+            compact.add(dvp)
+        return compact
+
+    def __len__(self) -> int:
+        return len(self._dvps) + len(self._raw)
+
+    def __contains__(self, dvp_id: str) -> bool:
+        return dvp_id in self._dvps or dvp_id in self._raw
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._dvps
+        yield from self._raw
+
+    def add(self, dvp: Dict[str, Any]):
+        """Adds (or replaces) a DVP given in its to_json() form, including any lineage it already has."""
+        dvp_id = dvp['id']
+        self._dvps.pop(dvp_id, None)
+        self._raw.pop(dvp_id, None)
+        created_at = parse_timestamp(dvp.get('created_at'))
+        fits = (tuple(dvp) == DVP_FIELDS and created_at is not None and isinstance(dvp['claim_text'], str)
+                and isinstance(dvp['lineage'], list))
+        if not fits:
+            self._raw[dvp_id] = dict(dvp, lineage=list(dvp.get('lineage', [])))
+            return
+        self._dvps[dvp_id] = CompactDVP(dvp_id, dvp['claim_text'], created_at, dvp['current_confidence'],
+                                        dvp['agent_karma'])
+        for step in dvp['lineage']:
+            self.append_step(dvp_id, step, dvp['current_confidence'])
+
+    def append_step(self, dvp_id: str, step: Dict[str, Any], current_confidence: float):
+        """Appends one lineage step and the resulting confidence; raises KeyError for unknown DVPs."""
+        dvp = self._dvps.get(dvp_id)
+        if dvp is None:
+            raw = self._raw[dvp_id]
+            raw['lineage'].append(step)
+            raw['current_confidence'] = current_confidence
+            return
+        dvp.rows.append(self.steps.append(step, dvp_id, len(dvp.rows)))
+        dvp.current_confidence = current_confidence
+
+    def apply_record(self, record: Dict[str, Any]):
+        """Applies a single log record, with the same semantics as ledger_store.apply_record."""
+        op = record['op']
+        if op == 'create':
+            self.add(record['dvp'])
+        elif op == 'step':
+            if record['id'] in self:
+                self.append_step(record['id'], record['step'], record['current_confidence'])
+        else:
+            raise ValueError(f"Unknown ledger record op: {op}")
+
+    def get_compact(self, dvp_id: str) -> Optional[CompactDVP]:
+        """Returns the slotted DVP, or None if it is unknown or kept verbatim."""
+        return self._dvps.get(dvp_id)
+
+    def version(self, dvp_id: str) -> int:
+        """Number of lineage steps of a DVP (its compare-and-swap version)."""
+        dvp = self._dvps.get(dvp_id)
+        return len(dvp.rows) if dvp is not None else len(self._raw[dvp_id]['lineage'])
+
+    def get(self, dvp_id: str) -> Optional[Dict[str, Any]]:
+        """Returns one DVP in its to_json() form, or None if it does not exist."""
+        dvp = self._dvps.get(dvp_id)
+        if dvp is None:
+            raw = self._raw.get(dvp_id)
+            return dict(raw, lineage=list(raw['lineage'])) if raw is not None else None
+        return {
+            "id": dvp.id,
+            "claim_text": dvp.claim_text,
+            "created_at": format_timestamp(dvp.created_at),
+            "current_confidence": dvp.current_confidence,
+            "lineage": [self.steps.get(row, dvp_id, position) for position, row in enumerate(dvp.rows)],
+            "agent_karma": dvp.agent_karma
+        }
+
+    def to_json(self) -> Dict[str, Dict[str, Any]]:
+        """Returns the whole ledger as the dict-of-dicts JSON ledger."""
+        return {dvp_id: self.get(dvp_id) for dvp_id in self}
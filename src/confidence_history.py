@@ -0,0 +1,128 @@
+import bisect
+from typing import Dict, Any, Optional, List, Iterator, Tuple
+
+from src.dvp_model import DEFAULT_CONFIDENCE, calculate_k_factor, clamp_confidence
+
+# --- Point-in-Time Confidence ---
+# Answers "what was this DVP's confidence at time T" and "which DVPs were above
+# 0.8 on 2026-03-01" without replaying whole lineages. Every CHECKPOINT_INTERVAL
+# steps the confidence reached is kept; an as-of query binary searches the
+# lineage on step timestamps, starts from the last checkpoint before that
+# position and replays at most CHECKPOINT_INTERVAL - 1 weighted changes with the
+# clamp of DVP.add_lineage_step. A DVP whose last step is before T needs no
+# replay at all: its answer is current_confidence.
+#
+# Checkpoints follow a LedgerStore through its listener hooks. Records applied
+# incrementally carry the exact confidence after each step (and at creation);
+# after a full reload the checkpoints are replayed from the stored weighted
+# changes, starting from DEFAULT_CONFIDENCE, the confidence every DVP is created
+# with.
+#
+# "As of T" counts the steps timestamped before T, and only DVPs created before
+# T exist then (upper bounds are exclusive, as in LedgerIndex), so a date means
+# its midnight: "2026-03-01" is the state at the start of that day. Lineage
+# order is taken as time order.
+
+CHECKPOINT_INTERVAL = 8 # Steps between checkpoints: one float per 8 steps bounds the replay per query
+
+
+def _timestamp(step: Dict[str, Any]) -> str:
+    return step.get('timestamp', '')
+
+
+def weighted_change(step: Dict[str, Any], agent_karma: float = 0) -> float:
+    """The confidence change a stored step applied (steps written before weighted_change recompute it)."""
+    change = step.get('weighted_change')
+    if change is None:
+        change = step['result_score_change'] * calculate_k_factor(agent_karma)
+    return change
+
+
+class ConfidenceHistory:
+    """Confidence checkpoints of every DVP, for as-of queries."""
+
+    def __init__(self, ledger: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.reset(ledger if ledger is not None else {})
+
+    # --- Maintenance (LedgerStore listener interface) ---
+
+    def reset(self, ledger: Dict[str, Dict[str, Any]]):
+        """Replays the checkpoints of a whole ledger."""
+        self._ledger = ledger
+        # _checkpoints[id][c]: confidence after c * CHECKPOINT_INTERVAL steps
+        self._checkpoints: Dict[str, List[float]] = {}
+        self._created: List[Tuple[str, str]] = [] # Sorted (created_at, dvp_id)
+        for dvp in ledger.values():
+            self._replay(dvp)
+            self._created.append((dvp.get('created_at', ''), dvp['id']))
+        self._created.sort()
+
+    def apply(self, record: Dict[str, Any], ledger: Dict[str, Dict[str, Any]]):
+        """Checkpoints one log record that has just been applied to the ledger."""
+        self._ledger = ledger
+        if record['op'] == 'create':
+            dvp = ledger[record['dvp']['id']]
+            if dvp['id'] in self._checkpoints:
+                self._replay(dvp) # A create replayed over an existing DVP
+                return
+            self._checkpoints[dvp['id']] = [dvp['current_confidence']]
+            entry = (dvp.get('created_at', ''), dvp['id'])
+            # Records arrive in time order, so this is normally an append
+            if not self._created or self._created[-1] <= entry:
+                self._created.append(entry)
+            else:
+                bisect.insort(self._created, entry)
+        elif record['op'] == 'step':
+            dvp = ledger.get(record['id'])
+            if dvp is None:
+                return # Skipped by apply_record as well
+            size = len(dvp['lineage'])
+            checkpoints = self._checkpoints.get(dvp['id'])
+            if checkpoints is None or len(checkpoints) != (size - 1) // CHECKPOINT_INTERVAL + 1:
+                self._replay(dvp)
+            elif size % CHECKPOINT_INTERVAL == 0:
+                checkpoints.append(record['current_confidence'])
+
+    def _replay(self, dvp: Dict[str, Any]):
+        lineage = dvp['lineage']
+        confidence = DEFAULT_CONFIDENCE if lineage else dvp['current_confidence']
+        checkpoints = [confidence]
+        karma = dvp.get('agent_karma', 0)
+        for position, step in enumerate(lineage, 1):
+            confidence = clamp_confidence(confidence + weighted_change(step, karma))
+            if position % CHECKPOINT_INTERVAL == 0:
+                checkpoints.append(confidence)
+        self._checkpoints[dvp['id']] = checkpoints
+
+    # --- Queries ---
+
+    def confidence_as_of(self, dvp_id: str, as_of: str) -> Optional[float]:
+        """Confidence of a DVP at `as_of`, or None if it was created later; raises KeyError for an unknown DVP."""
+        dvp = self._ledger[dvp_id]
+        if dvp.get('created_at', '') >= as_of:
+            return None
+        return self._as_of(dvp, as_of)
+
+    def _as_of(self, dvp: Dict[str, Any], as_of: str) -> float:
+        lineage = dvp['lineage']
+        if not lineage or _timestamp(lineage[-1]) < as_of:
+            return dvp['current_confidence']
+        steps = bisect.bisect_left(lineage, as_of, key=_timestamp)
+        first = steps - steps % CHECKPOINT_INTERVAL
+        confidence = self._checkpoints[dvp['id']][first // CHECKPOINT_INTERVAL]
+        for position in range(first, steps):
+            step = lineage[position]
+            change = step.get('weighted_change')
+            if change is None:
+                change = weighted_change(step, dvp.get('agent_karma', 0))
+            confidence = max(0.0, min(1.0, confidence + change)) # clamp_confidence, inlined
+        return confidence
+
+    def dvps_as_of(self, as_of: str, min_confidence: float = 0.0,
+                   max_confidence: float = 1.0) -> Iterator[Tuple[str, float]]:
+        """(DVP id, confidence) at `as_of` for the DVPs then in [min, max], oldest first."""
+        ledger = self._ledger
+        for _, dvp_id in self._created[:bisect.bisect_left(self._created, (as_of,))]:
+            confidence = self._as_of(ledger[dvp_id], as_of)
+            if min_confidence <= confidence <= max_confidence:
+                yield dvp_id, confidence
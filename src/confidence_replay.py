@@ -0,0 +1,141 @@
+from typing import Dict, Any, List, Optional, Callable, Tuple
+
+import numpy as np
+
+from src.dvp_model import DEFAULT_CONFIDENCE, calculate_k_factor
+from src.compact_ledger import CompactLedger
+
+# --- Bulk Confidence Replay (NumPy) ---
+# Recomputes every DVP's confidence from its lineage when PROTOCOL.md parameters
+# (score tables, the K-Factor formula) change. Lineages are held as flat arrays:
+# one float64 score per step, in DVP order, with offsets marking where each DVP's
+# steps start. K-Factors and weighted changes are computed in bulk.
+#
+# The [0, 1] clamp makes confidence a sequential recurrence, so it cannot be a
+# plain cumulative sum. Instead the replay walks lineage *positions*: DVPs are
+# ordered by lineage length, so the DVPs that still have a step at position j are
+# a prefix of that order, and one vectorized add + clamp advances all of them.
+# Once few DVPs remain (the long tail), each finishes in a scalar loop.
+#
+# Every float operation is the one DVP.add_lineage_step performs, in the same
+# order (score * k, confidence + weighted, min then max), and K-Factors come from
+# the scalar calculate_k_factor, so results match the scalar path exactly.
+
+SCALAR_TAIL_THRESHOLD = 16 # Below this many active DVPs a Python loop beats a NumPy call per position
+
+
+class ConfidenceReplay:
+    """Flat NumPy arrays of every lineage in a ledger, replayed in bulk."""
+
+    def __init__(self, ids: List[str], karma: np.ndarray, offsets: np.ndarray, scores: np.ndarray):
+        self.ids = ids
+        self.karma = karma # float64, one per DVP
+        self.offsets = offsets # int64, len(ids) + 1; steps of DVP i are scores[offsets[i]:offsets[i + 1]]
+        self.scores = scores # float64 result_score_change of every step
+
+    @classmethod
+    def from_ledger(cls, ledger: Dict[str, Dict[str, Any]]) -> 'ConfidenceReplay':
+        """Loads the lineages of a dict-of-dicts ledger."""
+        ids = list(ledger)
+        lengths = np.fromiter((len(ledger[dvp_id]['lineage']) for dvp_id in ids), dtype=np.int64, count=len(ids))
+        offsets = np.zeros(len(ids) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        scores = np.fromiter((step['result_score_change'] for dvp_id in ids for step in ledger[dvp_id]['lineage']),
+                             dtype=np.float64, count=int(offsets[-1]))
+        karma = np.fromiter((ledger[dvp_id].get('agent_karma', 0) for dvp_id in ids), dtype=np.float64,
+                            count=len(ids))
+        return cls(ids, karma, offsets, scores)
+
+    @classmethod
+    def from_compact(cls, compact: CompactLedger) -> 'ConfidenceReplay':
+        """Loads the lineages of a CompactLedger, reading its score column without per-step dicts."""
+        ids = list(compact)
+        column = np.frombuffer(compact.steps.score_change, dtype=np.float64)
+        parts, karma, lengths = [], [], []
+        raw_rows = compact.steps.raw
+        for dvp_id in ids:
+            dvp = compact.get_compact(dvp_id)
+            if dvp is not None and not (raw_rows and any(row in raw_rows for row in dvp.rows)):
+                parts.append(column[np.frombuffer(dvp.rows, dtype=np.uint32)])
+                karma.append(dvp.agent_karma)
+            else:
+                data = compact.get(dvp_id)
+                parts.append(np.array([step['result_score_change'] for step in data['lineage']], dtype=np.float64))
+                karma.append(data.get('agent_karma', 0))
+            lengths.append(len(parts[-1]))
+        offsets = np.zeros(len(ids) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        scores = np.concatenate(parts) if parts else np.zeros(0, dtype=np.float64)
+        return cls(ids, np.array(karma, dtype=np.float64), offsets, scores)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def k_factors(self, k_factor: Callable[[float], float] = calculate_k_factor) -> np.ndarray:
+        """K-Factor per DVP, evaluated once per distinct karma value with the scalar formula."""
+        distinct, inverse = np.unique(self.karma, return_inverse=True)
+        return np.array([k_factor(float(value)) for value in distinct], dtype=np.float64)[inverse]
+
+    def replay(self, scores: Optional[np.ndarray] = None,
+               k_factor: Callable[[float], float] = calculate_k_factor,
+               initial_confidence: float = DEFAULT_CONFIDENCE) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Replays every lineage from `initial_confidence`.
+
+        `scores` optionally replaces the stored score of each step (e.g. after a score
+        table change). Returns (confidence per DVP, K-Factor per DVP, weighted change
+        per step).
+        """
+        scores = self.scores if scores is None else np.asarray(scores, dtype=np.float64)
+        if scores.shape != self.scores.shape:
+            raise ValueError(f"Expected {len(self.scores)} scores, got {len(scores)}.")
+        lengths = np.diff(self.offsets)
+        k_factors = self.k_factors(k_factor)
+        weighted = scores * np.repeat(k_factors, lengths)
+
+        # Longest lineages first, so the DVPs active at each position form a prefix
+        order = np.argsort(-lengths, kind='stable')
+        starts = self.offsets[:-1][order]
+        sorted_lengths = lengths[order]
+        confidence = np.full(len(self.ids), initial_confidence, dtype=np.float64)
+        active_confidence = confidence[order]
+
+        negated_lengths = -sorted_lengths # Ascending, for searchsorted
+        position = 0
+        active = int(np.count_nonzero(sorted_lengths))
+        while active >= SCALAR_TAIL_THRESHOLD:
+            head = active_confidence[:active]
+            head += weighted[starts[:active] + position]
+            np.minimum(head, 1.0, out=head)
+            np.maximum(head, 0.0, out=head)
+            position += 1
+            # Count the DVPs with more than `position` steps
+            active = int(np.searchsorted(negated_lengths, -position, side='left'))
+
+        for i in range(active):
+            value = float(active_confidence[i])
+            for change in weighted[starts[i] + position:starts[i] + sorted_lengths[i]].tolist():
+                value = max(0.0, min(1.0, value + change))
+            active_confidence[i] = value
+
+        confidence[order] = active_confidence
+        return confidence, k_factors, weighted
+
+    def apply(self, ledger: Dict[str, Dict[str, Any]], scores: Optional[np.ndarray] = None,
+              k_factor: Callable[[float], float] = calculate_k_factor,
+              initial_confidence: float = DEFAULT_CONFIDENCE) -> np.ndarray:
+        """Replays and writes the new K-Factors, weighted changes and confidences back into the ledger."""
+        confidence, k_factors, weighted = self.replay(scores, k_factor, initial_confidence)
+        new_scores = None if scores is None else np.asarray(scores, dtype=np.float64).tolist()
+        weighted = weighted.tolist()
+        for i, dvp_id in enumerate(self.ids):
+            dvp = ledger[dvp_id]
+            k = float(k_factors[i])
+            start = int(self.offsets[i])
+            for j, step in enumerate(dvp['lineage']):
+                if new_scores is not None:
+                    step['result_score_change'] = new_scores[start + j]
+                step['k_factor_applied'] = k
+                step['weighted_change'] = weighted[start + j]
+            dvp['current_confidence'] = float(confidence[i])
+        return confidence
@@ -3,23 +3,42 @@ import hashlib
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 from math import log10 # Added for Karma K-Factor calculation
+from src.ledger_merkle import LineageTree, dvp_root, header_hash
+
+DEFAULT_CONFIDENCE = 0.5 # Confidence of a newly created DVP
+UNIX_EPOCH = datetime(1970, 1, 1)
+
+# --- RGP Math (from PROTOCOL.md) ---
+# Shared by DVP.add_lineage_step and the bulk replay engine, which must agree bit for bit.
+
+def calculate_k_factor(agent_karma: float) -> float:
+    """K-Factor = 1 + log10(1 + KARMA_SCORE)."""
+    return 1 + log10(1 + agent_karma)
+
+def clamp_confidence(confidence: float) -> float:
+    """Keeps a confidence inside [0, 1]."""
+    return max(0.0, min(1.0, confidence))
 
 # --- DVP Schema Definition (from PROJECT.md) ---
 class DVP:
-    def __init__(self, claim_text: str, current_confidence: float = 0.5, lineage: List[Dict[str, Any]] = None, agent_karma: float = 0):
+    # Slotted: no per-instance __dict__, which matters when many DVPs are held in memory
+    __slots__ = ('id', 'claim_text', 'created_at', 'current_confidence', 'lineage', 'agent_karma', '_lineage_tree')
+
+    def __init__(self, claim_text: str, current_confidence: float = DEFAULT_CONFIDENCE, lineage: List[Dict[str, Any]] = None, agent_karma: float = 0):
         self.id = self._generate_id(claim_text)
         self.claim_text = claim_text
         self.created_at = datetime.utcnow().isoformat() + 'Z'
         self.current_confidence = current_confidence
         self.lineage = lineage if lineage is not None else []
         self.agent_karma = agent_karma # Agent's reputation score used for K-Factor
+        self._lineage_tree = None # Merkle tree over the lineage, built on first merkle_root()
 
     def _generate_id(self, claim_text: str) -> str:
         """Generates a simple content-addressable hash ID for the DVP."""
         data = f"{claim_text}{datetime.utcnow().isoformat()}"
         return hashlib.sha256(data.encode('utf-8')).hexdigest()
 
-    def add_lineage_step(self, step_data: Dict[str, Any]):
+    def add_lineage_step(self, step_data: Dict[str, Any], reputation=None):
         """
         Adds a verification step to the lineage and updates confidence based on RGP.
         
@@ -29,25 +48,61 @@ class DVP:
         - agent_did: Decentralized Identifier of the agent/group
         - result_score_change: Score modification based on PROTOCOL.md
         - attestation_vc_uri: URI to the immutable VC record
+
+        With a reputation store (src.reputation.ReputationStore), the K-Factor comes
+        from the decayed Karma of step_data['agent_did'] instead of agent_karma. The
+        store is only read here; credit the agent with record_step() once the step
+        is committed.
         """
-        step_data['timestamp'] = datetime.utcnow().isoformat() + 'Z'
+        now = datetime.utcnow()
+        step_data['timestamp'] = now.isoformat() + 'Z'
         self.lineage.append(step_data)
         
         # 1. Calculate K-Factor: K-Factor = 1 + log10(1 + KARMA_SCORE)
-        # Note: For this SVM, we use the hardcoded agent_karma property from the DVP instance.
-        karma_score_source = self.agent_karma # Simulating the agent's karma
-        k_factor = 1 + log10(1 + karma_score_source)
+        if reputation is not None:
+            k_factor = reputation.k_factor(step_data['agent_did'], (now - UNIX_EPOCH).total_seconds())
+        else:
+            # Note: For this SVM, we use the hardcoded agent_karma property from the DVP instance.
+            karma_score_source = self.agent_karma # Simulating the agent's karma
+            k_factor = calculate_k_factor(karma_score_source)
 
         # 2. Apply K-Factor to the score change
         weighted_score_change = step_data['result_score_change'] * k_factor
 
         # 3. Apply RGP Logic (from PROTOCOL.md)
-        self.current_confidence = max(0.0, min(1.0, self.current_confidence + weighted_score_change))
+        self.current_confidence = clamp_confidence(self.current_confidence + weighted_score_change)
 
         # 4. For testing, add K-Factor to step_data (optional, for debugging)
         step_data['k_factor_applied'] = k_factor
         step_data['weighted_change'] = weighted_score_change
 
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> 'DVP':
+        """Re-hydrates a DVP from its serialized dictionary, preserving its ID and creation date."""
+        dvp = cls.__new__(cls)
+        dvp.id = data['id']
+        dvp.claim_text = data['claim_text']
+        dvp.created_at = data['created_at']
+        dvp.current_confidence = data['current_confidence']
+        dvp.lineage = list(data['lineage'])
+        dvp.agent_karma = data.get('agent_karma', 0)
+        dvp._lineage_tree = None
+        return dvp
+
+    def merkle_root(self) -> str:
+        """
+        Hex Merkle root committing to this DVP and its lineage (see src.ledger_merkle).
+
+        The lineage tree is kept between calls and only hashes the steps added since
+        the last one; it is rebuilt if the lineage was shortened.
+        """
+        tree = self._lineage_tree
+        if tree is None or tree.size > len(self.lineage):
+            tree = self._lineage_tree = LineageTree()
+        for step in self.lineage[tree.size:]:
+            tree.append(step)
+        return dvp_root(header_hash(self.to_json()), tree.root(), tree.size).hex()
+
     def to_json(self) -> Dict[str, Any]:
         """Returns the DVP as a serializable dictionary."""
         return {
@@ -64,6 +119,16 @@ class DVP:
         with open(filename, 'w') as f:
             json.dump(self.to_json(), f, indent=2)
 
+def build_step_data(dvp_id: str, lineage_length: int, process_type: str, agent_did: str, score_change: float, attestation_uri: str) -> Dict[str, Any]:
+    """Builds the lineage step dictionary for the next step of a DVP."""
+    return {
+        "step_id": f"{process_type.lower()}-{dvp_id}-{lineage_length + 1}",
+        "process_type": process_type,
+        "agent_did": agent_did,
+        "result_score_change": score_change,
+        "attestation_vc_uri": attestation_uri
+    }
+
 # --- Test Example (Simulated OSD Process) ---
 if __name__ == "__main__":
     # 1. Create Initial DVP
@@ -0,0 +1,278 @@
+import json
+import os
+import struct
+from typing import Dict, Any, Optional, Iterator, Iterable, BinaryIO
+
+from src.compact_ledger import DVP_FIELDS, STEP_FIELDS, StepTable, format_timestamp, parse_timestamp
+
+# --- Binary Ledger Format ---
+# A compact alternative to the indented JSON export. The JSON file spends most of
+# its bytes on whitespace and on the eight key names repeated in every lineage
+# step, and json.load has to build the whole file in memory before the first DVP
+# is usable. The binary file is a versioned header followed by length-prefixed
+# records, so it can be written and read one DVP at a time:
+#
+#   header:  b'SLDG' | u16 format version | u16 flags (0)
+#   record:  u8 kind | u32 payload length | payload
+#
+# Record kinds:
+#   STRING  - defines the next string code (UTF-8 payload); process types and
+#             agent DIDs are written once and referenced by code afterwards.
+#   DVP     - a DVP packed field by field (see _pack_dvp).
+#   JSON    - a DVP that does not fit the packed layout, as compact JSON.
+#
+# Integers are little-endian. Readers reject files from a newer format version.
+
+BINARY_MAGIC = b'SLDG'
+BINARY_FORMAT_VERSION = 1
+BINARY_SUFFIX = '.slb'
+FORMAT_JSON = 'json'
+FORMAT_BINARY = 'binary'
+
+FILE_HEADER = struct.Struct('<4sHH')
+RECORD_HEADER = struct.Struct('<BI')
+RECORD_STRING, RECORD_DVP, RECORD_JSON = 1, 2, 3
+
+DVP_HEADER = struct.Struct('<32sBddqII') # id, flags, confidence, karma, created_at, claim length, step count
+STEP_HEADER = struct.Struct('<IIdqddI') # process type, agent DID, score, timestamp, k-factor, weighted, uri length
+STEP_ID_LENGTH = struct.Struct('<I') # 0: the default step_id; otherwise a custom step_id of that length follows
+KARMA_IS_INT = 0x01
+
+
+class LedgerFormatError(ValueError):
+    """Raised when a binary ledger file is malformed or from an unsupported version."""
+
+
+def _is_hex_id(value: Any) -> bool:
+    return isinstance(value, str) and len(value) == 64 and value == value.lower() and \
+        all(c in '0123456789abcdef' for c in value)
+
+
+class BinaryLedgerWriter:
+    """Streams DVPs (in their to_json() form) into the binary ledger format."""
+
+    def __init__(self, f: BinaryIO):
+        self._file = f
+        self._codes: Dict[str, int] = {}
+        f.write(FILE_HEADER.pack(BINARY_MAGIC, BINARY_FORMAT_VERSION, 0))
+
+    def _write_record(self, kind: int, payload: bytes):
+        self._file.write(RECORD_HEADER.pack(kind, len(payload)))
+        self._file.write(payload)
+
+    def _code(self, value: str) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self._codes)
+            self._write_record(RECORD_STRING, value.encode('utf-8'))
+        return code
+
+    def _pack_dvp(self, dvp: Dict[str, Any]) -> Optional[bytes]:
+        """Packs a DVP with the standard schema, or returns None so it is written as JSON."""
+        if tuple(dvp) != DVP_FIELDS or not _is_hex_id(dvp['id']) or not isinstance(dvp['claim_text'], str):
+            return None
+        created_at = parse_timestamp(dvp['created_at'])
+        karma = dvp['agent_karma']
+        if created_at is None or type(dvp['current_confidence']) is not float or not isinstance(dvp['lineage'], list):
+            return None
+        if type(karma) is int and abs(karma) < 2 ** 53:
+            flags = KARMA_IS_INT
+        elif type(karma) is float:
+            flags = 0
+        else:
+            return None
+
+        steps = []
+        for position, step in enumerate(dvp['lineage']):
+            if not isinstance(step, dict) or tuple(step) != STEP_FIELDS:
+                return None
+            timestamp = parse_timestamp(step['timestamp'])
+            if timestamp is None or not all(isinstance(step[key], str) for key in
+                                            ("step_id", "process_type", "agent_did", "attestation_vc_uri")):
+                return None
+            if not all(type(step[key]) is float for key in ("result_score_change", "k_factor_applied", "weighted_change")):
+                return None
+            if not step['step_id']:
+                return None # A zero length is reserved for the default step_id
+            uri = step['attestation_vc_uri'].encode('utf-8')
+            steps.append(STEP_HEADER.pack(self._code(step['process_type']), self._code(step['agent_did']),
+                                          step['result_score_change'], timestamp, step['k_factor_applied'],
+                                          step['weighted_change'], len(uri)))
+            steps.append(uri)
+            if step['step_id'] == StepTable.default_step_id(step['process_type'], dvp['id'], position):
+                steps.append(STEP_ID_LENGTH.pack(0))
+            else:
+                step_id = step['step_id'].encode('utf-8')
+                steps.append(STEP_ID_LENGTH.pack(len(step_id)) + step_id)
+
+        claim_text = dvp['claim_text'].encode('utf-8')
+        header = DVP_HEADER.pack(bytes.fromhex(dvp['id']), flags, dvp['current_confidence'], float(karma),
+                                 created_at, len(claim_text), len(dvp['lineage']))
+        return b''.join([header, claim_text] + steps)
+
+    def write(self, dvp: Dict[str, Any]):
+        """Appends one DVP to the file."""
+        payload = self._pack_dvp(dvp)
+        if payload is None:
+            self._write_record(RECORD_JSON, json.dumps(dvp, separators=(',', ':')).encode('utf-8'))
+        else:
+            self._write_record(RECORD_DVP, payload)
+
+    def write_all(self, dvps: Iterable[Dict[str, Any]]):
+        for dvp in dvps:
+            self.write(dvp)
+
+
+class BinaryLedgerReader:
+    """Streams DVPs back out of a binary ledger file; iterate over it to get to_json() dictionaries."""
+
+    def __init__(self, f: BinaryIO):
+        self._file = f
+        self._strings = []
+        header = f.read(FILE_HEADER.size)
+        if len(header) < FILE_HEADER.size:
+            raise LedgerFormatError("File is too short to be a binary ledger.")
+        magic, version, _ = FILE_HEADER.unpack(header)
+        if magic != BINARY_MAGIC:
+            raise LedgerFormatError("Not a binary ledger file (bad magic).")
+        if version > BINARY_FORMAT_VERSION:
+            raise LedgerFormatError(f"Binary ledger format version {version} is newer than supported "
+                                    f"version {BINARY_FORMAT_VERSION}.")
+        self.version = version
+
+    def _unpack_dvp(self, payload: bytes) -> Dict[str, Any]:
+        strings = self._strings
+        dvp_id, flags, confidence, karma, created_at, claim_length, step_count = DVP_HEADER.unpack_from(payload)
+        dvp_id = dvp_id.hex()
+        offset = DVP_HEADER.size
+        claim_text = payload[offset:offset + claim_length].decode('utf-8')
+        offset += claim_length
+
+        lineage = []
+        for position in range(step_count):
+            process_type, agent_did, score, timestamp, k_factor, weighted, uri_length = \
+                STEP_HEADER.unpack_from(payload, offset)
+            offset += STEP_HEADER.size
+            uri = payload[offset:offset + uri_length].decode('utf-8')
+            offset += uri_length
+            step_id_length, = STEP_ID_LENGTH.unpack_from(payload, offset)
+            offset += STEP_ID_LENGTH.size
+            process_type = strings[process_type]
+            if step_id_length:
+                step_id = payload[offset:offset + step_id_length].decode('utf-8')
+                offset += step_id_length
+            else:
+                step_id = StepTable.default_step_id(process_type, dvp_id, position)
+            lineage.append({
+                "step_id": step_id,
+                "process_type": process_type,
+                "agent_did": strings[agent_did],
+                "result_score_change": score,
+                "attestation_vc_uri": uri,
+                "timestamp": format_timestamp(timestamp),
+                "k_factor_applied": k_factor,
+                "weighted_change": weighted
+            })
+
+        return {
+            "id": dvp_id,
+            "claim_text": claim_text,
+            "created_at": format_timestamp(created_at),
+            "current_confidence": confidence,
+            "lineage": lineage,
+            "agent_karma": int(karma) if flags & KARMA_IS_INT else karma
+        }
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        read = self._file.read
+        while True:
+            header = read(RECORD_HEADER.size)
+            if not header:
+                return
+            if len(header) < RECORD_HEADER.size:
+                raise LedgerFormatError("Truncated record header.")
+            kind, length = RECORD_HEADER.unpack(header)
+            payload = read(length)
+            if len(payload) < length:
+                raise LedgerFormatError("Truncated record payload.")
+            try:
+                if kind == RECORD_STRING:
+                    self._strings.append(payload.decode('utf-8'))
+                elif kind == RECORD_DVP:
+                    yield self._unpack_dvp(payload)
+                elif kind == RECORD_JSON:
+                    yield json.loads(payload)
+                else:
+                    raise LedgerFormatError(f"Unknown record kind {kind}.")
+            except (struct.error, IndexError, UnicodeDecodeError) as e:
+                raise LedgerFormatError(f"Malformed record: {e}")
+
+
+# --- File-Level Helpers ---
+
+def format_for_path(path: str) -> str:
+    """Picks the format for an output file from its extension (.slb is binary, anything else JSON)."""
+    return FORMAT_BINARY if path.endswith(BINARY_SUFFIX) else FORMAT_JSON
+
+def detect_format(path: str) -> str:
+    """Detects the format of an existing ledger file from its first bytes."""
+    with open(path, 'rb') as f:
+        return FORMAT_BINARY if f.read(len(BINARY_MAGIC)) == BINARY_MAGIC else FORMAT_JSON
+
+def iter_ledger_file(path: str) -> Iterator[Dict[str, Any]]:
+    """Yields the DVPs of a JSON or binary ledger file (binary files are streamed)."""
+    if detect_format(path) == FORMAT_BINARY:
+        with open(path, 'rb') as f:
+            yield from BinaryLedgerReader(f)
+    else:
+        with open(path, 'r') as f:
+            yield from json.load(f).values()
+
+def load_ledger_file(path: str) -> Dict[str, Dict[str, Any]]:
+    """Loads a JSON or binary ledger file into the dict-of-dicts ledger."""
+    return {dvp['id']: dvp for dvp in iter_ledger_file(path)}
+
+def write_ledger_file(dvps: Iterable[Dict[str, Any]], path: str, fmt: Optional[str] = None):
+    """
+    Atomically writes DVPs to a ledger file (temp file + fsync + rename).
+
+    The format defaults to the one implied by the file extension; JSON is written
+    indented for human reading.
+    """
+    fmt = fmt or format_for_path(path)
+    if fmt not in (FORMAT_JSON, FORMAT_BINARY):
+        raise ValueError(f"Unknown ledger format: {fmt}")
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + '.tmp'
+    try:
+        if fmt == FORMAT_BINARY:
+            with open(tmp_path, 'wb') as f:
+                BinaryLedgerWriter(f).write_all(dvps)
+                f.flush()
+                os.fsync(f.fileno())
+        else:
+            with open(tmp_path, 'w') as f:
+                json.dump({dvp['id']: dvp for dvp in dvps}, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+    except BaseException:
+        # The DVP source failed part-way (e.g. a corrupt input file); leave no partial output behind
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+
+def convert_ledger_file(source_path: str, target_path: str, fmt: Optional[str] = None) -> int:
+    """Converts a ledger file between JSON and binary; returns the number of DVPs written."""
+    count = 0
+
+    def counted():
+        nonlocal count
+        for dvp in iter_ledger_file(source_path):
+            count += 1
+            yield dvp
+
+    write_ledger_file(counted(), target_path, fmt)
+    return count
@@ -0,0 +1,500 @@
+import asyncio
+import itertools
+import json
+import math
+import os
+import signal
+import socket
+import sys
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional, List, Iterator
+
+from src.dvp_model import DVP, build_step_data
+from src.ledger_store import LedgerStore, AmbiguousIdError, VersionConflictError
+from src.sharded_store import ShardedLedgerStore
+from src.change_feed import ChangeFeed, FeedTruncatedError
+from src.reputation import ReputationStore
+from src.ledger_index import LedgerIndex
+from src.ledger_merkle import LedgerMerkle
+from src.confidence_history import ConfidenceHistory
+from src.claim_index import ANONYMOUS_AGENT_DID, ON_DUPLICATE, RESUBMISSION_PROCESS_TYPE, ClaimIndex
+
+# --- Resident Ledger Service ---
+# Holds the ledger in memory behind a Unix domain socket so agents no longer pay
+# interpreter startup and a ledger reload per command. The protocol is one JSON
+# object per line in each direction:
+#   request:  {"op": "add_step", "dvp_id": "...", ...}
+#   response: {"ok": true, "result": ...} or {"ok": false, "error": "..."}
+#
+# Mutations run on the event loop, so each one is applied atomically. Records are
+# appended without flushing and a single committer task fsyncs them in groups
+# (group commit); a client is answered once its record is durable. A per-DVP lock
+# is held until then, so a later step on the same DVP is never acknowledged on top
+# of an earlier one that has not reached disk.
+#
+# Queries that can match much of the ledger (query, steps, ledger-wide as_of)
+# have no implicit limit and are answered in batches: zero or more
+# {"ok": true, "partial": [...]} lines, then {"ok": true, "result": [...]} with the last batch. The matches are
+# collected as references to the ledger when the request runs (the indexes
+# cannot be iterated across writes), then encoded one batch at a time, each
+# batch waiting on drain(), so the reply never exists as a single JSON document
+# on either end.
+#
+# {"op": "subscribe", "from_seq": n} turns a connection into a stream of change
+# events (one JSON line each) read from the change feed files. Subscribers are
+# woken after each group commit, and poll for events written by other processes.
+# A subscriber that reads slowly pauses on drain(): its position stays in the
+# feed on disk, so the daemon buffers at most one transport's worth for it.
+
+DEFAULT_SOCKET_PATH = 'data/ledger.sock'
+STREAM_BATCH_RESULTS = 256 # Results per line of a streamed reply
+MAX_REQUEST_BYTES = 1024 * 1024
+SUBSCRIBE_BATCH_EVENTS = 256 # Events read from the feed per write to a subscriber
+SUBSCRIBE_POLL_INTERVAL = 0.05 # Seconds a caught-up subscriber waits for events from other processes
+
+
+class DaemonError(Exception):
+    """Raised by the client when the daemon rejects a request."""
+
+
+class LedgerDaemon:
+    """Serves create, add_step, status and the index-backed queries over a Unix domain socket."""
+
+    def __init__(self, store: LedgerStore, socket_path: str = DEFAULT_SOCKET_PATH, commit_delay: float = 0.0,
+                 reputation: Optional[ReputationStore] = None, feed: Optional[ChangeFeed] = None):
+        self.store = store
+        self.feed = feed # Change feed the store publishes to, streamed to subscribers
+        self.socket_path = socket_path
+        self.commit_delay = commit_delay # Optional linger to let more writes join a group commit
+        self.ledger = store.load()
+        self.index = LedgerIndex()
+        store.add_listener(self.index) # Maintained incrementally on every write and catch-up
+        self.merkle = LedgerMerkle()
+        store.add_listener(self.merkle)
+        self.history = ConfidenceHistory()
+        store.add_listener(self.history)
+        self.claims = ClaimIndex()
+        store.add_listener(self.claims)
+        # Per-agent Karma for K-Factors, credited with every step written to the store
+        self.reputation = reputation
+        if reputation is not None:
+            store.add_listener(reputation)
+        self._dvp_locks: Dict[str, asyncio.Lock] = {}
+        self._dvp_lock_users: Dict[str, int] = {}
+        self._commit_waiters: List[asyncio.Future] = []
+        self._commit_requested: Optional[asyncio.Event] = None
+        self._events_committed: Optional[asyncio.Event] = None # Replaced after each set, so no waiter misses one
+        self._subscribers = set() # Connection tasks streaming change events, cancelled on shutdown
+        self._server = None
+
+    # --- Group Commit ---
+
+    async def _committer(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._commit_requested.wait()
+            if self.commit_delay:
+                await asyncio.sleep(self.commit_delay)
+            self._commit_requested.clear()
+            waiters, self._commit_waiters = self._commit_waiters, []
+            try:
+                await loop.run_in_executor(None, self.store.commit)
+            except Exception as e:
+                for waiter in waiters:
+                    waiter.set_exception(e)
+            else:
+                for waiter in waiters:
+                    waiter.set_result(None)
+                self._events_committed.set()
+                self._events_committed = asyncio.Event()
+
+    def _wait_durable(self) -> asyncio.Future:
+        waiter = asyncio.get_running_loop().create_future()
+        self._commit_waiters.append(waiter)
+        self._commit_requested.set()
+        return waiter
+
+    @asynccontextmanager
+    async def _locked_dvp(self, dvp_id: str):
+        """Serializes mutations of one DVP; locks are dropped once no request holds or awaits them."""
+        lock = self._dvp_locks.get(dvp_id)
+        if lock is None:
+            lock = self._dvp_locks[dvp_id] = asyncio.Lock()
+        self._dvp_lock_users[dvp_id] = self._dvp_lock_users.get(dvp_id, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self._dvp_lock_users[dvp_id] -= 1
+            if self._dvp_lock_users[dvp_id] == 0:
+                del self._dvp_lock_users[dvp_id]
+                del self._dvp_locks[dvp_id]
+
+    # --- Operations ---
+
+    @staticmethod
+    def _check_type(name: str, value: Any, expected_type) -> Any:
+        """Rejects request parameters of the wrong JSON type before they reach the store."""
+        if isinstance(value, bool) or not isinstance(value, expected_type):
+            raise ValueError(f"Parameter '{name}' has invalid type {type(value).__name__}.")
+        return value
+
+    def _check_limit(self, limit: Any) -> Optional[int]:
+        if limit is None:
+            return None
+        if self._check_type('limit', limit, int) < 1:
+            raise ValueError("Parameter 'limit' must be at least 1.")
+        return limit
+
+    def _check_number(self, name: str, value: Any) -> float:
+        value = float(self._check_type(name, value, (int, float)))
+        if not math.isfinite(value):
+            raise ValueError(f"Parameter '{name}' must be a finite number.")
+        return value
+
+    def _resolve(self, dvp_id: str) -> str:
+        self._check_type('dvp_id', dvp_id, str)
+        full_id = self.store.resolve_id(dvp_id)
+        if full_id is None:
+            raise KeyError(f"DVP with ID {dvp_id} not found.")
+        return full_id
+
+    async def op_create(self, claim_text: str, agent_karma: float = 0, on_duplicate: str = 'return',
+                        agent_did: Optional[str] = None) -> Dict[str, Any]:
+        self._check_type('claim_text', claim_text, str)
+        agent_karma = self._check_number('agent_karma', agent_karma)
+        if on_duplicate not in ON_DUPLICATE:
+            raise ValueError(f"Parameter 'on_duplicate' must be one of {', '.join(ON_DUPLICATE)}.")
+        if agent_did is not None:
+            self._check_type('agent_did', agent_did, str)
+        # No await between the lookup and the append, so concurrent creates of one claim make one DVP
+        self.store.refresh()
+        existing = self.claims.find(claim_text) if on_duplicate != 'create' else None
+        if existing is not None:
+            if on_duplicate == 'extend':
+                result = await self.op_add_step(existing, RESUBMISSION_PROCESS_TYPE, agent_did or ANONYMOUS_AGENT_DID,
+                                                0.0, "")
+                return dict(result, created=False)
+            return {"id": existing, "created": False}
+        similar = [{"id": dvp_id, "similarity": similarity} for dvp_id, similarity in self.claims.similar(claim_text)]
+        dvp_instance = DVP(claim_text=claim_text, agent_karma=agent_karma)
+        self.store.append_create(dvp_instance.to_json())
+        await self._wait_durable()
+        return {"id": dvp_instance.id, "created": True, "similar": similar}
+
+    async def op_add_step(self, dvp_id: str, process_type: str, agent_did: str, score_change: float,
+                          attestation_uri: str) -> Dict[str, Any]:
+        dvp_id = self._resolve(dvp_id)
+        for name, value in (('process_type', process_type), ('agent_did', agent_did), ('attestation_uri', attestation_uri)):
+            self._check_type(name, value, str)
+        score_change = self._check_number('score_change', score_change)
+
+        def build_step(dvp_data):
+            dvp_instance = DVP.from_json(dvp_data)
+            step_data = build_step_data(dvp_id, len(dvp_instance.lineage), process_type, agent_did,
+                                        score_change, attestation_uri)
+            dvp_instance.add_lineage_step(step_data, self.reputation)
+            return step_data, dvp_instance.current_confidence
+
+        async with self._locked_dvp(dvp_id):
+            # Compare-and-swap append: other processes may write to the same store.
+            _, current_confidence = self.store.update(dvp_id, build_step)
+            await self._wait_durable()
+        return {"id": dvp_id, "current_confidence": current_confidence}
+
+    async def op_status(self, dvp_id: str) -> Dict[str, Any]:
+        return self.store.get(self._resolve(dvp_id))
+
+    async def op_query(self, min_confidence: float = 0.0, max_confidence: float = 1.0,
+                       limit: Optional[int] = None, agent_did: Optional[str] = None,
+                       process_type: Optional[str] = None, created_after: Optional[str] = None,
+                       created_before: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        min_confidence = self._check_number('min_confidence', min_confidence)
+        max_confidence = self._check_number('max_confidence', max_confidence)
+        limit = self._check_limit(limit)
+        for name, value in (('agent_did', agent_did), ('process_type', process_type),
+                            ('created_after', created_after), ('created_before', created_before)):
+            if value is not None:
+                self._check_type(name, value, str)
+        self.store.refresh()
+        matches = self.index.query(agent_did, process_type, min_confidence, max_confidence, created_after, created_before)
+        rows = [(dvp['id'], dvp['current_confidence']) for dvp in itertools.islice(matches, limit)]
+        return ({"id": dvp_id, "current_confidence": confidence} for dvp_id, confidence in rows)
+
+    async def op_steps(self, process_type: Optional[str] = None, agent_did: Optional[str] = None,
+                       start: Optional[str] = None, end: Optional[str] = None,
+                       limit: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        limit = self._check_limit(limit)
+        for name, value in (('process_type', process_type), ('agent_did', agent_did), ('start', start), ('end', end)):
+            if value is not None:
+                self._check_type(name, value, str)
+        self.store.refresh()
+        rows = list(itertools.islice(self.index.steps(process_type, agent_did, start, end), limit))
+        return ({"dvp_id": dvp_id, "step": step} for dvp_id, step in rows)
+
+    async def op_as_of(self, as_of: str, dvp_id: Optional[str] = None, min_confidence: float = 0.0,
+                       max_confidence: float = 1.0, limit: Optional[int] = None) -> Any:
+        self._check_type('as_of', as_of, str)
+        if dvp_id is not None:
+            dvp_id = self._resolve(dvp_id)
+            self.store.refresh()
+            return {"id": dvp_id, "confidence": self.history.confidence_as_of(dvp_id, as_of)}
+        min_confidence = self._check_number('min_confidence', min_confidence)
+        max_confidence = self._check_number('max_confidence', max_confidence)
+        limit = self._check_limit(limit)
+        self.store.refresh()
+        rows = list(itertools.islice(self.history.dvps_as_of(as_of, min_confidence, max_confidence), limit))
+        return ({"id": dvp_id, "confidence": confidence} for dvp_id, confidence in rows)
+
+    async def op_karma(self, agent_did: str) -> Dict[str, Any]:
+        self._check_type('agent_did', agent_did, str)
+        if self.reputation is None:
+            raise ValueError("Reputation tracking is not enabled on this daemon (start it with --reputation).")
+        self.store.refresh()
+        return {"agent_did": agent_did, "karma": self.reputation.karma(agent_did),
+                "k_factor": self.reputation.k_factor(agent_did)}
+
+    async def op_merkle_root(self) -> str:
+        self.store.refresh()
+        return self.merkle.root()
+
+    async def op_merkle_nodes(self, level: int, indexes: List[int]) -> List[str]:
+        self._check_type('level', level, int)
+        self._check_type('indexes', indexes, list)
+        for index in indexes:
+            self._check_type('indexes', index, int)
+        self.store.refresh()
+        return self.merkle.nodes(level, indexes)
+
+    async def op_merkle_buckets(self, indexes: List[int]) -> List[Dict[str, str]]:
+        self._check_type('indexes', indexes, list)
+        for index in indexes:
+            self._check_type('indexes', index, int)
+        self.store.refresh()
+        return self.merkle.buckets(indexes)
+
+    async def op_step_proof(self, dvp_id: str, position: int) -> Dict[str, Any]:
+        self._check_type('position', position, int)
+        dvp_id = self._resolve(dvp_id)
+        self.store.refresh()
+        try:
+            return {"root": self.merkle.root(), "proof": self.merkle.prove_step(dvp_id, position)}
+        except IndexError as e:
+            raise ValueError(str(e))
+
+    async def op_ping(self) -> str:
+        return "pong"
+
+    # --- Connection Handling ---
+
+    async def _dispatch(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        op = request.pop('op', None)
+        handler = getattr(self, f"op_{op}", None) if isinstance(op, str) else None
+        if handler is None:
+            return {"ok": False, "error": f"Unknown op: {op}"}
+        try:
+            return {"ok": True, "result": await handler(**request)}
+        except KeyError as e:
+            return {"ok": False, "error": e.args[0] if e.args else str(e)}
+        except (AmbiguousIdError, VersionConflictError, TypeError, ValueError) as e:
+            return {"ok": False, "error": str(e)}
+        except Exception as e:
+            # Failed group commits (OSError) and anything unexpected: answer, don't drop the client
+            return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+
+    async def _send_stream(self, writer: asyncio.StreamWriter, results: Iterator[Any]):
+        """Writes a streamed result in batches of STREAM_BATCH_RESULTS, waiting on drain() after each."""
+        batch = list(itertools.islice(results, STREAM_BATCH_RESULTS))
+        while True:
+            following = list(itertools.islice(results, STREAM_BATCH_RESULTS))
+            response = {"ok": True, "partial": batch} if following else {"ok": True, "result": batch}
+            writer.write((json.dumps(response) + '\n').encode('utf-8'))
+            await writer.drain()
+            if not following:
+                return
+            batch = following
+
+    async def _subscribe(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                         from_seq: Optional[int] = None):
+        """Streams change events from from_seq (default: the next one) until the client disconnects."""
+        if self.feed is None:
+            raise ValueError("This daemon has no change feed.")
+        if from_seq is not None:
+            self._check_type('from_seq', from_seq, int)
+        seq = self.feed.next_seq() if from_seq is None else from_seq
+        writer.write((json.dumps({"ok": True, "result": {"from_seq": seq}}) + '\n').encode('utf-8'))
+        while True:
+            committed = self._events_committed
+            try:
+                data, count = self.feed.read_raw(seq, SUBSCRIBE_BATCH_EVENTS)
+            except FeedTruncatedError as e:
+                # The subscriber fell behind the feed's retention
+                writer.write((json.dumps({"ok": False, "error": str(e)}) + '\n').encode('utf-8'))
+                return
+            if count:
+                writer.write(data)
+                seq += count
+                await writer.drain()
+                continue
+            if reader.at_eof():
+                return # The subscriber hung up while caught up
+            try:
+                await asyncio.wait_for(committed.wait(), SUBSCRIBE_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("request must be a JSON object")
+                except ValueError as e:
+                    response = {"ok": False, "error": f"Invalid request: {e}"}
+                else:
+                    if request.get('op') == 'subscribe':
+                        request.pop('op')
+                        task = asyncio.current_task()
+                        self._subscribers.add(task)
+                        try:
+                            await self._subscribe(reader, writer, **request)
+                            break
+                        except (TypeError, ValueError) as e:
+                            response = {"ok": False, "error": str(e)}
+                        except asyncio.CancelledError:
+                            break # Daemon shutdown: end the stream like a hang-up
+                        finally:
+                            self._subscribers.discard(task)
+                    else:
+                        response = await self._dispatch(request)
+                        if isinstance(response.get('result'), Iterator):
+                            await self._send_stream(writer, response['result'])
+                            continue
+                writer.write((json.dumps(response) + '\n').encode('utf-8'))
+                await writer.drain()
+        except (ConnectionResetError, BrokenPipeError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve_forever(self):
+        """Starts the socket server and the committer, and runs until cancelled."""
+        self._commit_requested = asyncio.Event()
+        self._events_committed = asyncio.Event()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        committer = asyncio.create_task(self._committer())
+        self._server = await asyncio.start_unix_server(self._handle_client, path=self.socket_path,
+                                                       limit=MAX_REQUEST_BYTES)
+        try:
+            async with self._server:
+                await self._server.serve_forever()
+        finally:
+            committer.cancel()
+            subscribers = list(self._subscribers)
+            for subscriber in subscribers:
+                subscriber.cancel()
+            await asyncio.gather(*subscribers, return_exceptions=True)
+            self.store.commit()
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+
+class LedgerClient:
+    """Synchronous client for the ledger daemon, used by the thin CLI."""
+
+    def __init__(self, socket_path: str = DEFAULT_SOCKET_PATH):
+        self.socket_path = socket_path
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.connect(socket_path)
+        self._reader = self._sock.makefile('rb')
+
+    def _responses(self, op: str, params: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """Sends one request and yields its response lines: any partial batches, then the final response."""
+        self._sock.sendall((json.dumps({"op": op, **params}) + '\n').encode('utf-8'))
+        while True:
+            line = self._reader.readline()
+            if not line:
+                raise DaemonError("Ledger daemon closed the connection.")
+            response = json.loads(line)
+            if not response['ok']:
+                raise DaemonError(response['error'])
+            yield response
+            if 'partial' not in response:
+                return
+
+    def request(self, op: str, **params) -> Any:
+        """Sends one request and returns its result, raising DaemonError on failure; a streamed list is joined."""
+        partial = []
+        for response in self._responses(op, params):
+            partial.extend(response.get('partial', ()))
+        return partial + response['result'] if partial else response['result']
+
+    def stream(self, op: str, **params) -> Iterator[Any]:
+        """
+        Sends a request whose result is a list and yields its items as their batches arrive.
+
+        Consume it to the end before sending another request on this client.
+        """
+        for response in self._responses(op, params):
+            yield from response['partial'] if 'partial' in response else response['result']
+
+    def subscribe(self, from_seq: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Streams change events from from_seq (default: the next one published).
+
+        The connection carries only the subscription from then on. Stops when the
+        daemon closes the connection; raises DaemonError if the request is rejected
+        or the subscriber falls behind the feed's retention.
+        """
+        params = {} if from_seq is None else {"from_seq": from_seq}
+        self._sock.sendall((json.dumps({"op": "subscribe", **params}) + '\n').encode('utf-8'))
+        for line in self._reader:
+            message = json.loads(line)
+            if 'seq' in message:
+                yield message
+            elif not message['ok']:
+                raise DaemonError(message['error'])
+
+    def close(self):
+        self._reader.close()
+        self._sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def serve(store_path: str, socket_path: str = DEFAULT_SOCKET_PATH, legacy_path: Optional[str] = None,
+          commit_delay: float = 0.0, reputation: bool = False, shards: Optional[int] = None,
+          feed_path: Optional[str] = None):
+    """Runs the ledger daemon in the foreground until SIGINT or SIGTERM."""
+    feed = ChangeFeed(feed_path, fsync=True) if feed_path else None
+    store = ShardedLedgerStore(store_path, shards=shards, legacy_path=legacy_path, fsync=True, change_feed=feed)
+    agent_reputation = ReputationStore() if reputation else None # Built from the ledger when registered
+    daemon = LedgerDaemon(store, socket_path, commit_delay, agent_reputation, feed)
+
+    async def main():
+        task = asyncio.create_task(daemon.serve_forever())
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, task.cancel)
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    print(f"Ledger daemon serving {len(daemon.ledger)} DVPs on {socket_path}")
+    with store.write_batch():
+        asyncio.run(main())
+    store.close()
+    if feed is not None:
+        feed.close()
+    print("Ledger daemon stopped.")
+    sys.stdout.flush()
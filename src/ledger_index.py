@@ -0,0 +1,180 @@
+import bisect
+from typing import Dict, Any, Optional, List, Iterator, Tuple
+
+# --- Secondary Indexes over the In-Memory Ledger ---
+# Answers "which DVPs did this agent touch", "all steps of this process type",
+# "DVPs created (or steps taken) in this time window" and confidence-range
+# queries without scanning every DVP. The indexes follow a LedgerStore through
+# its listener hooks (reset on a full reload, apply per log record), so they are
+# maintained incrementally on every add_step, including steps caught up from
+# other processes.
+#
+# Timestamps are the ledger's ISO-8601 UTC strings, which sort chronologically as
+# strings; range bounds may be any prefix ("2026-02-03"). Lower bounds are
+# inclusive and upper bounds exclusive.
+#
+# Every query is a generator. Consume it before the ledger is written to again
+# (the daemon does so within a single request).
+
+CONFIDENCE_BUCKETS = 100 # Confidence index: one bucket per 0.01, each holding DVP id -> confidence
+
+
+def _bucket(confidence: float) -> int:
+    return min(max(int(confidence * CONFIDENCE_BUCKETS), 0), CONFIDENCE_BUCKETS - 1)
+
+
+class LedgerIndex:
+    """Secondary indexes on agent DID, process type, creation/step time and confidence."""
+
+    def __init__(self, ledger: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.reset(ledger if ledger is not None else {})
+
+    # --- Maintenance (LedgerStore listener interface) ---
+
+    def reset(self, ledger: Dict[str, Dict[str, Any]]):
+        """Rebuilds every index from a whole ledger."""
+        self._ledger = ledger
+        self._agent_dvps: Dict[str, Dict[str, None]] = {} # Insertion-ordered sets
+        self._process_dvps: Dict[str, Dict[str, None]] = {}
+        self._process_steps: Dict[str, List[Tuple[str, int]]] = {}
+        self._created: List[Tuple[str, str]] = [] # Sorted (created_at, dvp_id)
+        self._step_times: List[Tuple[str, str, int]] = [] # Sorted (timestamp, dvp_id, position)
+        self._confidence: Dict[str, float] = {}
+        self._confidence_buckets: List[Dict[str, float]] = [{} for _ in range(CONFIDENCE_BUCKETS)]
+        # Bulk load: append everything, then sort the time indexes once
+        self._bulk = True
+        for dvp in ledger.values():
+            self._add_dvp(dvp)
+        self._created.sort()
+        self._step_times.sort()
+        self._bulk = False
+
+    def apply(self, record: Dict[str, Any], ledger: Dict[str, Dict[str, Any]]):
+        """Indexes one log record that has just been applied to the ledger."""
+        self._ledger = ledger
+        if record['op'] == 'create':
+            self._add_dvp(ledger[record['dvp']['id']])
+        elif record['op'] == 'step':
+            dvp = ledger.get(record['id'])
+            if dvp is None:
+                return # Skipped by apply_record as well
+            self._add_step(dvp['id'], len(dvp['lineage']) - 1, record['step'])
+            self._set_confidence(dvp['id'], dvp['current_confidence'])
+
+    def _add_dvp(self, dvp: Dict[str, Any]):
+        dvp_id = dvp['id']
+        if dvp_id in self._confidence:
+            return # Already indexed (a create replayed over an existing DVP)
+        self._insert(self._created, (dvp.get('created_at', ''), dvp_id))
+        for position, step in enumerate(dvp['lineage']):
+            self._add_step(dvp_id, position, step)
+        self._set_confidence(dvp_id, dvp['current_confidence'])
+
+    def _add_step(self, dvp_id: str, position: int, step: Dict[str, Any]):
+        agent_did, process_type = step.get('agent_did'), step.get('process_type')
+        if agent_did is not None:
+            self._agent_dvps.setdefault(agent_did, {})[dvp_id] = None
+        if process_type is not None:
+            self._process_dvps.setdefault(process_type, {})[dvp_id] = None
+            self._process_steps.setdefault(process_type, []).append((dvp_id, position))
+        self._insert(self._step_times, (step.get('timestamp', ''), dvp_id, position))
+
+    def _insert(self, sorted_list: List[tuple], entry: tuple):
+        # Records arrive in time order, so this is normally an append
+        if self._bulk or not sorted_list or sorted_list[-1] <= entry:
+            sorted_list.append(entry)
+        else:
+            bisect.insort(sorted_list, entry)
+
+    def _set_confidence(self, dvp_id: str, confidence: float):
+        previous = self._confidence.get(dvp_id)
+        if previous is not None:
+            del self._confidence_buckets[_bucket(previous)][dvp_id]
+        self._confidence[dvp_id] = confidence
+        self._confidence_buckets[_bucket(confidence)][dvp_id] = confidence
+
+    # --- Queries ---
+
+    def dvps_by_agent(self, agent_did: str) -> Iterator[str]:
+        """DVP ids with at least one step by `agent_did`, in the order the agent first touched them."""
+        yield from self._agent_dvps.get(agent_did, ())
+
+    def dvps_by_confidence(self, min_confidence: float = 0.0, max_confidence: float = 1.0,
+                           descending: bool = False) -> Iterator[Tuple[str, float]]:
+        """(DVP id, confidence) pairs with min <= confidence <= max, sorted by confidence."""
+        if min_confidence > max_confidence:
+            return
+        buckets = range(_bucket(min_confidence), _bucket(max_confidence) + 1)
+        for b in (reversed(buckets) if descending else buckets):
+            matches = sorted(((confidence, dvp_id) for dvp_id, confidence in self._confidence_buckets[b].items()
+                              if min_confidence <= confidence <= max_confidence), reverse=descending)
+            for confidence, dvp_id in matches:
+                yield dvp_id, confidence
+
+    def dvps_created_between(self, start: Optional[str] = None, end: Optional[str] = None) -> Iterator[str]:
+        """DVP ids created in [start, end), oldest first."""
+        position = bisect.bisect_left(self._created, (start,)) if start else 0
+        while position < len(self._created):
+            created_at, dvp_id = self._created[position]
+            if end and created_at >= end:
+                return
+            yield dvp_id
+            position += 1
+
+    def steps(self, process_type: Optional[str] = None, agent_did: Optional[str] = None,
+              start: Optional[str] = None, end: Optional[str] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """(DVP id, step) pairs matching every given filter; step time in [start, end)."""
+        if process_type is not None:
+            candidates = iter(self._process_steps.get(process_type, ()))
+        else:
+            candidates = self._steps_between(start, end)
+        for dvp_id, position in candidates:
+            step = self._ledger[dvp_id]['lineage'][position]
+            if process_type is not None and step.get('process_type') != process_type:
+                continue
+            if agent_did is not None and step.get('agent_did') != agent_did:
+                continue
+            timestamp = step.get('timestamp', '')
+            if (start and timestamp < start) or (end and timestamp >= end):
+                continue
+            yield dvp_id, step
+
+    def _steps_between(self, start: Optional[str], end: Optional[str]) -> Iterator[Tuple[str, int]]:
+        position = bisect.bisect_left(self._step_times, (start,)) if start else 0
+        while position < len(self._step_times):
+            timestamp, dvp_id, step_position = self._step_times[position]
+            if end and timestamp >= end:
+                return
+            yield dvp_id, step_position
+            position += 1
+
+    def query(self, agent_did: Optional[str] = None, process_type: Optional[str] = None,
+              min_confidence: float = 0.0, max_confidence: float = 1.0,
+              created_after: Optional[str] = None, created_before: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Streams the DVPs matching every given filter.
+
+        The most selective index available drives the scan (agent, then process type,
+        then creation time, then confidence); the other filters are checked per DVP.
+        """
+        if agent_did is not None:
+            candidates = self.dvps_by_agent(agent_did)
+        elif process_type is not None:
+            candidates = iter(self._process_dvps.get(process_type, ()))
+        elif created_after or created_before:
+            candidates = self.dvps_created_between(created_after, created_before)
+        else:
+            candidates = (dvp_id for dvp_id, _ in self.dvps_by_confidence(min_confidence, max_confidence))
+
+        for dvp_id in candidates:
+            if not min_confidence <= self._confidence[dvp_id] <= max_confidence:
+                continue
+            if agent_did is not None and dvp_id not in self._agent_dvps.get(agent_did, ()):
+                continue
+            if process_type is not None and dvp_id not in self._process_dvps.get(process_type, ()):
+                continue
+            dvp = self._ledger[dvp_id]
+            created_at = dvp.get('created_at', '')
+            if (created_after and created_at < created_after) or (created_before and created_at >= created_before):
+                continue
+            yield dvp
@@ -0,0 +1,317 @@
+import hashlib
+import json
+from typing import Dict, Any, Optional, List, Tuple
+
+# --- Merkle Commitments over the Ledger ---
+# Two levels of Merkle trees commit to every byte of provenance:
+#
+#   lineage tree  one per DVP, over its lineage steps (RFC 6962 shape: a tree of n
+#                 leaves splits at the largest power of two below n). Appending a
+#                 step hashes the leaf plus the subtrees it completes, O(1) amortized;
+#                 the root costs O(log n).
+#   DVP root      commits to the DVP's header (id, claim_text, created_at,
+#                 agent_karma, current_confidence), its lineage root and step count.
+#   ledger tree   a fixed binary tree over 2**BUCKET_BITS buckets; a DVP falls in the
+#                 bucket given by the first bits of sha256(id), and a bucket hashes its
+#                 (id, DVP root) entries in id order. Only the buckets touched since
+#                 the last root are rehashed, with their paths to the top.
+#
+# Hashes are domain separated by a one-byte prefix (leaf, node, DVP, bucket) and
+# steps and headers are hashed as canonical JSON (sorted keys, no whitespace), so
+# any replica computes the same roots from the same records.
+#
+# Two replicas find the DVPs they disagree on by walking the ledger tree top down,
+# asking the other side only for the children of nodes that differ: O(d log N)
+# hashes for d differing DVPs instead of the whole ledger. A step inclusion proof
+# (prove_step) holds the lineage audit path, the DVP header hash, the entries of
+# the DVP's bucket and the bucket's path to the ledger root; verify_step checks it
+# against a trusted ledger root without the ledger.
+
+BUCKET_BITS = 16
+
+_LEAF, _NODE, _DVP, _BUCKET = b'\x00', b'\x01', b'\x02', b'\x03'
+HEADER_FIELDS = ('id', 'claim_text', 'created_at', 'agent_karma', 'current_confidence')
+
+
+def _sha256(data: bytes) -> bytes:
+    return hashlib.sha256(data).digest()
+
+
+def _canonical(value: Any) -> bytes:
+    return json.dumps(value, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+def leaf_hash(step: Dict[str, Any]) -> bytes:
+    """Hash of one lineage step."""
+    return _sha256(_LEAF + _canonical(step))
+
+
+def node_hash(left: bytes, right: bytes) -> bytes:
+    return _sha256(_NODE + left + right)
+
+
+def header_hash(dvp: Dict[str, Any]) -> bytes:
+    """Hash of the DVP fields outside its lineage."""
+    return _sha256(_canonical({field: dvp.get(field) for field in HEADER_FIELDS}))
+
+
+def dvp_root(header: bytes, lineage_root: bytes, size: int) -> bytes:
+    return _sha256(_DVP + header + lineage_root + size.to_bytes(8, 'big'))
+
+
+def bucket_hash(entries: Dict[str, bytes]) -> bytes:
+    """Hash of a bucket's id -> DVP root entries, in id order."""
+    return _sha256(_BUCKET + b''.join(dvp_id.encode('utf-8') + b'\x00' + entries[dvp_id]
+                                      for dvp_id in sorted(entries)))
+
+
+def bucket_of(dvp_id: str) -> int:
+    return int.from_bytes(_sha256(dvp_id.encode('utf-8'))[:4], 'big') >> (32 - BUCKET_BITS)
+
+
+EMPTY_LINEAGE = _sha256(b'') # Root of an empty lineage, as in RFC 6962
+# EMPTY_NODES[level]: hash of a ledger subtree of that height with no DVPs in it
+EMPTY_NODES = [bucket_hash({})]
+for _ in range(BUCKET_BITS):
+    EMPTY_NODES.append(node_hash(EMPTY_NODES[-1], EMPTY_NODES[-1]))
+
+
+def _split(size: int) -> int:
+    """Largest power of two below size (size > 1)."""
+    return 1 << ((size - 1).bit_length() - 1)
+
+
+class LineageTree:
+    """Append-only Merkle tree over one DVP's lineage steps."""
+
+    __slots__ = ('_levels',)
+
+    def __init__(self, steps=()):
+        # _levels[h][i]: hash of the complete subtree over leaves [i * 2**h, (i + 1) * 2**h)
+        self._levels: List[List[bytes]] = [[]]
+        for step in steps:
+            self.append(step)
+
+    @property
+    def size(self) -> int:
+        return len(self._levels[0])
+
+    def append(self, step: Dict[str, Any]):
+        """Adds the next step; hashes its leaf and any subtrees it completes."""
+        digest = leaf_hash(step)
+        height = 0
+        while True:
+            level = self._levels[height]
+            level.append(digest)
+            if len(level) % 2:
+                return
+            digest = node_hash(level[-2], level[-1])
+            height += 1
+            if height == len(self._levels):
+                self._levels.append([])
+
+    def _subtree(self, start: int, size: int) -> bytes:
+        """Hash of the RFC 6962 subtree over leaves [start, start + size)."""
+        if size & (size - 1) == 0 and start % size == 0:
+            return self._levels[size.bit_length() - 1][start // size]
+        k = _split(size)
+        return node_hash(self._subtree(start, k), self._subtree(start + k, size - k))
+
+    def root(self) -> bytes:
+        return self._subtree(0, self.size) if self.size else EMPTY_LINEAGE
+
+    def audit_path(self, position: int) -> List[bytes]:
+        """Sibling hashes from the leaf at `position` up to the root."""
+        if not 0 <= position < self.size:
+            raise IndexError(f"Lineage position {position} out of range (size {self.size}).")
+        path, start, size = [], 0, self.size
+        while size > 1:
+            k = _split(size)
+            if position - start < k:
+                path.append(self._subtree(start + k, size - k))
+                size = k
+            else:
+                path.append(self._subtree(start, k))
+                start, size = start + k, size - k
+        return path[::-1]
+
+
+def lineage_root_from_path(leaf: bytes, position: int, size: int, path: List[bytes]) -> Optional[bytes]:
+    """Recomputes a lineage root from a leaf and its audit path (RFC 9162 2.1.3.2); None if malformed."""
+    if not 0 <= position < size:
+        return None
+    fn, sn, digest = position, size - 1, leaf
+    for sibling in path:
+        if sn == 0:
+            return None
+        if fn & 1 or fn == sn:
+            digest = node_hash(sibling, digest)
+            while not fn & 1 and fn:
+                fn, sn = fn >> 1, sn >> 1
+        else:
+            digest = node_hash(digest, sibling)
+        fn, sn = fn >> 1, sn >> 1
+    return digest if sn == 0 else None
+
+
+class LedgerMerkle:
+    """Lineage trees of every DVP and the ledger tree over their roots."""
+
+    def __init__(self, ledger: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.reset(ledger if ledger is not None else {})
+
+    # --- Maintenance (LedgerStore listener interface) ---
+
+    def reset(self, ledger: Dict[str, Dict[str, Any]]):
+        """Rehashes every DVP of a whole ledger."""
+        self._ledger = ledger
+        self._trees: Dict[str, LineageTree] = {}
+        self._roots: Dict[str, bytes] = {}
+        self._buckets: Dict[int, Dict[str, bytes]] = {}
+        # _nodes[level]: non-empty node hashes of the ledger tree; level 0 holds the buckets
+        self._nodes: List[Dict[int, bytes]] = [{} for _ in range(BUCKET_BITS + 1)]
+        self._dirty = set()
+        for dvp in ledger.values():
+            self._trees[dvp['id']] = LineageTree(dvp['lineage'])
+            self._update_root(dvp)
+
+    def apply(self, record: Dict[str, Any], ledger: Dict[str, Dict[str, Any]]):
+        """Hashes one log record that has just been applied to the ledger."""
+        self._ledger = ledger
+        dvp_id = record['dvp']['id'] if record['op'] == 'create' else record['id']
+        dvp = ledger.get(dvp_id)
+        if dvp is None:
+            return # A step skipped by apply_record
+        tree = self._trees.get(dvp_id)
+        if record['op'] == 'create' or tree is None or tree.size != len(dvp['lineage']) - 1:
+            tree = self._trees[dvp_id] = LineageTree(dvp['lineage'])
+        else:
+            tree.append(record['step'])
+        self._update_root(dvp)
+
+    def _update_root(self, dvp: Dict[str, Any]):
+        tree = self._trees[dvp['id']]
+        root = dvp_root(header_hash(dvp), tree.root(), tree.size)
+        self._roots[dvp['id']] = root
+        bucket = bucket_of(dvp['id'])
+        self._buckets.setdefault(bucket, {})[dvp['id']] = root
+        self._dirty.add(bucket)
+
+    def _flush(self):
+        """Rehashes the dirty buckets and their paths to the top."""
+        if not self._dirty:
+            return
+        level = self._nodes[0]
+        for bucket in self._dirty:
+            level[bucket] = bucket_hash(self._buckets[bucket])
+        dirty = self._dirty
+        for height in range(1, BUCKET_BITS + 1):
+            below, level = level, self._nodes[height]
+            empty = EMPTY_NODES[height - 1]
+            dirty = {index >> 1 for index in dirty}
+            for index in dirty:
+                level[index] = node_hash(below.get(2 * index, empty), below.get(2 * index + 1, empty))
+        self._dirty = set()
+
+    # --- Roots and Replica Comparison ---
+
+    def root(self) -> str:
+        """Hex root of the whole ledger."""
+        self._flush()
+        return self._nodes[BUCKET_BITS].get(0, EMPTY_NODES[BUCKET_BITS]).hex()
+
+    def dvp_root(self, dvp_id: str) -> str:
+        """Hex root of one DVP; raises KeyError for an unknown DVP."""
+        return self._roots[dvp_id].hex()
+
+    def nodes(self, level: int, indexes: List[int]) -> List[str]:
+        """Hex hashes of ledger tree nodes; level BUCKET_BITS is the root, level 0 the buckets."""
+        if not 0 <= level <= BUCKET_BITS:
+            raise ValueError(f"Merkle level must be between 0 and {BUCKET_BITS}.")
+        self._flush()
+        nodes = self._nodes[level]
+        return [nodes.get(index, EMPTY_NODES[level]).hex() for index in indexes]
+
+    def buckets(self, indexes: List[int]) -> List[Dict[str, str]]:
+        """The id -> hex DVP root entries of each bucket."""
+        return [{dvp_id: root.hex() for dvp_id, root in self._buckets.get(index, {}).items()} for index in indexes]
+
+    # --- Inclusion Proofs ---
+
+    def prove_step(self, dvp_id: str, position: int) -> Dict[str, Any]:
+        """Proof that lineage step `position` of a DVP is in the ledger with the current root."""
+        self._flush()
+        tree = self._trees[dvp_id]
+        dvp = self._ledger[dvp_id]
+        bucket = bucket_of(dvp_id)
+        ledger_path, index = [], bucket
+        for height in range(BUCKET_BITS):
+            ledger_path.append(self._nodes[height].get(index ^ 1, EMPTY_NODES[height]).hex())
+            index >>= 1
+        return {"dvp_id": dvp_id, "position": position, "lineage_size": tree.size,
+                "lineage_path": [digest.hex() for digest in tree.audit_path(position)],
+                "header_hash": header_hash(dvp).hex(), "bucket": self.buckets([bucket])[0],
+                "ledger_path": ledger_path}
+
+
+def verify_step(step: Dict[str, Any], proof: Dict[str, Any], ledger_root: str) -> bool:
+    """Checks a prove_step proof for a step against a trusted ledger root."""
+    try:
+        lineage_root = lineage_root_from_path(leaf_hash(step), proof['position'], proof['lineage_size'],
+                                              [bytes.fromhex(digest) for digest in proof['lineage_path']])
+        if lineage_root is None:
+            return False
+        root = dvp_root(bytes.fromhex(proof['header_hash']), lineage_root, proof['lineage_size'])
+        entries = {dvp_id: bytes.fromhex(digest) for dvp_id, digest in proof['bucket'].items()}
+        if entries.get(proof['dvp_id']) != root or len(proof['ledger_path']) != BUCKET_BITS:
+            return False
+        digest, index = bucket_hash(entries), bucket_of(proof['dvp_id'])
+        for sibling in proof['ledger_path']:
+            sibling = bytes.fromhex(sibling)
+            digest = node_hash(sibling, digest) if index & 1 else node_hash(digest, sibling)
+            index >>= 1
+        return digest.hex() == ledger_root
+    except (KeyError, TypeError, ValueError):
+        return False
+
+
+def diff_replicas(local: LedgerMerkle, remote) -> Tuple[List[str], int]:
+    """
+    Ids of the DVPs whose roots differ between two replicas, or that only one holds.
+
+    remote needs nodes(level, indexes) and buckets(indexes) like LedgerMerkle (e.g.
+    RemoteMerkle over a daemon connection). Asks for the children of differing nodes
+    one level per round trip; returns the ids and the number of hashes received.
+    """
+    received = 1
+    level, differing = BUCKET_BITS, [0]
+    if remote.nodes(level, differing) == local.nodes(level, differing):
+        return [], received
+    while level > 0:
+        level -= 1
+        children = [child for index in differing for child in (2 * index, 2 * index + 1)]
+        theirs = remote.nodes(level, children)
+        received += len(children)
+        differing = [index for index, ours, other in zip(children, local.nodes(level, children), theirs)
+                     if ours != other]
+    ids = set()
+    for ours, theirs in zip(local.buckets(differing), remote.buckets(differing)):
+        received += len(theirs)
+        ids.update(dvp_id for dvp_id in ours.keys() | theirs.keys() if ours.get(dvp_id) != theirs.get(dvp_id))
+    return sorted(ids), received
+
+
+class RemoteMerkle:
+    """The replica-comparison side of LedgerMerkle, served by a ledger daemon (LedgerClient)."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def root(self) -> str:
+        return self.client.request('merkle_root')
+
+    def nodes(self, level: int, indexes: List[int]) -> List[str]:
+        return self.client.request('merkle_nodes', level=level, indexes=indexes)
+
+    def buckets(self, indexes: List[int]) -> List[Dict[str, str]]:
+        return self.client.request('merkle_buckets', indexes=indexes)
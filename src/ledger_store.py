@@ -0,0 +1,1040 @@
+import errno
+import fcntl
+import json
+import mmap
+import os
+import string
+import struct
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, List, Iterator, Tuple, Callable
+
+from src.ledger_codec import load_ledger_file
+from src.claim_index import claim_hash
+
+# --- Append-Only Ledger Storage (Write-Ahead Log + Snapshots) ---
+# Every create and lineage step is appended as a single JSON line to the active
+# log segment, so the cost of a write no longer depends on the size of the ledger.
+# In-memory state is rebuilt from the latest snapshot plus the log segments that
+# follow it. Compaction folds sealed segments into a new snapshot in a background
+# thread once the log has grown past a fraction of the snapshot size, which keeps
+# the amortized cost per write O(1).
+#
+# Every snapshot and segment has a companion .idx file mapping DVP ids to the byte
+# offset and length of their records, so a single DVP can be read with a binary
+# search plus a few small reads instead of replaying the whole ledger. A .claims
+# file beside them maps the hash of each created DVP's normalized claim (see
+# claim_index) to its id, so the DVPs carrying a claim are found the same way,
+# without loading the ledger.
+#
+# Concurrent writers: appends take a short inter-process byte-range lock on
+# ledger.lock, and lineage updates are compare-and-swap on the DVP's version (its
+# number of lineage steps) under a lock stripe chosen by id prefix. Writers to
+# different DVPs only share the append critical section, never a read-modify-write.
+
+SEGMENT_PREFIX = 'segment-'
+SEGMENT_SUFFIX = '.log'
+SNAPSHOT_PREFIX = 'snapshot-'
+SNAPSHOT_SUFFIX = '.jsonl'
+INDEX_SUFFIX = '.idx'
+CLAIMS_SUFFIX = '.claims'
+
+# Snapshot index entries are sorted by id: raw sha256 id, record offset, record length.
+SNAPSHOT_INDEX_ENTRY = struct.Struct('>32sQI')
+# Segment index entries follow log order and also carry the record op.
+SEGMENT_INDEX_ENTRY = struct.Struct('>32sQIB')
+OP_CODES = {'create': 0, 'step': 1}
+OP_CREATE = OP_CODES['create']
+# Claim index entries: claim hash, raw sha256 id. Sorted in a snapshot, in log order in a segment.
+CLAIM_INDEX_ENTRY = struct.Struct('>32s32s')
+
+LOCK_FILE = 'ledger.lock'
+COMPACT_LOCK_FILE = 'compact.lock'
+RETIRED_FILE = 'retired' # Present once a store has been replaced (e.g. by a reshard); appends then fail
+APPEND_LOCK_BYTE = 0
+LOCK_STRIPE_HEX_DIGITS = 3 # 4096 per-DVP lock stripes, bytes 1..4096 of the lock file
+LOCK_RETRY_DELAY = 0.001 # Seconds before retrying a record lock refused as a (false) deadlock
+DEFAULT_MAX_RETRIES = 100
+POINT_CACHE_SIZE = 1024 # DVPs whose point-read state is kept between lookups
+
+# Compact once the live log reaches this many bytes or this ratio of the snapshot size.
+DEFAULT_MIN_COMPACT_BYTES = 4 * 1024 * 1024
+DEFAULT_COMPACT_RATIO = 1.0
+
+
+def _encode_record(record: Dict[str, Any]) -> bytes:
+    """Encodes one log record as a compact JSON line."""
+    return (json.dumps(record, separators=(',', ':')) + '\n').encode('utf-8')
+
+
+def _record_id(record: Dict[str, Any]) -> str:
+    """Returns the DVP id a log record belongs to."""
+    return record['dvp']['id'] if record['op'] == 'create' else record['id']
+
+
+def _claim_entry(dvp: Dict[str, Any]) -> bytes:
+    """Claim index entry of a serialized DVP."""
+    return CLAIM_INDEX_ENTRY.pack(bytes.fromhex(claim_hash(dvp['claim_text'])), bytes.fromhex(dvp['id']))
+
+
+class AmbiguousIdError(LookupError):
+    """Raised when a shortened DVP id matches more than one DVP."""
+
+    def __init__(self, prefix: str, candidates: List[str]):
+        super().__init__(f"DVP id prefix {prefix} is ambiguous: {', '.join(candidates)}")
+        self.prefix = prefix
+        self.candidates = candidates
+
+
+class StoreRetiredError(Exception):
+    """Raised when appending to a store that has been replaced by another one."""
+
+    def __init__(self, path: str):
+        super().__init__(f"Ledger store {path} has been retired")
+        self.path = path
+
+
+class VersionConflictError(Exception):
+    """Raised when a compare-and-swap append finds the DVP at a different version than expected."""
+
+    def __init__(self, dvp_id: str, expected: Optional[int], actual: Optional[int]):
+        super().__init__(f"DVP {dvp_id} is at version {actual}, expected {expected}")
+        self.dvp_id = dvp_id
+        self.expected = expected
+        self.actual = actual
+
+
+def apply_record(state: Dict[str, Dict[str, Any]], record: Dict[str, Any]):
+    """Applies a single log record to an in-memory ledger dictionary."""
+    op = record['op']
+    if op == 'create':
+        dvp = record['dvp']
+        state[dvp['id']] = dvp
+    elif op == 'step':
+        dvp = state.get(record['id'])
+        if dvp is None:
+            # A step for an unknown DVP can only come from a damaged log; skip it.
+            return
+        dvp['lineage'].append(record['step'])
+        dvp['current_confidence'] = record['current_confidence']
+    else:
+        raise ValueError(f"Unknown ledger record op: {op}")
+
+
+class LedgerStore:
+    """
+    Append-only storage engine for the DVP ledger.
+
+    Layout of the store directory:
+    - snapshot-<N>.jsonl: one DVP per line (sorted by id), covering segments <= N.
+    - segment-<M>.log: log records appended after the snapshot (M > N).
+    - <file>.idx: id -> (offset, length) index for the snapshot or segment beside it.
+    - <file>.claims: claim hash -> id index for the DVPs created in it.
+    - ledger.lock / compact.lock: inter-process lock files.
+
+    Several processes may open the same store. Appends are serialized by a short
+    byte-range lock, lineage updates are checked against per-DVP versions under a
+    striped lock (see append_step and update), and a process that holds the ledger
+    in memory picks up records written by the others before it reads or writes.
+    """
+
+    def __init__(self, path: str, legacy_path: Optional[str] = None, fsync: bool = False,
+                 auto_compact: bool = True, min_compact_bytes: int = DEFAULT_MIN_COMPACT_BYTES,
+                 compact_ratio: float = DEFAULT_COMPACT_RATIO, change_feed=None):
+        self.path = path
+        self.fsync = fsync
+        self.change_feed = change_feed # ChangeFeed that every appended record is published to
+        self.auto_compact = auto_compact
+        self.min_compact_bytes = min_compact_bytes
+        self.compact_ratio = compact_ratio
+        self._lock = threading.RLock()
+        self._range_thread_locks: Dict[int, threading.Lock] = {}
+        self._range_guard = threading.Lock()
+        self._compaction_thread: Optional[threading.Thread] = None
+        self._state: Optional[Dict[str, Dict[str, Any]]] = None
+        self._applied_segment = 0 # Position up to which _state reflects the log
+        self._applied_offset = 0
+        # id -> (snapshot, {segment: index bytes applied}, dvp) for incremental point reads
+        self._point_cache: 'OrderedDict[bytes, Tuple[int, Dict[int, int], Optional[Dict[str, Any]]]]' = OrderedDict()
+        self._listeners: List[Any] = [] # Secondary structures kept in step with the in-memory ledger
+        self._log_file = None
+        self._index_file = None
+        self._claims_file = None
+        self._batch_depth = 0
+
+        os.makedirs(self.path, exist_ok=True)
+        self._lock_fd = os.open(os.path.join(self.path, LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+        with self._compaction_lock(blocking=False) as acquired:
+            if acquired:
+                self._cleanup_stale_files()
+                if legacy_path and self._is_empty() and os.path.exists(legacy_path):
+                    self._import_legacy(legacy_path)
+
+        with self._range_lock(APPEND_LOCK_BYTE):
+            self._snapshot = self._latest_snapshot()
+            segments = self._live_segments()
+            self._segment = segments[-1] if segments else self._snapshot + 1
+            self._repair_tail()
+            self._repair_indexes(segments)
+        self._snapshot_bytes = self._file_size(self._snapshot_path(self._snapshot))
+        self._log_bytes = sum(self._file_size(self._segment_path(s)) for s in segments)
+
+    # --- Inter-Process Locking ---
+
+    @contextmanager
+    def _range_lock(self, byte: int):
+        """
+        Exclusive lock on one byte of the shared lock file.
+
+        POSIX record locks only exclude other processes, so each byte also has a
+        thread lock to exclude other threads of this process.
+
+        Linux's deadlock detection for record locks reports false positives when
+        processes queue on several bytes of one file. Stripes are always taken
+        before the append byte, so there is no real cycle and EDEADLK is retried.
+        """
+        with self._range_guard:
+            thread_lock = self._range_thread_locks.get(byte)
+            if thread_lock is None:
+                thread_lock = self._range_thread_locks[byte] = threading.Lock()
+        with thread_lock:
+            while True:
+                try:
+                    fcntl.lockf(self._lock_fd, fcntl.LOCK_EX, 1, byte, os.SEEK_SET)
+                    break
+                except OSError as e:
+                    if e.errno != errno.EDEADLK:
+                        raise
+                    time.sleep(LOCK_RETRY_DELAY)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self._lock_fd, fcntl.LOCK_UN, 1, byte, os.SEEK_SET)
+
+    @staticmethod
+    def _stripe_byte(dvp_id: str) -> int:
+        """Maps a DVP id to its lock stripe, so writers to different DVPs rarely contend."""
+        return 1 + int(dvp_id[:LOCK_STRIPE_HEX_DIGITS], 16)
+
+    @contextmanager
+    def _compaction_lock(self, blocking: bool = True):
+        """Yields True while holding the store-wide compaction lock, or False if it is busy."""
+        with open(os.path.join(self.path, COMPACT_LOCK_FILE), 'a') as f:
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    # --- File Layout Helpers ---
+
+    def _segment_path(self, number: int) -> str:
+        return os.path.join(self.path, f"{SEGMENT_PREFIX}{number:08d}{SEGMENT_SUFFIX}")
+
+    def _snapshot_path(self, number: int) -> str:
+        return os.path.join(self.path, f"{SNAPSHOT_PREFIX}{number:08d}{SNAPSHOT_SUFFIX}")
+
+    @staticmethod
+    def _index_path(data_path: str) -> str:
+        return data_path + INDEX_SUFFIX
+
+    @staticmethod
+    def _claims_path(data_path: str) -> str:
+        return data_path + CLAIMS_SUFFIX
+
+    def _numbered_files(self, prefix: str, suffix: str) -> List[int]:
+        numbers = []
+        for name in os.listdir(self.path):
+            if name.startswith(prefix) and name.endswith(suffix):
+                numbers.append(int(name[len(prefix):-len(suffix)]))
+        return sorted(numbers)
+
+    def _latest_snapshot(self) -> int:
+        snapshots = self._numbered_files(SNAPSHOT_PREFIX, SNAPSHOT_SUFFIX)
+        return snapshots[-1] if snapshots else 0
+
+    def _live_segments(self) -> List[int]:
+        return [s for s in self._numbered_files(SEGMENT_PREFIX, SEGMENT_SUFFIX) if s > self._snapshot]
+
+    @staticmethod
+    def _file_size(path: str) -> int:
+        return os.path.getsize(path) if os.path.exists(path) else 0
+
+    def _is_empty(self) -> bool:
+        return not self._numbered_files(SNAPSHOT_PREFIX, SNAPSHOT_SUFFIX) and \
+            not self._numbered_files(SEGMENT_PREFIX, SEGMENT_SUFFIX)
+
+    def _cleanup_stale_files(self):
+        """Removes leftovers of an interrupted compaction (caller holds the compaction lock)."""
+        snapshot = self._latest_snapshot()
+        for name in os.listdir(self.path):
+            if name.endswith('.tmp'):
+                os.remove(os.path.join(self.path, name))
+        for s in self._numbered_files(SNAPSHOT_PREFIX, SNAPSHOT_SUFFIX):
+            if s < snapshot:
+                self._remove_with_index(self._snapshot_path(s))
+        for s in self._numbered_files(SEGMENT_PREFIX, SEGMENT_SUFFIX):
+            if s <= snapshot:
+                self._remove_with_index(self._segment_path(s))
+        for s in self._numbered_files(SNAPSHOT_PREFIX, SNAPSHOT_SUFFIX + INDEX_SUFFIX):
+            if s != snapshot:
+                os.remove(self._index_path(self._snapshot_path(s)))
+        for s in self._numbered_files(SEGMENT_PREFIX, SEGMENT_SUFFIX + INDEX_SUFFIX):
+            if s <= snapshot:
+                os.remove(self._index_path(self._segment_path(s)))
+        for s in self._numbered_files(SNAPSHOT_PREFIX, SNAPSHOT_SUFFIX + CLAIMS_SUFFIX):
+            if s != snapshot:
+                os.remove(self._claims_path(self._snapshot_path(s)))
+        for s in self._numbered_files(SEGMENT_PREFIX, SEGMENT_SUFFIX + CLAIMS_SUFFIX):
+            if s <= snapshot:
+                os.remove(self._claims_path(self._segment_path(s)))
+
+    def _remove_with_index(self, data_path: str):
+        for path in (data_path, self._index_path(data_path), self._claims_path(data_path)):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _repair_tail(self):
+        """Truncates a torn final record left behind by a crash mid-append (caller holds the append lock)."""
+        path = self._segment_path(self._segment)
+        size = self._file_size(path)
+        if size == 0:
+            return
+        with open(path, 'rb+') as f:
+            f.seek(max(0, size - 1))
+            if f.read(1) == b'\n':
+                return
+            f.seek(0)
+            data = f.read()
+            f.truncate(data.rfind(b'\n') + 1)
+
+    def _repair_indexes(self, segments: List[int]):
+        """
+        Rebuilds any index that does not exactly cover the file it belongs to.
+
+        A create's claim entry is written before its id index entry, so a segment
+        whose id index covers it has every claim entry; claim indexes missing
+        (stores written before they existed) or torn are rebuilt as well.
+        """
+        snapshot_path = self._snapshot_path(self._snapshot)
+        if os.path.exists(snapshot_path) and not os.path.exists(self._index_path(snapshot_path)):
+            self._rebuild_index(snapshot_path, SNAPSHOT_INDEX_ENTRY)
+        if os.path.exists(snapshot_path) and not os.path.exists(self._claims_path(snapshot_path)):
+            self._rebuild_claims(snapshot_path)
+        for s in segments:
+            path = self._segment_path(s)
+            index_path = self._index_path(path)
+            index_size = self._file_size(index_path)
+            covered = 0
+            if index_size % SEGMENT_INDEX_ENTRY.size == 0 and index_size > 0:
+                with open(index_path, 'rb') as f:
+                    f.seek(index_size - SEGMENT_INDEX_ENTRY.size)
+                    _, offset, length, _ = SEGMENT_INDEX_ENTRY.unpack(f.read(SEGMENT_INDEX_ENTRY.size))
+                    covered = offset + length
+            claims_path = self._claims_path(path)
+            if covered != self._file_size(path) or index_size % SEGMENT_INDEX_ENTRY.size:
+                self._rebuild_index(path, SEGMENT_INDEX_ENTRY)
+                self._rebuild_claims(path)
+            elif not os.path.exists(claims_path) or self._file_size(claims_path) % CLAIM_INDEX_ENTRY.size:
+                self._rebuild_claims(path)
+
+    def _rebuild_index(self, data_path: str, entry: struct.Struct):
+        """Recreates an index file by scanning the records of its data file."""
+        tmp_path = self._index_path(data_path) + '.tmp'
+        offset = 0
+        with open(data_path, 'rb') as data, open(tmp_path, 'wb') as out:
+            for line in data:
+                if not line.endswith(b'\n'):
+                    break
+                record = json.loads(line)
+                if entry is SNAPSHOT_INDEX_ENTRY:
+                    out.write(entry.pack(bytes.fromhex(record['id']), offset, len(line)))
+                else:
+                    out.write(entry.pack(bytes.fromhex(_record_id(record)), offset, len(line),
+                                         OP_CODES[record['op']]))
+                offset += len(line)
+        os.replace(tmp_path, self._index_path(data_path))
+
+    def _rebuild_claims(self, data_path: str):
+        """Recreates the claim index of a snapshot or segment by scanning its records."""
+        snapshot = data_path.endswith(SNAPSHOT_SUFFIX)
+        entries = []
+        with open(data_path, 'rb') as data:
+            for line in data:
+                if not line.endswith(b'\n'):
+                    break
+                record = json.loads(line)
+                if snapshot:
+                    entries.append(_claim_entry(record))
+                elif record['op'] == 'create':
+                    entries.append(_claim_entry(record['dvp']))
+        tmp_path = self._claims_path(data_path) + '.tmp'
+        with open(tmp_path, 'wb') as out:
+            out.write(b''.join(sorted(entries) if snapshot else entries))
+        os.replace(tmp_path, self._claims_path(data_path))
+
+    def _import_legacy(self, legacy_path: str):
+        """Seeds an empty store with the contents of a whole-file ledger (JSON or binary)."""
+        self.seed(load_ledger_file(legacy_path))
+
+    def seed(self, state: Dict[str, Dict[str, Any]]):
+        """Writes a whole ledger as the first snapshot of an empty store."""
+        with self._lock:
+            if not self._is_empty():
+                raise ValueError(f"Ledger store {self.path} is not empty")
+            self._snapshot_bytes = self._write_snapshot(0, state)
+
+    # --- Reading ---
+
+    def _read_snapshot(self, number: int) -> Dict[str, Dict[str, Any]]:
+        state = {}
+        path = self._snapshot_path(number)
+        if not os.path.exists(path):
+            return state
+        with open(path, 'rb') as f:
+            for line in f:
+                dvp = json.loads(line)
+                state[dvp['id']] = dvp
+        return state
+
+    @staticmethod
+    def _replay_segment(state: Dict[str, Dict[str, Any]], path: str, start: int = 0, listeners: List[Any] = ()) -> int:
+        """Applies the complete records of a segment from a byte offset; returns the offset reached."""
+        with open(path, 'rb') as f:
+            f.seek(start)
+            data = f.read()
+        end = data.rfind(b'\n') + 1 # A torn final record is left for a later read
+        for line in data[:end].splitlines():
+            record = json.loads(line)
+            apply_record(state, record)
+            for listener in listeners:
+                listener.apply(record, state)
+        return start + end
+
+    def _replay(self, snapshot: int, segments: List[int]) -> Dict[str, Dict[str, Any]]:
+        state = self._read_snapshot(snapshot)
+        for s in segments:
+            self._replay_segment(state, self._segment_path(s))
+        return state
+
+    def _reload_state(self):
+        """Rebuilds the in-memory ledger from the latest snapshot and live segments."""
+        while True:
+            self._snapshot = self._latest_snapshot()
+            segments = self._live_segments()
+            try:
+                state = self._read_snapshot(self._snapshot)
+                offset = 0
+                for s in segments:
+                    offset = self._replay_segment(state, self._segment_path(s))
+            except FileNotFoundError:
+                continue # Another process compacted while we were reading; start over
+            break
+        if self._state is None:
+            self._state = state
+        else:
+            # Keep the dictionary identity: callers may hold a reference to it.
+            self._state.clear()
+            self._state.update(state)
+        self._applied_segment = segments[-1] if segments else self._snapshot + 1
+        self._applied_offset = offset
+        for listener in self._listeners:
+            listener.reset(self._state)
+
+    def _catch_up(self):
+        """Applies records appended by other processes since the in-memory ledger was last updated."""
+        if self._state is None:
+            return
+        while True:
+            path = self._segment_path(self._applied_segment)
+            if not os.path.exists(path):
+                if self._applied_segment <= self._latest_snapshot():
+                    # Another process compacted the segment away before we read all of it.
+                    self._reload_state()
+                return
+            if self._file_size(path) > self._applied_offset:
+                self._applied_offset = self._replay_segment(self._state, path, self._applied_offset, self._listeners)
+            if not os.path.exists(self._segment_path(self._applied_segment + 1)):
+                return
+            self._applied_segment += 1
+            self._applied_offset = 0
+
+    def install_state(self, state: Dict[str, Dict[str, Any]], position: Tuple[int, int, int]):
+        """
+        Adopts a ledger read by load_state (typically in a worker process) as the
+        in-memory ledger, then catches up from the log position it was read at.
+        """
+        with self._lock:
+            if self._state is not None:
+                self._catch_up()
+                return
+            self._state = state
+            self._snapshot, self._applied_segment, self._applied_offset = position
+            self._catch_up()
+            for listener in self._listeners:
+                listener.reset(self._state)
+
+    def refresh(self):
+        """Brings the in-memory ledger (if loaded) up to date with writes from other processes."""
+        with self._lock:
+            self._catch_up()
+
+    def load(self) -> Dict[str, Dict[str, Any]]:
+        """Returns the full in-memory ledger, rebuilding it from disk on first use."""
+        with self._lock:
+            if self._state is None:
+                self._reload_state()
+            else:
+                self._catch_up()
+            return self._state
+
+    def add_listener(self, listener):
+        """
+        Keeps a derived structure (e.g. a secondary index) in step with the in-memory ledger.
+
+        Loads the ledger if needed. listener.reset(ledger) is called now and after any
+        full reload; listener.apply(record, ledger) after each record applied to it,
+        whether written by this store or caught up from another process.
+        """
+        with self._lock:
+            self._listeners.append(listener)
+            if self._state is None:
+                self._reload_state()
+            else:
+                listener.reset(self._state)
+
+    def get(self, dvp_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns the serialized DVP for an id, or None if it is not in the ledger.
+
+        Uses the in-memory ledger when it is loaded, otherwise reads only the
+        records of this DVP through the snapshot and segment indexes.
+        """
+        with self._lock:
+            if self._state is not None:
+                self._catch_up()
+                return self._state.get(dvp_id)
+            try:
+                key = bytes.fromhex(dvp_id)
+            except ValueError:
+                return None
+            if len(key) != 32:
+                return None
+            while True:
+                try:
+                    return self._point_read(key)
+                except FileNotFoundError:
+                    continue # Another process compacted while we were reading; start over
+
+    def _point_read(self, key: bytes) -> Optional[Dict[str, Any]]:
+        """
+        Reads one DVP through the indexes.
+
+        The result is cached together with how much of each segment index has been
+        applied, so repeated reads of a DVP (as in read-modify-write loops) only
+        parse the records appended since the previous read.
+        """
+        self._snapshot = self._latest_snapshot()
+        cached = self._point_cache.pop(key, None)
+        if cached is not None and cached[0] == self._snapshot:
+            _, applied, dvp = cached
+        else:
+            applied, dvp = {}, self._lookup_snapshot(key)
+        for s in self._live_segments():
+            start = applied.get(s, 0)
+            entries = self._segment_entries(s, start)
+            applied[s] = start + len(entries)
+            matches = list(self._lookup_segment(entries, key))
+            if not matches:
+                continue
+            with open(self._segment_path(s), 'rb') as f:
+                for position, op, offset, length in matches:
+                    f.seek(offset)
+                    data = f.read(length)
+                    if len(data) < length:
+                        # Indexed by a writer whose record is not flushed yet; retry it next time.
+                        applied[s] = start + position
+                        break
+                    record = json.loads(data)
+                    if op == OP_CREATE:
+                        dvp = record['dvp']
+                    elif dvp is not None:
+                        dvp['lineage'].append(record['step'])
+                        dvp['current_confidence'] = record['current_confidence']
+        if self._latest_snapshot() != self._snapshot:
+            # A compaction deleted segments we may have listed but not read; start over
+            raise FileNotFoundError(self._snapshot_path(self._snapshot))
+        self._point_cache[key] = (self._snapshot, applied, dvp)
+        if len(self._point_cache) > POINT_CACHE_SIZE:
+            self._point_cache.popitem(last=False)
+        # Hand out a copy so callers never see the cached lineage grow under them.
+        return None if dvp is None else dict(dvp, lineage=list(dvp['lineage']))
+
+    def __contains__(self, dvp_id: str) -> bool:
+        return self.get(dvp_id) is not None
+
+    def version(self, dvp_id: str) -> Optional[int]:
+        """Returns the DVP's version (the number of lineage steps), or None if it does not exist."""
+        dvp = self.get(dvp_id)
+        return None if dvp is None else len(dvp['lineage'])
+
+    @staticmethod
+    def _read_at(path: str, offset: int, length: int) -> bytes:
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            return f.read(length)
+
+    def _snapshot_entry(self, index: mmap.mmap, position: int) -> Tuple[bytes, int, int]:
+        start = position * SNAPSHOT_INDEX_ENTRY.size
+        return SNAPSHOT_INDEX_ENTRY.unpack_from(index, start)
+
+    def _snapshot_lower_bound(self, index: mmap.mmap, key: bytes) -> int:
+        """Binary search for the first snapshot index entry whose id is >= key."""
+        lo, hi = 0, len(index) // SNAPSHOT_INDEX_ENTRY.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = mid * SNAPSHOT_INDEX_ENTRY.size
+            if index[start:start + 32] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _open_snapshot_index(self) -> Optional[mmap.mmap]:
+        index_path = self._index_path(self._snapshot_path(self._snapshot))
+        if self._file_size(index_path) == 0:
+            return None
+        with open(index_path, 'rb') as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _lookup_snapshot(self, key: bytes) -> Optional[Dict[str, Any]]:
+        index = self._open_snapshot_index()
+        if index is None:
+            return None
+        with index:
+            position = self._snapshot_lower_bound(index, key)
+            if position * SNAPSHOT_INDEX_ENTRY.size >= len(index):
+                return None
+            entry_id, offset, length = self._snapshot_entry(index, position)
+            if entry_id != key:
+                return None
+        return json.loads(self._read_at(self._snapshot_path(self._snapshot), offset, length))
+
+    def _segment_entries(self, number: int, start: int = 0) -> bytes:
+        path = self._index_path(self._segment_path(number))
+        if not os.path.exists(path):
+            return b''
+        with open(path, 'rb') as f:
+            f.seek(start)
+            entries = f.read()
+        # Drop a partially written entry from a concurrent writer.
+        return entries[:len(entries) - len(entries) % SEGMENT_INDEX_ENTRY.size]
+
+    @staticmethod
+    def _lookup_segment(entries: bytes, key: bytes) -> Iterator[Tuple[int, int, int, int]]:
+        """Yields (entry position, op, offset, length) for every record of one DVP in segment index bytes."""
+        position = entries.find(key)
+        while position != -1:
+            if position % SEGMENT_INDEX_ENTRY.size == 0:
+                _, offset, length, op = SEGMENT_INDEX_ENTRY.unpack_from(entries, position)
+                yield position, op, offset, length
+            position = entries.find(key, position + 1)
+
+    def resolve_id(self, prefix: str) -> Optional[str]:
+        """
+        Expands a unique DVP id prefix (like a shortened git hash) to the full id.
+
+        Returns None when nothing matches and raises AmbiguousIdError when the
+        prefix matches more than one DVP.
+        """
+        prefix = prefix.lower()
+        # int(prefix, 16) would also accept '0x1a', '1_a' or surrounding whitespace
+        if not prefix or not all(c in string.hexdigits for c in prefix):
+            return None
+        if len(prefix) >= 64:
+            return prefix if self.get(prefix) is not None else None
+
+        matches = set()
+        with self._lock:
+            if self._state is not None:
+                self._catch_up()
+                matches.update(dvp_id for dvp_id in self._state if dvp_id.startswith(prefix))
+            else:
+                self._snapshot = self._latest_snapshot()
+                index = self._open_snapshot_index()
+                if index is not None:
+                    with index:
+                        lower = bytes.fromhex(prefix + '0' * (len(prefix) % 2))
+                        position = self._snapshot_lower_bound(index, lower)
+                        while position * SNAPSHOT_INDEX_ENTRY.size < len(index) and len(matches) < 2:
+                            entry_id = self._snapshot_entry(index, position)[0].hex()
+                            if not entry_id.startswith(prefix):
+                                break
+                            matches.add(entry_id)
+                            position += 1
+                for s in self._live_segments():
+                    entries = self._segment_entries(s)
+                    for entry_id, _, _, op in SEGMENT_INDEX_ENTRY.iter_unpack(entries):
+                        if op == OP_CREATE and entry_id.hex().startswith(prefix):
+                            matches.add(entry_id.hex())
+
+        if len(matches) > 1:
+            raise AmbiguousIdError(prefix, sorted(matches))
+        return matches.pop() if matches else None
+
+    def claim_ids(self, digest: str) -> List[str]:
+        """
+        Ids of the DVPs whose normalized claim has this hash (claim_index.claim_hash), sorted.
+
+        Reads only the claim indexes, like a point read: a binary search in the
+        snapshot's and a scan of the live segments', never the ledger itself.
+        """
+        key = bytes.fromhex(digest)
+        with self._lock:
+            while True:
+                try:
+                    return self._lookup_claims(key)
+                except FileNotFoundError:
+                    continue # Another process compacted while we were reading; start over
+
+    def _lookup_claims(self, key: bytes) -> List[str]:
+        self._snapshot = self._latest_snapshot()
+        matches = set()
+        claims_path = self._claims_path(self._snapshot_path(self._snapshot))
+        if self._file_size(claims_path):
+            with open(claims_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as index:
+                lo, hi = 0, len(index) // CLAIM_INDEX_ENTRY.size
+                while lo < hi:
+                    mid = (lo + hi) // 2
+                    start = mid * CLAIM_INDEX_ENTRY.size
+                    if index[start:start + 32] < key:
+                        lo = mid + 1
+                    else:
+                        hi = mid
+                while lo * CLAIM_INDEX_ENTRY.size < len(index):
+                    claim, dvp_id = CLAIM_INDEX_ENTRY.unpack_from(index, lo * CLAIM_INDEX_ENTRY.size)
+                    if claim != key:
+                        break
+                    matches.add(dvp_id.hex())
+                    lo += 1
+        for s in self._live_segments():
+            path = self._claims_path(self._segment_path(s))
+            if not os.path.exists(path):
+                continue
+            with open(path, 'rb') as f:
+                entries = f.read()
+            position = entries.find(key)
+            while position != -1:
+                # A partially written final entry is too short to match
+                if position % CLAIM_INDEX_ENTRY.size == 0 and position + CLAIM_INDEX_ENTRY.size <= len(entries):
+                    matches.add(entries[position + 32:position + CLAIM_INDEX_ENTRY.size].hex())
+                position = entries.find(key, position + 1)
+        if self._latest_snapshot() != self._snapshot:
+            raise FileNotFoundError(self._snapshot_path(self._snapshot))
+        return sorted(matches)
+
+    def __len__(self) -> int:
+        return len(self.load())
+
+    # --- Writing ---
+
+    def _follow_rotation(self):
+        """
+        Switches to the newest segment if a compaction (in any process) has sealed ours.
+
+        Any number of compactions may have happened since our last append, so the
+        active segment is always the highest one on disk (and above the latest
+        snapshot). An open handle whose file was unlinked is reopened by path.
+        """
+        segments = self._numbered_files(SEGMENT_PREFIX, SEGMENT_SUFFIX)
+        newest = max(segments[-1] if segments else 0, self._latest_snapshot() + 1, self._segment)
+        if newest != self._segment:
+            self._close_segment()
+            self._segment = newest
+        elif self._log_file is not None:
+            try:
+                on_disk = os.stat(self._segment_path(self._segment)).st_ino
+            except FileNotFoundError:
+                on_disk = None
+            if on_disk != os.fstat(self._log_file.fileno()).st_ino:
+                self._close_segment()
+
+    def _append(self, record: Dict[str, Any]):
+        data = _encode_record(record)
+        key = bytes.fromhex(_record_id(record))
+        with self._lock, self._range_lock(APPEND_LOCK_BYTE):
+            if self._is_retired():
+                raise StoreRetiredError(self.path)
+            self._follow_rotation()
+            self._catch_up()
+            if self._log_file is None:
+                path = self._segment_path(self._segment)
+                self._log_file = open(path, 'ab')
+                self._index_file = open(self._index_path(path), 'ab')
+                self._claims_file = open(self._claims_path(path), 'ab')
+            # Other processes append to the same file, so the offset is the current end of it.
+            offset = os.fstat(self._log_file.fileno()).st_size
+            self._log_file.write(data)
+            self._log_file.flush()
+            if record['op'] == 'create':
+                # Before the id index entry, so every indexed create has its claim entry
+                self._claims_file.write(_claim_entry(record['dvp']))
+                self._claims_file.flush()
+            self._index_file.write(SEGMENT_INDEX_ENTRY.pack(key, offset, len(data), OP_CODES[record['op']]))
+            self._index_file.flush()
+            if self.change_feed is not None:
+                # Under the append lock, so change events follow the log order
+                self.change_feed.publish(record)
+            self._log_bytes += len(data)
+            if self._state is not None:
+                apply_record(self._state, record)
+                for listener in self._listeners:
+                    listener.apply(record, self._state)
+                self._applied_segment = self._segment
+                self._applied_offset = offset + len(data)
+        if self._batch_depth == 0:
+            self.commit()
+        if self.auto_compact and self._should_compact():
+            self.compact(wait=False)
+
+    def _is_retired(self) -> bool:
+        return os.path.exists(os.path.join(self.path, RETIRED_FILE))
+
+    @contextmanager
+    def pause_writes(self):
+        """Holds the append lock: no thread or process can append to the store until the block exits."""
+        with self._lock, self._range_lock(APPEND_LOCK_BYTE):
+            yield self
+
+    def retire(self):
+        """Marks the store as replaced; every later append, from any process, raises StoreRetiredError."""
+        with open(os.path.join(self.path, RETIRED_FILE), 'w'):
+            pass
+
+    def commit(self):
+        """
+        Makes appended records durable (fsync) when durability is enabled.
+
+        Records are always written through to the file under the append lock, so
+        other processes see them immediately; only the fsync is deferred inside a
+        write batch. It runs outside the store lock on duplicated descriptors, so
+        other threads can keep appending while a group of records is made durable.
+        The change feed, if any, is committed after the records.
+        """
+        if not self.fsync:
+            return
+        with self._lock:
+            descriptors = [] if self._log_file is None else \
+                [os.dup(handle.fileno()) for handle in (self._log_file, self._index_file, self._claims_file)]
+        for fd in descriptors:
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        if self.change_feed is not None:
+            self.change_feed.commit()
+
+    @contextmanager
+    def write_batch(self):
+        """Defers the fsync of appended records until the batch exits, then commits once."""
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                if self._batch_depth == 0:
+                    self.commit()
+
+    def append_create(self, dvp_json: Dict[str, Any]):
+        """Appends a newly created DVP to the log."""
+        self._append({"op": "create", "dvp": dvp_json})
+
+    def append_step(self, dvp_id: str, step_data: Dict[str, Any], current_confidence: float,
+                    expected_version: Optional[int] = None):
+        """
+        Appends one lineage step and the resulting confidence to the log.
+
+        With expected_version the append is a compare-and-swap: it only happens if
+        the DVP still has that many lineage steps, checked under the DVP's lock
+        stripe, and VersionConflictError is raised otherwise.
+        """
+        if expected_version is None:
+            self._append_step_record(dvp_id, step_data, current_confidence)
+            return
+        with self._range_lock(self._stripe_byte(dvp_id)):
+            self._compare_and_append(dvp_id, step_data, current_confidence, expected_version)
+
+    def _append_step_record(self, dvp_id: str, step_data: Dict[str, Any], current_confidence: float):
+        self._append({"op": "step", "id": dvp_id, "step": step_data, "current_confidence": current_confidence})
+
+    def _compare_and_append(self, dvp_id: str, step_data: Dict[str, Any], current_confidence: float,
+                            expected_version: int):
+        """Version check and append; the caller holds the DVP's lock stripe."""
+        actual = self.version(dvp_id)
+        if actual != expected_version:
+            raise VersionConflictError(dvp_id, expected_version, actual)
+        self._append_step_record(dvp_id, step_data, current_confidence)
+
+    def update(self, dvp_id: str, build_step: Callable[[Dict[str, Any]], Tuple[Dict[str, Any], float]],
+               max_retries: int = DEFAULT_MAX_RETRIES) -> Tuple[Dict[str, Any], float]:
+        """
+        Read-modify-write of one DVP.
+
+        build_step receives the current serialized DVP and returns the next step and
+        the resulting confidence. The read and the compare-and-swap append happen
+        under the DVP's lock stripe, so update() callers never conflict with each
+        other; if a writer that does not take the stripe (a plain append_step)
+        got there first, build_step is called again with the fresh state.
+        Returns the (step_data, confidence) that was committed; raises KeyError
+        for an unknown DVP.
+        """
+        expected = None
+        with self._range_lock(self._stripe_byte(dvp_id)):
+            for _ in range(max_retries):
+                dvp_data = self.get(dvp_id)
+                if dvp_data is None:
+                    raise KeyError(dvp_id)
+                expected = len(dvp_data['lineage'])
+                step_data, current_confidence = build_step(dvp_data)
+                try:
+                    self._compare_and_append(dvp_id, step_data, current_confidence, expected)
+                    return step_data, current_confidence
+                except VersionConflictError:
+                    continue
+            raise VersionConflictError(dvp_id, expected, self.version(dvp_id))
+
+    # --- Compaction ---
+
+    def _should_compact(self) -> bool:
+        running = self._compaction_thread is not None and self._compaction_thread.is_alive()
+        threshold = max(self.min_compact_bytes, self._snapshot_bytes * self.compact_ratio)
+        return not running and self._log_bytes >= threshold
+
+    def _write_snapshot(self, number: int, state: Dict[str, Dict[str, Any]]) -> int:
+        """Atomically writes a snapshot file and its index (temp file + fsync + rename)."""
+        path = self._snapshot_path(number)
+        index_path = self._index_path(path)
+        claims_path = self._claims_path(path)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f, open(index_path + '.tmp', 'wb') as index, \
+                open(claims_path + '.tmp', 'wb') as claims:
+            for dvp_id in sorted(state):
+                line = (json.dumps(state[dvp_id], separators=(',', ':')) + '\n').encode('utf-8')
+                index.write(SNAPSHOT_INDEX_ENTRY.pack(bytes.fromhex(dvp_id), f.tell(), len(line)))
+                f.write(line)
+            claims.write(b''.join(sorted(_claim_entry(dvp) for dvp in state.values())))
+            for handle in (f, index, claims):
+                handle.flush()
+                os.fsync(handle.fileno())
+            size = f.tell()
+        # The indexes are renamed first: a crash in between leaves indexes that the
+        # next open discards, never a snapshot without them.
+        os.replace(index_path + '.tmp', index_path)
+        os.replace(claims_path + '.tmp', claims_path)
+        os.replace(tmp_path, path)
+        return size
+
+    def compact(self, wait: bool = True):
+        """
+        Folds the current snapshot and all sealed log segments into a new snapshot.
+
+        The active segment is sealed and a new one is started under the append lock,
+        so writers (in this and other processes) keep appending while the merge runs
+        from the files on disk. Only one process compacts at a time.
+        """
+        with self._lock:
+            thread = self._compaction_thread
+            if thread is None or not thread.is_alive():
+                thread = threading.Thread(target=self._run_compaction, name='ledger-compaction')
+                self._compaction_thread = thread
+                thread.start()
+        if wait:
+            thread.join()
+
+    @contextmanager
+    def freeze_compaction(self):
+        """Keeps every process from compacting the store until the block exits (waits for a running compaction)."""
+        with self._compaction_lock() as acquired:
+            yield acquired
+
+    def _run_compaction(self):
+        with self._compaction_lock(blocking=False) as acquired:
+            if not acquired:
+                return # Another process is already compacting
+            with self._lock, self._range_lock(APPEND_LOCK_BYTE):
+                if self._is_retired():
+                    return
+                self._follow_rotation()
+                self._catch_up()
+                base_snapshot = self._latest_snapshot()
+                sealed = self._segment
+                self._close_segment()
+                self._segment = sealed + 1
+                # Creating the next segment announces the rotation to other writers.
+                open(self._segment_path(self._segment), 'ab').close()
+                if self._state is not None:
+                    # The in-memory ledger already covers the sealed segment; move past it
+                    # so its deletion below does not force a full reload.
+                    self._applied_segment = self._segment
+                    self._applied_offset = 0
+            segments = [s for s in self._numbered_files(SEGMENT_PREFIX, SEGMENT_SUFFIX)
+                        if base_snapshot < s <= sealed]
+            merged = self._replay(base_snapshot, segments)
+            sealed_bytes = sum(self._file_size(self._segment_path(s)) for s in segments)
+            size = self._write_snapshot(sealed, merged)
+            with self._lock:
+                self._snapshot = sealed
+                self._snapshot_bytes = size
+                self._log_bytes = max(0, self._log_bytes - sealed_bytes)
+                for s in segments:
+                    self._remove_with_index(self._segment_path(s))
+                self._remove_with_index(self._snapshot_path(base_snapshot))
+
+    def _close_segment(self):
+        for handle in (self._log_file, self._index_file, self._claims_file):
+            if handle is not None:
+                handle.flush()
+                if self.fsync:
+                    os.fsync(handle.fileno())
+                handle.close()
+        self._log_file = None
+        self._index_file = None
+        self._claims_file = None
+
+    def close(self):
+        """Waits for any running compaction and closes the active log segment."""
+        thread = self._compaction_thread
+        if thread is not None:
+            thread.join()
+        with self._lock:
+            self._close_segment()
+            if self._lock_fd is not None:
+                os.close(self._lock_fd)
+                self._lock_fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def load_state(path: str) -> Tuple[Dict[str, Dict[str, Any]], Tuple[int, int, int]]:
+    """
+    Reads the whole ledger of a store and the log position it reflects.
+
+    Meant for worker processes: the process serving the store hands the result to
+    LedgerStore.install_state. Closing the lock file drops every POSIX record lock
+    the calling process holds on it, so do not call this where the store is open.
+    """
+    with LedgerStore(path, auto_compact=False) as store:
+        state = store.load()
+        return state, (store._snapshot, store._applied_segment, store._applied_offset)
@@ -0,0 +1,107 @@
+import time
+from typing import Dict, Any, Optional, Tuple
+
+from src.dvp_model import calculate_k_factor
+from src.compact_ledger import parse_timestamp
+
+# --- Per-Agent Reputation (Karma) with Lazy Decay (PROTOCOL.md §4) ---
+# Agents earn +1 Karma per successful contribution (a lineage step with a positive
+# score change) and Karma decays by 10% every 30 days. Decay periods are aligned
+# to the Unix epoch, so an agent's Karma at any time is closed-form:
+#
+#   karma(t) = stored_karma * DECAY_FACTOR ** (period(t) - stored_period)
+#
+# Nothing sweeps over all agents when a period ends; Karma is brought up to date
+# only when an agent is read or credited. K-Factors are memoized per agent for
+# the period they were computed in and dropped when that agent is credited, so a
+# lookup is a dict hit in the common case. Times are POSIX seconds.
+#
+# A ReputationStore is also a ledger listener (store.add_listener): it is rebuilt
+# from the ledger on every full reload and credited with each step record applied
+# afterwards, so steps written by batch jobs or other processes count as well.
+
+DECAY_FACTOR = 0.9
+DECAY_PERIOD_SECONDS = 30 * 24 * 60 * 60
+KARMA_PER_CONTRIBUTION = 1.0
+
+
+def decay_period(timestamp: float) -> int:
+    """Index of the 30-day decay period containing `timestamp`."""
+    return int(timestamp // DECAY_PERIOD_SECONDS)
+
+
+class ReputationStore:
+    """Karma and K-Factor per agent DID, decayed lazily at read time."""
+
+    def __init__(self):
+        self._karma: Dict[str, Tuple[float, int]] = {} # agent_did -> (karma, period it was last brought up to date)
+        self._k_factors: Dict[str, Tuple[int, float]] = {} # agent_did -> (period, memoized K-Factor)
+
+    @classmethod
+    def from_ledger(cls, ledger: Dict[str, Dict[str, Any]]) -> 'ReputationStore':
+        """Builds every agent's Karma from the lineage steps in a ledger."""
+        reputation = cls()
+        reputation.reset(ledger)
+        return reputation
+
+    def reset(self, ledger: Dict[str, Dict[str, Any]]):
+        """Rebuilds every agent's Karma from the lineage steps in a ledger, in timestamp order."""
+        contributions = []
+        for dvp in ledger.values():
+            for step in dvp['lineage']:
+                micros = parse_timestamp(step.get('timestamp'))
+                if micros is not None and step.get('result_score_change', 0) > 0:
+                    contributions.append((micros, step['agent_did']))
+        contributions.sort()
+        self._karma.clear()
+        self._k_factors.clear()
+        for micros, agent_did in contributions:
+            self.credit(agent_did, micros / 1_000_000)
+
+    def apply(self, record: Dict[str, Any], ledger: Dict[str, Dict[str, Any]]):
+        """Credits the agent of a step record that has just been applied to the ledger."""
+        if record['op'] == 'step' and record['id'] in ledger:
+            self.record_step(record['step'])
+
+    def __len__(self) -> int:
+        return len(self._karma)
+
+    def __contains__(self, agent_did: str) -> bool:
+        return agent_did in self._karma
+
+    def _decayed(self, agent_did: str, period: int) -> Tuple[float, int]:
+        """(Karma brought forward to `period`, period to store it under)."""
+        entry = self._karma.get(agent_did)
+        if entry is None:
+            return 0.0, period
+        karma, stored_period = entry
+        # A read from before the last update (clock skew, replays) does not grow Karma back
+        if period <= stored_period:
+            return karma, stored_period
+        return karma * DECAY_FACTOR ** (period - stored_period), period
+
+    def karma(self, agent_did: str, now: Optional[float] = None) -> float:
+        """Karma of an agent at `now` (default: the current time); unknown agents have 0."""
+        return self._decayed(agent_did, decay_period(time.time() if now is None else now))[0]
+
+    def k_factor(self, agent_did: str, now: Optional[float] = None) -> float:
+        """K-Factor of an agent at `now`, memoized until its Karma changes or a period ends."""
+        period = decay_period(time.time() if now is None else now)
+        cached = self._k_factors.get(agent_did)
+        if cached is not None and cached[0] == period:
+            return cached[1]
+        k_factor = calculate_k_factor(self._decayed(agent_did, period)[0])
+        self._k_factors[agent_did] = (period, k_factor)
+        return k_factor
+
+    def credit(self, agent_did: str, now: Optional[float] = None, amount: float = KARMA_PER_CONTRIBUTION):
+        """Adds Karma for a contribution at `now`, folding in any decay since the last update."""
+        karma, period = self._decayed(agent_did, decay_period(time.time() if now is None else now))
+        self._karma[agent_did] = (karma + amount, period)
+        self._k_factors.pop(agent_did, None)
+
+    def record_step(self, step_data: Dict[str, Any]):
+        """Credits the agent of a committed lineage step if it was a successful contribution."""
+        micros = parse_timestamp(step_data.get('timestamp'))
+        if micros is not None and step_data['result_score_change'] > 0:
+            self.credit(step_data['agent_did'], micros / 1_000_000)
@@ -0,0 +1,606 @@
+import fcntl
+import itertools
+import json
+import os
+import shutil
+import threading
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from typing import Dict, Any, Optional, List, Iterator, Tuple, Callable
+
+from src.ledger_codec import load_ledger_file
+from src.ledger_store import (LedgerStore, AmbiguousIdError, StoreRetiredError, DEFAULT_MAX_RETRIES,
+                              SEGMENT_PREFIX, SNAPSHOT_PREFIX, load_state)
+
+# --- Sharded Ledger Storage ---
+# The ledger is split into shards by the leading hex digits of the sha256 DVP
+# id, each shard a LedgerStore of its own (log segments, snapshots, indexes and
+# locks). Shard i of n holds the ids whose first 16 bits p satisfy
+# p * n >> 16 == i, i.e. n contiguous ranges of the id space, so any count up to
+# 65536 works and a short id prefix maps to a run of neighbouring shards.
+#
+#   single DVP   get, resolve_id, append_create, append_step and update touch
+#                only the DVP's shard: its files, its append lock, its stripes
+#   one claim    claim_ids() binary-searches the claim index of every shard, as
+#                a claim's hash says nothing about the id it was created with
+#   whole ledger load() reads the shards in a pool of worker processes (JSON
+#                parsing holds the GIL, so threads would not help) and hands
+#                the parsed states back; scan() runs a function over each shard
+#                in the workers and returns only its results; compact() folds
+#                the shards in the pool as well
+#
+# Layout of the store directory:
+# - shards.json: {"generation": g, "shards": n}
+# - gen-<g>/shard-<i>/: the LedgerStore of shard i in generation g
+# Without shards.json the directory itself is a plain LedgerStore, read as
+# generation 0 with one shard, so an existing store opens unchanged.
+#
+# Resharding is online. A new generation is seeded from the in-memory shards,
+# the records appended meanwhile (by any process) are forwarded to it, and then,
+# with every old shard's append lock held for a moment, the last records are
+# forwarded, shards.json is switched and the old shards are retired. A writer
+# that was waiting on an old shard then gets StoreRetiredError and retries on
+# the new generation; every other process switches on its next operation, as
+# each operation first checks whether shards.json has changed.
+
+MANIFEST_FILE = 'shards.json'
+RESHARD_LOCK_FILE = 'reshard.lock'
+GENERATION_PREFIX = 'gen-'
+SHARD_PREFIX = 'shard-'
+SHARD_KEY_HEX_DIGITS = 4 # Shards are ranges of the first 16 bits of the id
+MAX_SHARDS = 16 ** SHARD_KEY_HEX_DIGITS
+
+
+def shard_of(dvp_id: str, shards: int) -> int:
+    """Index of the shard holding a DVP id (or any id starting with a 4-digit prefix)."""
+    return int(dvp_id[:SHARD_KEY_HEX_DIGITS], 16) * shards >> (4 * SHARD_KEY_HEX_DIGITS)
+
+
+def _check_shard_count(shards: int):
+    if not isinstance(shards, int) or not 1 <= shards <= MAX_SHARDS:
+        raise ValueError(f"Shard count must be an integer from 1 to {MAX_SHARDS}, got {shards!r}")
+
+
+def _scan_shard(path: str, function: Callable[[Dict[str, Dict[str, Any]]], Any]) -> Any:
+    return function(load_state(path)[0])
+
+
+def _compact_shard(path: str):
+    with LedgerStore(path, auto_compact=False) as store:
+        store.compact()
+
+
+class ShardedLedger(Mapping):
+    """
+    Read-only view of the whole ledger over the in-memory shards.
+
+    Lookups go straight to the DVP's shard; iteration chains the shards. The view
+    keeps its identity across reshards, like the dictionary of LedgerStore.load.
+    """
+
+    def __init__(self):
+        self._states: List[Dict[str, Dict[str, Any]]] = []
+
+    def _bind(self, states: List[Dict[str, Dict[str, Any]]]):
+        self._states = states
+
+    def __getitem__(self, dvp_id: str) -> Dict[str, Any]:
+        try:
+            return self._states[shard_of(dvp_id, len(self._states))][dvp_id]
+        except (ValueError, TypeError):
+            raise KeyError(dvp_id) from None
+
+    def __contains__(self, dvp_id) -> bool:
+        try:
+            return dvp_id in self._states[shard_of(dvp_id, len(self._states))]
+        except (ValueError, TypeError):
+            return False
+
+    def __iter__(self) -> Iterator[str]:
+        return itertools.chain.from_iterable(self._states)
+
+    def __len__(self) -> int:
+        return sum(len(state) for state in self._states)
+
+    def values(self):
+        return itertools.chain.from_iterable(state.values() for state in self._states)
+
+    def items(self):
+        return itertools.chain.from_iterable(state.items() for state in self._states)
+
+
+class _ShardListener:
+    """Forwards one shard's listener calls to a listener of the whole ledger."""
+
+    def __init__(self, listener, ledger: ShardedLedger):
+        self.listener = listener
+        self.ledger = ledger
+        self.active = False # Registration resets each shard; the listener is reset once, afterwards
+
+    def reset(self, _):
+        if self.active:
+            self.listener.reset(self.ledger)
+
+    def apply(self, record: Dict[str, Any], _):
+        self.listener.apply(record, self.ledger)
+
+
+class _ReshardCopier:
+    """
+    Listener on an old shard during a reshard.
+
+    Takes the shard's DVPs (and their versions) when registered, queues the records
+    applied until the new shards are seeded from them, then forwards each record.
+    """
+
+    def __init__(self, targets: List[LedgerStore]):
+        self.targets = targets
+        self.dvps: Optional[List[Tuple[Dict[str, Any], int, float]]] = None
+        self.pending: List[Dict[str, Any]] = []
+        self.forwarding = False
+
+    def reset(self, ledger: Dict[str, Dict[str, Any]]):
+        if self.dvps is not None:
+            raise RuntimeError("A shard was reloaded during a reshard") # Compaction is frozen meanwhile
+        # Steps appended later are forwarded, so each DVP is seeded at its current version
+        self.dvps = [(dvp, len(dvp['lineage']), dvp['current_confidence']) for dvp in ledger.values()]
+
+    def apply(self, record: Dict[str, Any], _):
+        if self.forwarding:
+            self._forward(record)
+        elif record['op'] == 'create':
+            # The created DVP's lineage keeps growing in the old shard's memory
+            self.pending.append(dict(record, dvp=dict(record['dvp'], lineage=list(record['dvp']['lineage']))))
+        else:
+            self.pending.append(record)
+
+    def start(self):
+        """Forwards the queued records; the caller holds the old shard's append lock."""
+        for record in self.pending:
+            self._forward(record)
+        self.pending = []
+        self.forwarding = True
+
+    def _forward(self, record: Dict[str, Any]):
+        if record['op'] == 'create':
+            self.targets[shard_of(record['dvp']['id'], len(self.targets))].append_create(record['dvp'])
+        else:
+            self.targets[shard_of(record['id'], len(self.targets))].append_step(
+                record['id'], record['step'], record['current_confidence'])
+
+
+class ShardedLedgerStore:
+    """
+    The DVP ledger split into LedgerStore shards by id prefix, with the LedgerStore API.
+
+    `shards` is the shard count of a new store; an existing store keeps its count
+    (an unsharded store opens as one shard) until reshard() changes it. `workers`
+    bounds the pools of whole-ledger operations (default: one per core).
+    """
+
+    def __init__(self, path: str, shards: Optional[int] = None, legacy_path: Optional[str] = None,
+                 fsync: bool = False, workers: Optional[int] = None, **store_options):
+        if shards is not None:
+            _check_shard_count(shards)
+        self.path = path
+        self.fsync = fsync
+        self.workers = workers
+        self.store_options = store_options
+        self._lock = threading.RLock()
+        self._ledger = ShardedLedger()
+        self._listeners: List[Any] = []
+        self._loaded = False
+        self._shards: List[LedgerStore] = []
+        self._retired: List[LedgerStore] = [] # Replaced by a reshard; closed with the store
+        self._generation: Optional[int] = None
+        self._manifest_key = None
+        self._compaction_thread: Optional[threading.Thread] = None
+
+        os.makedirs(path, exist_ok=True)
+        if shards is not None and shards > 1 and self._read_manifest() is None:
+            with self._reshard_lock():
+                if self._read_manifest() is None and not self._has_unsharded_data():
+                    self._create(shards, legacy_path)
+        self._open_generation(legacy_path)
+
+    # --- Layout ---
+
+    def _manifest_path(self) -> str:
+        return os.path.join(self.path, MANIFEST_FILE)
+
+    def _generation_path(self, generation: int) -> str:
+        return os.path.join(self.path, f"{GENERATION_PREFIX}{generation:04d}")
+
+    def _shard_paths(self, generation: int, shards: int) -> List[str]:
+        if generation == 0:
+            return [self.path]
+        return [os.path.join(self._generation_path(generation), f"{SHARD_PREFIX}{i:05d}") for i in range(shards)]
+
+    def _read_manifest(self) -> Optional[Dict[str, int]]:
+        try:
+            with open(self._manifest_path(), 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _manifest_stat(self):
+        try:
+            stat = os.stat(self._manifest_path())
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _write_manifest(self, generation: int, shards: int):
+        tmp_path = self._manifest_path() + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({"generation": generation, "shards": shards}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._manifest_path())
+
+    def _has_unsharded_data(self) -> bool:
+        return any(name.startswith((SNAPSHOT_PREFIX, SEGMENT_PREFIX)) for name in os.listdir(self.path))
+
+    @contextmanager
+    def _reshard_lock(self):
+        """Store-wide lock held while the layout is created or changed, by any process."""
+        with open(os.path.join(self.path, RESHARD_LOCK_FILE), 'a') as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _open_store(self, path: str, **options) -> LedgerStore:
+        return LedgerStore(path, fsync=self.fsync, **dict(self.store_options, **options))
+
+    def _create(self, shards: int, legacy_path: Optional[str]):
+        """Lays out a new store as generation 1, importing the legacy ledger file if there is one."""
+        parts = [{} for _ in range(shards)]
+        if legacy_path and os.path.exists(legacy_path):
+            for dvp_id, dvp in load_ledger_file(legacy_path).items():
+                parts[shard_of(dvp_id, shards)][dvp_id] = dvp
+        for path, part in zip(self._shard_paths(1, shards), parts):
+            with self._open_store(path, auto_compact=False) as store:
+                if part:
+                    store.seed(part)
+        self._write_manifest(1, shards)
+
+    def _open_generation(self, legacy_path: Optional[str] = None):
+        """Opens the shards named by shards.json (the caller holds the lock or is the constructor)."""
+        self._manifest_key = self._manifest_stat()
+        manifest = self._read_manifest() or {"generation": 0, "shards": 1}
+        if manifest['generation'] == self._generation:
+            return
+        self._retired.extend(self._shards)
+        if manifest['generation'] == 0:
+            self._shards = [self._open_store(self.path, legacy_path=legacy_path)]
+        else:
+            self._shards = [self._open_store(path) for path in self._shard_paths(**manifest)]
+        self._generation = manifest['generation']
+        if self._loaded:
+            self._ledger._bind(self._load_shards(self._shards))
+            for listener in self._listeners:
+                self._attach(listener)
+                listener.reset(self._ledger)
+
+    def _check_generation(self) -> bool:
+        """Switches to a new generation if shards.json has changed; True if it did."""
+        if self._manifest_stat() == self._manifest_key:
+            return False
+        with self._lock:
+            generation = self._generation
+            self._open_generation()
+            return self._generation != generation
+
+    @property
+    def shards(self) -> int:
+        """Current shard count."""
+        self._check_generation()
+        return len(self._shards)
+
+    def _shard(self, dvp_id: str) -> LedgerStore:
+        shards = self._shards
+        return shards[shard_of(dvp_id, len(shards))]
+
+    # --- Pools ---
+
+    def _worker_count(self, tasks: int) -> int:
+        return max(1, min(tasks, self.workers or os.cpu_count() or 1))
+
+    def _map_processes(self, function: Callable, *iterables) -> List[Any]:
+        """Runs function over the shards in worker processes, or in this process when one worker is enough."""
+        tasks = list(zip(*iterables))
+        workers = self._worker_count(len(tasks))
+        if workers == 1:
+            return [function(*task) for task in tasks]
+        with ProcessPoolExecutor(workers) as pool:
+            return list(pool.map(function, *zip(*tasks)))
+
+    def _map_threads(self, function: Callable, items: List[Any]) -> List[Any]:
+        workers = self._worker_count(len(items))
+        if workers == 1:
+            return [function(item) for item in items]
+        with ThreadPoolExecutor(workers) as pool:
+            return list(pool.map(function, items))
+
+    def _load_shards(self, shards: List[LedgerStore]) -> List[Dict[str, Dict[str, Any]]]:
+        """Loads the shards, parsing them in worker processes when there is more than one worker."""
+        if self._worker_count(len(shards)) > 1:
+            # Workers open the shards themselves; load_state must not run here (see its docstring)
+            for shard, (state, position) in zip(shards, self._map_processes(load_state, [s.path for s in shards])):
+                shard.install_state(state, position)
+        return [shard.load() for shard in shards]
+
+    # --- Reading ---
+
+    def load(self) -> ShardedLedger:
+        """Returns the full in-memory ledger (a read-only view over the shards), loading it on first use."""
+        self._check_generation()
+        with self._lock:
+            if not self._loaded:
+                self._ledger._bind(self._load_shards(self._shards))
+                self._loaded = True
+            else:
+                for shard in self._shards:
+                    shard.refresh()
+            return self._ledger
+
+    def refresh(self):
+        """Brings the in-memory shards (if loaded) up to date with writes from other processes."""
+        self._check_generation()
+        for shard in self._shards:
+            shard.refresh()
+
+    def _attach(self, listener):
+        adapters = [_ShardListener(listener, self._ledger) for _ in self._shards]
+        for shard, adapter in zip(self._shards, adapters):
+            shard.add_listener(adapter)
+        for adapter in adapters:
+            adapter.active = True
+
+    def add_listener(self, listener):
+        """
+        Keeps a derived structure in step with the whole in-memory ledger.
+
+        Same contract as LedgerStore.add_listener; listeners receive the sharded view
+        as the ledger, and are reset when any shard is reloaded or after a reshard.
+        """
+        self.load()
+        with self._lock:
+            self._attach(listener)
+            self._listeners.append(listener)
+            listener.reset(self._ledger)
+
+    def scan(self, function: Callable[[Dict[str, Dict[str, Any]]], Any]) -> List[Any]:
+        """
+        Runs function over each shard's ledger in the worker pool, returning the results in shard order.
+
+        The shards are read by the workers and only the results come back, so a
+        full scan neither loads the ledger here nor ships it between processes.
+        function must be picklable (a module-level function).
+        """
+        self._check_generation()
+        paths = [shard.path for shard in self._shards]
+        return self._map_processes(_scan_shard, paths, [function] * len(paths))
+
+    def get(self, dvp_id: str) -> Optional[Dict[str, Any]]:
+        """Returns the serialized DVP for an id, or None; reads only its shard."""
+        while True:
+            self._check_generation()
+            try:
+                shard = self._shard(dvp_id)
+            except ValueError:
+                return None
+            dvp = shard.get(dvp_id)
+            # A reshard may have removed the shard's files mid-read
+            if dvp is not None or not self._check_generation():
+                return dvp
+
+    def __contains__(self, dvp_id: str) -> bool:
+        return self.get(dvp_id) is not None
+
+    def version(self, dvp_id: str) -> Optional[int]:
+        """Returns the DVP's version (the number of lineage steps), or None if it does not exist."""
+        dvp = self.get(dvp_id)
+        return None if dvp is None else len(dvp['lineage'])
+
+    def resolve_id(self, prefix: str) -> Optional[str]:
+        """
+        Expands a unique DVP id prefix to the full id, like LedgerStore.resolve_id.
+
+        A prefix of 4 or more hex digits lies in one shard; a shorter one is looked
+        up in the run of shards its ids can fall in.
+        """
+        while True:
+            self._check_generation()
+            shards = self._shards
+            try:
+                first = shard_of(prefix.ljust(SHARD_KEY_HEX_DIGITS, '0'), len(shards))
+                last = shard_of(prefix.ljust(SHARD_KEY_HEX_DIGITS, 'f'), len(shards))
+            except ValueError:
+                return None
+            matches = []
+            for shard in shards[first:last + 1]:
+                try:
+                    match = shard.resolve_id(prefix)
+                except AmbiguousIdError as e:
+                    matches.extend(e.candidates)
+                else:
+                    if match is not None:
+                        matches.append(match)
+            if matches or not self._check_generation():
+                break
+        if len(matches) > 1:
+            raise AmbiguousIdError(prefix.lower(), sorted(matches))
+        return matches[0] if matches else None
+
+    def claim_ids(self, digest: str) -> List[str]:
+        """
+        Ids of the DVPs whose normalized claim has this hash, like LedgerStore.claim_ids.
+
+        Claims are not sharded by id, so every shard's claim indexes are searched.
+        """
+        while True:
+            self._check_generation()
+            matches = sorted(itertools.chain.from_iterable(shard.claim_ids(digest) for shard in self._shards))
+            if matches or not self._check_generation():
+                return matches
+
+    def __len__(self) -> int:
+        return len(self.load())
+
+    # --- Writing ---
+
+    def _write(self, dvp_id: str, operation: Callable[[LedgerStore], Any]) -> Any:
+        """Runs a write on the DVP's shard, retrying on the new generation if a reshard retired it."""
+        while True:
+            self._check_generation()
+            try:
+                return operation(self._shard(dvp_id))
+            except StoreRetiredError:
+                with self._lock:
+                    generation = self._generation
+                    self._open_generation()
+                    if self._generation == generation:
+                        raise
+
+    def append_create(self, dvp_json: Dict[str, Any]):
+        """Appends a newly created DVP to its shard's log."""
+        self._write(dvp_json['id'], lambda shard: shard.append_create(dvp_json))
+
+    def append_step(self, dvp_id: str, step_data: Dict[str, Any], current_confidence: float,
+                    expected_version: Optional[int] = None):
+        """Appends one lineage step to the DVP's shard (a compare-and-swap with expected_version)."""
+        self._write(dvp_id, lambda shard: shard.append_step(dvp_id, step_data, current_confidence, expected_version))
+
+    def update(self, dvp_id: str, build_step: Callable[[Dict[str, Any]], Tuple[Dict[str, Any], float]],
+               max_retries: int = DEFAULT_MAX_RETRIES) -> Tuple[Dict[str, Any], float]:
+        """Read-modify-write of one DVP in its shard; see LedgerStore.update."""
+        return self._write(dvp_id, lambda shard: shard.update(dvp_id, build_step, max_retries))
+
+    def commit(self):
+        """Makes appended records durable in every shard, fsyncing the shards in parallel."""
+        if self.fsync:
+            self._map_threads(LedgerStore.commit, self._shards)
+
+    @contextmanager
+    def write_batch(self):
+        """Defers the fsync of appended records in every shard until the batch exits."""
+        with ExitStack() as stack:
+            for shard in self._shards:
+                stack.enter_context(shard.write_batch())
+            yield self
+
+    # --- Compaction ---
+
+    def compact(self, wait: bool = True):
+        """
+        Compacts every shard, up to `workers` at a time.
+
+        Shards are compacted in worker processes unless this process holds the
+        ledger in memory: a compaction by another process would force it to
+        reload every shard, so then each shard compacts on a thread of its own.
+        """
+        self._check_generation()
+        shards = self._shards
+        if self._loaded:
+            run = lambda: self._map_threads(LedgerStore.compact, shards)
+        else:
+            run = lambda: self._map_processes(_compact_shard, [shard.path for shard in shards])
+        if wait:
+            run()
+            return
+        with self._lock:
+            thread = self._compaction_thread
+            if thread is None or not thread.is_alive():
+                self._compaction_thread = threading.Thread(target=run, name='sharded-ledger-compaction')
+                self._compaction_thread.start()
+
+    # --- Resharding ---
+
+    def reshard(self, shards: int):
+        """
+        Moves the ledger to a new generation of `shards` shards while writers keep going.
+
+        Every process may keep reading and writing meanwhile; appends only wait
+        for the final switch, which forwards the last records and retires the old
+        shards under their append locks. Returns the previous shard count.
+        """
+        _check_shard_count(shards)
+        with self._reshard_lock(), self._lock:
+            self._check_generation()
+            old, previous = self._shards, self._generation
+            if len(old) == shards:
+                return shards
+            generation = previous + 1
+            if os.path.exists(self._generation_path(generation)):
+                shutil.rmtree(self._generation_path(generation)) # Left by an interrupted reshard
+            # Forwarded records were published to the change feed when first appended
+            targets = [self._open_store(path, auto_compact=False, change_feed=None)
+                       for path in self._shard_paths(generation, shards)]
+            with ExitStack() as frozen:
+                # Compaction would reload the old shards and lose the copiers' positions
+                for shard in old:
+                    frozen.enter_context(shard.freeze_compaction())
+                if not self._loaded:
+                    self._load_shards(old)
+                copiers = [_ReshardCopier(targets) for _ in old]
+                for shard, copier in zip(old, copiers):
+                    shard.add_listener(copier)
+                parts = [{} for _ in range(shards)]
+                for copier in copiers:
+                    for dvp, version, confidence in copier.dvps:
+                        parts[shard_of(dvp['id'], shards)][dvp['id']] = \
+                            dict(dvp, lineage=dvp['lineage'][:version], current_confidence=confidence)
+                self._map_threads(lambda target_part: target_part[0].seed(target_part[1]), list(zip(targets, parts)))
+                for shard, copier in zip(old, copiers):
+                    with shard.pause_writes():
+                        copier.start()
+                for shard in old:
+                    shard.refresh() # Forward the bulk of the concurrent writes before pausing them
+
+                with ExitStack() as paused:
+                    for shard in old:
+                        paused.enter_context(shard.pause_writes())
+                    for shard in old:
+                        shard.refresh()
+                    self._map_threads(LedgerStore.commit, targets)
+                    self._write_manifest(generation, shards)
+                    for shard in old:
+                        shard.retire()
+            for target in targets:
+                target.close()
+            self._open_generation()
+            self._remove_generation_data(previous, old)
+        return len(old)
+
+    def _remove_generation_data(self, generation: int, shards: List[LedgerStore]):
+        """Deletes the data files of a retired generation, and older generation directories."""
+        for shard in shards:
+            for name in os.listdir(shard.path):
+                if name.startswith((SNAPSHOT_PREFIX, SEGMENT_PREFIX)):
+                    os.remove(os.path.join(shard.path, name))
+        # The retired markers of the previous generation stay for writers still on it
+        for name in os.listdir(self.path):
+            if name.startswith(GENERATION_PREFIX) and int(name[len(GENERATION_PREFIX):]) < generation:
+                shutil.rmtree(os.path.join(self.path, name))
+
+    # --- Lifecycle ---
+
+    def close(self):
+        """Waits for any running compaction and closes every shard."""
+        thread = self._compaction_thread
+        if thread is not None:
+            thread.join()
+        with self._lock:
+            for shard in self._shards + self._retired:
+                shard.close()
+            self._retired = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -1,78 +1,403 @@
 import sys
+import itertools
 import json
+import math
 import os
-import os, sys; sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))); from src.dvp_model import DVP 
+import time
+from typing import Optional
+import os, sys; sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))); from src.dvp_model import DVP, build_step_data
+from src.ledger_store import LedgerStore, AmbiguousIdError, VersionConflictError
+from src.sharded_store import MAX_SHARDS, ShardedLedgerStore
+from src.change_feed import ChangeFeed, FeedTruncatedError
+from src.ledger_codec import write_ledger_file, convert_ledger_file
+from src.reputation import ReputationStore
+from src.ledger_index import LedgerIndex
+from src.confidence_history import ConfidenceHistory
+from src.claim_index import ANONYMOUS_AGENT_DID, ON_DUPLICATE, RESUBMISSION_PROCESS_TYPE, ClaimIndex, find_stored_claim
+from src.ledger_daemon import LedgerClient, DaemonError, DEFAULT_SOCKET_PATH, serve
 
 # Define the local path for the DVP ledger store
-DVP_LEDGER_PATH = 'data/ledger.json'
+DVP_LEDGER_PATH = 'data/ledger.json' # Whole-file JSON ledger (legacy format, used for human export)
+DVP_STORE_PATH = 'data/ledger' # Append-only log + snapshot store, sharded by DVP id prefix
+DVP_STORE_SHARDS = 16 # Shard count of a new store; the reshard command changes it for an existing one
+DVP_FEED_PATH = 'data/feed' # Sequence-numbered change events of every create and add_step
+
+# When this variable names a running daemon's socket, commands are sent to the daemon
+DAEMON_SOCKET_ENV = 'SL_LEDGER_SOCKET'
+
+_ledger_store = None
+_change_feed = None
+
+def get_change_feed():
+    """Opens the change feed that every ledger write is published to."""
+    global _change_feed
+    if _change_feed is None:
+        _change_feed = ChangeFeed(DVP_FEED_PATH)
+    return _change_feed
+
+def get_ledger_store():
+    """Opens the sharded ledger store, importing the legacy JSON ledger on first use."""
+    global _ledger_store
+    if _ledger_store is None:
+        _ledger_store = ShardedLedgerStore(DVP_STORE_PATH, shards=DVP_STORE_SHARDS, legacy_path=DVP_LEDGER_PATH,
+                                           change_feed=get_change_feed())
+    return _ledger_store
 
 def load_dvp_ledger():
-    """Loads the entire ledger from the file system."""
-    if not os.path.exists(DVP_LEDGER_PATH):
-        return {}
-    with open(DVP_LEDGER_PATH, 'r') as f:
-        return json.load(f)
-
-def save_dvp_ledger(ledger):
-    """Saves the entire ledger to the file system."""
-    os.makedirs(os.path.dirname(DVP_LEDGER_PATH), exist_ok=True)
-    with open(DVP_LEDGER_PATH, 'w') as f:
-        json.dump(ledger, f, indent=2)
-
-def create_dvp_claim(claim_text: str, agent_karma: float = 0):
-    """Creates a new DVP, adds it to the ledger, and returns its ID."""
+    """Loads the entire ledger (latest snapshot + log replay) from the ledger store."""
+    return get_ledger_store().load()
+
+def save_dvp_ledger(ledger, path: str = DVP_LEDGER_PATH):
+    """Exports the entire ledger to a file: indented JSON, or the binary format for a .slb path."""
+    # Written to a temporary file and renamed, so a crash never leaves a truncated export
+    write_ledger_file(ledger.values(), path)
+
+def get_daemon_client():
+    """Connects to the ledger daemon named by SL_LEDGER_SOCKET, or returns None to work locally."""
+    socket_path = os.environ.get(DAEMON_SOCKET_ENV)
+    if not socket_path or not os.path.exists(socket_path):
+        return None
+    try:
+        return LedgerClient(socket_path)
+    except OSError:
+        return None # Stale socket file; fall back to the local store
+
+def daemon_request(client, op: str, **params):
+    """Sends one request to the daemon, printing the error and exiting if it is rejected."""
+    try:
+        return client.request(op, **params)
+    except DaemonError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+def daemon_stream(client, op: str, **params):
+    """Streams the items of a list result from the daemon, printing the error and exiting if it is rejected."""
+    try:
+        yield from client.stream(op, **params)
+    except DaemonError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+def lookup_dvp(dvp_id: str):
+    """Resolves a full or shortened DVP id and reads only that DVP from the ledger store."""
+    store = get_ledger_store()
+    try:
+        full_id = store.resolve_id(dvp_id)
+    except AmbiguousIdError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    dvp_data = store.get(full_id) if full_id else None
+    if dvp_data is None:
+        print(f"Error: DVP with ID {dvp_id} not found.")
+        sys.exit(1)
+    return dvp_data
+
+def create_dvp_claim(claim_text: str, agent_karma: float = 0, on_duplicate: str = 'return',
+                     agent_did: Optional[str] = None, similar: bool = False):
+    """
+    Creates a new DVP, adds it to the ledger, and returns its ID.
+
+    If a DVP with the same normalized claim exists, on_duplicate 'return' returns
+    its ID instead, 'extend' also adds a zero-score resubmission step by agent_did,
+    and 'create' makes a new DVP anyway. The duplicate is found through the
+    store's on-disk claim index, without loading the ledger. With similar, the
+    whole ledger is loaded into a near-duplicate index and claims resembling the
+    new one are reported (a daemon always does this). The lookup and the append
+    are not atomic across processes; run a daemon to serialize creates.
+    """
+    store = get_ledger_store()
+    existing = find_stored_claim(store, claim_text) if on_duplicate != 'create' else None
+    if existing is not None:
+        print(f"Duplicate Claim: existing DVP ID={existing}")
+        if on_duplicate == 'extend':
+            add_dvp_step(existing, RESUBMISSION_PROCESS_TYPE, agent_did or ANONYMOUS_AGENT_DID, 0.0, "")
+        return existing
+    if similar:
+        index = ClaimIndex()
+        store.add_listener(index)
+        for dvp_id, similarity in index.similar(claim_text):
+            print(f"Warning: similar claim in DVP {dvp_id} (similarity {similarity:.2f})")
     dvp_instance = DVP(claim_text=claim_text, agent_karma=agent_karma)
-    ledger = load_dvp_ledger()
-    ledger[dvp_instance.id] = dvp_instance.to_json()
-    save_dvp_ledger(ledger)
+    get_ledger_store().append_create(dvp_instance.to_json())
     print(f"DVP Created Successfully: ID={dvp_instance.id}")
     return dvp_instance.id
 
+def _parse_create_args(args):
+    """Parses create arguments into (claim_text, agent_karma, on_duplicate, agent_did, similar), raising ValueError."""
+    positional, on_duplicate, agent_did, similar = [], 'return', None, False
+    position = 0
+    while position < len(args):
+        option = args[position]
+        if option == "--similar":
+            similar = True
+            position += 1
+            continue
+        if option in ("--on-duplicate", "--agent"):
+            if position + 1 >= len(args):
+                raise ValueError(f"option '{option}' needs a value")
+            if option == "--agent":
+                agent_did = args[position + 1]
+            else:
+                on_duplicate = args[position + 1]
+            position += 2
+            continue
+        positional.append(option)
+        position += 1
+    if not 1 <= len(positional) <= 2:
+        raise ValueError("expected a claim text and an optional initial karma")
+    if on_duplicate not in ON_DUPLICATE:
+        raise ValueError(f"--on-duplicate must be one of {', '.join(ON_DUPLICATE)}")
+    try:
+        agent_karma = float(positional[1]) if len(positional) == 2 else 0
+    except ValueError:
+        raise ValueError("initial_karma must be a number")
+    return positional[0], agent_karma, on_duplicate, agent_did, similar
+
 def add_dvp_step(dvp_id: str, process_type: str, agent_did: str, score_change: float, attestation_uri: str):
     """Adds a lineage step to an existing DVP, updating its confidence score."""
-    ledger = load_dvp_ledger()
-    if dvp_id not in ledger:
-        print(f"Error: DVP with ID {dvp_id} not found.")
-        sys.exit(1)
+    dvp_id = lookup_dvp(dvp_id)['id']
 
-    dvp_data = ledger[dvp_id]
-    
-    # Re-hydrate DVP model to use the logic
-    dvp_instance = DVP(
-        claim_text=dvp_data['claim_text'],
-        current_confidence=dvp_data['current_confidence'],
-        lineage=dvp_data['lineage'],
-        agent_karma=dvp_data['agent_karma'] # Inject the karma from the ledger
-    )
-    # The ID and creation date must be preserved from the original data
-    dvp_instance.id = dvp_data['id']
-    dvp_instance.created_at = dvp_data['created_at']
-
-    step_data = {
-        "step_id": f"{process_type.lower()}-{dvp_id}-{len(dvp_instance.lineage) + 1}",
-        "process_type": process_type,
-        "agent_did": agent_did,
-        "result_score_change": score_change,
-        "attestation_vc_uri": attestation_uri
-    }
-    
-    # Use the model logic to add the step and update confidence
-    dvp_instance.add_lineage_step(step_data)
+    def build_step(dvp_data):
+        # Re-hydrate DVP model to use the logic (ID, creation date and karma are preserved)
+        dvp_instance = DVP.from_json(dvp_data)
+        step_data = build_step_data(dvp_id, len(dvp_instance.lineage), process_type, agent_did, score_change, attestation_uri)
+        # Use the model logic to add the step and update confidence
+        dvp_instance.add_lineage_step(step_data)
+        return step_data, dvp_instance.current_confidence
+
+    # Append the step to the ledger log as a compare-and-swap on the DVP's version;
+    # if another writer got there first, the step is recomputed from the fresh state.
+    try:
+        _, current_confidence = get_ledger_store().update(dvp_id, build_step)
+    except VersionConflictError as e:
+        print(f"Error: {e} (too much contention, step not added).")
+        sys.exit(1)
 
-    # Update ledger and save
-    ledger[dvp_id] = dvp_instance.to_json()
-    save_dvp_ledger(ledger)
-    
-    print(f"Step Added: ID={dvp_id}, Confidence Updated to {dvp_instance.current_confidence:.2f}")
+    print(f"Step Added: ID={dvp_id}, Confidence Updated to {current_confidence:.2f}")
 
 def get_dvp_status(dvp_id: str):
     """Retrieves and prints the full JSON status of a DVP."""
-    ledger = load_dvp_ledger()
-    if dvp_id not in ledger:
-        print(f"Error: DVP with ID {dvp_id} not found.")
-        sys.exit(1)
-    
-    print(json.dumps(ledger[dvp_id], indent=2))
+    print(json.dumps(lookup_dvp(dvp_id), indent=2))
+
+BATCH_ROW_FIELDS = ("dvp_id", "process_type", "agent_did", "score_change", "attestation_uri")
+DEFAULT_BATCH_CHUNK_SIZE = 1000
+
+def _parse_batch_row(line: str):
+    """Parses one JSONL batch row into add_step arguments, raising ValueError if it is invalid."""
+    try:
+        row = json.loads(line)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"invalid JSON ({e.msg})")
+    if not isinstance(row, dict):
+        raise ValueError("row must be a JSON object")
+    missing = [key for key in BATCH_ROW_FIELDS if key not in row]
+    if missing:
+        raise ValueError(f"missing field(s): {', '.join(missing)}")
+    for key in ("dvp_id", "process_type", "agent_did", "attestation_uri"):
+        if not isinstance(row[key], str):
+            raise ValueError(f"{key} must be a string")
+    try:
+        if isinstance(row['score_change'], bool):
+            raise TypeError
+        score_change = float(row['score_change'])
+    except (TypeError, ValueError):
+        raise ValueError("score_change must be a number")
+    if not math.isfinite(score_change):
+        raise ValueError("score_change must be finite")
+    return row['dvp_id'], row['process_type'], row['agent_did'], score_change, row['attestation_uri']
+
+def batch_add_steps(stream, chunk_size: int = DEFAULT_BATCH_CHUNK_SIZE, store: Optional[LedgerStore] = None):
+    """
+    Applies lineage steps streamed as JSONL rows in a single pass over an in-memory ledger.
+
+    Each row carries the add_step arguments as fields (dvp_id, process_type, agent_did,
+    score_change, attestation_uri). Appended records are fsynced once per chunk when the
+    store was opened with fsync=True, so a crash loses at most the chunk in progress.
+    Returns a summary with the number of applied steps, throughput and rejected rows.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+    if store is None:
+        store = get_ledger_store()
+    store.load()
+    dvp_instances = {} # DVPs touched by this batch, re-hydrated once
+    applied = 0
+    rejected = []
+    start = time.perf_counter()
+
+    with store.write_batch():
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                dvp_id, process_type, agent_did, score_change, attestation_uri = _parse_batch_row(line)
+                if dvp_id not in dvp_instances and store.get(dvp_id) is None:
+                    raise ValueError(f"DVP with ID {dvp_id} not found")
+            except ValueError as e:
+                rejected.append((line_number, str(e)))
+                continue
+
+            # Compare-and-swap on the DVP's version; a concurrent writer invalidates the cached instance.
+            while True:
+                dvp_instance = dvp_instances.get(dvp_id)
+                if dvp_instance is None:
+                    dvp_instance = dvp_instances[dvp_id] = DVP.from_json(store.get(dvp_id))
+                expected_version = len(dvp_instance.lineage)
+                step_data = build_step_data(dvp_id, expected_version, process_type, agent_did, score_change, attestation_uri)
+                dvp_instance.add_lineage_step(step_data)
+                try:
+                    store.append_step(dvp_id, step_data, dvp_instance.current_confidence, expected_version=expected_version)
+                    break
+                except VersionConflictError:
+                    del dvp_instances[dvp_id]
+            applied += 1
+            if applied % chunk_size == 0:
+                store.commit()
+
+    elapsed = time.perf_counter() - start
+    return {
+        "applied": applied,
+        "rejected": rejected,
+        "elapsed_seconds": elapsed,
+        "steps_per_second": applied / elapsed if elapsed > 0 else 0.0
+    }
+
+# --- Ledger Queries ---
+QUERY_OPTIONS = {
+    "--agent": "agent_did",
+    "--process-type": "process_type",
+    "--min-confidence": "min_confidence",
+    "--max-confidence": "max_confidence",
+    "--since": "since",
+    "--until": "until",
+    "--limit": "limit"
+}
+
+def _parse_query_args(args):
+    """Parses query options into (filters, steps), raising ValueError if they are invalid."""
+    filters = {}
+    steps = False
+    position = 0
+    while position < len(args):
+        option = args[position]
+        if option == "--steps":
+            steps = True
+            position += 1
+            continue
+        if option not in QUERY_OPTIONS:
+            raise ValueError(f"unknown option '{option}'")
+        if position + 1 >= len(args):
+            raise ValueError(f"option '{option}' needs a value")
+        name, value = QUERY_OPTIONS[option], args[position + 1]
+        position += 2
+        if name in ("min_confidence", "max_confidence"):
+            try:
+                value = float(value)
+            except ValueError:
+                value = math.nan
+            if not math.isfinite(value):
+                raise ValueError(f"{option} must be a number")
+        elif name == "limit":
+            try:
+                value = int(value)
+            except ValueError:
+                value = 0
+            if value < 1:
+                raise ValueError("--limit must be a positive integer")
+        filters[name] = value
+    if steps and ("min_confidence" in filters or "max_confidence" in filters):
+        raise ValueError("confidence bounds apply to DVP queries, not --steps")
+    return filters, steps
+
+def query_ledger(filters, steps: bool = False, store: Optional[LedgerStore] = None):
+    """
+    Streams query results from secondary indexes over the local ledger store.
+
+    DVP queries yield {"id", "current_confidence"} for DVPs matching every filter
+    (--since/--until bound created_at); step queries yield {"dvp_id", "step"} with
+    --since/--until bounding the step timestamp. Both match the daemon's replies.
+    """
+    if store is None:
+        store = get_ledger_store()
+    index = LedgerIndex()
+    store.add_listener(index)
+    if steps:
+        matches = ({"dvp_id": dvp_id, "step": step} for dvp_id, step in
+                   index.steps(filters.get("process_type"), filters.get("agent_did"),
+                               filters.get("since"), filters.get("until")))
+    else:
+        matches = ({"id": dvp['id'], "current_confidence": dvp['current_confidence']} for dvp in
+                   index.query(filters.get("agent_did"), filters.get("process_type"),
+                               filters.get("min_confidence", 0.0), filters.get("max_confidence", 1.0),
+                               filters.get("since"), filters.get("until")))
+    return itertools.islice(matches, filters.get("limit"))
+
+def query_daemon(client, filters, steps: bool = False):
+    """Streams a query's results from the daemon as their batches arrive; every match unless --limit is given."""
+    limit = filters.get("limit")
+    if steps:
+        return daemon_stream(client, "steps", process_type=filters.get("process_type"),
+                             agent_did=filters.get("agent_did"), start=filters.get("since"),
+                             end=filters.get("until"), limit=limit)
+    return daemon_stream(client, "query", agent_did=filters.get("agent_did"),
+                         process_type=filters.get("process_type"),
+                         min_confidence=filters.get("min_confidence", 0.0),
+                         max_confidence=filters.get("max_confidence", 1.0),
+                         created_after=filters.get("since"), created_before=filters.get("until"), limit=limit)
+
+AS_OF_OPTIONS = ("min_confidence", "max_confidence", "limit")
+
+def _parse_as_of_args(args):
+    """Parses as_of arguments into (timestamp, dvp_id or None, filters), raising ValueError if they are invalid."""
+    if not args or args[0].startswith("--"):
+        raise ValueError("a timestamp is required")
+    as_of, args = args[0], args[1:]
+    dvp_id = None
+    if args and not args[0].startswith("--"):
+        dvp_id, args = args[0], args[1:]
+    filters, steps = _parse_query_args(args)
+    unsupported = [name for name in filters if name not in AS_OF_OPTIONS]
+    if steps or unsupported:
+        raise ValueError("as_of takes only --min-confidence, --max-confidence and --limit")
+    if dvp_id is not None and filters:
+        raise ValueError("confidence bounds and --limit apply to ledger-wide as_of queries")
+    return as_of, dvp_id, filters
+
+def change_events(from_seq: int = 0, follow: bool = False, feed: Optional[ChangeFeed] = None):
+    """Streams change events from `from_seq` on; with follow, keeps waiting for new ones."""
+    if feed is None:
+        feed = get_change_feed()
+    if follow:
+        yield from feed.tail(from_seq)
+        return
+    while True:
+        events = feed.read(from_seq)
+        if not events:
+            return
+        yield from events
+        from_seq += len(events)
+
+def confidence_as_of(as_of: str, filters, store: Optional[LedgerStore] = None):
+    """Streams {"id", "confidence"} for the DVPs whose confidence at `as_of` is within the filter bounds."""
+    if store is None:
+        store = get_ledger_store()
+    history = ConfidenceHistory()
+    store.add_listener(history)
+    matches = ({"id": dvp_id, "confidence": confidence} for dvp_id, confidence in
+               history.dvps_as_of(as_of, filters.get("min_confidence", 0.0), filters.get("max_confidence", 1.0)))
+    return itertools.islice(matches, filters.get("limit"))
+
+def as_of_daemon(client, as_of: str, filters):
+    """Streams a ledger-wide as_of query's results from the daemon; every match unless --limit is given."""
+    return daemon_stream(client, "as_of", as_of=as_of, min_confidence=filters.get("min_confidence", 0.0),
+                         max_confidence=filters.get("max_confidence", 1.0), limit=filters.get("limit"))
+
+def dvp_confidence_as_of(dvp_id: str, as_of: str):
+    """Returns {"id", "confidence"} for one DVP at `as_of` (confidence None before it was created)."""
+    dvp_id = lookup_dvp(dvp_id)['id']
+    history = ConfidenceHistory()
+    get_ledger_store().add_listener(history)
+    return {"id": dvp_id, "confidence": history.confidence_as_of(dvp_id, as_of)}
 
 # --- Main CLI Dispatcher ---
 if __name__ == "__main__":
@@ -84,13 +409,27 @@ if __name__ == "__main__":
     args = sys.argv[2:]
 
     if command == "create":
-        if len(args) < 1 or len(args) > 2:
-            print("Usage: sl_cli.py create \"<claim_text>\" [initial_karma=0]")
+        try:
+            claim_text, agent_karma, on_duplicate, agent_did, similar = _parse_create_args(args)
+        except ValueError as e:
+            print(f"Error: {e}")
+            print("Usage: sl_cli.py create \"<claim_text>\" [initial_karma=0] [--on-duplicate return|extend|create] "
+                  "[--agent <did>] [--similar]")
             sys.exit(1)
-        
-        claim_text = args[0]
-        agent_karma = float(args[1]) if len(args) == 2 else 0
-        create_dvp_claim(claim_text, agent_karma)
+        client = get_daemon_client()
+        if client:
+            result = daemon_request(client, "create", claim_text=claim_text, agent_karma=agent_karma,
+                                    on_duplicate=on_duplicate, agent_did=agent_did)
+            if not result['created']:
+                print(f"Duplicate Claim: existing DVP ID={result['id']}")
+                if 'current_confidence' in result:
+                    print(f"Step Added: ID={result['id']}, Confidence Updated to {result['current_confidence']:.2f}")
+            else:
+                for match in result['similar']:
+                    print(f"Warning: similar claim in DVP {match['id']} (similarity {match['similarity']:.2f})")
+                print(f"DVP Created Successfully: ID={result['id']}")
+        else:
+            create_dvp_claim(claim_text, agent_karma, on_duplicate, agent_did, similar)
 
     elif command == "add_step":
         if len(args) != 5:
@@ -108,13 +447,161 @@ if __name__ == "__main__":
             sys.exit(1)
         attestation_uri = args[4]
 
-        add_dvp_step(dvp_id, process_type, agent_did, score_change, attestation_uri)
+        client = get_daemon_client()
+        if client:
+            result = daemon_request(client, "add_step", dvp_id=dvp_id, process_type=process_type, agent_did=agent_did,
+                                    score_change=score_change, attestation_uri=attestation_uri)
+            print(f"Step Added: ID={result['id']}, Confidence Updated to {result['current_confidence']:.2f}")
+        else:
+            add_dvp_step(dvp_id, process_type, agent_did, score_change, attestation_uri)
 
     elif command == "status":
         if len(args) != 1:
-            print("Usage: sl_cli.py status <dvp_id>")
+            print("Usage: sl_cli.py status <dvp_id or unique id prefix>")
+            sys.exit(1)
+        client = get_daemon_client()
+        if client:
+            print(json.dumps(daemon_request(client, "status", dvp_id=args[0]), indent=2))
+        else:
+            get_dvp_status(args[0])
+
+    elif command == "query":
+        try:
+            filters, steps = _parse_query_args(args)
+        except ValueError as e:
+            print(f"Error: {e}")
+            print("Usage: sl_cli.py query [--agent <did>] [--process-type <type>] [--min-confidence <x>] "
+                  "[--max-confidence <x>] [--since <timestamp>] [--until <timestamp>] [--steps] [--limit <n>]")
+            sys.exit(1)
+        client = get_daemon_client()
+        results = query_daemon(client, filters, steps) if client else query_ledger(filters, steps)
+        # One JSON object per line, printed as results stream out of the index
+        for result in results:
+            print(json.dumps(result))
+
+    elif command == "as_of":
+        try:
+            as_of, dvp_id, filters = _parse_as_of_args(args)
+        except ValueError as e:
+            print(f"Error: {e}")
+            print("Usage: sl_cli.py as_of <timestamp> [<dvp_id>] [--min-confidence <x>] [--max-confidence <x>] "
+                  "[--limit <n>]")
+            sys.exit(1)
+        client = get_daemon_client()
+        if dvp_id is not None:
+            result = (daemon_request(client, "as_of", as_of=as_of, dvp_id=dvp_id) if client
+                      else dvp_confidence_as_of(dvp_id, as_of))
+            if result['confidence'] is None:
+                print(f"DVP {result['id']} did not exist yet at {as_of}.")
+            else:
+                print(f"DVP {result['id']}: Confidence as of {as_of} was {result['confidence']:.2f}")
+        else:
+            results = as_of_daemon(client, as_of, filters) if client else confidence_as_of(as_of, filters)
+            for result in results:
+                print(json.dumps(result))
+
+    elif command == "serve":
+        reputation = "--reputation" in args
+        args = [arg for arg in args if arg != "--reputation"]
+        if len(args) > 1:
+            print(f"Usage: sl_cli.py serve [socket_path={DEFAULT_SOCKET_PATH}] [--reputation]")
+            sys.exit(1)
+        serve(DVP_STORE_PATH, args[0] if args else DEFAULT_SOCKET_PATH, legacy_path=DVP_LEDGER_PATH,
+              reputation=reputation, shards=DVP_STORE_SHARDS, feed_path=DVP_FEED_PATH)
+
+    elif command == "karma":
+        if len(args) != 1:
+            print("Usage: sl_cli.py karma <agent_did>")
+            sys.exit(1)
+        client = get_daemon_client()
+        if client:
+            result = daemon_request(client, "karma", agent_did=args[0])
+            karma, k_factor = result['karma'], result['k_factor']
+        else:
+            reputation = ReputationStore.from_ledger(load_dvp_ledger())
+            karma, k_factor = reputation.karma(args[0]), reputation.k_factor(args[0])
+        print(f"Agent {args[0]}: Karma={karma:.3f}, K-Factor={k_factor:.3f}")
+
+    elif command == "batch":
+        if len(args) < 1 or len(args) > 2:
+            print("Usage: sl_cli.py batch <steps.jsonl | -> [chunk_size=1000]")
+            print("Each line: {\"dvp_id\": ..., \"process_type\": ..., \"agent_did\": ..., \"score_change\": ..., \"attestation_uri\": ...}")
+            sys.exit(1)
+        try:
+            chunk_size = int(args[1]) if len(args) == 2 else DEFAULT_BATCH_CHUNK_SIZE
+        except ValueError:
+            chunk_size = 0
+        if chunk_size < 1:
+            print(f"Error: chunk_size must be a positive integer, got '{args[1]}'.")
+            sys.exit(1)
+        # Durable store, so the commit after each chunk is a real fsync checkpoint
+        with ChangeFeed(DVP_FEED_PATH, fsync=True) as feed, \
+                ShardedLedgerStore(DVP_STORE_PATH, shards=DVP_STORE_SHARDS, legacy_path=DVP_LEDGER_PATH,
+                                   fsync=True, change_feed=feed) as store:
+            if args[0] == "-":
+                summary = batch_add_steps(sys.stdin, chunk_size, store)
+            else:
+                with open(args[0], 'r') as f:
+                    summary = batch_add_steps(f, chunk_size, store)
+
+        for line_number, reason in summary["rejected"]:
+            print(f"Rejected line {line_number}: {reason}")
+        print(f"Batch Complete: {summary['applied']} steps applied, {len(summary['rejected'])} rejected "
+              f"in {summary['elapsed_seconds']:.2f}s ({summary['steps_per_second']:.0f} steps/s)")
+
+    elif command == "compact":
+        get_ledger_store().compact()
+        print("Ledger compacted.")
+
+    elif command == "feed":
+        follow = "--follow" in args
+        args = [arg for arg in args if arg != "--follow"]
+        try:
+            from_seq = int(args[0]) if len(args) == 1 else 0
+        except ValueError:
+            from_seq = -1
+        if len(args) > 1 or from_seq < 0:
+            print("Usage: sl_cli.py feed [from_seq=0] [--follow]")
+            sys.exit(1)
+        try:
+            for event in change_events(from_seq, follow):
+                print(json.dumps(event), flush=follow)
+        except FeedTruncatedError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        except KeyboardInterrupt:
+            pass
+
+    elif command == "reshard":
+        if len(args) != 1:
+            print(f"Usage: sl_cli.py reshard <shard_count (1-{MAX_SHARDS})>")
+            sys.exit(1)
+        try:
+            shards = int(args[0])
+            previous = get_ledger_store().reshard(shards)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        print(f"Ledger resharded from {previous} to {shards} shards.")
+
+    elif command == "export":
+        if len(args) > 1:
+            print("Usage: sl_cli.py export [output_path=data/ledger.json]  (a .slb path writes the binary format)")
+            sys.exit(1)
+        output_path = args[0] if args else DVP_LEDGER_PATH
+        save_dvp_ledger(load_dvp_ledger(), output_path)
+        print(f"Ledger exported to: {output_path}")
+
+    elif command == "convert":
+        if len(args) != 2:
+            print("Usage: sl_cli.py convert <input_path> <output_path>  (JSON <-> binary, chosen by the .slb extension)")
+            sys.exit(1)
+        try:
+            count = convert_ledger_file(args[0], args[1])
+        except (OSError, ValueError) as e:
+            print(f"Error: could not convert {args[0]}: {e}")
             sys.exit(1)
-        get_dvp_status(args[0])
+        print(f"Converted {count} DVPs to: {args[1]}")
 
     else:
         print(f"Unknown command: {command}")
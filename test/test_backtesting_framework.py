@@ -0,0 +1,68 @@
+import unittest
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+from backtesting_framework import BacktestingEnvironment, simulate_positions
+
+class VectorizedBacktestTest(unittest.TestCase):
+
+    def setUp(self):
+        """Write a tick CSV spanning a month boundary for each test."""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.csv_path = os.path.join(self.tmp_dir, 'ticks.csv')
+        rng = np.random.default_rng(3)
+        timestamps = (list(pd.date_range('2026-01-01 09:00', periods=40, freq='37min'))
+                      + list(pd.date_range('2026-02-01 09:00', periods=40, freq='37min')))
+        pd.DataFrame({
+            'timestamp': timestamps,
+            'price': 40000 + rng.normal(0, 20, len(timestamps)).cumsum(),
+            'volume': rng.integers(1, 10, len(timestamps)).astype(float),
+            'order_flow_delta': rng.uniform(-1, 1, len(timestamps))
+        }).to_csv(self.csv_path, index=False)
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.env = BacktestingEnvironment(self.csv_path, 100000.0)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_matches_step_by_step_accounting(self):
+        """Tests that the array engine produces the same equity curve as a per-tick loop."""
+        prices = self.env.market_data['price'].to_numpy()
+        positions = np.sign(np.sin(np.arange(len(prices)) / 5.0)) * 0.5
+        equity, trades, fees = simulate_positions(prices, positions, 100000.0, fee_rate=0.001)
+
+        cash, held, expected = 100000.0, 0.0, []
+        for price, target in zip(prices, positions):
+            cash -= (target - held) * price + abs(target - held) * price * 0.001
+            held = target
+            expected.append(cash + held * price)
+        np.testing.assert_allclose(equity, expected, rtol=0, atol=1e-6)
+        self.assertAlmostEqual(fees.sum(), np.abs(np.diff(positions, prepend=0.0) * prices).sum() * 0.001)
+
+        with self.assertRaises(ValueError):
+            simulate_positions(prices, positions[:-1], 100000.0)
+
+    def test_daily_returns(self):
+        """Tests daily returns from the vectorized run and one return per date in the step-wise loop."""
+        positions = np.ones(len(self.env.market_data))
+        summary = self.env.run_vectorized(positions, fee_rate=0.0)
+        daily = self.env.daily_returns
+        self.assertEqual(daily.index[0], pd.Timestamp('2026-01-01'))
+        closes = self.env.equity_curve.resample('D').last().ffill()
+        self.assertAlmostEqual(daily.iloc[0], closes.iloc[0] / 100000.0 - 1)
+        self.assertAlmostEqual(daily.iloc[-1], closes.iloc[-1] / closes.iloc[-2] - 1)
+        self.assertAlmostEqual((1 + daily).prod() - 1, summary["pnl"] / 100000.0)
+        self.assertEqual(summary["fills"], 1)
+
+        # Jan 1, Jan 2 and Feb 1, Feb 2: the same day-of-month in two months are different days
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.env.run_simulation(agent=None)
+        self.assertEqual(list(self.env.daily_returns.index.strftime('%Y-%m-%d')),
+                         ['2026-01-01', '2026-01-02', '2026-02-01', '2026-02-02'])
+
+if __name__ == '__main__':
+    unittest.main()
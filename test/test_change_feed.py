@@ -0,0 +1,84 @@
+import unittest
+import multiprocessing
+import os
+import shutil
+import tempfile
+from src.dvp_model import DVP, build_step_data
+from src.ledger_store import LedgerStore
+from src.sharded_store import ShardedLedgerStore
+from src.change_feed import ChangeFeed, FeedTruncatedError, EVENT_INDEX_ENTRY
+from src.sl_cli import change_events
+
+def _feed_writer(store_path, feed_path, dvp_ids, steps):
+    """Adds steps to every DVP round-robin through a store publishing to the feed (runs in a child process)."""
+    with ChangeFeed(feed_path) as feed, ShardedLedgerStore(store_path, change_feed=feed) as store:
+        for i in range(steps):
+            dvp_id = dvp_ids[i % len(dvp_ids)]
+            store.update(dvp_id, lambda dvp_data: (
+                build_step_data(dvp_id, len(dvp_data['lineage']), "PeerReview", f"did:synergy:{os.getpid()}", 0.01,
+                                "uri:vc"), 0.5))
+
+class ChangeFeedTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.store_path = os.path.join(self.tmp_dir, 'ledger')
+        self.feed_path = os.path.join(self.tmp_dir, 'feed')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_sequence_rotation_and_retention(self):
+        """Tests gapless numbering across segments, reads from any retained offset and the retention limit."""
+        dvp = DVP(claim_text="Feed claim")
+        with ChangeFeed(self.feed_path, segment_events=4, retained_segments=2) as feed, \
+                LedgerStore(self.store_path, change_feed=feed) as store:
+            store.append_create(dict(dvp.to_json(), lineage=[]))
+            for i in range(9):
+                store.append_step(dvp.id, {"step_id": f"s{i}"}, 0.5 + i / 100)
+            self.assertEqual((feed.oldest_seq(), feed.next_seq()), (4, 10))
+            events = feed.read(6)
+            self.assertEqual([event['seq'] for event in events], [6, 7]) # A read stops at the end of its segment
+            self.assertEqual(events[0]['step'], {"step_id": "s5"})
+            self.assertEqual((events[0]['op'], events[0]['id'], events[0]['current_confidence']), ("step", dvp.id, 0.55))
+            self.assertEqual([event['seq'] for event in change_events(5, feed=feed)], [5, 6, 7, 8, 9])
+            self.assertEqual(feed.read(10), [])
+            with self.assertRaises(FeedTruncatedError):
+                feed.read(0)
+
+        # A crash mid-publish leaves event data without its index entry and half an entry
+        with open(os.path.join(self.feed_path, 'events-0000000000000008.log'), 'ab') as data:
+            data.write(b'{"seq": 10, "torn')
+        with open(os.path.join(self.feed_path, 'events-0000000000000008.log.idx'), 'ab') as index:
+            index.write(EVENT_INDEX_ENTRY.pack(0, 1)[:5])
+        with ChangeFeed(self.feed_path, segment_events=1000, retained_segments=2) as feed:
+            self.assertEqual(feed.segment_events, 4) # Fixed when the feed was created
+            self.assertEqual(feed.read(8)[-1]['seq'], 9)
+            self.assertEqual(feed.publish({"op": "step", "id": dvp.id, "step": {}, "current_confidence": 0.5}), 10)
+            self.assertEqual([event['seq'] for event in feed.read(8)], [8, 9, 10])
+
+    def test_concurrent_writers_and_shards(self):
+        """Tests that processes writing to several shards share one gapless sequence in lineage order."""
+        dvps = [DVP(claim_text=f"Feed claim {i}") for i in range(6)]
+        with ChangeFeed(self.feed_path) as feed, ShardedLedgerStore(self.store_path, shards=4, change_feed=feed) as store:
+            for dvp in dvps:
+                store.append_create(dict(dvp.to_json(), lineage=[]))
+        ids = [dvp.id for dvp in dvps]
+        writers = [multiprocessing.Process(target=_feed_writer, args=(self.store_path, self.feed_path, ids, 30))
+                   for _ in range(3)]
+        for writer in writers:
+            writer.start()
+        for writer in writers:
+            writer.join()
+            self.assertEqual(writer.exitcode, 0)
+
+        with ChangeFeed(self.feed_path) as feed, ShardedLedgerStore(self.store_path) as store:
+            events = list(change_events(0, feed=feed))
+            self.assertEqual([event['seq'] for event in events], list(range(6 + 90)))
+            self.assertEqual([event['id'] for event in events[:6]], ids)
+            for dvp_id in ids:
+                steps = [event['step']['step_id'] for event in events if event['op'] == 'step' and event['id'] == dvp_id]
+                self.assertEqual(steps, [step['step_id'] for step in store.get(dvp_id)['lineage']])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+import unittest
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock
+from src import sl_cli
+from src.dvp_model import DVP
+from src.ledger_store import LedgerStore
+from src.sharded_store import ShardedLedgerStore
+from src.claim_index import ClaimIndex, RESUBMISSION_PROCESS_TYPE, claim_hash, find_stored_claim, normalize_claim
+
+MOTION = "The Synergy Ledger architecture will solve the problem of Civil Unrest."
+
+class ClaimIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.store_path = os.path.join(self.tmp_dir, 'ledger')
+        self.store = LedgerStore(self.store_path)
+        self.index = ClaimIndex()
+        self.store.add_listener(self.index)
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def _create(self, claim_text, created_at):
+        dvp = DVP(claim_text=claim_text)
+        dvp.created_at = created_at
+        self.store.append_create(dvp.to_json())
+        return dvp.id
+
+    def test_exact_duplicates(self):
+        """Tests that normalized claims match, oldest first, incrementally and after a reload."""
+        self.assertEqual(normalize_claim("  High-Karma\tDVP  test! "), "high karma dvp test")
+        later = self._create("High-Karma DVP Test", "2026-02-03T00:00:00Z")
+        first = self._create("high karma dvp test.", "2026-02-01T00:00:00Z")
+        other = self._create("Another claim", "2026-02-02T00:00:00Z")
+        reloaded = LedgerStore(self.store_path)
+        from_reload = ClaimIndex(near_duplicates=False)
+        reloaded.add_listener(from_reload)
+        for index in (self.index, from_reload):
+            self.assertEqual(index.find("HIGH-KARMA  DVP TEST"), first)
+            self.assertEqual(index.find("Another claim?"), other)
+            self.assertIsNone(index.find("High-Karma DVP Test 2"))
+            self.assertEqual(list(index.duplicates()), [[first, later]])
+        with self.assertRaises(ValueError):
+            from_reload.similar("Another claim")
+        reloaded.close()
+
+    def test_near_duplicates(self):
+        """Tests that paraphrases are flagged and unrelated claims are not, among many claims."""
+        original = self._create(MOTION, "2026-02-01T00:00:00Z")
+        for i in range(300):
+            self._create(f"Agent {i} reports that carbon taxes cut emissions in region {i * 7}.", "2026-02-02T00:00:00Z")
+        for paraphrase in ("Civil unrest will be solved by the Synergy Ledger architecture.",
+                           "The Synergy Ledger architecture will solve the problem of civil unrest in cities"):
+            matches = self.index.similar(paraphrase)
+            self.assertEqual(matches[0][0], original)
+            self.assertGreater(matches[0][1], 0.4)
+            self.assertLess(len(matches), 3)
+        self.assertEqual(self.index.similar("Quantum computing will break RSA within a decade."), [])
+
+    def test_create_modes(self):
+        """Tests that create returns, extends or duplicates an existing DVP as asked."""
+        with mock.patch.object(sl_cli, '_ledger_store', self.store), contextlib.redirect_stdout(io.StringIO()) as out:
+            first = sl_cli.create_dvp_claim(MOTION)
+            self.assertEqual(sl_cli.create_dvp_claim(MOTION.upper()), first)
+            self.assertEqual(sl_cli.create_dvp_claim(MOTION, on_duplicate='extend', agent_did="did:synergy:b"), first)
+            self.assertNotEqual(sl_cli.create_dvp_claim(MOTION, on_duplicate='create'), first)
+            sl_cli.create_dvp_claim("Civil unrest will be solved by the Synergy Ledger architecture.", similar=True)
+        lineage = self.store.get(first)['lineage']
+        self.assertEqual([(step['process_type'], step['agent_did'], step['result_score_change']) for step in lineage],
+                         [(RESUBMISSION_PROCESS_TYPE, "did:synergy:b", 0.0)])
+        self.assertEqual(len(self.store.load()), 3)
+        self.assertIn(f"Warning: similar claim in DVP {first}", out.getvalue())
+
+        self.assertEqual(sl_cli._parse_create_args(["claim", "2", "--on-duplicate", "extend", "--agent", "did:x"]),
+                         ("claim", 2.0, "extend", "did:x", False))
+        self.assertEqual(sl_cli._parse_create_args(["--similar", "claim"]), ("claim", 0, "return", None, True))
+        for bad in ([], ["claim", "--on-duplicate", "merge"], ["claim", "high"], ["claim", "--agent"]):
+            with self.assertRaises(ValueError):
+                sl_cli._parse_create_args(bad)
+
+    def test_stored_claim_index(self):
+        """Tests the on-disk claim index through compaction, reopening and a rebuild for a store without one."""
+        later = self._create("High-Karma DVP Test", "2026-02-03T00:00:00Z")
+        first = self._create("high karma dvp test.", "2026-02-01T00:00:00Z")
+        self.store.compact()
+        after = self._create("HIGH KARMA DVP TEST", "2026-01-01T00:00:00Z")
+        other = self._create("Another claim", "2026-02-02T00:00:00Z")
+        self.assertEqual(self.store.claim_ids(claim_hash("high karma dvp test")), sorted([first, later, after]))
+        self.assertEqual(find_stored_claim(self.store, "High-karma DVP test!"), after)
+        self.assertIsNone(find_stored_claim(self.store, "High-Karma DVP Test 2"))
+        self.store.close()
+
+        for name in os.listdir(self.store_path):
+            if name.endswith('.claims'):
+                os.remove(os.path.join(self.store_path, name))
+        self.store = LedgerStore(self.store_path)
+        self.assertEqual(find_stored_claim(self.store, "Another claim"), other)
+        self.assertEqual(len(self.store.claim_ids(claim_hash("high karma dvp test"))), 3)
+
+    def test_local_create_does_not_load_the_ledger(self):
+        """Tests that a one-shot create finds duplicates in a sharded store without loading the ledger."""
+        with ShardedLedgerStore(os.path.join(self.tmp_dir, 'sharded'), shards=4) as store:
+            for i in range(50):
+                store.append_create(DVP(claim_text=f"Sharded claim {i}").to_json())
+            with mock.patch.object(sl_cli, '_ledger_store', store), contextlib.redirect_stdout(io.StringIO()), \
+                    mock.patch.object(LedgerStore, '_reload_state', side_effect=AssertionError("ledger loaded")):
+                existing = sl_cli.create_dvp_claim("sharded CLAIM 7")
+                created = sl_cli.create_dvp_claim("Sharded claim 50")
+                self.assertEqual(store.get(existing)['claim_text'], "Sharded claim 7")
+                self.assertEqual(sl_cli.create_dvp_claim("Sharded claim 50!"), created)
+
+if __name__ == '__main__':
+    unittest.main()
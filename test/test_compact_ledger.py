@@ -0,0 +1,69 @@
+import unittest
+from src.dvp_model import DVP, build_step_data
+from src.ledger_store import apply_record
+from src.compact_ledger import CompactLedger, format_timestamp, parse_timestamp
+
+class CompactLedgerTest(unittest.TestCase):
+
+    def _dvp_with_steps(self, claim_text, steps):
+        dvp = DVP(claim_text=claim_text, agent_karma=3)
+        for i in range(steps):
+            dvp.add_lineage_step(build_step_data(dvp.id, len(dvp.lineage), "FunctionalAudit",
+                                                 f"did:synergy:node-{i % 2}", 0.05, f"uri:audit-{i}"))
+        return dvp
+
+    def test_round_trips_to_json_schema(self):
+        """Tests that DVPs built by the model come back identical from the columnar tables."""
+        dvps = [self._dvp_with_steps(f"Compact claim {i}", i) for i in range(5)]
+        ledger = {dvp.id: dvp.to_json() for dvp in dvps}
+        compact = CompactLedger.from_ledger(ledger)
+
+        self.assertEqual(compact.to_json(), ledger)
+        self.assertEqual(len(compact.steps), 10)
+        self.assertEqual(len(compact.steps.agent_dids), 2)
+        self.assertEqual(compact.steps.step_ids, {})
+        self.assertEqual(compact.version(dvps[4].id), 4)
+
+    def test_irregular_data_kept_verbatim(self):
+        """Tests that hand-written step ids, extra keys and legacy DVPs survive unchanged."""
+        dvp = self._dvp_with_steps("Irregular claim", 1)
+        custom = dict(dvp.lineage[0], step_id="osd-20260203-001")
+        extra = dict(dvp.lineage[0], note="manual entry")
+        legacy = {"id": "legacy-1", "claim_text": "Legacy", "created_at": "2026-02-03",
+                  "current_confidence": 0.5, "lineage": []}
+
+        compact = CompactLedger()
+        compact.add(legacy)
+        compact.add(dict(dvp.to_json(), lineage=[]))
+        for step in (custom, extra):
+            compact.append_step(dvp.id, step, 0.7)
+        compact.append_step("legacy-1", custom, 0.6)
+
+        self.assertEqual(compact.get(dvp.id)['lineage'], [custom, extra])
+        self.assertEqual(compact.get(dvp.id)['current_confidence'], 0.7)
+        self.assertEqual(compact.get("legacy-1"), dict(legacy, lineage=[custom], current_confidence=0.6))
+        self.assertIsNone(compact.get("missing"))
+
+    def test_apply_record_matches_dict_ledger(self):
+        """Tests that replaying log records gives the same ledger as ledger_store.apply_record."""
+        dvp = self._dvp_with_steps("Replayed claim", 3)
+        records = [{"op": "create", "dvp": dict(dvp.to_json(), lineage=[])}]
+        records += [{"op": "step", "id": dvp.id, "step": step, "current_confidence": 0.5 + i / 10}
+                    for i, step in enumerate(dvp.lineage)]
+        records.append({"op": "step", "id": "unknown", "step": dvp.lineage[0], "current_confidence": 0.1})
+
+        state, compact = {}, CompactLedger()
+        for record in records:
+            apply_record(state, record)
+            compact.apply_record(record)
+        self.assertEqual(compact.to_json(), state)
+
+    def test_timestamps_round_trip(self):
+        """Tests integer timestamps, including whole seconds where isoformat drops the fraction."""
+        for value in ("2026-02-03T10:11:12.000123Z", "2026-02-03T10:11:12Z"):
+            self.assertEqual(format_timestamp(parse_timestamp(value)), value)
+        for value in ("2026-02-03T10:11:12.000Z", "2026-02-03", "2026-02-03T10:11:12+00:00", None):
+            self.assertIsNone(parse_timestamp(value))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+import os
+import shutil
+import tempfile
+import numpy as np
+from src.dvp_model import DVP, build_step_data
+from src.ledger_store import LedgerStore
+from src.confidence_history import CHECKPOINT_INTERVAL, ConfidenceHistory
+from src.sl_cli import _parse_as_of_args, confidence_as_of
+
+def _at(day, second=0):
+    return f"2026-03-{day:02d}T00:00:{second:02d}.000000Z"
+
+class ConfidenceHistoryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.store_path = os.path.join(self.tmp_dir, 'ledger')
+        self.store = LedgerStore(self.store_path)
+        self.history = ConfidenceHistory()
+        self.store.add_listener(self.history)
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def _create(self, claim_text, created_at, agent_karma=0):
+        dvp = DVP(claim_text=claim_text, agent_karma=agent_karma)
+        dvp.created_at = created_at
+        self.store.append_create(dict(dvp.to_json(), lineage=[]))
+        return dvp
+
+    def _add(self, dvp, score_change, timestamp):
+        """Adds a step stamped `timestamp`; returns the confidence after it."""
+        step = build_step_data(dvp.id, len(dvp.lineage), "PeerReview", "did:synergy:node-a", score_change, "uri:vc")
+        dvp.add_lineage_step(step)
+        step['timestamp'] = timestamp
+        self.store.append_step(dvp.id, step, dvp.current_confidence)
+        return dvp.current_confidence
+
+    def test_as_of_matches_step_by_step_confidence(self):
+        """Tests every point in a long lineage, incrementally and after a reload, against the recorded confidences."""
+        rng = np.random.default_rng(22)
+        dvp = self._create("Long claim", _at(1), agent_karma=3)
+        history = [(_at(1), dvp.current_confidence)]
+        for i, change in enumerate(rng.normal(0, 0.2, 3 * CHECKPOINT_INTERVAL + 5).round(3).tolist()):
+            timestamp = f"2026-03-02T{i // 60:02d}:{i % 60:02d}:00.000000Z"
+            history.append((timestamp, self._add(dvp, change, timestamp)))
+
+        reloaded = LedgerStore(self.store_path)
+        from_reload = ConfidenceHistory()
+        reloaded.add_listener(from_reload)
+        for listener in (self.history, from_reload):
+            self.assertIsNone(listener.confidence_as_of(dvp.id, _at(1)))
+            for (timestamp, _), (_, before) in zip(history[1:], history):
+                self.assertEqual(listener.confidence_as_of(dvp.id, timestamp), before)
+            self.assertEqual(listener.confidence_as_of(dvp.id, _at(3)), dvp.current_confidence)
+        reloaded.close()
+
+    def test_ledger_wide_as_of_and_cli(self):
+        """Tests a ledger-wide threshold query, creation bounds and the CLI as_of path."""
+        rising, falling = self._create("Rising", _at(1)), self._create("Falling", _at(1))
+        late = self._create("Late", _at(5))
+        self._add(rising, 0.4, _at(2))
+        self._add(falling, -0.4, _at(2))
+        self._add(rising, -0.4, _at(4))
+        self._add(late, 0.4, _at(6))
+
+        self.assertEqual(list(self.history.dvps_as_of("2026-03-03", min_confidence=0.8)),
+                         [(rising.id, rising.lineage[0]['weighted_change'] + 0.5)])
+        self.assertEqual({dvp_id for dvp_id, _ in self.history.dvps_as_of("2026-03-05")}, {rising.id, falling.id})
+        self.assertEqual(len(list(self.history.dvps_as_of("2026-03-07", min_confidence=0.8))), 1)
+
+        as_of, dvp_id, filters = _parse_as_of_args(["2026-03-03", "--min-confidence", "0.8"])
+        self.assertEqual((as_of, dvp_id, filters), ("2026-03-03", None, {"min_confidence": 0.8}))
+        self.assertEqual([result['id'] for result in confidence_as_of(as_of, filters, store=self.store)], [rising.id])
+        self.assertEqual(_parse_as_of_args(["2026-03-03", rising.id[:8]])[1], rising.id[:8])
+        for bad in ([], ["--limit", "1"], ["2026-03-03", "--agent", "x"], ["2026-03-03", rising.id, "--limit", "1"]):
+            with self.assertRaises(ValueError):
+                _parse_as_of_args(bad)
+
+if __name__ == '__main__':
+    unittest.main()
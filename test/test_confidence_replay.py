@@ -0,0 +1,60 @@
+import unittest
+import random
+import numpy as np
+from src.dvp_model import DVP, build_step_data
+from src.compact_ledger import CompactLedger
+from src.confidence_replay import ConfidenceReplay, SCALAR_TAIL_THRESHOLD
+
+class ConfidenceReplayTest(unittest.TestCase):
+
+    def setUp(self):
+        """Build DVPs through the scalar path, with lineages long enough to hit both clamps."""
+        rng = random.Random(11)
+        self.ledger = {}
+        for i in range(60):
+            dvp = DVP(claim_text=f"Replay claim {i}", agent_karma=rng.choice([0, 1, 2.5, 40]))
+            # A few long lineages exercise the scalar tail after the vectorized positions
+            steps = rng.randint(0, 12) if i % 20 else SCALAR_TAIL_THRESHOLD * 4
+            for _ in range(steps):
+                dvp.add_lineage_step(build_step_data(dvp.id, len(dvp.lineage), "OxfordDebate", "did:synergy:eig-lead",
+                                                     rng.choice([0.10, -0.05, 0.05, -0.10, 0.20, -0.50]), "uri:vc"))
+            self.ledger[dvp.id] = dvp.to_json()
+
+    def _assert_matches_scalar(self, replay, confidence, k_factors, weighted):
+        for i, dvp_id in enumerate(replay.ids):
+            dvp = self.ledger[dvp_id]
+            self.assertEqual(confidence[i], dvp['current_confidence'])
+            start = replay.offsets[i]
+            for j, step in enumerate(dvp['lineage']):
+                self.assertEqual(k_factors[i], step['k_factor_applied'])
+                self.assertEqual(weighted[start + j], step['weighted_change'])
+
+    def test_matches_scalar_path_exactly(self):
+        """Tests that bulk replay reproduces add_lineage_step bit for bit."""
+        replay = ConfidenceReplay.from_ledger(self.ledger)
+        self._assert_matches_scalar(replay, *replay.replay())
+
+    def test_compact_ledger_source(self):
+        """Tests loading the score column straight from a CompactLedger."""
+        replay = ConfidenceReplay.from_compact(CompactLedger.from_ledger(self.ledger))
+        self._assert_matches_scalar(replay, *replay.replay())
+
+    def test_apply_new_parameters(self):
+        """Tests that a changed K-Factor formula and score table match a scalar re-run."""
+        def k_factor(karma):
+            return 1 + karma / 100
+
+        replay = ConfidenceReplay.from_ledger(self.ledger)
+        new_scores = np.where(replay.scores < 0, replay.scores * 2, replay.scores)
+        confidence = replay.apply(self.ledger, scores=new_scores, k_factor=k_factor)
+
+        for i, dvp_id in enumerate(replay.ids):
+            dvp = self.ledger[dvp_id]
+            expected = 0.5
+            for step in dvp['lineage']:
+                expected = max(0.0, min(1.0, expected + step['result_score_change'] * k_factor(dvp['agent_karma'])))
+            self.assertEqual(confidence[i], expected)
+            self.assertEqual(dvp['current_confidence'], expected)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,215 @@
+import unittest
+import asyncio
+import time
+import numpy as np
+from kill_switch_monitor import (EquityTracker, ExchangeAccount, ExchangeConnectionPool, KillSwitchMonitor,
+                                 LatencyHistogram, MultiAccountMonitor, replay_stream)
+from mock_exchange import MockExchange
+from risk_engine import RollingRiskEstimator
+
+def _fill(side, quantity, price, fee=0.0, symbol="BTCUSDT"):
+    return {"e": "ORDER_TRADE_UPDATE", "o": {"s": symbol, "S": side, "l": str(quantity), "L": str(price), "n": str(fee)}}
+
+def _mark(price, symbol="BTCUSDT"):
+    return {"e": "markPriceUpdate", "s": symbol, "p": str(price)}
+
+class KillSwitchMonitorTest(unittest.TestCase):
+
+    def _monitor(self, polled=(0.0, False), **kwargs):
+        self.kills, self.polls = [], []
+        def kill(key):
+            self.kills.append(key)
+            return True
+        def poll(key):
+            self.polls.append(key)
+            return polled
+        kwargs.setdefault("poll_interval", 3600)
+        return KillSwitchMonitor(1000.0, "EXEC", "DATA", kill=kill, poll=poll, **kwargs)
+
+    def test_incremental_equity(self):
+        """Tests the O(1) equity updates against marking every position from scratch."""
+        rng = np.random.default_rng(2)
+        tracker = EquityTracker(1000.0)
+        cash, positions, marks, peak = 1000.0, {}, {}, 1000.0
+        for _ in range(500):
+            symbol = str(rng.choice(["BTCUSDT", "ETHUSDT"]))
+            price = float(rng.uniform(90, 110))
+            if rng.random() < 0.3:
+                quantity, fee = float(rng.normal(0, 2)), float(rng.uniform(0, 0.1))
+                tracker.apply_fill(symbol, quantity, price, fee)
+                marks.setdefault(symbol, price)
+                positions[symbol] = positions.get(symbol, 0.0) + quantity
+                cash -= quantity * price + fee
+            else:
+                tracker.apply_mark(symbol, price)
+                marks[symbol] = price
+            equity = cash + sum(positions[s] * marks[s] for s in positions)
+            peak = max(peak, equity)
+            self.assertAlmostEqual(tracker.equity, equity, places=6)
+            self.assertAlmostEqual(tracker.drawdown, 1 - equity / peak, places=9)
+
+    def test_kill_fires_once_on_stream_breach(self):
+        """Tests that the first breaching event fires the kill once and that later breaches do not."""
+        monitor = self._monitor()
+        events = [_fill("BUY", 10, 100.0), _mark(99.0), _mark(96.0), _mark(95.0), _mark(90.0)]
+
+        async def scenario():
+            await monitor.run(replay_stream(events))
+            return await monitor.trigger("late reconciliation")
+
+        self.assertFalse(asyncio.run(scenario()))
+        self.assertEqual(self.kills, ["EXEC"])
+        self.assertEqual(monitor.events_processed, 4) # 10 units marked from 100 to 95 lose 5% of 1000
+        self.assertTrue(monitor.kill_succeeded)
+        self.assertEqual(monitor.detection_latency.count, 1)
+        self.assertEqual(monitor.kill_latency.count, 1)
+        self.assertIn("stream", monitor.kill_reason)
+
+    def test_concurrent_triggers(self):
+        """Tests that triggers racing on the event loop fire the kill exactly once."""
+        monitor = self._monitor()
+
+        async def scenario():
+            return await asyncio.gather(*(monitor.trigger(f"race {i}") for i in range(20)))
+
+        self.assertEqual(sum(asyncio.run(scenario())), 1)
+        self.assertEqual(self.kills, ["EXEC"])
+
+    def test_reconciliation_poll(self):
+        """Tests that the slow poll fires the kill when the exchange reports a breach the stream missed."""
+        monitor = self._monitor(poll_interval=0.01, polled=(0.07, True))
+
+        async def quiet_stream():
+            for _ in range(100):
+                await asyncio.sleep(0.005)
+                yield _mark(100.0)
+
+        asyncio.run(monitor.run(quiet_stream()))
+        self.assertEqual(self.kills, ["EXEC"])
+        self.assertEqual(self.polls, ["DATA"])
+        self.assertIn("reconciliation", monitor.kill_reason)
+        self.assertLess(monitor.events_processed, 100)
+
+    def test_position_limits_follow_marks(self):
+        """Tests that mark prices feed a per-symbol risk estimator sized from the account's current equity."""
+        monitor = self._monitor(risk_estimator=lambda: RollingRiskEstimator(window=50, min_observations=20))
+        reference = RollingRiskEstimator(window=50, min_observations=20)
+        rng = np.random.default_rng(3)
+        prices = 100.0 * np.cumprod(1 + rng.normal(0, 0.002, 60))
+        monitor.on_event(_fill("BUY", 1, 100.0), time.perf_counter())
+        for price in prices[:10]:
+            monitor.on_event(_mark(price), time.perf_counter())
+            reference.update_price(price)
+        self.assertEqual(monitor.max_position_size("BTCUSDT"), 0.0) # Not ready: nothing sized from a short window
+        self.assertEqual(monitor.max_position_size("ETHUSDT"), 0.0)
+        for price in prices[10:]:
+            monitor.on_event(_mark(price), time.perf_counter())
+            reference.update_price(price)
+        monitor.on_event(_mark(3000.0, symbol="ETHUSDT"), time.perf_counter())
+
+        self.assertEqual(set(monitor.risk), {"BTCUSDT", "ETHUSDT"})
+        self.assertEqual(monitor.risk["BTCUSDT"].cvar, reference.cvar)
+        equity = monitor.tracker.equity
+        self.assertNotEqual(equity, 1000.0)
+        self.assertAlmostEqual(monitor.max_position_notional("BTCUSDT"), reference.max_position_notional(equity))
+        self.assertAlmostEqual(monitor.max_position_size("BTCUSDT"), reference.max_position_size(prices[-1], equity))
+        self.assertAlmostEqual(monitor.max_position_size("BTCUSDT", leverage_cap=0.5), 0.5 * equity / prices[-1])
+        self.assertEqual(monitor.max_position_size("ETHUSDT"), 0.0)
+
+    def test_histogram_percentiles(self):
+        """Tests that percentiles land in the right log bucket."""
+        histogram = LatencyHistogram()
+        for micros in [10] * 98 + [1000, 5000]:
+            histogram.record(micros / 1e6)
+        self.assertTrue(10 <= histogram.percentile(50) < 10 * 2 ** 0.25)
+        self.assertTrue(1000 <= histogram.percentile(99) < 1000 * 2 ** 0.25)
+        self.assertAlmostEqual(histogram.percentile(100), 5000)
+
+class MultiAccountMonitorTest(unittest.TestCase):
+
+    def _spec(self, name, equity, events, interval, delay=0.0):
+        return {"execution_key": f"EXEC-{name}", "initial_equity": equity, "events": events,
+                "interval": interval, "delay": delay}
+
+    def _sell_off(self, quantity, marks):
+        return [_fill("BUY", quantity, 10000.0)] + [_mark(price) for price in marks]
+
+    def test_account_and_global_limits(self):
+        """Tests a per-account kill, then a portfolio kill revoking every key once and in parallel."""
+        venue_a = MockExchange({
+            "DATA-A": self._spec("A", 10000.0, self._sell_off(1, range(9900, 8800, -100)), 0.005),
+            "DATA-B": self._spec("B", 190000.0, self._sell_off(10, range(9900, 8000, -100)), 0.02)})
+        venue_b = MockExchange({"DATA-C": self._spec("C", 100000.0, [_mark(100.0)] * 50, 0.0, delay=0.2)})
+
+        async def scenario():
+            ports = [await venue_a.start(), await venue_b.start()]
+            accounts = [ExchangeAccount("A", '127.0.0.1', ports[0], "DATA-A", "EXEC-A", 10000.0),
+                        ExchangeAccount("B", '127.0.0.1', ports[0], "DATA-B", "EXEC-B", 190000.0),
+                        ExchangeAccount("C", '127.0.0.1', ports[1], "DATA-C", "EXEC-C", 100000.0)]
+            monitor = MultiAccountMonitor(accounts, poll_interval=0.05)
+            await monitor.run()
+            await venue_a.close()
+            await venue_b.close()
+            return monitor
+
+        monitor = asyncio.run(scenario())
+        revocations = dict(venue_a.revocations, **venue_b.revocations)
+        self.assertEqual({key: len(times) for key, times in revocations.items()},
+                         {"EXEC-A": 1, "EXEC-B": 1, "EXEC-C": 1})
+        self.assertIn("A drawdown", monitor.monitors["A"].kill_reason) # 11% of A, 0.4% of the portfolio
+        self.assertIn("portfolio", monitor.kill_reason)
+        self.assertLess(revocations["EXEC-A"][0], revocations["EXEC-B"][0])
+        # 1100 lost on A plus 14000 on B (marked at 8600) is 5% of 300000
+        self.assertAlmostEqual(monitor.monitors["B"].tracker.equity, 190000.0 - 14000.0)
+        self.assertGreaterEqual(monitor.drawdown, 0.05)
+        self.assertLess(revocations["EXEC-B"][0], revocations["EXEC-C"][0] - 0.1) # Not held up by C's 0.2s
+        self.assertEqual(monitor.detection_latency.count, 1)
+        self.assertEqual(sorted(monitor.revoked_accounts()), ["A", "B", "C"])
+        self.assertEqual(monitor.errors, {})
+
+    def test_slow_account_does_not_delay_others(self):
+        """Tests that an account whose stream and polls are slow does not delay another's kill on the same venue."""
+        venue = MockExchange({
+            "DATA-FAST": self._spec("FAST", 10000.0, self._sell_off(1, range(9950, 8000, -50)), 0.005),
+            "DATA-SLOW": self._spec("SLOW", 10000.0, [_mark(100.0)] * 10, 0.0, delay=0.5),
+            "DATA-BAD": self._spec("BAD", 10000.0, [], 0.0)})
+
+        async def scenario():
+            port = await venue.start()
+            accounts = [ExchangeAccount("FAST", '127.0.0.1', port, "DATA-FAST", "EXEC-FAST", 10000.0),
+                        ExchangeAccount("SLOW", '127.0.0.1', port, "DATA-SLOW", "EXEC-SLOW", 10000.0),
+                        ExchangeAccount("BAD", '127.0.0.1', port, "DATA-WRONG", "EXEC-BAD", 10000.0)]
+            monitor = MultiAccountMonitor(accounts, pool_size=2, poll_interval=0.01, timeout=2.0)
+            started = time.perf_counter()
+            task = asyncio.create_task(monitor.run())
+            while not venue.revocations.get("EXEC-FAST"):
+                await asyncio.sleep(0.005)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            await venue.close()
+            return monitor, venue.revocations["EXEC-FAST"][0] - started
+
+        monitor, elapsed = asyncio.run(scenario())
+        self.assertLess(elapsed, 0.3) # 11 events 5ms apart; the slow account's poll takes 0.5s
+        self.assertIn("Invalid API-key", monitor.errors["BAD"])
+        self.assertFalse(monitor.monitors["SLOW"].killed)
+
+    def test_pool_is_bounded(self):
+        """Tests that concurrent requests share at most `size` connections and reuse them."""
+        venue = MockExchange({"DATA-A": self._spec("A", 1000.0, [], 0.0, delay=0.01)})
+
+        async def scenario():
+            port = await venue.start()
+            pool = ExchangeConnectionPool('127.0.0.1', port, size=3)
+            results = await asyncio.gather(*(pool.request("account", key="DATA-A") for _ in range(30)))
+            await pool.close()
+            await venue.close()
+            return pool, results
+
+        pool, results = asyncio.run(scenario())
+        self.assertEqual(len(results), 30)
+        self.assertEqual(pool.opened, 3)
+        self.assertEqual(venue.connections, 3)
+
+if __name__ == '__main__':
+    unittest.main()
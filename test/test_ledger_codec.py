@@ -0,0 +1,73 @@
+import unittest
+import io
+import json
+import os
+import shutil
+import tempfile
+from src.dvp_model import DVP, build_step_data
+from src.ledger_codec import (BinaryLedgerWriter, BinaryLedgerReader, LedgerFormatError, FILE_HEADER, BINARY_MAGIC,
+                              BINARY_FORMAT_VERSION, convert_ledger_file, detect_format, load_ledger_file,
+                              write_ledger_file, FORMAT_BINARY, FORMAT_JSON)
+
+class LedgerCodecTest(unittest.TestCase):
+
+    def setUp(self):
+        """Build a small ledger with regular and irregular DVPs."""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.ledger = {}
+        for i in range(3):
+            dvp = DVP(claim_text=f"Codec claim {i} ✓", agent_karma=i * 1.5 if i else 0)
+            for j in range(i + 1):
+                dvp.add_lineage_step(build_step_data(dvp.id, len(dvp.lineage), "OxfordDebate",
+                                                     "did:synergy:eig-lead", 0.10, f"uri:vc/{i}-{j}"))
+            self.ledger[dvp.id] = dvp.to_json()
+        custom = DVP(claim_text="Hand-written step")
+        custom.add_lineage_step({"step_id": "osd-20260203-001", "process_type": "OxfordDebate",
+                                 "agent_did": "did:synergy:eig-lead", "result_score_change": 0.10,
+                                 "attestation_vc_uri": "https://ledger.com/vc/osd-20260203-001"})
+        self.ledger[custom.id] = custom.to_json()
+        self.ledger["legacy-1"] = {"id": "legacy-1", "claim_text": "Legacy", "current_confidence": 1,
+                                   "lineage": [{"note": "free-form"}]}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_stream_round_trip(self):
+        """Tests that every DVP comes back identical, with int and float values preserved."""
+        buffer = io.BytesIO()
+        BinaryLedgerWriter(buffer).write_all(self.ledger.values())
+        buffer.seek(0)
+        decoded = {dvp['id']: dvp for dvp in BinaryLedgerReader(buffer)}
+        self.assertEqual(json.dumps(decoded, sort_keys=True), json.dumps(self.ledger, sort_keys=True))
+        self.assertLess(len(buffer.getvalue()), len(json.dumps(self.ledger, separators=(',', ':'))))
+
+    def test_convert_between_formats(self):
+        """Tests JSON -> binary -> JSON conversion and format detection."""
+        json_path = os.path.join(self.tmp_dir, 'ledger.json')
+        binary_path = os.path.join(self.tmp_dir, 'ledger.slb')
+        back_path = os.path.join(self.tmp_dir, 'back.json')
+        write_ledger_file(self.ledger.values(), json_path)
+
+        self.assertEqual(convert_ledger_file(json_path, binary_path), len(self.ledger))
+        self.assertEqual(detect_format(binary_path), FORMAT_BINARY)
+        convert_ledger_file(binary_path, back_path)
+        self.assertEqual(detect_format(back_path), FORMAT_JSON)
+        self.assertEqual(load_ledger_file(back_path), self.ledger)
+        self.assertEqual(load_ledger_file(binary_path), self.ledger)
+
+    def test_rejects_bad_files(self):
+        """Tests the version check and truncated records."""
+        newer = io.BytesIO(FILE_HEADER.pack(BINARY_MAGIC, BINARY_FORMAT_VERSION + 1, 0))
+        with self.assertRaises(LedgerFormatError):
+            BinaryLedgerReader(newer)
+        with self.assertRaises(LedgerFormatError):
+            BinaryLedgerReader(io.BytesIO(b'{"a": 1}'))
+
+        buffer = io.BytesIO()
+        BinaryLedgerWriter(buffer).write_all(self.ledger.values())
+        truncated = io.BytesIO(buffer.getvalue()[:-3])
+        with self.assertRaises(LedgerFormatError):
+            list(BinaryLedgerReader(truncated))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,260 @@
+import unittest
+import asyncio
+import json
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+from unittest import mock
+from src.dvp_model import DVP, build_step_data
+from src.ledger_store import LedgerStore
+from src.ledger_daemon import LedgerDaemon, LedgerClient, DaemonError
+from src.reputation import ReputationStore
+from src.ledger_merkle import LedgerMerkle, RemoteMerkle, diff_replicas, verify_step
+from src.change_feed import ChangeFeed
+from src import sl_cli
+
+class LedgerDaemonTest(unittest.TestCase):
+
+    def setUp(self):
+        """Start a daemon on a temporary socket, running its event loop in a background thread."""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.tmp_dir, 'ledger.sock')
+        self.feed = ChangeFeed(os.path.join(self.tmp_dir, 'feed'))
+        self.store = LedgerStore(os.path.join(self.tmp_dir, 'ledger'), change_feed=self.feed)
+        self.daemon = LedgerDaemon(self.store, self.socket_path, feed=self.feed)
+        self.loop = asyncio.new_event_loop()
+        self.task = self.loop.create_task(self.daemon.serve_forever())
+        self.thread = threading.Thread(target=self._run_loop)
+        self.thread.start()
+        deadline = time.time() + 5
+        while not os.path.exists(self.socket_path):
+            self.assertLess(time.time(), deadline, "daemon did not start")
+            time.sleep(0.01)
+
+    def _run_loop(self):
+        try:
+            self.loop.run_until_complete(self.task)
+        except asyncio.CancelledError:
+            pass
+
+    def tearDown(self):
+        self.loop.call_soon_threadsafe(self.task.cancel)
+        self.thread.join()
+        self.loop.close()
+        self.store.close()
+        self.feed.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def _add_step(self, client, dvp_id, score_change):
+        return client.request("add_step", dvp_id=dvp_id, process_type="FunctionalAudit",
+                              agent_did="did:synergy:ffg-node-a", score_change=score_change,
+                              attestation_uri="uri:audit")
+
+    def test_round_trips(self):
+        """Tests create, add_step, status, query and steps through the socket protocol."""
+        with LedgerClient(self.socket_path) as client:
+            self.assertEqual(client.request("ping"), "pong")
+            dvp_id = client.request("create", claim_text="Daemon claim", agent_karma=0)['id']
+            result = self._add_step(client, dvp_id[:12], 0.10)
+            self.assertEqual(result['id'], dvp_id)
+            self.assertAlmostEqual(result['current_confidence'], 0.6)
+
+            status = client.request("status", dvp_id=dvp_id)
+            self.assertEqual(len(status['lineage']), 1)
+            self.assertEqual(status, self.store.get(dvp_id))
+
+            matches = client.request("query", min_confidence=0.55)
+            self.assertEqual(matches, [{"id": dvp_id, "current_confidence": status['current_confidence']}])
+            self.assertEqual(client.request("query", max_confidence=0.5), [])
+            self.assertEqual(client.request("query", agent_did="did:synergy:ffg-node-a"), matches)
+            self.assertEqual(client.request("query", process_type="OSD_Win"), [])
+            steps = client.request("steps", process_type="FunctionalAudit", limit=5)
+            self.assertEqual(steps, [{"dvp_id": dvp_id, "step": status['lineage'][0]}])
+
+            step_time = status['lineage'][0]['timestamp']
+            self.assertEqual(client.request("as_of", as_of=step_time, dvp_id=dvp_id[:12]),
+                             {"id": dvp_id, "confidence": 0.5})
+            self.assertEqual(client.request("as_of", as_of="9999", min_confidence=0.55),
+                             [{"id": dvp_id, "confidence": status['current_confidence']}])
+            self.assertEqual(client.request("as_of", as_of=status['created_at']), [])
+
+    def test_concurrent_clients_on_one_dvp(self):
+        """Tests that steps sent to one DVP from several connections are all kept, in distinct positions."""
+        with LedgerClient(self.socket_path) as client:
+            dvp_id = client.request("create", claim_text="Contended daemon claim")['id']
+
+        errors = []
+
+        def worker():
+            try:
+                with LedgerClient(self.socket_path) as client:
+                    for _ in range(10):
+                        self._add_step(client, dvp_id, 0.01)
+            except Exception as e:
+                errors.append(e)
+
+        workers = [threading.Thread(target=worker) for _ in range(4)]
+        for worker_thread in workers:
+            worker_thread.start()
+        for worker_thread in workers:
+            worker_thread.join()
+
+        self.assertEqual(errors, [])
+        lineage = self.store.get(dvp_id)['lineage']
+        self.assertEqual(len(lineage), 40)
+        self.assertEqual(len({step['step_id'] for step in lineage}), 40)
+
+    def test_malformed_requests_get_error_responses(self):
+        """Tests that bad requests are answered with ok=false and leave the connection usable."""
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(self.socket_path)
+            reader = sock.makefile('rb')
+            for request in (b'not json\n', b'[1, 2]\n', b'{"op": "explode"}\n',
+                            b'{"op": "status", "dvp_id": 5}\n', b'{"op": "create"}\n',
+                            b'{"op": "add_step", "dvp_id": "ab", "process_type": 1}\n'):
+                sock.sendall(request)
+                response = json.loads(reader.readline())
+                self.assertFalse(response['ok'], request)
+                self.assertIsInstance(response['error'], str)
+            sock.sendall(b'{"op": "ping"}\n')
+            self.assertEqual(json.loads(reader.readline()), {"ok": True, "result": "pong"})
+            reader.close()
+
+        with LedgerClient(self.socket_path) as client:
+            with self.assertRaises(DaemonError):
+                client.request("status", dvp_id="0" * 64)
+            with self.assertRaises(DaemonError):
+                client.request("query", limit="all")
+
+    def test_queries_stream_every_match(self):
+        """Tests that query, steps and as_of return every match, in batches of STREAM_BATCH_RESULTS, unless limited."""
+        with LedgerClient(self.socket_path) as client:
+            ids = [client.request("create", claim_text=f"Streamed claim {i}")['id'] for i in range(120)]
+            for dvp_id in ids[:3]:
+                self._add_step(client, dvp_id, 0.01)
+            with mock.patch('src.ledger_daemon.STREAM_BATCH_RESULTS', 50):
+                self.assertEqual(sorted(match['id'] for match in client.request("query")), sorted(ids))
+                self.assertEqual(len(list(client.stream("query", limit=101))), 101)
+                self.assertEqual([step['dvp_id'] for step in client.stream("steps")], ids[:3])
+                self.assertEqual(client.request("ping"), "pong") # The connection is usable after a stream
+                self.assertEqual(len(list(sl_cli.query_daemon(client, {"min_confidence": 0.0}))), 120)
+                self.assertEqual(len(list(sl_cli.query_daemon(client, {}, steps=True))), 3)
+                self.assertEqual(len(list(sl_cli.as_of_daemon(client, "9999", {}))), 120)
+                self.assertEqual(len(list(sl_cli.as_of_daemon(client, "9999", {"min_confidence": 0.505}))), 3)
+
+                with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                    sock.connect(self.socket_path)
+                    reader = sock.makefile('rb')
+                    sock.sendall(b'{"op": "query"}\n')
+                    lines = [json.loads(reader.readline()) for _ in range(3)]
+                    reader.close()
+            self.assertEqual([len(line.get('partial', line.get('result'))) for line in lines], [50, 50, 20])
+            self.assertEqual(['partial' in line for line in lines], [True, True, False])
+
+    def test_failed_commit_is_reported(self):
+        """Tests that an fsync failure in the group commit becomes an error response."""
+        with LedgerClient(self.socket_path) as client:
+            with mock.patch.object(self.store, 'commit', side_effect=OSError("disk full")):
+                with self.assertRaises(DaemonError) as raised:
+                    client.request("create", claim_text="Unlucky claim")
+            self.assertIn("disk full", str(raised.exception))
+            self.assertEqual(client.request("ping"), "pong")
+
+    def test_reputation_weights_steps(self):
+        """Tests that with reputation enabled, an agent's earlier contributions raise its K-Factor."""
+        with LedgerClient(self.socket_path) as client:
+            with self.assertRaises(DaemonError):
+                client.request("karma", agent_did="did:synergy:ffg-node-a")
+            self.daemon.reputation = ReputationStore()
+            self.store.add_listener(self.daemon.reputation)
+            dvp_id = client.request("create", claim_text="Karma claim")['id']
+            for _ in range(2):
+                self._add_step(client, dvp_id, 0.01)
+            self.assertEqual(client.request("karma", agent_did="did:synergy:ffg-node-a")['karma'], 2)
+
+        lineage = self.store.get(dvp_id)['lineage']
+        self.assertEqual(lineage[0]['k_factor_applied'], 1)
+        self.assertGreater(lineage[1]['k_factor_applied'], 1)
+
+    def test_reputation_follows_other_writers(self):
+        """Tests that Karma covers steps already in the ledger and steps written by another process."""
+        with LedgerClient(self.socket_path) as client:
+            dvp_id = client.request("create", claim_text="Shared karma claim")['id']
+            self._add_step(client, dvp_id, 0.01)
+        self.daemon.reputation = ReputationStore()
+        self.store.add_listener(self.daemon.reputation) # As LedgerDaemon(reputation=...) registers it
+
+        with LedgerStore(self.store.path) as batch:
+            def build_step(dvp_data):
+                dvp = DVP.from_json(dvp_data)
+                step = build_step_data(dvp_id, len(dvp.lineage), "FunctionalAudit", "did:synergy:batch", 0.02, "uri:batch")
+                dvp.add_lineage_step(step)
+                return step, dvp.current_confidence
+            batch.update(dvp_id, build_step)
+            batch.commit()
+
+        with LedgerClient(self.socket_path) as client:
+            self.assertEqual(client.request("karma", agent_did="did:synergy:ffg-node-a")['karma'], 1)
+            self.assertEqual(client.request("karma", agent_did="did:synergy:batch")['karma'], 1)
+            self._add_step(client, dvp_id, 0.01)
+            self.assertEqual(client.request("karma", agent_did="did:synergy:ffg-node-a")['karma'], 2)
+
+    def test_duplicate_claims(self):
+        """Tests that a resubmitted claim returns or extends the existing DVP unless a new one is asked for."""
+        with LedgerClient(self.socket_path) as client:
+            first = client.request("create", claim_text="Duplicate claim")
+            self.assertTrue(first['created'])
+            self.assertEqual(client.request("create", claim_text="duplicate  CLAIM!"), {"id": first['id'], "created": False})
+            extended = client.request("create", claim_text="Duplicate claim", on_duplicate="extend", agent_did="did:x")
+            self.assertEqual((extended['id'], extended['created']), (first['id'], False))
+            self.assertEqual(self.store.get(first['id'])['lineage'][0]['agent_did'], "did:x")
+            second = client.request("create", claim_text="Duplicate claim", on_duplicate="create")
+            self.assertNotEqual(second['id'], first['id'])
+            similar = client.request("create", claim_text="A duplicate claim")['similar']
+            self.assertEqual({match['id'] for match in similar}, {first['id'], second['id']})
+            with self.assertRaises(DaemonError):
+                client.request("create", claim_text="Duplicate claim", on_duplicate="merge")
+
+    def test_merkle_sync_and_proofs(self):
+        """Tests comparing a replica against the daemon's Merkle tree and verifying a served step proof."""
+        with LedgerClient(self.socket_path) as client:
+            dvp_id = client.request("create", claim_text="Merkle claim")['id']
+            self._add_step(client, dvp_id, 0.05)
+            replica = LedgerMerkle({})
+            self.assertEqual(diff_replicas(replica, RemoteMerkle(client))[0], [dvp_id])
+            replica.reset({dvp_id: self.store.get(dvp_id)})
+            self.assertEqual(diff_replicas(replica, RemoteMerkle(client)), ([], 1))
+
+            served = client.request("step_proof", dvp_id=dvp_id[:12], position=0)
+            self.assertEqual(served['root'], client.request("merkle_root"))
+            self.assertTrue(verify_step(self.store.get(dvp_id)['lineage'][0], served['proof'], served['root']))
+            with self.assertRaises(DaemonError):
+                client.request("step_proof", dvp_id=dvp_id, position=1)
+
+    def test_change_feed_subscription(self):
+        """Tests that a subscriber receives each create and step in order, live and from an earlier offset."""
+        with LedgerClient(self.socket_path) as client, LedgerClient(self.socket_path) as subscriber:
+            dvp_id = client.request("create", claim_text="Feed claim")['id']
+            live = subscriber.subscribe()
+            received = []
+            reader = threading.Thread(target=lambda: received.extend(next(live) for _ in range(2)))
+            reader.start()
+            time.sleep(0.1) # Let the subscription start at the next event
+            self._add_step(client, dvp_id, 0.10)
+            self._add_step(client, dvp_id, -0.05)
+            reader.join(5)
+            self.assertEqual([(event['seq'], event['op']) for event in received], [(1, "step"), (2, "step")])
+            self.assertEqual([event['step'] for event in received], self.store.get(dvp_id)['lineage'])
+
+        with LedgerClient(self.socket_path) as subscriber:
+            replay = subscriber.subscribe(from_seq=0)
+            first = next(replay)
+            self.assertEqual((first['seq'], first['op'], first['dvp']['claim_text']), (0, "create", "Feed claim"))
+        with LedgerClient(self.socket_path) as subscriber, self.assertRaises(DaemonError):
+            next(subscriber.subscribe(from_seq=-1))
+
+if __name__ == '__main__':
+    unittest.main()
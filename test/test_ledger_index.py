@@ -0,0 +1,115 @@
+import unittest
+import os
+import shutil
+import tempfile
+from src.dvp_model import DVP, build_step_data
+from src.ledger_store import LedgerStore
+from src.ledger_index import LedgerIndex
+from src.sl_cli import _parse_query_args, query_ledger
+
+AGENT_A = "did:synergy:ffg-node-a"
+AGENT_B = "did:synergy:ffg-node-b"
+
+class LedgerIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        """Create a store with an index listening to it for each test."""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.store_path = os.path.join(self.tmp_dir, 'ledger')
+        self.store = LedgerStore(self.store_path)
+        self.index = LedgerIndex()
+        self.store.add_listener(self.index)
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def _create(self, store, claim_text, created_at):
+        dvp = DVP(claim_text=claim_text)
+        dvp.created_at = created_at
+        store.append_create(dict(dvp.to_json(), lineage=[]))
+        return dvp
+
+    def _add_step(self, store, dvp, process_type, agent_did, score_change, timestamp):
+        current = DVP.from_json(store.get(dvp.id))
+        step = build_step_data(dvp.id, len(current.lineage), process_type, agent_did, score_change, "uri:test")
+        current.add_lineage_step(step)
+        step['timestamp'] = timestamp
+        store.append_step(dvp.id, step, current.current_confidence)
+        dvp.current_confidence = current.current_confidence
+
+    def _populate(self, store):
+        first = self._create(store, "First claim", "2026-02-01T09:00:00.000000Z")
+        second = self._create(store, "Second claim", "2026-02-03T09:00:00.000000Z")
+        third = self._create(store, "Third claim", "2026-02-05T09:00:00.000000Z")
+        self._add_step(store, first, "OSD_Win", AGENT_A, 0.40, "2026-02-01T10:00:00.000000Z")
+        self._add_step(store, second, "MaliciousAttestation", AGENT_B, -0.30, "2026-02-03T10:00:00.000000Z")
+        self._add_step(store, third, "OSD_Win", AGENT_B, 0.20, "2026-02-05T10:00:00.000000Z")
+        self._add_step(store, second, "FunctionalAudit", AGENT_A, 0.05, "2026-02-06T10:00:00.000000Z")
+        return first, second, third
+
+    def _ids(self, dvps):
+        return [dvp['id'] for dvp in dvps]
+
+    def test_queries_follow_each_write(self):
+        """Tests that every index reflects creates and steps as they are appended."""
+        first, second, third = self._populate(self.store)
+
+        self.assertEqual(list(self.index.dvps_by_agent(AGENT_A)), [first.id, second.id])
+        self.assertEqual(self._ids(self.index.query(agent_did=AGENT_B)), [second.id, third.id])
+        self.assertEqual([(dvp_id, step['agent_did']) for dvp_id, step in self.index.steps("MaliciousAttestation")],
+                         [(second.id, AGENT_B)])
+        self.assertEqual(self._ids(self.index.query(min_confidence=0.8)), [first.id])
+        self.assertEqual(list(self.index.dvps_by_confidence(descending=True)),
+                         [(first.id, 0.9), (third.id, 0.7), (second.id, second.current_confidence)])
+        self.assertEqual(self._ids(self.index.query(created_after="2026-02-03", created_before="2026-02-05")),
+                         [second.id])
+        self.assertEqual([dvp_id for dvp_id, _ in self.index.steps(start="2026-02-05")], [third.id, second.id])
+        self.assertEqual(self._ids(self.index.query(agent_did=AGENT_A, min_confidence=0.5)), [first.id])
+
+    def test_out_of_order_step_is_sorted_in(self):
+        """Tests that a step with an earlier timestamp is inserted at its place in the time index."""
+        first, second, third = self._populate(self.store)
+        self._add_step(self.store, first, "FunctionalAudit", AGENT_B, 0.01, "2026-02-02T00:00:00.000000Z")
+        self.assertEqual([step['timestamp'][:10] for _, step in self.index.steps(start="2026-02-01", end="2026-02-04")],
+                         ["2026-02-01", "2026-02-02", "2026-02-03"])
+
+    def test_reset_on_reload_and_catch_up(self):
+        """Tests that an index built on reopen matches, and follows writes from another store."""
+        first, second, third = self._populate(self.store)
+        self.store.close()
+
+        reader = LedgerStore(self.store_path)
+        index = LedgerIndex()
+        reader.add_listener(index)
+        self.assertEqual(list(index.dvps_by_agent(AGENT_A)), [first.id, second.id])
+
+        with LedgerStore(self.store_path) as writer:
+            fourth = self._create(writer, "Fourth claim", "2026-02-07T09:00:00.000000Z")
+            self._add_step(writer, fourth, "OSD_Win", AGENT_A, 0.10, "2026-02-07T10:00:00.000000Z")
+        reader.refresh()
+        self.assertEqual(list(index.dvps_by_agent(AGENT_A)), [first.id, second.id, fourth.id])
+        self.assertEqual(self._ids(index.query(created_after="2026-02-07")), [fourth.id])
+        reader.close()
+        self.store = LedgerStore(self.store_path)
+
+    def test_cli_query(self):
+        """Tests query option parsing and that the CLI query streams matches up to --limit."""
+        first, second, third = self._populate(self.store)
+        filters, steps = _parse_query_args(["--agent", AGENT_B, "--min-confidence", "0.1", "--limit", "1"])
+        self.assertEqual(filters, {"agent_did": AGENT_B, "min_confidence": 0.1, "limit": 1})
+        self.assertFalse(steps)
+        self.assertEqual(list(query_ledger(filters, store=self.store)),
+                         [{"id": second.id, "current_confidence": second.current_confidence}])
+
+        filters, steps = _parse_query_args(["--process-type", "OSD_Win", "--since", "2026-02-02", "--steps"])
+        self.assertTrue(steps)
+        self.assertEqual([result['dvp_id'] for result in query_ledger(filters, steps, store=self.store)], [third.id])
+
+        for bad in (["--limit", "0"], ["--min-confidence", "nan"], ["--agent"], ["--bogus", "1"],
+                    ["--steps", "--max-confidence", "0.5"]):
+            with self.assertRaises(ValueError):
+                _parse_query_args(bad)
+
+if __name__ == '__main__':
+    unittest.main()
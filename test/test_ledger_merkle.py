@@ -0,0 +1,94 @@
+import unittest
+import copy
+import os
+import shutil
+import tempfile
+from src.dvp_model import DVP, build_step_data
+from src.ledger_store import LedgerStore
+from src.ledger_merkle import (BUCKET_BITS, LedgerMerkle, LineageTree, diff_replicas, leaf_hash,
+                               lineage_root_from_path, node_hash, verify_step)
+
+def _reference_root(leaves):
+    """RFC 6962 MTH computed recursively from scratch."""
+    if len(leaves) == 1:
+        return leaves[0]
+    k = 1 << ((len(leaves) - 1).bit_length() - 1)
+    return node_hash(_reference_root(leaves[:k]), _reference_root(leaves[k:]))
+
+def _steps(count):
+    return [build_step_data("dvp", i, "PeerReview", f"did:synergy:node-{i % 3}", 0.01, f"uri:vc/{i}")
+            for i in range(count)]
+
+class LedgerMerkleTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.store = LedgerStore(os.path.join(self.tmp_dir, 'ledger'))
+        self.merkle = LedgerMerkle()
+        self.store.add_listener(self.merkle)
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def _populate(self, dvps=20, steps=3):
+        ids = []
+        for i in range(dvps):
+            dvp = DVP(claim_text=f"Claim {i}")
+            self.store.append_create(dict(dvp.to_json(), lineage=[]))
+            for step in _steps(steps):
+                dvp.add_lineage_step(step)
+                self.store.append_step(dvp.id, step, dvp.current_confidence)
+            ids.append(dvp.id)
+        return ids
+
+    def test_incremental_lineage_root_and_audit_paths(self):
+        """Tests every lineage size against a from-scratch root, and every audit path against it."""
+        steps = _steps(40)
+        tree = LineageTree()
+        for size, step in enumerate(steps, 1):
+            tree.append(step)
+            leaves = [leaf_hash(s) for s in steps[:size]]
+            root = _reference_root(leaves)
+            self.assertEqual(tree.root(), root)
+            for position in range(size):
+                path = tree.audit_path(position)
+                self.assertEqual(lineage_root_from_path(leaves[position], position, size, path), root)
+                self.assertNotEqual(lineage_root_from_path(leaves[position - 1], position, size, path)
+                                    if size > 1 else None, root)
+
+    def test_ledger_root_follows_store_and_matches_dvp(self):
+        """Tests that incremental updates give the root of a full rehash and the DVP's own root."""
+        ids = self._populate()
+        dvp = DVP.from_json(self.store.get(ids[0]))
+        self.assertEqual(self.merkle.dvp_root(ids[0]), dvp.merkle_root())
+        before = self.merkle.root()
+        step = build_step_data(dvp.id, len(dvp.lineage), "FinalApproval", "did:synergy:eig-lead", 0.05, "uri:vc/x")
+        dvp.add_lineage_step(step)
+        self.store.append_step(dvp.id, step, dvp.current_confidence)
+        self.assertNotEqual(self.merkle.root(), before)
+        self.assertEqual(self.merkle.dvp_root(ids[0]), dvp.merkle_root())
+        self.assertEqual(self.merkle.root(), LedgerMerkle(self.store.load()).root())
+
+    def test_replica_diff_and_step_proof(self):
+        """Tests finding tampered and missing DVPs, and verifying a step proof against the root."""
+        ids = self._populate(dvps=200, steps=2)
+        replica = copy.deepcopy(self.store.load())
+        replica[ids[5]]['lineage'][1]['result_score_change'] = 0.5 # Tampered step
+        replica[ids[9]]['current_confidence'] = 0.99 # Tampered header
+        del replica[ids[17]]
+        differing, received = diff_replicas(self.merkle, LedgerMerkle(replica))
+        self.assertEqual(differing, sorted([ids[5], ids[9], ids[17]]))
+        self.assertLess(received, 3 * 2 * BUCKET_BITS + 20) # Not the 200 DVPs
+        self.assertEqual(diff_replicas(self.merkle, LedgerMerkle(copy.deepcopy(self.store.load()))), ([], 1))
+
+        root = self.merkle.root()
+        step = self.store.get(ids[5])['lineage'][1]
+        proof = self.merkle.prove_step(ids[5], 1)
+        self.assertTrue(verify_step(step, proof, root))
+        self.assertFalse(verify_step(replica[ids[5]]['lineage'][1], proof, root))
+        self.assertFalse(verify_step(step, proof, LedgerMerkle(replica).root()))
+        self.assertFalse(verify_step(step, dict(proof, position=0), root))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,217 @@
+import unittest
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+from unittest import mock
+from src.dvp_model import DVP, build_step_data
+from src.ledger_store import LedgerStore, AmbiguousIdError, VersionConflictError
+
+def _concurrent_writer(store_path, dvp_id, steps):
+    """Adds lineage steps to one DVP through optimistic updates (runs in a child process)."""
+    with LedgerStore(store_path, min_compact_bytes=2048) as store:
+        for _ in range(steps):
+            def build_step(dvp_data):
+                dvp = DVP.from_json(dvp_data)
+                step = build_step_data(dvp_id, len(dvp.lineage), "FunctionalAudit", "did:synergy:ffg-node-a", 0.01, "uri:audit")
+                dvp.add_lineage_step(step)
+                return step, dvp.current_confidence
+            store.update(dvp_id, build_step)
+
+class LedgerStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        """Create an empty store directory for each test."""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.store_path = os.path.join(self.tmp_dir, 'ledger')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _add_step(self, store, dvp_id, score_change):
+        dvp = DVP.from_json(store.get(dvp_id))
+        step = {
+            "step_id": f"audit-{dvp_id}-{len(dvp.lineage) + 1}",
+            "process_type": "FunctionalAudit",
+            "agent_did": "did:synergy:ffg-node-a",
+            "result_score_change": score_change,
+            "attestation_vc_uri": "uri:audit"
+        }
+        dvp.add_lineage_step(step)
+        store.append_step(dvp_id, step, dvp.current_confidence)
+        return dvp
+
+    def test_log_replay_rebuilds_state(self):
+        """Tests that creates and steps appended to the log survive a reopen."""
+        dvp = DVP(claim_text="Replay claim", agent_karma=0)
+        with LedgerStore(self.store_path) as store:
+            store.append_create(dvp.to_json())
+            self._add_step(store, dvp.id, 0.10)
+            expected = self._add_step(store, dvp.id, -0.05)
+
+        with LedgerStore(self.store_path) as store:
+            self.assertEqual(store.get(dvp.id), expected.to_json())
+
+    def test_compaction_preserves_state(self):
+        """Tests that compaction folds the log into a snapshot without losing writes."""
+        with LedgerStore(self.store_path, auto_compact=False) as store:
+            ids = []
+            for i in range(20):
+                dvp = DVP(claim_text=f"Claim {i}")
+                store.append_create(dvp.to_json())
+                ids.append(dvp.id)
+            self._add_step(store, ids[0], 0.10)
+            before = json.loads(json.dumps(store.load()))
+            store.compact()
+            self._add_step(store, ids[1], 0.05)
+            before[ids[1]] = store.get(ids[1])
+
+        with LedgerStore(self.store_path) as store:
+            self.assertEqual(store.load(), before)
+        segments = [name for name in os.listdir(self.store_path) if name.endswith('.log')]
+        self.assertEqual(len(segments), 1)
+
+    def test_torn_record_is_discarded(self):
+        """Tests that a partially written final record does not corrupt the ledger."""
+        dvp = DVP(claim_text="Torn write claim")
+        with LedgerStore(self.store_path) as store:
+            store.append_create(dvp.to_json())
+        segment = [name for name in os.listdir(self.store_path) if name.endswith('.log')][0]
+        with open(os.path.join(self.store_path, segment), 'ab') as f:
+            f.write(b'{"op":"step","id":"')
+
+        with LedgerStore(self.store_path) as store:
+            self.assertEqual(len(store), 1)
+            self._add_step(store, dvp.id, 0.10)
+        with LedgerStore(self.store_path) as store:
+            self.assertEqual(len(store.get(dvp.id)['lineage']), 1)
+
+    def test_legacy_json_import(self):
+        """Tests that an existing whole-file JSON ledger seeds an empty store."""
+        dvp = DVP(claim_text="Legacy claim")
+        legacy_path = os.path.join(self.tmp_dir, 'ledger.json')
+        with open(legacy_path, 'w') as f:
+            json.dump({dvp.id: dvp.to_json()}, f, indent=2)
+
+        with LedgerStore(self.store_path, legacy_path=legacy_path) as store:
+            self.assertEqual(store.get(dvp.id), dvp.to_json())
+
+    def test_point_lookup_matches_full_load(self):
+        """Tests that indexed point reads return the same DVP as a full replay."""
+        with LedgerStore(self.store_path, auto_compact=False) as store:
+            ids = []
+            for i in range(10):
+                dvp = DVP(claim_text=f"Indexed claim {i}")
+                store.append_create(dvp.to_json())
+                ids.append(dvp.id)
+            self._add_step(store, ids[3], 0.10)
+            store.compact()
+            self._add_step(store, ids[3], -0.05)
+            self._add_step(store, ids[7], 0.05)
+
+        with LedgerStore(self.store_path) as store:
+            point_reads = {dvp_id: store.get(dvp_id) for dvp_id in ids}
+            self.assertIsNone(store.get('0' * 64))
+            self.assertEqual(point_reads, store.load())
+            self.assertEqual(len(point_reads[ids[3]]['lineage']), 2)
+
+    def test_index_rebuilt_after_crash(self):
+        """Tests that a segment index missing its last entries is rebuilt on open."""
+        dvp = DVP(claim_text="Index repair claim")
+        with LedgerStore(self.store_path) as store:
+            store.append_create(dvp.to_json())
+            self._add_step(store, dvp.id, 0.10)
+        index = [name for name in os.listdir(self.store_path) if name.endswith('.log.idx')][0]
+        with open(os.path.join(self.store_path, index), 'rb+') as f:
+            f.truncate(10)
+
+        with LedgerStore(self.store_path) as store:
+            self.assertEqual(len(store.get(dvp.id)['lineage']), 1)
+
+    def test_resolve_id_prefix(self):
+        """Tests git-style lookup by unique id prefix."""
+        with LedgerStore(self.store_path, auto_compact=False) as store:
+            dvps = [DVP(claim_text=f"Prefix claim {i}") for i in range(40)]
+            for dvp in dvps[:20]:
+                store.append_create(dvp.to_json())
+            store.compact()
+            for dvp in dvps[20:]:
+                store.append_create(dvp.to_json())
+
+        with LedgerStore(self.store_path) as store:
+            for dvp in (dvps[0], dvps[30]):
+                self.assertEqual(store.resolve_id(dvp.id[:12]), dvp.id)
+            self.assertEqual(store.resolve_id(dvps[5].id), dvps[5].id)
+            for invalid in ('not-hex', '0x1a', '1_a', ' 1a', ''):
+                self.assertIsNone(store.resolve_id(invalid))
+            first_chars = [dvp.id[0] for dvp in dvps]
+            shared = next(c for c in first_chars if first_chars.count(c) > 1)
+            with self.assertRaises(AmbiguousIdError):
+                store.resolve_id(shared)
+
+    def test_stale_version_is_rejected(self):
+        """Tests that a compare-and-swap append fails when another writer got there first."""
+        dvp = DVP(claim_text="Versioned claim")
+        with LedgerStore(self.store_path) as store, LedgerStore(self.store_path) as other:
+            store.append_create(dvp.to_json())
+            store.load()
+            self._add_step(other, dvp.id, 0.10)
+            step = build_step_data(dvp.id, 0, "FunctionalAudit", "did:synergy:test", 0.05, "uri:stale")
+            with self.assertRaises(VersionConflictError):
+                store.append_step(dvp.id, step, 0.55, expected_version=0)
+            # The in-memory ledger picks up the other process' step before checking.
+            self.assertEqual(store.version(dvp.id), 1)
+
+    def test_writer_follows_repeated_foreign_compactions(self):
+        """Tests that a writer idle across two compactions by another process does not append to a dead segment."""
+        first, late = DVP(claim_text="Before compactions"), DVP(claim_text="After compactions")
+        with LedgerStore(self.store_path, auto_compact=False) as store, \
+                LedgerStore(self.store_path, auto_compact=False) as other:
+            store.append_create(first.to_json())
+            other.compact()
+            other.append_create(DVP(claim_text="Between compactions").to_json())
+            other.compact()
+            store.append_create(late.to_json())
+
+        with LedgerStore(self.store_path) as store:
+            self.assertIsNotNone(store.get(first.id))
+            self.assertIsNotNone(store.get(late.id))
+            self.assertEqual(len(store.load()), 3)
+
+    def test_own_compaction_keeps_memory_state(self):
+        """Tests that compacting does not force a full reload of an in-memory ledger."""
+        dvp = DVP(claim_text="Resident claim")
+        with LedgerStore(self.store_path, auto_compact=False) as store:
+            store.append_create(dvp.to_json())
+            state = store.load()
+            with mock.patch.object(store, '_reload_state', wraps=store._reload_state) as reload:
+                store.compact()
+                self._add_step(store, dvp.id, 0.10)
+                store.compact()
+                self.assertEqual(reload.call_count, 0)
+            self.assertIs(store.load(), state)
+            self.assertEqual(len(state[dvp.id]['lineage']), 1)
+
+    def test_concurrent_writers_lose_no_steps(self):
+        """Tests that processes adding steps to the same DVP never overwrite each other."""
+        dvp = DVP(claim_text="Contended claim")
+        with LedgerStore(self.store_path) as store:
+            store.append_create(dvp.to_json())
+
+        writers = [multiprocessing.Process(target=_concurrent_writer, args=(self.store_path, dvp.id, 25))
+                   for _ in range(4)]
+        for writer in writers:
+            writer.start()
+        for writer in writers:
+            writer.join()
+            self.assertEqual(writer.exitcode, 0)
+
+        with LedgerStore(self.store_path) as store:
+            lineage = store.get(dvp.id)['lineage']
+            self.assertEqual(len(lineage), 100)
+            self.assertEqual(len({step['step_id'] for step in lineage}), 100)
+            self.assertEqual(store.load()[dvp.id]['lineage'], lineage)
+
+if __name__ == '__main__':
+    unittest.main()
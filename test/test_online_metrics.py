@@ -0,0 +1,61 @@
+import unittest
+import math
+import numpy as np
+import pandas as pd
+from backtesting_framework import calculate_performance_metrics, compute_performance_metrics
+from online_metrics import PerformanceAccumulator
+
+class PerformanceAccumulatorTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(12)
+        # Long enough to have several new highs and drawdowns, starting with a loss
+        self.returns = np.r_[-0.03, rng.normal(0.001, 0.02, 999)]
+
+    def assertMetricsEqual(self, actual, expected):
+        self.assertEqual(set(actual), set(expected))
+        for key in expected:
+            if math.isnan(expected[key]):
+                self.assertTrue(math.isnan(actual[key]), key)
+            else:
+                self.assertAlmostEqual(actual[key], expected[key], delta=1e-9 * max(1.0, abs(expected[key])), msg=key)
+
+    def test_matches_batch_function(self):
+        """Tests that one update per return gives the batch metrics at every prefix length checked."""
+        accumulator = PerformanceAccumulator()
+        for i, daily_return in enumerate(self.returns, start=1):
+            accumulator.update(daily_return)
+            if i in (1, 2, 3, 10, 500, len(self.returns)):
+                self.assertMetricsEqual(accumulator.snapshot(), compute_performance_metrics(pd.Series(self.returns[:i])))
+        self.assertEqual(accumulator.formatted(), calculate_performance_metrics(pd.Series(self.returns)))
+        self.assertMetricsEqual(PerformanceAccumulator().snapshot(), compute_performance_metrics(pd.Series([], dtype=float)))
+
+    def test_merged_shards_match_whole_stream(self):
+        """Tests that merging accumulators over consecutive shards equals one accumulator over all returns."""
+        expected = compute_performance_metrics(pd.Series(self.returns))
+        for cuts in ([500], [1, 2, 3], [100, 101, 700], [250, 500, 750]):
+            shards = np.split(self.returns, cuts)
+            merged = PerformanceAccumulator()
+            for shard in shards:
+                accumulator = PerformanceAccumulator()
+                for daily_return in shard:
+                    accumulator.update(daily_return)
+                merged.merge(accumulator)
+            self.assertMetricsEqual(merged.snapshot(), expected)
+
+            # Vectorized shard construction, and updates continuing after a merge
+            merged = PerformanceAccumulator()
+            for shard in shards[:-1]:
+                merged.update_many(shard)
+            for daily_return in shards[-1]:
+                merged.update(daily_return)
+            self.assertMetricsEqual(merged.snapshot(), expected)
+
+    def test_drawdown_spanning_shards(self):
+        """Tests a drawdown whose peak is in one shard and trough in a later one that also sets new highs."""
+        returns = np.array([0.10, -0.05, 0.02, -0.20, 0.05, 0.40, -0.30, 0.10])
+        first, second = PerformanceAccumulator.from_returns(returns[:3]), PerformanceAccumulator.from_returns(returns[3:])
+        self.assertMetricsEqual(first.merge(second).snapshot(), compute_performance_metrics(pd.Series(returns)))
+
+if __name__ == '__main__':
+    unittest.main()
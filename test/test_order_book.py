@@ -0,0 +1,126 @@
+import unittest
+import numpy as np
+from order_book import MatchingSimulator, OrderBook, OrderBookGap
+
+def _snapshot(update_id=100):
+    return {"lastUpdateId": update_id, "E": 0,
+            "bids": [["99.0", "2"], ["98.0", "5"], ["97.0", "1"]],
+            "asks": [["101.0", "1"], ["102.0", "3"], ["103.0", "4"]]}
+
+def _diff(first, final, time, bids=(), asks=()):
+    return {"e": "depthUpdate", "E": time, "U": first, "u": final,
+            "b": [[str(p), str(q)] for p, q in bids], "a": [[str(p), str(q)] for p, q in asks]}
+
+def _trade(time, price, quantity, buyer_is_maker):
+    return {"e": "trade", "E": time, "T": time, "p": str(price), "q": str(quantity), "m": buyer_is_maker}
+
+class OrderBookTest(unittest.TestCase):
+
+    def test_matches_brute_force_book(self):
+        """Tests best levels and depth against a plain dict book over random diffs."""
+        rng = np.random.default_rng(3)
+        book = OrderBook()
+        book.apply_snapshot({"lastUpdateId": 0, "bids": [], "asks": []})
+        reference = {"bid": {}, "ask": {}}
+        for update in range(1, 2000):
+            bids, asks = [], []
+            for _ in range(5):
+                side = rng.integers(2)
+                price = float(rng.integers(90, 100) if side == 0 else rng.integers(100, 110))
+                quantity = float(rng.choice([0, 0, 1, 2.5]))
+                (bids if side == 0 else asks).append((price, quantity))
+                levels = reference["bid" if side == 0 else "ask"]
+                if quantity:
+                    levels[price] = quantity
+                else:
+                    levels.pop(price, None)
+            self.assertTrue(book.apply_diff(_diff(update, update, update, bids, asks)))
+            for side, reverse in (("bid", True), ("ask", False)):
+                expected = sorted(reference[side].items(), reverse=reverse)[:3]
+                self.assertEqual(book.depth(side, 3), expected)
+        self.assertEqual(book.best_bid(), max(reference["bid"].items()) if reference["bid"] else None)
+
+    def test_update_sequence(self):
+        """Tests that stale diffs are dropped and that gaps raise (spot and futures rules)."""
+        book = OrderBook()
+        book.apply_snapshot(_snapshot(100))
+        self.assertFalse(book.apply_diff(_diff(95, 100, 1, bids=[(99.0, 0)])))
+        self.assertEqual(book.best_bid(), (99.0, 2.0))
+        with self.assertRaises(OrderBookGap):
+            book.apply_diff(_diff(103, 105, 2)) # Does not cover update 101
+        self.assertTrue(book.apply_diff(_diff(98, 105, 2, bids=[(99.0, 0)])))
+        self.assertEqual(book.best_bid(), (98.0, 5.0))
+        self.assertTrue(book.apply_diff(_diff(106, 110, 3, asks=[(100.5, 1)])))
+        self.assertEqual(book.spread(), 2.5)
+        with self.assertRaises(OrderBookGap):
+            book.apply_diff(_diff(112, 115, 4))
+
+        book.apply_snapshot(_snapshot(200))
+        self.assertTrue(book.apply_diff(dict(_diff(190, 200, 5), pu=189)))
+        with self.assertRaises(OrderBookGap):
+            book.apply_diff(dict(_diff(202, 210, 6), pu=201))
+
+class MatchingSimulatorTest(unittest.TestCase):
+
+    def _simulator(self, latency_ms=10):
+        simulator = MatchingSimulator(latency_ms=latency_ms, maker_fee_rate=0.0, taker_fee_rate=0.001)
+        simulator.process(_snapshot())
+        return simulator
+
+    def test_market_order_walks_the_book_after_latency(self):
+        """Tests that a market order fills at the book as of its arrival, level by level."""
+        simulator = self._simulator()
+        order_id = simulator.submit_market("BUY", 3.0, 0)
+        simulator.process(_diff(101, 101, 5, asks=[(101.0, 0)])) # Best ask lifted before the order arrives
+        self.assertEqual(simulator.orders[order_id]["status"], "PENDING")
+        simulator.process(_diff(102, 102, 10))
+        self.assertEqual([(f["price"], f["quantity"]) for f in simulator.fills], [(102.0, 3.0)])
+        self.assertAlmostEqual(simulator.cash, -306.0 - 0.306)
+
+        order_id = simulator.submit_market("SELL", 10.0, 10)
+        simulator.process(_diff(103, 103, 20))
+        self.assertEqual([(f["price"], f["quantity"]) for f in simulator.fills[1:]], [(99.0, 2.0), (98.0, 5.0), (97.0, 1.0)])
+        self.assertEqual(simulator.orders[order_id]["status"], "EXPIRED")
+        self.assertEqual(simulator.position, -5.0)
+
+    def test_limit_order_queue_position(self):
+        """Tests that a resting bid fills only after the quantity ahead of it has traded."""
+        simulator = self._simulator()
+        order_id = simulator.submit_limit("BUY", 99.0, 1.0, 0)
+        simulator.process(_diff(101, 101, 10, bids=[(99.0, 4)])) # The order arrives just before this diff
+        self.assertEqual(simulator.orders[order_id]["queue_ahead"], 2.0) # Joined behind the 2 shown on arrival
+        simulator.process(_trade(11, 99.0, 1.5, True))
+        simulator.process(_trade(12, 99.0, 1.0, False)) # A buy aggressor does not touch the bids
+        self.assertEqual(simulator.fills, [])
+        simulator.process(_diff(102, 102, 13, bids=[(99.0, 0.2)])) # Cancellations shrink the level below the queue
+        self.assertAlmostEqual(simulator.orders[order_id]["queue_ahead"], 0.2)
+        simulator.process(_trade(14, 99.0, 0.7, True))
+        self.assertEqual([(f["price"], f["liquidity"]) for f in simulator.fills], [(99.0, "maker")])
+        self.assertAlmostEqual(simulator.fills[0]["quantity"], 0.5)
+        simulator.process(_trade(15, 98.5, 3.0, True)) # Traded through the bid
+        self.assertEqual(simulator.orders[order_id]["status"], "FILLED")
+        self.assertEqual(simulator.position, 1.0)
+
+    def test_marketable_limit_cancel_and_cross(self):
+        """Tests a limit that partly takes, a cancel in flight, and a fill when the book crosses the order."""
+        simulator = self._simulator()
+        taker = simulator.submit_limit("BUY", 101.0, 2.0, 0)
+        simulator.process(_diff(101, 101, 10))
+        self.assertEqual([(f["price"], f["liquidity"]) for f in simulator.fills], [(101.0, "taker")])
+        self.assertEqual(simulator.orders[taker]["status"], "OPEN") # 1 left resting at 101
+
+        simulator.cancel(taker, 10)
+        simulator.process(_diff(102, 102, 15, asks=[(100.5, 2)])) # Crosses the bid before the cancel arrives
+        self.assertEqual(simulator.orders[taker]["status"], "FILLED")
+        self.assertEqual(simulator.fills[-1]["price"], 101.0)
+        simulator.process(_diff(103, 103, 20))
+        self.assertEqual(simulator.orders[taker]["status"], "FILLED")
+
+        resting = simulator.submit_limit("SELL", 105.0, 1.0, 20)
+        simulator.cancel(resting, 25)
+        simulator.process(_diff(104, 104, 40))
+        self.assertEqual(simulator.orders[resting]["status"], "CANCELED")
+        self.assertEqual(simulator.position, 2.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+from parameter_sweep import SweepRunner, evaluate, parameter_grid, strategy_positions
+
+class ParameterSweepTest(unittest.TestCase):
+
+    def setUp(self):
+        """Create six days of synthetic 10-second ticks for each test."""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.checkpoint_path = os.path.join(self.tmp_dir, 'sweep.jsonl')
+        rng = np.random.default_rng(21)
+        ticks = 6 * 8640 + 1 # Through midnight at the end of day six
+        self.market_data = pd.DataFrame({'price': 40000 + rng.normal(0, 3, ticks).cumsum()},
+                                        index=pd.date_range('2026-01-01', periods=ticks, freq='10s'))
+        self.grid = parameter_grid({"stop_loss": [0.0002, 0.002], "time_exit_seconds": [60, 600],
+                                    "leverage_cap": [0.1]})
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_exits(self):
+        """Tests that trades close at the stop-loss or the time exit, whichever comes first."""
+        prices = np.array([100.0] * 50 + [101.0, 101.5, 102.0, 100.8, 103.0, 104.0, 105.0, 106.0])
+        timestamps = np.arange(len(prices), dtype=np.int64) * 10 ** 9
+        positions = strategy_positions(prices, timestamps, stop_loss=0.01, time_exit_seconds=100, leverage_cap=1.0,
+                                       initial_capital=1010.0)
+        # Long 10 units from tick 50 at 101.0; the drop to 100.8 is under the 1% stop, so it holds to the time exit
+        np.testing.assert_array_equal(positions[50:58], [10.0] * 8)
+        positions = strategy_positions(prices, timestamps, stop_loss=0.001, time_exit_seconds=100, leverage_cap=1.0,
+                                       initial_capital=1010.0)
+        np.testing.assert_array_equal(positions[50:58], [10.0, 10.0, 10.0, 0.0, 0.0, 0.0, 0.0, 0.0])
+        positions = strategy_positions(prices, timestamps, stop_loss=0.01, time_exit_seconds=2, leverage_cap=1.0,
+                                       initial_capital=1010.0)
+        np.testing.assert_array_equal(positions[50:54], [10.0, 10.0, 0.0, 0.0])
+
+    def test_parallel_sweep_matches_serial_and_resumes(self):
+        """Tests that pooled results equal direct evaluation, are ranked, and are reused from the checkpoint."""
+        runner = SweepRunner(self.market_data, checkpoint_path=self.checkpoint_path, processes=2, fee_rate=0.0)
+        table = runner.sweep(self.grid)
+        self.assertEqual(len(table), 4)
+        self.assertTrue(table['sharpe_ratio'].is_monotonic_decreasing)
+
+        prices = self.market_data['price'].to_numpy()
+        timestamps = self.market_data.index.to_numpy(dtype='datetime64[ns]').view(np.int64)
+        for _, row in table.iterrows():
+            params = {key: row[key] for key in self.grid[0]}
+            self.assertEqual(evaluate(prices, timestamps, params, fee_rate=0.0)["final_equity"], row['final_equity'])
+
+        with open(self.checkpoint_path, 'r') as f:
+            self.assertEqual(len(f.readlines()), 4)
+        # Drop one finished run and add a torn line, as if the sweep had been killed mid-write
+        with open(self.checkpoint_path, 'r') as f:
+            lines = f.readlines()
+        with open(self.checkpoint_path, 'w') as f:
+            f.writelines(lines[:3] + [lines[3][:20]])
+        resumed = SweepRunner(self.market_data, checkpoint_path=self.checkpoint_path, processes=2,
+                              fee_rate=0.0).sweep(self.grid)
+        pd.testing.assert_frame_equal(resumed, table)
+        with open(self.checkpoint_path, 'r') as f:
+            self.assertEqual(sum(1 for line in f if line.endswith('\n') and json.loads(line)), 4)
+
+    def test_walk_forward(self):
+        """Tests rolling windows and that each test period uses the best in-sample parameters."""
+        runner = SweepRunner(self.market_data, processes=2, fee_rate=0.0)
+        windows = runner.walk_forward_windows(train_days=3, test_days=1)
+        self.assertEqual(len(windows), 3)
+        self.assertEqual(windows[0][0][1], windows[0][1][0])
+        results = runner.walk_forward(self.grid, train_days=3, test_days=1)
+        self.assertEqual(list(results['test_start'].dt.strftime('%Y-%m-%d')), ['2026-01-04', '2026-01-05', '2026-01-06'])
+        train_table = runner.sweep(self.grid, windows[0][0])
+        self.assertEqual(results['train_sharpe_ratio'].iloc[0], train_table['sharpe_ratio'].iloc[0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+from unittest import mock
+from src.dvp_model import DVP, build_step_data, calculate_k_factor
+from src.reputation import ReputationStore, DECAY_FACTOR, DECAY_PERIOD_SECONDS
+
+class ReputationStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.reputation = ReputationStore()
+        self.start = 1000 * DECAY_PERIOD_SECONDS # Start of a decay period
+
+    def test_lazy_decay_matches_closed_form(self):
+        """Tests +1 per contribution and 10% decay per elapsed 30-day period."""
+        for _ in range(3):
+            self.reputation.credit("did:a", self.start)
+        self.assertEqual(self.reputation.karma("did:a", self.start + DECAY_PERIOD_SECONDS - 1), 3)
+        self.assertAlmostEqual(self.reputation.karma("did:a", self.start + 2 * DECAY_PERIOD_SECONDS),
+                               3 * DECAY_FACTOR ** 2)
+
+        self.reputation.credit("did:a", self.start + DECAY_PERIOD_SECONDS)
+        self.assertAlmostEqual(self.reputation.karma("did:a", self.start + 3 * DECAY_PERIOD_SECONDS),
+                               (3 * DECAY_FACTOR + 1) * DECAY_FACTOR ** 2)
+        self.assertEqual(self.reputation.karma("did:unknown", self.start), 0)
+
+    def test_k_factor_memoized_until_karma_changes(self):
+        """Tests that K-Factors are cached per period and recomputed after a credit."""
+        self.reputation.credit("did:a", self.start)
+        with mock.patch('src.reputation.calculate_k_factor', wraps=calculate_k_factor) as compute:
+            first = self.reputation.k_factor("did:a", self.start)
+            self.assertEqual(self.reputation.k_factor("did:a", self.start + 60), first)
+            self.assertEqual(compute.call_count, 1)
+
+            self.reputation.credit("did:a", self.start + 60)
+            self.assertEqual(self.reputation.k_factor("did:a", self.start + 60), calculate_k_factor(2))
+            self.assertLess(self.reputation.k_factor("did:a", self.start + DECAY_PERIOD_SECONDS), calculate_k_factor(2))
+            self.assertEqual(compute.call_count, 3)
+
+    def test_lineage_steps_use_agent_karma(self):
+        """Tests that add_lineage_step weights by the agent's Karma and the ledger rebuild credits it."""
+        reputation = ReputationStore()
+        dvp = DVP(claim_text="Reputation claim", agent_karma=50)
+        for score in (0.05, -0.05, 0.05):
+            step = build_step_data(dvp.id, len(dvp.lineage), "FunctionalAudit", "did:synergy:ffg-node-a",
+                                   score, "uri:audit")
+            dvp.add_lineage_step(step, reputation)
+            reputation.record_step(step)
+
+        self.assertEqual([step['k_factor_applied'] for step in dvp.lineage],
+                         [calculate_k_factor(0), calculate_k_factor(1), calculate_k_factor(1)])
+        self.assertEqual(reputation.karma("did:synergy:ffg-node-a"), 2)
+        rebuilt = ReputationStore.from_ledger({dvp.id: dvp.to_json()})
+        self.assertEqual(rebuilt.karma("did:synergy:ffg-node-a"), 2)
+
+    def test_listener_follows_ledger_records(self):
+        """Tests that reset rebuilds Karma from scratch and apply credits applied step records only."""
+        self.reputation.credit("did:stale", self.start)
+        dvp = DVP(claim_text="Listener claim")
+        ledger = {dvp.id: dvp.to_json()}
+        self.reputation.reset(ledger)
+        self.assertNotIn("did:stale", self.reputation)
+
+        for score in (0.05, -0.05):
+            step = build_step_data(dvp.id, len(dvp.lineage), "FunctionalAudit", "did:a", score, "uri:audit")
+            dvp.add_lineage_step(step)
+            self.reputation.apply({"op": "step", "id": dvp.id, "step": step}, ledger)
+        self.reputation.apply({"op": "step", "id": "missing", "step": step}, ledger)
+        self.reputation.apply({"op": "create", "dvp": dvp.to_json()}, ledger)
+        self.assertEqual(self.reputation.karma("did:a"), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+import math
+import numpy as np
+from risk_engine import RollingRiskEstimator, rolling_position_limits
+
+class RollingRiskEstimatorTest(unittest.TestCase):
+
+    def _expected(self, window_returns, confidence):
+        ordered = np.sort(window_returns)
+        k = max(1, math.ceil((1 - confidence) * len(ordered) - 1e-9))
+        return -ordered[k - 1], -ordered[:k].mean()
+
+    def test_matches_sorted_window(self):
+        """Tests VaR and CVaR against sorting the window from scratch, through warm-up, eviction and ties."""
+        rng = np.random.default_rng(5)
+        returns = np.round(rng.standard_t(3, 2000) * 0.001, 5) # Fat tails, many ties
+        for window, confidence in ((50, 0.9), (200, 0.99), (7, 0.5), (1, 0.99)):
+            estimator = RollingRiskEstimator(window, confidence, min_observations=1)
+            for t, value in enumerate(returns):
+                estimator.update_return(value)
+                var, cvar = self._expected(returns[max(0, t + 1 - window):t + 1], confidence)
+                self.assertAlmostEqual(estimator.var, var, places=12)
+                self.assertAlmostEqual(estimator.cvar, cvar, places=12)
+            self.assertEqual(len(estimator), window)
+
+    def test_position_sizing(self):
+        """Tests the price-horizon returns and that the CVaR loss of the max position equals the budget."""
+        estimator = RollingRiskEstimator(window=100, confidence=0.99, horizon=2, min_observations=10)
+        prices = [100.0, 101.0, 99.0, 100.0, 98.0, 102.0, 100.0, 101.0, 97.0, 99.0, 100.0, 103.0]
+        for price in prices[:-1]:
+            estimator.update_price(price)
+        self.assertFalse(estimator.ready) # 9 two-tick returns so far
+        self.assertEqual(estimator.max_position_size(100.0, 10000.0), 0.0)
+        estimator.update_price(prices[-1])
+        self.assertAlmostEqual(estimator.var, 1 - 97.0 / 100.0) # 100 -> 97 over two ticks
+        self.assertAlmostEqual(estimator.max_position_notional(10000.0) * estimator.cvar, 0.02 * 10000.0)
+        self.assertEqual(estimator.max_position_notional(10000.0, leverage_cap=0.5), 5000.0)
+
+        limits = rolling_position_limits(prices, 10000.0, RollingRiskEstimator(100, horizon=2, min_observations=10))
+        self.assertEqual(list(limits[:11]), [0.0] * 11)
+        self.assertAlmostEqual(limits[-1], estimator.max_position_size(prices[-1], 10000.0))
+
+if __name__ == '__main__':
+    unittest.main()
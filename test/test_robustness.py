@@ -0,0 +1,56 @@
+import unittest
+import numpy as np
+import pandas as pd
+from backtesting_framework import compute_performance_metrics
+from robustness import path_metrics, resample_metrics, resample_paths, robustness_report
+
+class RobustnessTest(unittest.TestCase):
+
+    def test_path_metrics_match_batch_metrics(self):
+        """Tests the row-wise metrics against compute_performance_metrics, including degenerate rows."""
+        rng = np.random.default_rng(1)
+        paths = np.vstack([rng.normal(0.001, 0.02, (20, 60)),
+                           np.full(60, 0.001), # No losing day: NaN downside deviation
+                           np.r_[-0.01, np.full(59, 0.002)], # One losing day
+                           np.zeros(60)]) # Zero std
+        metrics = path_metrics(paths, ruin_limit=0.05)
+        for i, row in enumerate(paths):
+            expected = compute_performance_metrics(pd.Series(row))
+            for name, value in expected.items():
+                np.testing.assert_allclose(metrics[name][i], value, rtol=1e-9, atol=1e-12, err_msg=name)
+            drawdown = np.cumprod(1 + row) / np.maximum.accumulate(np.cumprod(1 + row)) - 1
+            hits = np.flatnonzero(drawdown <= -0.05)
+            self.assertEqual(metrics["time_to_ruin"][i], hits[0] + 1 if len(hits) else np.inf)
+
+    def test_resampling(self):
+        """Tests that block paths are runs of consecutive days and permutation paths reorder every day."""
+        returns = np.arange(10, dtype=np.float64)
+        rng = np.random.default_rng(2)
+        blocks = resample_paths(returns, 50, rng, 'block', block_length=4, horizon=22)
+        self.assertEqual(blocks.shape, (50, 22))
+        steps = (np.diff(blocks, axis=1) % 10).reshape(50, -1)
+        for offset in (0, 1, 2): # Within a block of 4 every step is +1 (wrapping around)
+            np.testing.assert_array_equal(steps[:, offset::4][:, :5], 1)
+        permuted = resample_paths(returns, 50, rng, 'permutation')
+        np.testing.assert_array_equal(np.sort(permuted, axis=1), np.broadcast_to(returns, (50, 10)))
+        self.assertGreater(len({tuple(row) for row in permuted}), 40)
+        with self.assertRaises(ValueError):
+            resample_paths(returns, 5, rng, 'jackknife')
+
+    def test_chunks_and_processes_agree(self):
+        """Tests that a process pool reproduces the serial run, and the report's shape."""
+        returns = np.random.default_rng(3).normal(0.0005, 0.01, 120)
+        serial = resample_metrics(returns, n_paths=900, seed=7, chunk_paths=200)
+        parallel = resample_metrics(returns, n_paths=900, seed=7, chunk_paths=200, processes=2)
+        for name, values in serial.items():
+            self.assertEqual(len(values), 900)
+            np.testing.assert_array_equal(values, parallel[name])
+
+        report = robustness_report(pd.Series(returns), n_paths=2000, seed=1)
+        sharpe = report.loc["sharpe_ratio"]
+        self.assertTrue(sharpe["ci_low"] < sharpe["median"] < sharpe["ci_high"])
+        self.assertAlmostEqual(sharpe["observed"], compute_performance_metrics(pd.Series(returns))["sharpe_ratio"])
+        self.assertTrue(0 <= report.loc["ruin_probability", "mean"] <= 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import unittest
+import multiprocessing
+import os
+import shutil
+import tempfile
+from src.dvp_model import DVP, build_step_data
+from src.ledger_codec import write_ledger_file
+from src.ledger_store import LedgerStore, AmbiguousIdError
+from src.ledger_index import LedgerIndex
+from src.sharded_store import ShardedLedgerStore, shard_of
+
+def _count_dvps(ledger):
+    return len(ledger)
+
+def _write_steps(path, dvp_ids, started, stop, written):
+    """Appends numbered steps round-robin until told to stop, from another process."""
+    with ShardedLedgerStore(path) as store:
+        n = 0
+        while not stop.is_set() or n < 50:
+            store.append_step(dvp_ids[n % len(dvp_ids)], {"n": n}, 0.5)
+            n += 1
+            if n == 50:
+                started.set()
+        written.value = n
+
+class ShardedLedgerStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.store_path = os.path.join(self.tmp_dir, 'ledger')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _dvps(self, count):
+        return [DVP(claim_text=f"Sharded claim {i}") for i in range(count)]
+
+    def test_routing_point_operations_and_parallel_load(self):
+        """Tests that DVPs land in their shard, point operations and loads agree, and pools give the same result."""
+        dvps = self._dvps(300)
+        with ShardedLedgerStore(self.store_path, shards=16, workers=2) as store:
+            for dvp in dvps:
+                store.append_create(dict(dvp.to_json(), lineage=[]))
+            step = build_step_data(dvps[0].id, 0, "PeerReview", "did:synergy:node-a", 0.1, "uri:vc")
+            store.update(dvps[0].id, lambda dvp_data: (step, 0.6))
+            self.assertEqual(store.shards, 16)
+            self.assertEqual(store.version(dvps[0].id), 1)
+            self.assertEqual(store.get(dvps[1].id)['claim_text'], "Sharded claim 1")
+            self.assertIsNone(store.get("not-an-id"))
+            self.assertEqual(store.resolve_id(dvps[2].id[:10]), dvps[2].id)
+            with self.assertRaises(AmbiguousIdError) as raised:
+                store.resolve_id(dvps[3].id[:1])
+            self.assertEqual(set(raised.exception.candidates),
+                             {dvp.id for dvp in dvps if dvp.id.startswith(dvps[3].id[:1])})
+            self.assertEqual(sum(store.scan(_count_dvps)), 300)
+            store.compact() # In worker processes: the ledger is not loaded here
+
+        for i, path in enumerate(sorted(os.listdir(os.path.join(self.store_path, 'gen-0001')))):
+            with LedgerStore(os.path.join(self.store_path, 'gen-0001', path)) as shard:
+                self.assertTrue(all(shard_of(dvp_id, 16) == i for dvp_id in shard.load()))
+
+        with ShardedLedgerStore(self.store_path, workers=2) as parallel, \
+                ShardedLedgerStore(self.store_path, workers=1) as sequential:
+            index = LedgerIndex()
+            parallel.add_listener(index)
+            self.assertEqual(dict(parallel.load()), dict(sequential.load()))
+            self.assertEqual(len(parallel), 300)
+            self.assertEqual(parallel.load()[dvps[0].id]['current_confidence'], 0.6)
+            sequential.append_create(dvps[0].to_json() | {"id": "0" * 64, "lineage": []})
+            self.assertIn("0" * 64, parallel.load())
+            self.assertEqual(len(list(index.query(process_type="PeerReview"))), 1)
+
+    def test_new_store_imports_legacy_ledger(self):
+        """Tests that a new sharded store is seeded from the legacy whole-file ledger."""
+        dvps = self._dvps(40)
+        legacy_path = os.path.join(self.tmp_dir, 'ledger.json')
+        write_ledger_file([dvp.to_json() for dvp in dvps], legacy_path)
+        with ShardedLedgerStore(self.store_path, shards=8, legacy_path=legacy_path) as store:
+            self.assertEqual(store.shards, 8)
+            self.assertEqual(set(store.load()), {dvp.id for dvp in dvps})
+
+    def test_online_reshard_with_concurrent_writer(self):
+        """Tests resharding an unsharded store twice while another process appends steps: nothing lost or doubled."""
+        dvps = self._dvps(20)
+        with LedgerStore(self.store_path) as unsharded:
+            for dvp in dvps:
+                unsharded.append_create(dict(dvp.to_json(), lineage=[]))
+        ids = [dvp.id for dvp in dvps]
+
+        store = ShardedLedgerStore(self.store_path, shards=16)
+        self.assertEqual(store.shards, 1) # An existing unsharded store is not resharded on open
+        index = LedgerIndex()
+        store.add_listener(index)
+        ledger = store.load()
+        started, stop, written = multiprocessing.Event(), multiprocessing.Event(), multiprocessing.Value('i', 0)
+        writer = multiprocessing.Process(target=_write_steps, args=(self.store_path, ids, started, stop, written))
+        writer.start()
+        try:
+            self.assertTrue(started.wait(30))
+            self.assertEqual(store.reshard(4), 1)
+            self.assertEqual(store.reshard(7), 4)
+        finally:
+            stop.set()
+            writer.join(30)
+        self.assertEqual(writer.exitcode, 0)
+
+        expected = {dvp_id: [n for n in range(written.value) if ids[n % len(ids)] == dvp_id] for dvp_id in ids}
+        self.assertIs(store.load(), ledger)
+        with ShardedLedgerStore(self.store_path) as reopened:
+            self.assertEqual(reopened.shards, 7)
+            for source in (store.load(), reopened.load()):
+                self.assertEqual({dvp_id: [step['n'] for step in dvp['lineage']] for dvp_id, dvp in source.items()},
+                                 expected)
+        self.assertEqual(len(list(index.query())), len(ids))
+        self.assertFalse(any(name.startswith(('snapshot-', 'segment-')) for name in os.listdir(self.store_path)))
+        with self.assertRaises(Exception):
+            LedgerStore(self.store_path).append_create(dvps[0].to_json())
+        store.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+import io
+import json
+import os
+import shutil
+import tempfile
+from src.dvp_model import DVP
+from src.ledger_store import LedgerStore
+from src.sl_cli import batch_add_steps
+
+class BatchAddStepsTest(unittest.TestCase):
+
+    def setUp(self):
+        """Create a store holding one DVP for each test."""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.store = LedgerStore(os.path.join(self.tmp_dir, 'ledger'), fsync=True)
+        self.dvp = DVP(claim_text="Batch claim")
+        self.store.append_create(self.dvp.to_json())
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def _row(self, **overrides):
+        row = {
+            "dvp_id": self.dvp.id,
+            "process_type": "FunctionalAudit",
+            "agent_did": "did:synergy:ffg-node-a",
+            "score_change": 0.05,
+            "attestation_uri": "uri:audit"
+        }
+        row.update(overrides)
+        return json.dumps(row)
+
+    def test_valid_and_invalid_rows(self):
+        """Tests that valid rows are applied in order and each bad row is rejected with its line number."""
+        lines = [
+            self._row(),
+            '{"dvp_id": ',
+            json.dumps({"dvp_id": self.dvp.id, "process_type": "FunctionalAudit"}),
+            self._row(dvp_id='0' * 64),
+            self._row(score_change="nan"),
+            self._row(agent_did=42),
+            "",
+            self._row(score_change=-0.10),
+        ]
+        summary = batch_add_steps(io.StringIO("\n".join(lines) + "\n"), chunk_size=1, store=self.store)
+
+        self.assertEqual(summary["applied"], 2)
+        self.assertEqual([line for line, _ in summary["rejected"]], [2, 3, 4, 5, 6])
+        self.assertIn("missing field(s)", summary["rejected"][1][1])
+        self.assertIn("not found", summary["rejected"][2][1])
+
+        lineage = self.store.get(self.dvp.id)['lineage']
+        self.assertEqual([step['result_score_change'] for step in lineage], [0.05, -0.10])
+        self.assertEqual(lineage[1]['step_id'], f"functionalaudit-{self.dvp.id}-2")
+
+    def test_chunk_size_must_be_positive(self):
+        """Tests that a zero chunk size is rejected instead of dividing by zero."""
+        with self.assertRaises(ValueError):
+            batch_add_steps(io.StringIO(self._row()), chunk_size=0, store=self.store)
+
+if __name__ == '__main__':
+    unittest.main()
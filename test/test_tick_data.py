@@ -0,0 +1,64 @@
+import unittest
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+from tick_data import TickDataCache
+
+class TickDataCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        """Write a small three-day tick CSV for each test."""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.csv_path = os.path.join(self.tmp_dir, 'ticks.csv')
+        rng = np.random.default_rng(7)
+        timestamps = pd.date_range('2026-01-01 22:00', periods=60, freq='90min')
+        self.ticks = pd.DataFrame({
+            'timestamp': timestamps,
+            'price': 40000 + rng.normal(0, 100, len(timestamps)).cumsum(),
+            'volume': rng.integers(10, 100, len(timestamps)).astype(float),
+            'order_flow_delta': rng.uniform(-1, 1, len(timestamps))
+        }).set_index('timestamp')
+        self.ticks.index = self.ticks.index.astype('datetime64[ns]') # The cache stores nanoseconds
+        # Two rows out of order, as exports occasionally are
+        rows = self.ticks.reset_index()
+        rows.iloc[[5, 6]] = rows.iloc[[6, 5]].to_numpy()
+        rows.to_csv(self.csv_path, index=False)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_cache_round_trip_and_time_slices(self):
+        """Tests that chunked conversion keeps every tick, sorted, and that ranges read only the matching rows."""
+        cache = TickDataCache(self.csv_path, chunk_rows=7)
+        self.assertFalse(cache.is_fresh())
+        self.assertEqual(cache.days(), ['2026-01-01', '2026-01-02', '2026-01-03', '2026-01-04', '2026-01-05'])
+        self.assertTrue(cache.is_fresh())
+        self.assertEqual(len(cache), len(self.ticks))
+        pd.testing.assert_frame_equal(cache.load(), self.ticks, check_freq=False)
+
+        start, end = '2026-01-02 12:00', '2026-01-04 03:00'
+        expected = self.ticks[(self.ticks.index >= start) & (self.ticks.index < end)]
+        pd.testing.assert_frame_equal(cache.load(start, end), expected, check_freq=False)
+        self.assertEqual(sum(len(frame) for frame in cache.iter_frames(start, end)), len(expected))
+        self.assertEqual(len(cache.load('2027-01-01')), 0)
+
+        # Columns are memory-mapped from the cache
+        first = next(cache.iter_columns())
+        self.assertIsInstance(first['price'].base, np.memmap)
+
+    def test_rebuilds_when_csv_changes(self):
+        """Tests that a changed CSV invalidates the cache, and that epoch-millisecond timestamps are parsed."""
+        TickDataCache(self.csv_path).ensure()
+        rows = pd.DataFrame({'timestamp': [1767225600000, 1767225601500], 'price': [1.0, 2.0],
+                             'volume': [3.0, 4.0], 'order_flow_delta': [0.5, -0.5]})
+        rows.to_csv(self.csv_path, index=False)
+        cache = TickDataCache(self.csv_path)
+        self.assertFalse(cache.is_fresh())
+        frame = cache.load()
+        self.assertEqual(list(frame.index), [pd.Timestamp('2026-01-01 00:00:00'), pd.Timestamp('2026-01-01 00:00:01.5')])
+        self.assertEqual(list(frame['price']), [1.0, 2.0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+import numpy as np
+import pandas as pd
+from backtesting_framework import simulate_positions
+from vector_env import VectorBacktestingEnvironment
+
+class VectorEnvironmentTest(unittest.TestCase):
+
+    def _frame(self, ticks, seed):
+        rng = np.random.default_rng(seed)
+        return pd.DataFrame({
+            'price': 100 + rng.normal(0, 1, ticks).cumsum(),
+            'volume': rng.integers(1, 10, ticks).astype(float),
+            'order_flow_delta': rng.uniform(-1, 1, ticks)
+        }, index=pd.date_range('2026-01-01', periods=ticks, freq='s', name='timestamp'))
+
+    def test_batched_steps_match_single_backtests(self):
+        """Tests that each environment's episode equals a vectorized backtest of the same positions."""
+        frames = [self._frame(30, 1), self._frame(45, 2), self._frame(30, 3)]
+        env = VectorBacktestingEnvironment(frames, initial_capital=1000.0, window=4, max_position=2.0, fee_rate=0.001)
+        observations = env.reset()
+        self.assertEqual(observations.shape, (3, 4, 3))
+        # The lookback before the first tick repeats it
+        np.testing.assert_array_equal(observations[1, :, 0], [frames[1]['price'].iloc[0]] * 4)
+
+        rng = np.random.default_rng(9)
+        actions = rng.uniform(-3, 3, (44, 3)) # Clipped to +/- 2
+        final = [None] * 3
+        total_rewards = np.zeros(3)
+        for t in range(44):
+            observations, rewards, dones, info = env.step(actions[t])
+            for i in np.flatnonzero(dones):
+                if final[i] is None:
+                    final[i] = (t, info['final_equity'][i], total_rewards[i] + rewards[i])
+            total_rewards += rewards
+            if t == 5:
+                np.testing.assert_array_equal(observations[0, :, 0], frames[0]['price'].iloc[3:7].to_numpy())
+
+        for i, frame in enumerate(frames):
+            steps, final_equity, reward_sum = final[i]
+            self.assertEqual(steps, len(frame) - 2)
+            positions = np.clip(actions[:len(frame) - 1, i], -2, 2)
+            equity, _, _ = simulate_positions(frame['price'].to_numpy(), np.append(positions, positions[-1]),
+                                              1000.0, fee_rate=0.001)
+            self.assertAlmostEqual(final_equity, equity[-1], places=9)
+            self.assertAlmostEqual(reward_sum, equity[-1] - 1000.0, places=9)
+
+        # Environments 0 and 2 were reset after 29 steps and have run 15 steps of a new episode
+        np.testing.assert_array_equal(env.cursor, [15, 0, 15])
+
+    def test_random_windows_and_validation(self):
+        """Tests seeded window sampling and rejection of bad shapes."""
+        frame = self._frame(100, 4)
+        first = VectorBacktestingEnvironment.random_windows(frame, 8, 20, seed=5)
+        second = VectorBacktestingEnvironment.random_windows(frame, 8, 20, seed=5)
+        np.testing.assert_array_equal(first.features, second.features)
+        self.assertEqual(first.features.shape, (160, 3))
+        with self.assertRaises(ValueError):
+            first.step(np.zeros(7))
+        with self.assertRaises(ValueError):
+            VectorBacktestingEnvironment.random_windows(frame, 2, 101)
+
+if __name__ == '__main__':
+    unittest.main()
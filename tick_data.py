@@ -0,0 +1,188 @@
+# tick_data.py
+# Phase 2 of ATS Strategy: Streaming tick-data loader with a columnar on-disk cache
+
+import json
+import os
+import shutil
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# --- Tick Schema ---
+# One row per tick: timestamp, price, volume, order_flow_delta. Timestamps may be
+# ISO-8601 strings or integer epoch milliseconds (the Binance export convention)
+# and are stored as naive UTC datetime64[ns].
+TICK_COLUMNS = ('timestamp', 'price', 'volume', 'order_flow_delta')
+VALUE_DTYPES = {'price': np.float64, 'volume': np.float64, 'order_flow_delta': np.float64}
+DEFAULT_CHUNK_ROWS = 1_000_000
+
+# --- Columnar Cache Layout ---
+# <csv path>.cache/
+#   manifest.json            source size/mtime (staleness check) and rows per day
+#   2026-01-01/price.npy ... one .npy per column per UTC day, sorted by timestamp
+#
+# The CSV is read once, in chunks with explicit dtypes, and spooled into raw
+# per-day column files; each day is then sorted and saved as .npy. Later runs open
+# the .npy files with mmap_mode='r', so startup does not depend on the file size,
+# and a time-range query only touches the days it overlaps.
+CACHE_SUFFIX = '.cache'
+MANIFEST_FILE = 'manifest.json'
+CACHE_FORMAT_VERSION = 1
+
+
+def _parse_timestamps(values: pd.Series) -> np.ndarray:
+    if pd.api.types.is_numeric_dtype(values):
+        return pd.to_datetime(values, unit='ms').to_numpy(dtype='datetime64[ns]')
+    return pd.to_datetime(values, utc=True).dt.tz_localize(None).to_numpy(dtype='datetime64[ns]')
+
+
+def iter_tick_chunks(csv_path: str, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Iterator[Dict[str, np.ndarray]]:
+    """Streams a tick CSV as dicts of column arrays, `chunk_rows` rows at a time."""
+    reader = pd.read_csv(csv_path, usecols=list(TICK_COLUMNS), dtype=VALUE_DTYPES, chunksize=chunk_rows)
+    for chunk in reader:
+        columns = {'timestamp': _parse_timestamps(chunk['timestamp'])}
+        for name in VALUE_DTYPES:
+            columns[name] = chunk[name].to_numpy()
+        yield columns
+
+
+def _to_datetime64(value) -> Optional[np.datetime64]:
+    if value is None:
+        return None
+    timestamp = pd.Timestamp(value)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert('UTC').tz_localize(None)
+    return timestamp.to_datetime64()
+
+
+class TickDataCache:
+    """
+    Per-day, per-column .npy cache of a tick CSV, built on first use.
+
+    `start` bounds are inclusive and `end` bounds exclusive; both accept anything
+    pandas.Timestamp does ("2026-01-02", datetimes, ISO strings).
+    """
+
+    def __init__(self, csv_path: str, cache_dir: Optional[str] = None, chunk_rows: int = DEFAULT_CHUNK_ROWS):
+        self.csv_path = csv_path
+        self.cache_dir = cache_dir or csv_path + CACHE_SUFFIX
+        self.chunk_rows = chunk_rows
+        self._manifest: Optional[dict] = None
+
+    # --- Building ---
+
+    def _source_signature(self) -> dict:
+        stat = os.stat(self.csv_path)
+        return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    def _read_manifest(self) -> Optional[dict]:
+        try:
+            with open(os.path.join(self.cache_dir, MANIFEST_FILE), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def is_fresh(self) -> bool:
+        """True if the cache exists and was built from the current CSV file."""
+        manifest = self._read_manifest()
+        return (manifest is not None and manifest.get("version") == CACHE_FORMAT_VERSION
+                and manifest.get("source") == self._source_signature())
+
+    def ensure(self) -> dict:
+        """Builds (or rebuilds, if the CSV changed) the cache; returns its manifest."""
+        if self._manifest is None:
+            if not self.is_fresh():
+                self.build()
+            self._manifest = self._read_manifest()
+        return self._manifest
+
+    def build(self):
+        """Converts the CSV into the columnar cache in one streaming pass."""
+        source = self._source_signature()
+        tmp_dir = self.cache_dir + '.tmp'
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        rows: Dict[str, int] = {}
+        try:
+            # 1. Spool each chunk's rows into raw per-day column files
+            for columns in iter_tick_chunks(self.csv_path, self.chunk_rows):
+                days = columns['timestamp'].astype('datetime64[D]')
+                # Ticks are normally in time order, so a chunk splits into a few contiguous runs
+                boundaries = np.flatnonzero(days[1:] != days[:-1]) + 1
+                for lo, hi in zip(np.r_[0, boundaries], np.r_[boundaries, len(days)]):
+                    day = str(days[lo])
+                    day_dir = os.path.join(tmp_dir, day)
+                    if day not in rows:
+                        os.makedirs(day_dir)
+                        rows[day] = 0
+                    for name in TICK_COLUMNS:
+                        with open(os.path.join(day_dir, name + '.raw'), 'ab') as f:
+                            columns[name][lo:hi].tofile(f)
+                    rows[day] += int(hi - lo)
+
+            # 2. Sort each day by time and save its columns as .npy
+            for day in rows:
+                day_dir = os.path.join(tmp_dir, day)
+                columns = {name: np.fromfile(os.path.join(day_dir, name + '.raw'),
+                                             dtype='datetime64[ns]' if name == 'timestamp' else VALUE_DTYPES[name])
+                           for name in TICK_COLUMNS}
+                timestamps = columns['timestamp']
+                order = None if np.all(timestamps[1:] >= timestamps[:-1]) else np.argsort(timestamps, kind='stable')
+                for name, values in columns.items():
+                    np.save(os.path.join(day_dir, name + '.npy'), values if order is None else values[order])
+                    os.remove(os.path.join(day_dir, name + '.raw'))
+
+            manifest = {"version": CACHE_FORMAT_VERSION, "source": source, "columns": list(TICK_COLUMNS),
+                        "days": dict(sorted(rows.items()))}
+            with open(os.path.join(tmp_dir, MANIFEST_FILE), 'w') as f:
+                json.dump(manifest, f, indent=2)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        os.replace(tmp_dir, self.cache_dir)
+        self._manifest = None
+
+    # --- Reading ---
+
+    def days(self) -> List[str]:
+        """UTC days present in the data, oldest first."""
+        return list(self.ensure()["days"])
+
+    def __len__(self) -> int:
+        return sum(self.ensure()["days"].values())
+
+    def iter_columns(self, start=None, end=None) -> Iterator[Dict[str, np.ndarray]]:
+        """Yields one dict of memory-mapped column slices per day overlapping [start, end)."""
+        start, end = _to_datetime64(start), _to_datetime64(end)
+        first_day = start.astype('datetime64[D]') if start is not None else None
+        for day in self.ensure()["days"]:
+            day_value = np.datetime64(day, 'D')
+            if (first_day is not None and day_value < first_day) or (end is not None and day_value >= end):
+                continue
+            day_dir = os.path.join(self.cache_dir, day)
+            columns = {name: np.load(os.path.join(day_dir, name + '.npy'), mmap_mode='r') for name in TICK_COLUMNS}
+            timestamps = columns['timestamp']
+            lo = int(np.searchsorted(timestamps, start, side='left')) if start is not None else 0
+            hi = int(np.searchsorted(timestamps, end, side='left')) if end is not None else len(timestamps)
+            if hi > lo:
+                yield {name: values[lo:hi] for name, values in columns.items()}
+
+    def iter_frames(self, start=None, end=None) -> Iterator[pd.DataFrame]:
+        """Yields one timestamp-indexed DataFrame per day overlapping [start, end)."""
+        for columns in self.iter_columns(start, end):
+            yield _to_frame(columns)
+
+    def load(self, start=None, end=None) -> pd.DataFrame:
+        """Loads [start, end) into a single timestamp-indexed DataFrame."""
+        parts = list(self.iter_columns(start, end))
+        if not parts:
+            return _to_frame({name: np.array([], dtype='datetime64[ns]' if name == 'timestamp' else VALUE_DTYPES[name])
+                              for name in TICK_COLUMNS})
+        return _to_frame({name: np.concatenate([part[name] for part in parts]) for name in TICK_COLUMNS})
+
+
+def _to_frame(columns: Dict[str, np.ndarray]) -> pd.DataFrame:
+    return pd.DataFrame({name: np.asarray(columns[name]) for name in VALUE_DTYPES},
+                        index=pd.DatetimeIndex(np.asarray(columns['timestamp']), name='timestamp'))
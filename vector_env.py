@@ -0,0 +1,117 @@
+# vector_env.py
+# Phase 2 of ATS Strategy: Vectorized multi-environment stepping for batched DRL inference
+
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from backtesting_framework import BacktestingEnvironment, INITIAL_CAPITAL, TAKER_FEE_RATE
+
+# --- Vector Environment ---
+# Steps N independent simulations (different symbols, time windows or seeds) in
+# lockstep, gym VectorEnv style: each step() takes one action per environment and
+# returns stacked observations, rewards and done flags. Calling the policy once per
+# step on the whole batch replaces N calls to agent.get_action(tick).
+#
+# All state lives in arrays indexed by environment. The tick data of every
+# environment is concatenated into flat feature arrays, with offsets marking where
+# each environment's ticks start, so an observation is one fancy-indexing gather.
+#
+# Actions are target positions (signed, in units of the asset), clipped to
+# +/- max_position and filled at the current tick's price with a taker fee.
+# Rewards are the change in equity over the step. An environment that reaches its
+# last tick is reported done and automatically reset to its first tick.
+
+OBSERVATION_FEATURES = ('price', 'volume', 'order_flow_delta')
+
+
+class VectorBacktestingEnvironment:
+    """N backtests stepped together; observations have shape (N, window, len(OBSERVATION_FEATURES))."""
+
+    def __init__(self, frames: Sequence[pd.DataFrame], initial_capital: float = INITIAL_CAPITAL,
+                 window: int = 1, max_position: float = 1.0, fee_rate: float = TAKER_FEE_RATE):
+        if not frames:
+            raise ValueError("At least one environment is required.")
+        if window < 1:
+            raise ValueError("window must be at least 1")
+        lengths = np.array([len(frame) for frame in frames], dtype=np.int64)
+        if lengths.min() < 2:
+            raise ValueError("Every environment needs at least two ticks.")
+        self.num_envs = len(frames)
+        self.window = window
+        self.initial_capital = initial_capital
+        self.max_position = max_position
+        self.fee_rate = fee_rate
+
+        self.lengths = lengths
+        self.offsets = np.zeros(self.num_envs, dtype=np.int64)
+        np.cumsum(lengths[:-1], out=self.offsets[1:])
+        self.features = np.stack([np.concatenate([frame[name].to_numpy(dtype=np.float64) for frame in frames])
+                                  for name in OBSERVATION_FEATURES], axis=1) # (total ticks, features)
+        self.prices = np.ascontiguousarray(self.features[:, 0])
+        self._lookback = np.arange(window - 1, -1, -1, dtype=np.int64) # window-1 ... 0 ticks back
+
+        self.cursor = np.zeros(self.num_envs, dtype=np.int64) # Current tick of each environment
+        self.cash = np.full(self.num_envs, initial_capital, dtype=np.float64)
+        self.position = np.zeros(self.num_envs, dtype=np.float64)
+        self.equity = np.full(self.num_envs, initial_capital, dtype=np.float64)
+
+    @classmethod
+    def from_environments(cls, envs: Sequence[BacktestingEnvironment], **kwargs) -> 'VectorBacktestingEnvironment':
+        """Steps the market data already loaded by several BacktestingEnvironments."""
+        kwargs.setdefault('initial_capital', envs[0].initial_capital)
+        return cls([env.market_data for env in envs], **kwargs)
+
+    @classmethod
+    def random_windows(cls, market_data: pd.DataFrame, num_envs: int, length: int, seed: Optional[int] = None,
+                       **kwargs) -> 'VectorBacktestingEnvironment':
+        """num_envs windows of `length` ticks at random (seeded) start positions in one series."""
+        if length > len(market_data):
+            raise ValueError(f"Window of {length} ticks is longer than the data ({len(market_data)} ticks).")
+        starts = np.random.default_rng(seed).integers(0, len(market_data) - length + 1, num_envs)
+        return cls([market_data.iloc[start:start + length] for start in starts], **kwargs)
+
+    def _observe(self) -> np.ndarray:
+        # Ticks before an environment's first tick repeat the first tick
+        back = np.maximum(self.cursor[:, None] - self._lookback, 0)
+        return self.features[self.offsets[:, None] + back]
+
+    def _reset_envs(self, mask: np.ndarray):
+        self.cursor[mask] = 0
+        self.cash[mask] = self.initial_capital
+        self.position[mask] = 0.0
+        self.equity[mask] = self.initial_capital
+
+    def reset(self) -> np.ndarray:
+        """Resets every environment to its first tick and returns the first observations."""
+        self._reset_envs(np.ones(self.num_envs, dtype=bool))
+        return self._observe()
+
+    def step(self, actions) -> Tuple[np.ndarray, np.ndarray, np.ndarray, Dict[str, np.ndarray]]:
+        """
+        Applies one target position per environment and advances every environment one tick.
+
+        Returns (observations, rewards, dones, info). For environments that finished
+        this step, info['final_equity'] holds their closing equity (NaN elsewhere)
+        and the returned observation is already the first one of the next episode.
+        """
+        targets = np.clip(np.asarray(actions, dtype=np.float64), -self.max_position, self.max_position)
+        if targets.shape != (self.num_envs,):
+            raise ValueError(f"Expected {self.num_envs} actions, got shape {targets.shape}.")
+        price = self.prices[self.offsets + self.cursor]
+        trades = targets - self.position
+        fees = np.abs(trades) * price * self.fee_rate
+        self.cash -= trades * price + fees
+        self.position = targets
+
+        self.cursor += 1
+        equity = self.cash + self.position * self.prices[self.offsets + self.cursor]
+        rewards = equity - self.equity
+        self.equity = equity
+
+        dones = self.cursor >= self.lengths - 1
+        final_equity = np.where(dones, equity, np.nan)
+        if dones.any():
+            self._reset_envs(dones)
+        return self._observe(), rewards, dones, {"final_equity": final_equity, "fees": fees}